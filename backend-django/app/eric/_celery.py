@@ -51,6 +51,10 @@ app.conf.beat_schedule = {
         "task": "eric.dss.tasks.process_dir_metadata_etags",
         "schedule": 60 * 60 * 24,  # 24 hours
     },
+    "delete-unreferenced-blobs": {
+        "task": "eric.projects.tasks.delete_unreferenced_blobs",
+        "schedule": 60 * 60 * 6,  # 6 hours
+    },
     # "inactivate_user": {
     #     "task": "eric.userprofile.tasks.inactivate_user",
     #     "schedule": 60 * 60 * 24,  # 24 hours
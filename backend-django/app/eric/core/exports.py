@@ -0,0 +1,250 @@
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+"""
+Rendering and caching of PDF exports.
+
+Rendered exports are stored in EXPORT_CACHE_FOLDER. The file name is derived from the version of the exported element
+(including the related data its export template renders, e.g. its links) and a fingerprint of the user and their
+permissions, so repeated exports of an unchanged element are served from the cache. Cached exports of other versions
+of the element (and of the same user with other permissions) are removed whenever a new export is stored.
+
+Exports are either rendered within the request or by an export job (see eric.core.tasks.render_export_job), whose
+status is kept in the cache for EXPORT_JOB_TIMEOUT seconds.
+"""
+import hashlib
+import os
+import re
+import tempfile
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max, Q
+from django.http import FileResponse, HttpResponse
+from django.template.loader import render_to_string
+from django.utils.encoding import force_text
+
+from rest_framework import status
+
+from weasyprint import HTML
+
+from eric.core.signals import export_job_changed
+
+EXPORT_JOB_CACHE_KEY = "export_job_%s"
+
+EXPORT_JOB_STATUS_PENDING = "pending"
+EXPORT_JOB_STATUS_RUNNING = "running"
+EXPORT_JOB_STATUS_FINISHED = "finished"
+EXPORT_JOB_STATUS_FAILED = "failed"
+
+# a single byte range, e.g. "bytes=0-1023", "bytes=1024-" or "bytes=-1024"
+BYTE_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def get_export_file_name(obj):
+    """
+    Returns the file name of the PDF export of the given object (as presented to the user)
+    """
+    template_name = obj._meta.export_template
+
+    return f"{os.path.splitext(os.path.basename(template_name))[0]}-{obj.pk}.pdf"
+
+
+def get_export_user_fingerprint(user):
+    """
+    Returns a fingerprint of the user and their permissions, which changes whenever the project permissions or the
+    model privileges of the user change (so an export never contains elements the user is not allowed to view anymore)
+    """
+    from eric.projects.models.cache import get_model_privilege_version, get_project_permission_cache_version
+
+    fingerprint = f"{user.pk}:{get_project_permission_cache_version(user)}:{get_model_privilege_version(user)}"
+
+    return hashlib.sha256(fingerprint.encode()).hexdigest()[:32]
+
+
+def get_queryset_fingerprint(queryset, *fields):
+    """
+    Returns a fingerprint of the given fields of all rows of the queryset, which changes whenever a row is added,
+    removed or changed
+    """
+    rows = sorted(str(row) for row in queryset.prefetch_related(None).values_list("pk", *fields))
+
+    return hashlib.sha256("\n".join(rows).encode()).hexdigest()[:32]
+
+
+def get_relations_fingerprint(obj):
+    """
+    Returns a fingerprint of the relations (links) of the given object and the latest change of the related objects,
+    as they are rendered by the export templates (see widgets/object_relations.html)
+    """
+    from django_changeset.models import ChangeSet
+
+    relations = obj.get_relations_queryset()
+
+    latest_related_object_change = (
+        ChangeSet.objects.filter(
+            Q(object_uuid__in=relations.values("left_object_id"))
+            | Q(object_uuid__in=relations.values("right_object_id"))
+        )
+        .exclude(object_uuid=obj.pk)
+        .aggregate(latest=Max("date"))["latest"]
+    )
+
+    return "{}:{}".format(
+        get_queryset_fingerprint(relations, "version_number", "private"),
+        latest_related_object_change.isoformat() if latest_related_object_change else None,
+    )
+
+
+def get_export_cache_path(obj, version, user):
+    """
+    Returns the path of the cached PDF export of the given version of the object for the given user
+    :param obj: the exported object
+    :param version: the version of the object and all other data that is part of the export
+    :param user: the user the export is rendered for
+    """
+    version_hash = hashlib.sha256(str(version).encode()).hexdigest()[:32]
+
+    return os.path.join(
+        settings.EXPORT_CACHE_FOLDER,
+        obj._meta.label_lower,
+        str(obj.pk),
+        f"{version_hash}-{user.pk}-{get_export_user_fingerprint(user)}.pdf",
+    )
+
+
+def render_export(template_name, context):
+    """
+    Renders the export template with the given context and converts it into a PDF document
+    :return: the PDF document
+    :rtype: bytes
+    """
+    # render the HTML to a string
+    export = render_to_string(template_name, context)
+    # and convert it into a PDF document
+    pdf_document = HTML(
+        string=force_text(export).encode("UTF-8"),
+    ).render()
+
+    return pdf_document.write_pdf()
+
+
+def store_export(file_path, content):
+    """
+    Stores a rendered PDF export in the cache and removes the cached exports of other versions of the same object, as
+    well as the cached exports of the same user with outdated permissions
+    """
+    directory, file_name = os.path.split(file_path)
+    version_hash, user_pk = file_name.split("-")[:2]
+
+    os.makedirs(directory, exist_ok=True)
+
+    # write into a temporary file first, so a concurrent request never serves a partially written export
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+
+    with os.fdopen(fd, "wb") as temp_file:
+        temp_file.write(content)
+
+    os.replace(temp_path, file_path)
+
+    for other_file_name in os.listdir(directory):
+        if not other_file_name.endswith(".pdf") or other_file_name == file_name:
+            continue
+
+        other_version_hash, other_user_pk = other_file_name.split("-")[:2]
+
+        if other_version_hash != version_hash or other_user_pk == user_pk:
+            try:
+                os.remove(os.path.join(directory, other_file_name))
+            except FileNotFoundError:
+                pass
+
+
+def get_export_file_response(request, file_path, file_name):
+    """
+    Responds with a cached PDF export, a single byte range can be requested with the HTTP Range header
+    Raises FileNotFoundError if the export is not cached (anymore)
+    """
+    file_size = os.path.getsize(file_path)
+    match = BYTE_RANGE_PATTERN.match(request.META.get("HTTP_RANGE", "").strip())
+
+    if match and any(match.groups()):
+        start, end = match.groups()
+
+        if start:
+            start = int(start)
+            end = min(int(end), file_size - 1) if end else file_size - 1
+        else:
+            # suffix range: the last n bytes
+            start = max(file_size - int(end), 0)
+            end = file_size - 1
+
+        if start > end or start >= file_size:
+            response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+            response["Content-Range"] = f"bytes */{file_size}"
+            return response
+
+        with open(file_path, "rb") as export_file:
+            export_file.seek(start)
+            response = HttpResponse(export_file.read(end - start + 1), status=status.HTTP_206_PARTIAL_CONTENT)
+
+        response["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+    else:
+        response = FileResponse(open(file_path, "rb"))
+
+    response["Accept-Ranges"] = "bytes"
+    # inline content -> enables displaying the file in the browser
+    response["Content-Disposition"] = f'inline; filename="{file_name}"'
+    # Deactivate debug toolbar by setting content type != text/html
+    response["Content-Type"] = "application/pdf"
+
+    return response
+
+
+def get_export_job(job_id):
+    """
+    Returns the export job with the given id, or None if it does not exist (anymore)
+    """
+    return cache.get(EXPORT_JOB_CACHE_KEY % job_id, None)
+
+
+def create_export_job(obj, user, view, file_path):
+    """
+    Creates a pending export job for the given object, which is rendered in the context of the given view
+    :param obj: the exported object
+    :param user: the user the export is rendered for
+    :param view: the (exportable) view the export has been requested from
+    :param file_path: the path of the cached export (see get_export_cache_path)
+    :return: the job
+    :rtype: dict
+    """
+    view_class = view.__class__
+
+    job = {
+        "job_id": uuid.uuid4().hex,
+        "status": EXPORT_JOB_STATUS_PENDING,
+        "error": None,
+        "model": obj._meta.label_lower,
+        "object_pk": str(obj.pk),
+        "user_pk": user.pk,
+        "view": f"{view_class.__module__}.{view_class.__qualname__}",
+        "view_kwargs": {key: str(value) for key, value in view.kwargs.items()},
+        "file_path": file_path,
+        "file_name": get_export_file_name(obj),
+    }
+
+    cache.set(EXPORT_JOB_CACHE_KEY % job["job_id"], job, settings.EXPORT_JOB_TIMEOUT)
+
+    return job
+
+
+def update_export_job(job, **kwargs):
+    """
+    Updates the export job and sends the export_job_changed signal
+    """
+    job.update(kwargs)
+    cache.set(EXPORT_JOB_CACHE_KEY % job["job_id"], job, settings.EXPORT_JOB_TIMEOUT)
+
+    export_job_changed.send(sender=None, job=job)
@@ -6,19 +6,29 @@ import os.path as path
 
 from django.db import transaction
 from django.http import HttpResponse
-from django.template.loader import render_to_string
-from django.utils.encoding import force_text
-from django.utils.timezone import datetime
 
 from rest_framework import filters, permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.response import Response
 
 from django_changeset.models import RevisionModelMixin
 from django_filters.rest_framework import DjangoFilterBackend
-from weasyprint import HTML
 
+from eric.core.exports import (
+    EXPORT_JOB_STATUS_FINISHED,
+    create_export_job,
+    get_export_cache_path,
+    get_export_file_name,
+    get_export_file_response,
+    get_export_job,
+    get_queryset_fingerprint,
+    get_relations_fingerprint,
+    render_export,
+    store_export,
+    update_export_job,
+)
 from eric.jwt_auth.jwt_utils import build_expiring_jwt_url
 from eric.search.rest.filters import FTSSearchFilter
 
@@ -179,9 +189,57 @@ class ExportableViewSetMixIn:
 
         return Response({"url": build_expiring_jwt_url(request, path)})
 
+    def get_export_context(self, obj):
+        """
+        Returns the context for rendering the export template of the given object
+        ViewSets can provide more data for their export templates here (e.g., the child elements of a LabBook)
+        """
+        return {"instance": obj}
+
+    def get_export_related_data(self, obj):
+        """
+        Returns the related data the export template of the given object renders, as a list of (queryset, fields)
+        tuples, e.g. the checklist items of a task
+        The links and the projects of the object are included by get_export_version already
+        """
+        return []
+
+    def get_export_version(self, obj):
+        """
+        Returns the version of the given object that its cached export belongs to, including the links, the projects
+        and the related data (see get_export_related_data) rendered by the export template
+        ViewSets that provide more data for their export templates (see get_export_context) need to include the version
+        of this data here as well
+        """
+        version = [str(obj.version_number)]
+
+        if hasattr(obj, "get_relations_queryset"):
+            version.append(get_relations_fingerprint(obj))
+
+        if hasattr(obj, "projects"):
+            version.append(get_queryset_fingerprint(obj.projects.viewable(), "name"))
+
+        for queryset, fields in self.get_export_related_data(obj):
+            version.append(get_queryset_fingerprint(queryset, *fields))
+
+        return ":".join(version)
+
+    @staticmethod
+    def get_export_template_error_response(obj):
+        """
+        Returns an error response if the model of the given object does not define an export template
+        """
+        if not hasattr(obj._meta, "export_template"):
+            return Response(
+                {"error": f"Model {obj.__class__.__name__} does not define export_template in Meta Class"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return None
+
     @action(detail=True, methods=["GET"], url_path="export")
     def export(self, request, pk=None):
-        """Exports the object as PDF file."""
+        """Exports the object as PDF file (or serves the cached export of the current version of the object)."""
 
         if request.user.is_anonymous:
             return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
@@ -189,71 +247,102 @@ class ExportableViewSetMixIn:
         obj = self.get_object()
 
         # verify that the model has export_template set
-        if not hasattr(obj._meta, "export_template"):
-            return Response(
-                {"error": f"Model {obj.__class__.__name__} does not define export_template in Meta Class"},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+        error_response = self.get_export_template_error_response(obj)
 
-        # define template and output filename
-        filepath = obj._meta.export_template
-        filename = f"{path.splitext(path.basename(filepath))[0]}-{obj.pk}.pdf"
-
-        # if the class to be exported is a LabBook we need to provide more data due to
-        # child elements of LabBooks and Sections
-        if obj.__class__.__name__ == "LabBook":
-            # get all viewable child_elements, that's all in the labbook and all in all sections
-            labbook_child_elements = obj.child_elements.viewable()
-
-            # get a list of all section elements
-            sections = []
-            for labbook_child_element in labbook_child_elements:
-                if labbook_child_element.is_labbook_section:
-                    sections.append(labbook_child_element)
-
-            # make a dict of all sections as keys and their child elements as values
-            section_child_elements = {}
-            child_elements_to_remove = []
-            for section in sections:
-                # get the viewable child elements of a section
-                child_elements = section.child_object.child_elements.viewable()
-                # add to the dict
-                section_child_elements[section.pk] = child_elements
-                # iterate over the section child elements and add them to list that can be used
-                # to filter labbook_child_elements
-                for child_element in child_elements:
-                    child_elements_to_remove.append(child_element.pk)
-
-            # filter out the child elements which are in sections to get the top level LabBook child elements
-            labbook_child_elements = labbook_child_elements.exclude(pk__in=child_elements_to_remove)
-
-            # provide a context for rendering including labbook_child_elements and section_child_elements
-            context = {
-                "instance": obj,
-                "now": datetime.now(),
-                "labbook_child_elements": labbook_child_elements,
-                "section_child_elements": section_child_elements,
-            }
-        # provide a context for rendering of all other classes then LabBooks
-        else:
-            context = {"instance": obj, "now": datetime.now()}
+        if error_response:
+            return error_response
 
-        # render the HTML to a string
-        export = render_to_string(filepath, context)
-        # and convert it into a PDF document
-        pdf_document = HTML(
-            string=force_text(export).encode("UTF-8"),
-        ).render()
-        export = pdf_document.write_pdf()
+        file_path = get_export_cache_path(obj, self.get_export_version(obj), request.user)
+        file_name = get_export_file_name(obj)
+
+        if not path.exists(file_path):
+            export = render_export(obj._meta.export_template, self.get_export_context(obj))
+            store_export(file_path, export)
 
         # finally, respond with the PDF document
-        response = HttpResponse(export)
-        # inline content -> enables displaying the file in the browser
-        response["Content-Disposition"] = f'inline; filename="{filename}"'
-        # Deactivate debug toolbar by setting content type != text/html
-        response["Content-Type"] = "application/pdf;"
+        return get_export_file_response(request, file_path, file_name)
 
-        return response
+    def get_export_job_or_404(self, job_id):
+        """
+        Returns the export job of the current user for the object, raises Http404 if there is no such job
+        """
+        obj = self.get_object()
+        job = get_export_job(job_id)
+
+        if (
+            not job
+            or job["user_pk"] != self.request.user.pk
+            or job["model"] != obj._meta.label_lower
+            or job["object_pk"] != str(obj.pk)
+        ):
+            raise NotFound
+
+        return job
+
+    def get_export_job_data(self, job):
+        """
+        Returns the representation of an export job, including a download link once the export has been rendered
+        """
+        url = None
+
+        if job["status"] == EXPORT_JOB_STATUS_FINISHED:
+            # the object path is the part of the current path in front of "export_jobs"
+            object_path = self.request.path[: self.request.path.rindex("/export_jobs/")]
+            url = build_expiring_jwt_url(self.request, f"{object_path}/export_jobs/{job['job_id']}/download/")
+
+        return {
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "error": job["error"],
+            "url": url,
+        }
+
+    @action(detail=True, methods=["POST"], url_path="export_jobs")
+    def start_export_job(self, request, pk=None):
+        """
+        Starts rendering the PDF export of the object in the background.
+        The job is finished right away if the export of the current version of the object has been cached already.
+        """
+        from eric.core.tasks import render_export_job
+
+        obj = self.get_object()
+
+        # verify that the model has export_template set
+        error_response = self.get_export_template_error_response(obj)
+
+        if error_response:
+            return error_response
+
+        file_path = get_export_cache_path(obj, self.get_export_version(obj), request.user)
+        job = create_export_job(obj, request.user, self, file_path)
+
+        if path.exists(file_path):
+            update_export_job(job, status=EXPORT_JOB_STATUS_FINISHED)
+        else:
+            transaction.on_commit(lambda: render_export_job.delay(job["job_id"]))
+
+        return Response(self.get_export_job_data(job), status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=["GET"], url_path=r"export_jobs/(?P<job_id>[0-9a-f]{32})")
+    def export_job(self, request, job_id, pk=None):
+        """Returns the status of an export job."""
+
+        return Response(self.get_export_job_data(self.get_export_job_or_404(job_id)))
+
+    @action(detail=True, methods=["GET"], url_path=r"export_jobs/(?P<job_id>[0-9a-f]{32})/download")
+    def download_export_job(self, request, job_id, pk=None):
+        """Serves the PDF export of a finished export job."""
+
+        job = self.get_export_job_or_404(job_id)
+
+        if job["status"] != EXPORT_JOB_STATUS_FINISHED:
+            raise NotFound
+
+        try:
+            return get_export_file_response(request, job["file_path"], job["file_name"])
+        except FileNotFoundError:
+            # the export has been replaced by the export of a newer version of the object in the meantime
+            raise NotFound
 
 
 class BaseAuthenticatedReadOnlyModelViewSet(BaseViewSetMixin, viewsets.ReadOnlyModelViewSet):
@@ -0,0 +1,8 @@
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+from django.dispatch import Signal
+
+# sent after the status of an export job has changed (see eric.core.exports), provides the job dict as "job"
+export_job_changed = Signal()
@@ -0,0 +1,95 @@
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+import logging
+import os
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory
+from django.utils.module_loading import import_string
+
+from rest_framework.request import Request
+
+from celery import shared_task
+from django_userforeignkey.request import set_current_request
+
+from eric.core.exports import (
+    EXPORT_JOB_STATUS_FAILED,
+    EXPORT_JOB_STATUS_FINISHED,
+    EXPORT_JOB_STATUS_RUNNING,
+    get_export_job,
+    render_export,
+    store_export,
+    update_export_job,
+)
+from eric.core.thumbnails import THUMBNAIL_FORMAT_JPEG, THUMBNAIL_FORMAT_WEBP, generate_thumbnail
+
+User = get_user_model()
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def render_export_job(job_id):
+    """
+    Renders the PDF export of an export job (see eric.core.exports) in the context of the user that started the job
+    """
+    job = get_export_job(job_id)
+
+    if not job:
+        logger.info(f"Not rendering export job '{job_id}' as it does not exist anymore")
+        return
+
+    user = User.objects.filter(pk=job["user_pk"]).first()
+
+    if not user:
+        update_export_job(job, status=EXPORT_JOB_STATUS_FAILED, error="User does not exist")
+        return
+
+    update_export_job(job, status=EXPORT_JOB_STATUS_RUNNING)
+
+    request = RequestFactory().get("/")
+    request.user = user
+    set_current_request(request)
+
+    try:
+        if not os.path.exists(job["file_path"]):
+            # use the queryset and the export context of the view the export has been requested from
+            view = import_string(job["view"])(
+                request=Request(request), kwargs=job["view_kwargs"], format_kwarg=None, action="export"
+            )
+            view.request.user = user
+
+            obj = view.get_queryset().filter(pk=job["object_pk"]).first()
+
+            if not obj:
+                update_export_job(job, status=EXPORT_JOB_STATUS_FAILED, error="Element does not exist")
+                return
+
+            store_export(job["file_path"], render_export(obj._meta.export_template, view.get_export_context(obj)))
+    except Exception:
+        logger.exception(f"Rendering export job '{job_id}' failed")
+        update_export_job(job, status=EXPORT_JOB_STATUS_FAILED, error="Rendering the export failed")
+        return
+    finally:
+        set_current_request(None)
+
+    update_export_job(job, status=EXPORT_JOB_STATUS_FINISHED)
+
+
+@shared_task
+def generate_thumbnails(names):
+    """
+    Generates the thumbnails in THUMBNAIL_PREGENERATE_SIZES of the given images (see eric.core.thumbnails)
+    """
+    for name in names:
+        try:
+            for size in settings.THUMBNAIL_PREGENERATE_SIZES:
+                for image_format in (THUMBNAIL_FORMAT_WEBP, THUMBNAIL_FORMAT_JPEG):
+                    generate_thumbnail(name, size, image_format)
+        except FileNotFoundError:
+            logger.info(f"Not generating the thumbnails of '{name}' as it does not exist anymore")
+        except Exception:
+            logger.exception(f"Generating the thumbnails of '{name}' failed")
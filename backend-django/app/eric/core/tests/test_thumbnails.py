@@ -0,0 +1,81 @@
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+import os
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+
+from rest_framework.exceptions import ValidationError
+
+from PIL import Image, features
+
+from eric.core.thumbnails import (
+    THUMBNAIL_FORMAT_JPEG,
+    THUMBNAIL_FORMAT_WEBP,
+    delete_thumbnails,
+    generate_thumbnail,
+    get_thumbnail_folder,
+    get_thumbnail_size,
+)
+
+
+@override_settings(THUMBNAIL_SIZES=(64, 256, 1024), THUMBNAIL_QUALITY=80)
+class ThumbnailTest(SimpleTestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+        settings_override = override_settings(MEDIA_ROOT=self.temp_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.name = "uploads/picture.png"
+        os.makedirs(os.path.join(self.temp_dir.name, "uploads"))
+        Image.new("RGBA", (800, 400), (255, 0, 0, 128)).save(os.path.join(self.temp_dir.name, self.name))
+
+    def test_size_buckets(self):
+        self.assertEqual(get_thumbnail_size(1), 64)
+        self.assertEqual(get_thumbnail_size("64"), 64)
+        self.assertEqual(get_thumbnail_size(65), 256)
+        self.assertEqual(get_thumbnail_size(5000), 1024)
+
+        for size in (0, -1, "abc", None):
+            with self.assertRaises(ValidationError):
+                get_thumbnail_size(size)
+
+    def test_generate_jpeg_thumbnail(self):
+        path = generate_thumbnail(self.name, 256, THUMBNAIL_FORMAT_JPEG)
+
+        self.assertTrue(path.startswith(get_thumbnail_folder(self.name)))
+
+        with Image.open(path) as thumbnail:
+            self.assertEqual(thumbnail.format, "JPEG")
+            self.assertEqual(thumbnail.mode, "RGB")
+            # the aspect ratio is kept
+            self.assertEqual(thumbnail.size, (256, 128))
+
+    def test_generate_webp_thumbnail(self):
+        if not features.check("webp"):
+            self.skipTest("Pillow has been built without WebP support")
+
+        path = generate_thumbnail(self.name, 64, THUMBNAIL_FORMAT_WEBP)
+
+        with Image.open(path) as thumbnail:
+            self.assertEqual(thumbnail.format, "WEBP")
+            self.assertEqual(thumbnail.size, (64, 32))
+
+    def test_thumbnails_are_cached_and_deleted(self):
+        path = generate_thumbnail(self.name, 256, THUMBNAIL_FORMAT_JPEG)
+        modified = os.path.getmtime(path)
+
+        # the original is no longer needed once the thumbnail exists
+        os.remove(os.path.join(self.temp_dir.name, self.name))
+
+        self.assertEqual(generate_thumbnail(self.name, 256, THUMBNAIL_FORMAT_JPEG), path)
+        self.assertEqual(os.path.getmtime(path), modified)
+
+        delete_thumbnails(self.name)
+
+        self.assertFalse(os.path.exists(get_thumbnail_folder(self.name)))
@@ -0,0 +1,81 @@
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+import os
+import tempfile
+from io import BytesIO
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+
+from django.test import SimpleTestCase
+
+from eric.core.zip_export import ZipExport
+
+
+class ZipExportTest(SimpleTestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+        self.files = {
+            "notes.txt": b"some text " * 1000,
+            "sub/picture.png": os.urandom(4096),
+            "sub/empty.csv": b"",
+        }
+        self.paths = {}
+
+        for arcname, content in self.files.items():
+            path = os.path.join(self.temp_dir.name, arcname.replace("/", "_"))
+            with open(path, "wb") as f:
+                f.write(content)
+            self.paths[arcname] = path
+
+    def create_export(self, **kwargs):
+        export = ZipExport(buffer_size=1024, **kwargs)
+
+        for arcname, path in self.paths.items():
+            export.add_file(path, arcname)
+
+        return export
+
+    def assert_zip_content(self, content):
+        with ZipFile(BytesIO(content)) as zip_file:
+            self.assertIsNone(zip_file.testzip())
+            self.assertEqual(sorted(zip_file.namelist()), sorted(self.files))
+
+            for arcname, file_content in self.files.items():
+                self.assertEqual(zip_file.read(arcname), file_content)
+
+            return {info.filename: info.compress_type for info in zip_file.infolist()}
+
+    def test_compressed_formats_are_stored(self):
+        export = self.create_export(compress=True)
+
+        # text files are deflated, so the size of the zip file is not known in advance
+        self.assertIsNone(export.content_length)
+
+        compress_types = self.assert_zip_content(b"".join(export))
+
+        self.assertEqual(compress_types["notes.txt"], ZIP_DEFLATED)
+        self.assertEqual(compress_types["sub/picture.png"], ZIP_STORED)
+
+    def test_content_length_without_compression(self):
+        export = self.create_export(compress=False)
+        content = b"".join(export)
+
+        self.assertEqual(export.content_length, len(content))
+
+        compress_types = self.assert_zip_content(content)
+
+        self.assertEqual(set(compress_types.values()), {ZIP_STORED})
+
+    def test_missing_files_are_skipped(self):
+        export = ZipExport(compress=False)
+
+        with self.assertLogs("eric.core.zip_export", level="WARNING"):
+            self.assertIsNone(export.add_file(os.path.join(self.temp_dir.name, "missing.txt"), "missing.txt"))
+
+        content = b"".join(export)
+
+        self.assertEqual(export.content_length, len(content))
+        self.assertEqual(ZipFile(BytesIO(content)).namelist(), [])
@@ -0,0 +1,205 @@
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+"""
+Thumbnails (size bucketed derivatives) of uploaded images.
+
+Thumbnails are stored next to the original image (``<original>.thumbnails/<size>.<format>``, relative to MEDIA_ROOT)
+and are derived from its name only. Uploaded files never change in place (a changed picture or file entry references a
+new file), so a cached thumbnail never has to be invalidated, it is deleted along with the original image.
+
+The sizes in THUMBNAIL_PREGENERATE_SIZES are generated by a Celery task (see eric.core.tasks.generate_thumbnails) once
+a new image has been uploaded, all other thumbnails are generated on their first request.
+"""
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.db import transaction
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework.exceptions import NotFound, ValidationError
+
+from PIL import Image, ImageOps, features
+
+from eric.core.utils import rfc5987_content_disposition
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_FORMAT_WEBP = "webp"
+THUMBNAIL_FORMAT_JPEG = "jpeg"
+
+THUMBNAIL_CONTENT_TYPES = {
+    THUMBNAIL_FORMAT_WEBP: "image/webp",
+    THUMBNAIL_FORMAT_JPEG: "image/jpeg",
+}
+
+# mime types of uploaded files thumbnails can be generated for
+THUMBNAIL_SOURCE_MIME_TYPES = {
+    "image/bmp",
+    "image/gif",
+    "image/jpeg",
+    "image/png",
+    "image/tiff",
+    "image/webp",
+}
+
+
+def get_thumbnail_size(size):
+    """
+    Returns the size bucket (see THUMBNAIL_SIZES) for the requested size, which is the smallest size that is not
+    smaller than the requested size (or the largest size)
+    Raises a ValidationError for invalid sizes
+    :param size: the requested maximum width and height in pixels (e.g., from the "size" query parameter)
+    :rtype: int
+    """
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        size = 0
+
+    if size <= 0:
+        raise ValidationError({"size": _("Size must be a positive number of pixels")})
+
+    sizes = sorted(settings.THUMBNAIL_SIZES)
+
+    for size_bucket in sizes:
+        if size_bucket >= size:
+            return size_bucket
+
+    return sizes[-1]
+
+
+def get_thumbnail_format(request):
+    """
+    Returns the format of the thumbnail for the request, WebP if the client accepts it, JPEG otherwise
+    """
+    if "image/webp" in request.META.get("HTTP_ACCEPT", "") and features.check("webp"):
+        return THUMBNAIL_FORMAT_WEBP
+
+    return THUMBNAIL_FORMAT_JPEG
+
+
+def get_thumbnail_folder(name):
+    """
+    Returns the folder of the thumbnails of the image with the given name (relative to MEDIA_ROOT)
+    """
+    return os.path.join(settings.MEDIA_ROOT, f"{name}.thumbnails")
+
+
+def get_thumbnail_path(name, size, image_format):
+    return os.path.join(get_thumbnail_folder(name), f"{size}.{image_format}")
+
+
+def get_thumbnail_etag(name, size, image_format):
+    return quote_etag(hashlib.sha256(f"{name}:{size}:{image_format}".encode()).hexdigest()[:32])
+
+
+def generate_thumbnail(name, size, image_format):
+    """
+    Generates the thumbnail of the image with the given name (relative to MEDIA_ROOT), if it does not exist yet
+    :return: the path of the thumbnail
+    """
+    thumbnail_path = get_thumbnail_path(name, size, image_format)
+
+    if os.path.exists(thumbnail_path):
+        return thumbnail_path
+
+    with Image.open(os.path.join(settings.MEDIA_ROOT, name)) as image:
+        # let the decoder scale down JPEG images while loading them
+        image.draft("RGB", (size, size))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((size, size), Image.LANCZOS)
+
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+
+        if image_format == THUMBNAIL_FORMAT_JPEG and image.mode == "RGBA":
+            # JPEG does not support transparency, use a white background instead
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+
+        os.makedirs(os.path.dirname(thumbnail_path), exist_ok=True)
+
+        # write into a temporary file first, so a concurrent request never serves a partially written thumbnail
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(thumbnail_path), suffix=".tmp")
+
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                image.save(temp_file, image_format.upper(), quality=settings.THUMBNAIL_QUALITY)
+
+            os.replace(temp_path, thumbnail_path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+
+    return thumbnail_path
+
+
+def delete_thumbnails(name):
+    """
+    Deletes all thumbnails of the image with the given name (relative to MEDIA_ROOT)
+    """
+    if name:
+        shutil.rmtree(get_thumbnail_folder(name), ignore_errors=True)
+
+
+def schedule_thumbnail_generation(*names):
+    """
+    Generates the thumbnails in THUMBNAIL_PREGENERATE_SIZES of the given images with a Celery task, once the current
+    transaction has been committed
+    """
+    from eric.core.tasks import generate_thumbnails
+
+    names = [name for name in names if name]
+
+    if names and settings.THUMBNAIL_PREGENERATE_SIZES:
+        transaction.on_commit(lambda: generate_thumbnails.delay(names))
+
+
+def get_thumbnail_response(request, name, size, file_name, max_age=None):
+    """
+    Responds with the thumbnail of the image with the given name (relative to MEDIA_ROOT), generating it if necessary
+    Responds with HTTP 304 if the ETag sent with If-None-Match is still valid, raises NotFound if no thumbnail can be
+    generated from the file.
+    :param size: the requested size (e.g., from the "size" query parameter)
+    :param file_name: the file name of the image (as presented to the user, without extension)
+    :param max_age: max-age of the Cache-Control header (default: settings.THUMBNAIL_CACHE_MAX_AGE)
+    """
+    size = get_thumbnail_size(size)
+    image_format = get_thumbnail_format(request)
+    etag = get_thumbnail_etag(name, size, image_format)
+
+    if_none_match = request.META.get("HTTP_IF_NONE_MATCH", None)
+
+    if if_none_match and etag in parse_etags(if_none_match):
+        response = HttpResponseNotModified()
+    else:
+        try:
+            thumbnail_path = generate_thumbnail(name, size, image_format)
+        except (OSError, Image.DecompressionBombError, ValueError) as error:
+            # the image does not exist (anymore), is not an image at all (e.g., a file uploaded with an image MIME
+            # type), is too large to decode safely or can not be converted
+            logger.info(f"Not responding with a thumbnail of '{name}': {error!r}")
+            raise NotFound(_("No thumbnail is available for this file"))
+
+        response = FileResponse(open(thumbnail_path, "rb"))
+        response["Content-Type"] = THUMBNAIL_CONTENT_TYPES[image_format]
+        response["Content-Disposition"] = rfc5987_content_disposition(f"{file_name}.{image_format}")
+
+    response["ETag"] = etag
+    # images can only be downloaded by users who are allowed to view the element
+    patch_cache_control(
+        response, private=True, max_age=settings.THUMBNAIL_CACHE_MAX_AGE if max_age is None else max_age
+    )
+    patch_vary_headers(response, ("Accept",))
+
+    return response
@@ -0,0 +1,444 @@
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+"""
+Streaming ZIP export of files on disk.
+
+All entries are planned before the first byte is sent: files in formats that are compressed already (images, videos,
+archives, ...) are stored instead of deflated, and if all entries are stored the exact size of the archive is known in
+advance (see ZipExport.content_length). Files are read with large buffers, the next chunk of a file is read in the
+background while the current chunk is sent. Archives with more than 65535 entries or entries/offsets above 4 GiB use
+the ZIP64 extensions.
+"""
+import logging
+import os
+import struct
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from zipfile import ZIP64_LIMIT, ZIP_FILECOUNT_LIMIT
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+
+# file extensions of formats that are compressed already, deflating them again only costs CPU time
+STORED_FILE_EXTENSIONS = {
+    # images
+    ".jpg",
+    ".jpeg",
+    ".png",
+    ".gif",
+    ".webp",
+    ".heic",
+    ".jp2",
+    # audio and video
+    ".mp3",
+    ".m4a",
+    ".aac",
+    ".ogg",
+    ".opus",
+    ".flac",
+    ".mp4",
+    ".m4v",
+    ".mov",
+    ".avi",
+    ".mkv",
+    ".webm",
+    # archives
+    ".zip",
+    ".gz",
+    ".tgz",
+    ".bz2",
+    ".xz",
+    ".zst",
+    ".lz4",
+    ".7z",
+    ".rar",
+    # documents and scientific data formats with internal compression
+    ".pdf",
+    ".docx",
+    ".xlsx",
+    ".pptx",
+    ".odt",
+    ".ods",
+    ".odp",
+    ".h5",
+    ".hdf5",
+    ".nc",
+    ".npz",
+}
+
+# bit 3: sizes and CRC are written in the data descriptor after the file data, bit 11: file names are UTF-8
+FLAGS = 0x08 | 0x800
+
+VERSION_DEFAULT = 20
+VERSION_ZIP64 = 45
+# created on unix, ZIP specification 4.5
+VERSION_MADE_BY = (3 << 8) | VERSION_ZIP64
+
+LOCAL_FILE_HEADER = struct.Struct("<4sHHHHHLLLHH")
+LOCAL_FILE_HEADER_SIGNATURE = b"PK\x03\x04"
+DATA_DESCRIPTOR = struct.Struct("<4sLLL")
+DATA_DESCRIPTOR_ZIP64 = struct.Struct("<4sLQQ")
+DATA_DESCRIPTOR_SIGNATURE = b"PK\x07\x08"
+CENTRAL_DIRECTORY_HEADER = struct.Struct("<4sHHHHHHLLLHHHHHLL")
+CENTRAL_DIRECTORY_HEADER_SIGNATURE = b"PK\x01\x02"
+END_OF_CENTRAL_DIRECTORY = struct.Struct("<4sHHHHLLH")
+END_OF_CENTRAL_DIRECTORY_SIGNATURE = b"PK\x05\x06"
+ZIP64_END_OF_CENTRAL_DIRECTORY = struct.Struct("<4sQHHLLQQQQ")
+ZIP64_END_OF_CENTRAL_DIRECTORY_SIGNATURE = b"PK\x06\x06"
+ZIP64_END_OF_CENTRAL_DIRECTORY_LOCATOR = struct.Struct("<4sLQL")
+ZIP64_END_OF_CENTRAL_DIRECTORY_LOCATOR_SIGNATURE = b"PK\x06\x07"
+# header id and size of the ZIP64 extra field
+ZIP64_EXTRA_HEADER = struct.Struct("<HH")
+ZIP64_EXTRA_ID = 0x0001
+# the ZIP64 extra field of a local file header (with placeholders for the uncompressed and compressed size)
+ZIP64_LOCAL_EXTRA = ZIP64_EXTRA_HEADER.pack(ZIP64_EXTRA_ID, 16) + struct.pack("<QQ", 0, 0)
+
+
+def is_compressed_file_format(file_name):
+    """
+    Returns whether the file name has the extension of a file format which is compressed already
+    """
+    return os.path.splitext(file_name)[1].lower() in STORED_FILE_EXTENSIONS
+
+
+def get_dos_date_time(timestamp):
+    """
+    Converts a timestamp to the (time, date) tuple of the ZIP format (which can not represent dates before 1980)
+    """
+    local_time = time.localtime(timestamp)
+    year = min(max(local_time.tm_year, 1980), 2107)
+
+    if year != local_time.tm_year:
+        return 0, (year - 1980) << 9 | 1 << 5 | 1
+
+    return (
+        local_time.tm_hour << 11 | local_time.tm_min << 5 | local_time.tm_sec // 2,
+        (year - 1980) << 9 | local_time.tm_mon << 5 | local_time.tm_mday,
+    )
+
+
+def read_file_chunks(path, buffer_size):
+    """
+    Reads a file in chunks of buffer_size bytes, the next chunk of a large file is read in the background while the
+    current chunk is being processed
+    """
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size <= buffer_size:
+            # small files are read at once
+            chunk = file.read()
+
+            if chunk:
+                yield chunk
+
+            return
+
+        if hasattr(os, "posix_fadvise"):
+            # let the kernel read ahead aggressively
+            os.posix_fadvise(file.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+
+        yield from _read_file_chunks_ahead(file, buffer_size)
+
+
+def _read_file_chunks_ahead(file, buffer_size):
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        next_chunk = executor.submit(file.read, buffer_size)
+
+        while True:
+            chunk = next_chunk.result()
+
+            if not chunk:
+                return
+
+            next_chunk = executor.submit(file.read, buffer_size)
+
+            yield chunk
+
+
+class ZipExportEntry:
+    """
+    A file of a ZIP export
+    """
+
+    def __init__(self, path, arcname, size, mode, date_time, compress):
+        self.path = path
+        self.arcname = arcname
+        self.encoded_arcname = arcname.encode("utf-8")
+        self.size = size
+        self.mode = mode
+        self.date_time = date_time
+        self.compress_type = ZIP_DEFLATED if compress else ZIP_STORED
+        # deflated data may be slightly larger than the original data
+        self.zip64 = (size * 1.05 if compress else size) >= ZIP64_LIMIT
+
+        # set while the entry is written
+        self.header_offset = None
+        self.crc = 0
+        self.compress_size = 0
+
+    @property
+    def local_header_size(self):
+        return LOCAL_FILE_HEADER.size + len(self.encoded_arcname) + (len(ZIP64_LOCAL_EXTRA) if self.zip64 else 0)
+
+    @property
+    def data_descriptor_size(self):
+        return DATA_DESCRIPTOR_ZIP64.size if self.zip64 else DATA_DESCRIPTOR.size
+
+    def get_local_header(self):
+        version = VERSION_ZIP64 if self.zip64 else VERSION_DEFAULT
+        # sizes and CRC are written to the data descriptor
+        extra = ZIP64_LOCAL_EXTRA if self.zip64 else b""
+        sizes = 0xFFFFFFFF if self.zip64 else 0
+
+        return (
+            LOCAL_FILE_HEADER.pack(
+                LOCAL_FILE_HEADER_SIGNATURE,
+                version,
+                FLAGS,
+                self.compress_type,
+                *self.date_time,
+                0,
+                sizes,
+                sizes,
+                len(self.encoded_arcname),
+                len(extra),
+            )
+            + self.encoded_arcname
+            + extra
+        )
+
+    def get_data_descriptor(self):
+        if self.zip64:
+            return DATA_DESCRIPTOR_ZIP64.pack(DATA_DESCRIPTOR_SIGNATURE, self.crc, self.compress_size, self.size)
+
+        return DATA_DESCRIPTOR.pack(DATA_DESCRIPTOR_SIGNATURE, self.crc, self.compress_size, self.size)
+
+    def get_central_directory_extra_values(self, header_offset):
+        values = []
+
+        if self.zip64:
+            values += [self.size, self.compress_size]
+
+        if header_offset >= ZIP64_LIMIT:
+            values.append(header_offset)
+
+        return values
+
+    def get_central_directory_header_size(self, header_offset):
+        values = self.get_central_directory_extra_values(header_offset)
+        extra_size = ZIP64_EXTRA_HEADER.size + 8 * len(values) if values else 0
+
+        return CENTRAL_DIRECTORY_HEADER.size + len(self.encoded_arcname) + extra_size
+
+    def get_central_directory_header(self):
+        values = self.get_central_directory_extra_values(self.header_offset)
+        extra = b""
+
+        if values:
+            extra = ZIP64_EXTRA_HEADER.pack(ZIP64_EXTRA_ID, 8 * len(values)) + struct.pack(
+                "<" + "Q" * len(values), *values
+            )
+
+        return (
+            CENTRAL_DIRECTORY_HEADER.pack(
+                CENTRAL_DIRECTORY_HEADER_SIGNATURE,
+                VERSION_MADE_BY,
+                VERSION_ZIP64 if values else VERSION_DEFAULT,
+                FLAGS,
+                self.compress_type,
+                *self.date_time,
+                self.crc,
+                0xFFFFFFFF if self.zip64 else self.compress_size,
+                0xFFFFFFFF if self.zip64 else self.size,
+                len(self.encoded_arcname),
+                len(extra),
+                0,
+                0,
+                0,
+                (self.mode & 0xFFFF) << 16,
+                0xFFFFFFFF if self.header_offset >= ZIP64_LIMIT else self.header_offset,
+            )
+            + self.encoded_arcname
+            + extra
+        )
+
+
+class ZipExport:
+    """
+    Streams a ZIP archive of files on disk, iterate over the export to get the archive in chunks
+
+    Usage:
+        export = ZipExport()
+        export.add_file("/path/to/file.txt", "directory/file.txt")
+        response = StreamingHttpResponse(export, content_type="application/zip")
+        if export.content_length is not None:
+            response["Content-Length"] = export.content_length
+    """
+
+    def __init__(self, compress=None, buffer_size=None):
+        """
+        :param compress: whether files in uncompressed formats are deflated
+            (default: settings.ZIP_EXPORT_COMPRESS_FILES)
+        :param buffer_size: size of the chunks files are read in (default: settings.ZIP_EXPORT_BUFFER_SIZE)
+        """
+        self.compress = settings.ZIP_EXPORT_COMPRESS_FILES if compress is None else compress
+        self.buffer_size = buffer_size or settings.ZIP_EXPORT_BUFFER_SIZE
+        self.entries = []
+
+    def add_file(self, path, arcname):
+        """
+        Adds a file to the export
+        :param path: path of the file on disk
+        :param arcname: path of the file within the archive
+        :return: the entry, or None if the file does not exist
+        """
+        try:
+            file_stat = os.stat(path)
+        except OSError:
+            logger.warning(f"Not adding '{path}' to the ZIP export as it does not exist")
+            return None
+
+        entry = ZipExportEntry(
+            path=path,
+            arcname=arcname.lstrip("/"),
+            size=file_stat.st_size,
+            mode=file_stat.st_mode,
+            date_time=get_dos_date_time(file_stat.st_mtime),
+            compress=self.compress and not is_compressed_file_format(arcname),
+        )
+        self.entries.append(entry)
+
+        return entry
+
+    @property
+    def content_length(self):
+        """
+        Returns the size of the archive, or None if the size is not known in advance (if any file is deflated)
+        """
+        if any(entry.compress_type != ZIP_STORED for entry in self.entries):
+            return None
+
+        offset = 0
+        central_directory_size = 0
+
+        for entry in self.entries:
+            central_directory_size += entry.get_central_directory_header_size(offset)
+            offset += entry.local_header_size + entry.size + entry.data_descriptor_size
+
+        return offset + central_directory_size + self.get_end_records_size(offset, central_directory_size)
+
+    def needs_zip64_end_records(self, central_directory_offset, central_directory_size):
+        return (
+            len(self.entries) >= ZIP_FILECOUNT_LIMIT
+            or central_directory_offset >= ZIP64_LIMIT
+            or central_directory_size >= ZIP64_LIMIT
+        )
+
+    def get_end_records_size(self, central_directory_offset, central_directory_size):
+        size = END_OF_CENTRAL_DIRECTORY.size
+
+        if self.needs_zip64_end_records(central_directory_offset, central_directory_size):
+            size += ZIP64_END_OF_CENTRAL_DIRECTORY.size + ZIP64_END_OF_CENTRAL_DIRECTORY_LOCATOR.size
+
+        return size
+
+    def get_end_records(self, central_directory_offset, central_directory_size):
+        count = len(self.entries)
+        records = b""
+
+        if self.needs_zip64_end_records(central_directory_offset, central_directory_size):
+            zip64_end_offset = central_directory_offset + central_directory_size
+            records += ZIP64_END_OF_CENTRAL_DIRECTORY.pack(
+                ZIP64_END_OF_CENTRAL_DIRECTORY_SIGNATURE,
+                ZIP64_END_OF_CENTRAL_DIRECTORY.size - 12,
+                VERSION_MADE_BY,
+                VERSION_ZIP64,
+                0,
+                0,
+                count,
+                count,
+                central_directory_size,
+                central_directory_offset,
+            )
+            records += ZIP64_END_OF_CENTRAL_DIRECTORY_LOCATOR.pack(
+                ZIP64_END_OF_CENTRAL_DIRECTORY_LOCATOR_SIGNATURE, 0, zip64_end_offset, 1
+            )
+
+            # the values of the ZIP64 records are used
+            count = 0xFFFF
+            central_directory_size = central_directory_offset = 0xFFFFFFFF
+
+        records += END_OF_CENTRAL_DIRECTORY.pack(
+            END_OF_CENTRAL_DIRECTORY_SIGNATURE,
+            0,
+            0,
+            count,
+            count,
+            central_directory_size,
+            central_directory_offset,
+            0,
+        )
+
+        return records
+
+    def write_entry(self, entry, offset):
+        """
+        Yields the local header, the (compressed) data and the data descriptor of an entry
+        """
+        entry.header_offset = offset
+        yield entry.get_local_header()
+
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15) if entry.compress_type else None
+        crc = 0
+        size = 0
+        compress_size = 0
+
+        for chunk in read_file_chunks(entry.path, self.buffer_size):
+            size += len(chunk)
+            crc = zlib.crc32(chunk, crc)
+
+            if compressor:
+                chunk = compressor.compress(chunk)
+
+                if not chunk:
+                    continue
+
+            compress_size += len(chunk)
+            yield chunk
+
+        if compressor:
+            chunk = compressor.flush()
+            compress_size += len(chunk)
+            yield chunk
+
+        if size != entry.size:
+            # the archive (and its announced size) has been planned with the previous size of the file
+            raise IOError(f"Size of '{entry.path}' changed while it was added to the ZIP export")
+
+        entry.crc = crc
+        entry.compress_size = compress_size
+
+        yield entry.get_data_descriptor()
+
+    def __iter__(self):
+        offset = 0
+
+        for entry in self.entries:
+            for chunk in self.write_entry(entry, offset):
+                offset += len(chunk)
+                yield chunk
+
+        central_directory_offset = offset
+
+        for entry in self.entries:
+            chunk = entry.get_central_directory_header()
+            offset += len(chunk)
+            yield chunk
+
+        yield self.get_end_records(central_directory_offset, offset - central_directory_offset)
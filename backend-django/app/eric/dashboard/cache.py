@@ -0,0 +1,104 @@
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+"""
+Persistent (cross-request) cache of the sections of the dashboard of a user.
+
+Cache keys are versioned with a per section generation (bumped whenever an element shown in the section is saved or
+deleted, see eric.dashboard.handlers) and the project permission cache version of the user, so stale entries are
+never read and expire via their timeout.
+"""
+import hashlib
+import json
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from rest_framework.utils.encoders import JSONEncoder
+
+from eric.projects.models.cache import get_project_permission_cache_version
+
+# dashboard_section:<section generation>:<project permission cache version>:<user pk>:<section>
+DASHBOARD_SECTION_CACHE_KEY = "dashboard_section:%s:%s:%s:%s"
+DASHBOARD_SECTION_GENERATION_CACHE_KEY = "dashboard_section_generation_%s"
+
+DASHBOARD_SECTIONS = ("projects", "contacts", "dmps", "files", "tasks", "resources")
+
+
+def _get_generation(cache_key):
+    generation = cache.get(cache_key, None)
+
+    if generation is None:
+        generation = uuid.uuid4().hex
+        # add() makes sure concurrent requests agree on one generation
+        if not cache.add(cache_key, generation, None):
+            generation = cache.get(cache_key, generation)
+
+    return generation
+
+
+def _bump_generation(cache_key):
+    cache.set(cache_key, uuid.uuid4().hex, None)
+
+
+def _get_cache_key(user, section):
+    return DASHBOARD_SECTION_CACHE_KEY % (
+        _get_generation(DASHBOARD_SECTION_GENERATION_CACHE_KEY % section),
+        get_project_permission_cache_version(user),
+        user.pk,
+        section,
+    )
+
+
+def get_section_etag(data):
+    """
+    Returns a hash of the serialized data of a dashboard section
+    :rtype: str
+    """
+    return hashlib.sha256(json.dumps(data, cls=JSONEncoder, sort_keys=True).encode()).hexdigest()
+
+
+def get_cached_sections(user, sections):
+    """
+    Returns the cached sections of the dashboard of the user
+    :return: a dict of section to a dict with the keys "data" and "etag", sections that are not cached are omitted
+    :rtype: dict
+    """
+    if not settings.DASHBOARD_CACHE_TIMEOUT:
+        return {}
+
+    cache_keys = {_get_cache_key(user, section): section for section in sections}
+
+    return {cache_keys[cache_key]: value for cache_key, value in cache.get_many(list(cache_keys)).items()}
+
+
+def cache_sections(user, sections):
+    """
+    Stores sections of the dashboard of the user in the cache
+    :param sections: a dict of section to a dict with the keys "data" and "etag"
+    """
+    timeout = settings.DASHBOARD_CACHE_TIMEOUT
+
+    if not timeout:
+        return
+
+    cache.set_many({_get_cache_key(user, section): value for section, value in sections.items()}, timeout)
+
+
+def invalidate_dashboard_sections(*sections):
+    """
+    Invalidates the given sections of the dashboards of all users
+    The invalidation is repeated after the current transaction has been committed, so that concurrent requests can not
+    re-populate the cache with data that has not been committed yet.
+    """
+    cache_keys = [DASHBOARD_SECTION_GENERATION_CACHE_KEY % section for section in sections]
+
+    def bump_generations():
+        for cache_key in cache_keys:
+            _bump_generation(cache_key)
+
+    bump_generations()
+    transaction.on_commit(bump_generations)
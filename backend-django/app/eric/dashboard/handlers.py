@@ -0,0 +1,41 @@
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from eric.dashboard.cache import DASHBOARD_SECTIONS, invalidate_dashboard_sections
+from eric.dmp.models import Dmp
+from eric.model_privileges.models import ModelPrivilege
+from eric.projects.models import Project, Resource
+from eric.shared_elements.models import Contact, File, Task, TaskAssignedUser
+
+# the dashboard sections that show elements of the given models
+DASHBOARD_SECTIONS_BY_MODEL = {
+    Project: ("projects",),
+    Contact: ("contacts",),
+    Dmp: ("dmps",),
+    File: ("files",),
+    Task: ("tasks",),
+    TaskAssignedUser: ("tasks",),
+    Resource: ("resources",),
+    # privileges on single elements change which elements are viewable in every section
+    ModelPrivilege: DASHBOARD_SECTIONS,
+}
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_dashboard_sections_of_element(sender, *args, **kwargs):
+    """
+    Invalidates the cached dashboard sections when an element shown in them is created, changed or deleted
+    :param sender:
+    :param args:
+    :param kwargs:
+    :return:
+    """
+    sections = DASHBOARD_SECTIONS_BY_MODEL.get(sender, None)
+
+    if sections:
+        invalidate_dashboard_sections(*sections)
@@ -2,11 +2,24 @@
 # Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
 # SPDX-License-Identifier: AGPL-3.0-or-later
 #
-from rest_framework import viewsets
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import status, viewsets
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.serializers import Serializer
 
+from django_userforeignkey.request import get_current_request, set_current_request
+
 from eric.core.rest.viewsets import BaseGenericViewSet
+from eric.dashboard.cache import DASHBOARD_SECTIONS, cache_sections, get_cached_sections, get_section_etag
 from eric.dashboard.rest.serializers import (
     DashboardContactSerializer,
     DashboardDmpSerializer,
@@ -50,6 +63,11 @@ class MyDashboardViewSet(BaseGenericViewSet, viewsets.mixins.ListModelMixin):
         "resources": DashboardResourceSerializer,
     }
 
+    # number of elements per section
+    num_elements_per_section = 10
+
+    sections_param = "sections"
+
     def get_serialized_data_for(self, request, view_name, num_elements):
         """
         Returns serialized data for a given view (e.g., tasks)
@@ -82,20 +100,105 @@ class MyDashboardViewSet(BaseGenericViewSet, viewsets.mixins.ListModelMixin):
             return self.dashboard_serializers[view_name](instance=qs, many=True).data
         return view.get_serializer(instance=qs, many=True).data
 
+    def get_section(self, request, view_name):
+        """
+        Returns the serialized data of a section and its etag
+        """
+        data = self.get_serialized_data_for(request, view_name, self.num_elements_per_section)
+
+        return {"data": data, "etag": get_section_etag(data)}
+
+    def get_section_in_thread(self, current_request, request, view_name):
+        """
+        Returns the serialized data of a section and its etag within a worker thread
+        """
+        # the current request (and therefore the current user) is stored per thread
+        set_current_request(current_request)
+
+        try:
+            return self.get_section(request, view_name)
+        finally:
+            set_current_request(None)
+            # every thread uses its own database connection
+            connection.close()
+
+    def load_sections(self, request, sections):
+        """
+        Loads the given sections from the database, concurrently if possible
+        :return: a dict of section to a dict with the keys "data" and "etag"
+        :rtype: dict
+        """
+        workers = min(settings.DASHBOARD_SECTION_WORKERS, len(sections))
+
+        # other database connections can not see the data of an open transaction (e.g., within tests)
+        if workers <= 1 or connection.in_atomic_block:
+            return {section: self.get_section(request, section) for section in sections}
+
+        current_request = get_current_request()
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                section: executor.submit(self.get_section_in_thread, current_request, request, section)
+                for section in sections
+            }
+
+            return {section: future.result() for section, future in futures.items()}
+
+    def get_requested_sections(self, request):
+        """
+        Returns the sections requested with the "sections" query parameter (comma separated), defaults to all sections
+        """
+        sections_param = request.query_params.get(self.sections_param, "")
+
+        if not sections_param:
+            return list(DASHBOARD_SECTIONS)
+
+        sections = []
+
+        for section in sections_param.split(","):
+            section = section.strip()
+
+            if section not in self.viewsets:
+                raise ValidationError({self.sections_param: _("Unknown section: {section}").format(section=section)})
+
+            if section not in sections:
+                sections.append(section)
+
+        return sections
+
     def list(self, request, *args, **kwargs):
         """
         ViewSet list endpoint
         Provides all the data that are displayed in a dashboard
+
+        The sections are cached per user (see eric.dashboard.cache), sections that are not cached are loaded
+        concurrently. Responds with HTTP 304 if the ETag sent with If-None-Match is still valid.
         """
-        limit = 10
-
-        data = {
-            "projects": self.get_serialized_data_for(request, "projects", limit),
-            "contacts": self.get_serialized_data_for(request, "contacts", limit),
-            "dmps": self.get_serialized_data_for(request, "dmps", limit),
-            "files": self.get_serialized_data_for(request, "files", limit),
-            "tasks": self.get_serialized_data_for(request, "tasks", limit),
-            "resources": self.get_serialized_data_for(request, "resources", limit),
-        }
-
-        return Response(data)
+        sections = self.get_requested_sections(request)
+
+        loaded_sections = get_cached_sections(request.user, sections)
+        missing_sections = [section for section in sections if section not in loaded_sections]
+
+        if missing_sections:
+            new_sections = self.load_sections(request, missing_sections)
+            cache_sections(request.user, new_sections)
+            loaded_sections.update(new_sections)
+
+        etag = quote_etag(
+            hashlib.sha256(
+                ":".join(f"{section}={loaded_sections[section]['etag']}" for section in sections).encode()
+            ).hexdigest()
+        )
+
+        if_none_match = request.META.get("HTTP_IF_NONE_MATCH", None)
+
+        if if_none_match and (etag in parse_etags(if_none_match) or "*" in parse_etags(if_none_match)):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response({section: loaded_sections[section]["data"] for section in sections})
+
+        response["ETag"] = etag
+        # browsers must revalidate the dashboard on every request
+        patch_cache_control(response, private=True, no_cache=True)
+
+        return response
@@ -21,14 +21,21 @@ class DashboardMixin:
     api/my/dashboard endpoint
     """
 
-    def rest_get_my_dashboard(self, auth_token, HTTP_USER_AGENT, REMOTE_ADDR):
+    def rest_get_my_dashboard(self, auth_token, HTTP_USER_AGENT, REMOTE_ADDR, sections=None, etag=None):
         """
         REST Wrapper for /api/my/dashboard
         :param auth_token:
         :param HTTP_USER_AGENT:
         :param REMOTE_ADDR:
+        :param sections: optional list of sections
+        :param etag: optional ETag which is sent with If-None-Match
         :return:
         """
         self.client.credentials(HTTP_AUTHORIZATION="Token " + auth_token)
 
-        return self.client.get("/api/my/dashboard/", HTTP_USER_AGENT=HTTP_USER_AGENT, REMOTE_ADDR=REMOTE_ADDR)
+        data = {"sections": ",".join(sections)} if sections else {}
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+
+        return self.client.get(
+            "/api/my/dashboard/", data, HTTP_USER_AGENT=HTTP_USER_AGENT, REMOTE_ADDR=REMOTE_ADDR, **headers
+        )
@@ -143,3 +143,59 @@ class DashboardTest(APITestCase, AuthenticationMixin, DashboardMixin, ProjectsMi
 
         # there should be zero tasks in this dashboard
         self.assertEqual(len(decoded_response["tasks"]), 0, msg="User2 should have zero projects in dashboard")
+
+    def test_dashboard_sections(self):
+        """
+        Tests that the sections parameter restricts the dashboard to the requested sections
+        :return:
+        """
+        response = self.rest_get_my_dashboard(self.token1, HTTP_USER_AGENT, REMOTE_ADDR, sections=["projects", "tasks"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        decoded_response = json.loads(response.content.decode())
+
+        self.assertEqual(set(decoded_response.keys()), {"projects", "tasks"})
+
+        # unknown sections are rejected
+        response = self.rest_get_my_dashboard(self.token1, HTTP_USER_AGENT, REMOTE_ADDR, sections=["meetings"])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_dashboard_etag(self):
+        """
+        Tests that the dashboard responds with HTTP 304 as long as it did not change and that the cached dashboard is
+        invalidated when an element is created
+        :return:
+        """
+        response = self.rest_get_my_dashboard(self.token1, HTTP_USER_AGENT, REMOTE_ADDR)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response["ETag"]
+
+        response = self.rest_get_my_dashboard(self.token1, HTTP_USER_AGENT, REMOTE_ADDR, etag=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+
+        # the dashboard of another user has another etag
+        response = self.rest_get_my_dashboard(self.token2, HTTP_USER_AGENT, REMOTE_ADDR, etag=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # create a task with user1
+        response = self.rest_create_task(
+            self.token1,
+            None,
+            "Some title",
+            "Some description",
+            Task.TASK_STATE_NEW,
+            Task.TASK_PRIORITY_NORMAL,
+            timezone.now(),
+            timezone.now() + timedelta(hours=1),
+            [self.user1.pk],
+            HTTP_USER_AGENT,
+            REMOTE_ADDR,
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        # the dashboard of user1 changed
+        response = self.rest_get_my_dashboard(self.token1, HTTP_USER_AGENT, REMOTE_ADDR, etag=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        decoded_response = json.loads(response.content.decode())
+        self.assertEqual(len(decoded_response["tasks"]), 1, msg="User1 should have one task in dashboard")
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dmp', '0021_migrate_view_permissions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dmp',
+            name='fts_fingerprint',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64, verbose_name='Fingerprint of the rendered FTS document'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Adds a GIN index on the FTS index (used by the typeahead search)"""
+
+    dependencies = [
+        ('dmp', '0022_fts_fingerprint'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS dmp_dmp_fts_index_gin ON dmp_dmp USING gin (fts_index);',
+            reverse_sql='DROP INDEX IF EXISTS dmp_dmp_fts_index_gin;',
+        ),
+    ]
@@ -82,6 +82,7 @@ class Dmp(
             ),
         )
         fts_template = "fts/dmp.html"
+        fts_source_fields = ("title", "dmp_form_data__name", "dmp_form_data__value")
         export_template = "export/export_pdf.html"
 
         def get_default_serializer(*args, **kwargs):
@@ -82,6 +82,9 @@ class DmpViewSet(
             Prefetch("dmp_form_data", queryset=DmpFormData.objects.viewable()),
         )
 
+    def get_export_related_data(self, obj):
+        return [(obj.dmp_form_data.all(), ("name", "value"))]
+
     @action(detail=True, methods=["GET"])
     def export(self, request, format=None, *args, **kwargs):
         """Endpoint for the DMP Export"""
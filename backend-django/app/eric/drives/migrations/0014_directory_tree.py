@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+import django.db.models.deletion
+from django.db import migrations, models, transaction
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+import mptt.fields
+
+DIRECTORY_TREE_ID_SEQUENCE = 'drives_directory_tree_id_seq'
+
+
+def get_nested_sets(directories):
+    """
+    Returns the nested set values (lft, rght, level, tree_id) of all directories by their pk, every root directory
+    (the virtual root directory of a drive) is the root of a separate tree
+    :param directories: list of tuples of the pk and the parent pk of the directories
+    """
+    children = {}
+
+    for pk, parent_pk in directories:
+        children.setdefault(parent_pk, []).append(pk)
+
+    nested_sets = {}
+
+    for tree_id, root_pk in enumerate(children.get(None, []), start=1):
+        counter = 1
+        nested_sets[root_pk] = [counter, None, 0, tree_id]
+        # depth first walk without recursion, as directory trees might be deep
+        stack = [(root_pk, iter(children.get(root_pk, [])))]
+
+        while stack:
+            pk, child_pks = stack[-1]
+            child_pk = next(child_pks, None)
+            counter += 1
+
+            if child_pk is None:
+                nested_sets[pk][1] = counter
+                stack.pop()
+            else:
+                nested_sets[child_pk] = [counter, None, len(stack), tree_id]
+                stack.append((child_pk, iter(children.get(child_pk, []))))
+
+    return nested_sets
+
+
+def build_directory_trees(apps, schema_editor):
+    Directory = apps.get_model('drives', 'Directory')
+    File = apps.get_model('shared_elements', 'File')
+
+    with transaction.atomic():
+        directories = list(Directory.objects.order_by('name', 'pk').values_list('pk', 'directory_id'))
+        nested_sets = get_nested_sets(directories)
+
+        updated_directories = [
+            Directory(pk=pk, lft=lft, rght=rght, level=level, tree_id=tree_id)
+            for pk, (lft, rght, level, tree_id) in nested_sets.items()
+        ]
+        Directory.objects.bulk_update(updated_directories, ['lft', 'rght', 'level', 'tree_id'], batch_size=1000)
+
+        # the size of all files within the directory and its sub directories
+        file_sizes = (
+            File.objects.filter(
+                directory__tree_id=OuterRef('tree_id'),
+                directory__lft__gte=OuterRef('lft'),
+                directory__rght__lte=OuterRef('rght'),
+            )
+            .order_by()
+            .values('directory__tree_id')
+            .annotate(file_size_sum=Sum('file_size'))
+            .values('file_size_sum')
+        )
+        Directory.objects.update(
+            cumulative_file_size=Coalesce(Subquery(file_sizes), 0, output_field=models.BigIntegerField())
+        )
+
+        # new drives get tree ids above the ones assigned by the rebuild
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT setval(%s, GREATEST(COALESCE(MAX(tree_id), 0), 1)) FROM drives_directory',
+                [DIRECTORY_TREE_ID_SEQUENCE],
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shared_elements', '0047_file_path_hash_index'),
+        ('drives', '0013_fts_index_gin'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='directory',
+            name='level',
+            field=models.PositiveIntegerField(default=0, editable=False),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='directory',
+            name='lft',
+            field=models.PositiveIntegerField(default=0, editable=False),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='directory',
+            name='rght',
+            field=models.PositiveIntegerField(default=0, editable=False),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='directory',
+            name='tree_id',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='directory',
+            name='cumulative_file_size',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Size of all files within the directory and its sub directories'),
+        ),
+        migrations.AlterField(
+            model_name='directory',
+            name='directory',
+            field=mptt.fields.TreeForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sub_directories', to='drives.directory', verbose_name='Parent Directory'),
+        ),
+        migrations.AlterIndexTogether(
+            name='directory',
+            index_together={('tree_id', 'lft')},
+        ),
+        migrations.RunSQL(
+            sql=f'CREATE SEQUENCE IF NOT EXISTS {DIRECTORY_TREE_ID_SEQUENCE};',
+            reverse_sql=f'DROP SEQUENCE IF EXISTS {DIRECTORY_TREE_ID_SEQUENCE};',
+        ),
+        migrations.RunPython(
+            build_directory_trees,
+            migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,117 @@
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+"""
+Persistent (cross-request) cache of the directory tree of a drive, which maps the path of every directory to its pk.
+
+A path is a tuple of directory names below the virtual root directory of the drive, the virtual root directory itself
+has the empty path. Cache keys are versioned with a per drive generation, which is bumped whenever a directory of the
+drive is saved or deleted, so stale entries are never read and expire via their timeout.
+"""
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# directory_path_index:<drive generation>:<drive pk>
+DIRECTORY_PATH_INDEX_CACHE_KEY = "directory_path_index:%s:%s"
+DIRECTORY_PATH_INDEX_GENERATION_CACHE_KEY = "directory_path_index_generation_%s"
+
+
+def _get_generation(cache_key):
+    generation = cache.get(cache_key, None)
+
+    if generation is None:
+        generation = uuid.uuid4().hex
+        # add() makes sure concurrent requests agree on one generation
+        if not cache.add(cache_key, generation, None):
+            generation = cache.get(cache_key, generation)
+
+    return generation
+
+
+def _bump_generation(cache_key):
+    cache.set(cache_key, uuid.uuid4().hex, None)
+
+
+def build_directory_path_index(drive_pk):
+    """
+    Builds the directory path index of a drive with a single query
+    If a directory contains several sub directories with the same name, the path maps to the first one (by name)
+    :return: a dict of directory path (tuple of directory names) to directory pk
+    :rtype: dict
+    """
+    from eric.drives.models import Directory
+
+    root_pk = None
+    sub_directories = defaultdict(list)
+
+    directories = (
+        Directory.objects.filter(drive_id=drive_pk)
+        .order_by("name", "created_at")
+        .values_list("pk", "name", "directory_id", "is_virtual_root")
+    )
+
+    for pk, name, parent_pk, is_virtual_root in directories:
+        if is_virtual_root:
+            root_pk = pk
+        else:
+            sub_directories[parent_pk].append((name, pk))
+
+    if root_pk is None:
+        return {}
+
+    index = {(): root_pk}
+    pending = [((), root_pk)]
+
+    while pending:
+        path, pk = pending.pop()
+
+        for name, sub_directory_pk in sub_directories.get(pk, []):
+            sub_directory_path = path + (name,)
+
+            if sub_directory_path not in index:
+                index[sub_directory_path] = sub_directory_pk
+                pending.append((sub_directory_path, sub_directory_pk))
+
+    return index
+
+
+def get_directory_path_index(drive_pk):
+    """
+    Returns the (cached) directory path index of a drive
+    :return: a dict of directory path (tuple of directory names) to directory pk
+    :rtype: dict
+    """
+    timeout = settings.DIRECTORY_PATH_INDEX_CACHE_TIMEOUT
+
+    if not timeout:
+        return build_directory_path_index(drive_pk)
+
+    cache_key = DIRECTORY_PATH_INDEX_CACHE_KEY % (
+        _get_generation(DIRECTORY_PATH_INDEX_GENERATION_CACHE_KEY % drive_pk),
+        drive_pk,
+    )
+
+    index = cache.get(cache_key, None)
+
+    if index is None:
+        index = build_directory_path_index(drive_pk)
+        cache.set(cache_key, index, timeout)
+
+    return index
+
+
+def invalidate_directory_path_index(drive_pk):
+    """
+    Invalidates the cached directory path index of a drive (e.g., when a directory is created, renamed or moved)
+    The invalidation is repeated after the current transaction has been committed, so that concurrent requests can not
+    re-populate the cache with data that has not been committed yet.
+    """
+    cache_key = DIRECTORY_PATH_INDEX_GENERATION_CACHE_KEY % drive_pk
+
+    _bump_generation(cache_key)
+    transaction.on_commit(lambda: _bump_generation(cache_key))
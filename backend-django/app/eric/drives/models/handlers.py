@@ -4,7 +4,7 @@
 #
 import re
 
-from django.db.models.signals import post_save, pre_delete, pre_save
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 from django.utils.translation import gettext as _
 
@@ -12,6 +12,7 @@ from rest_framework.exceptions import PermissionDenied
 
 from eric.core.models import disable_permission_checks
 from eric.drives.models import Directory, Drive
+from eric.drives.models.cache import invalidate_directory_path_index
 from eric.projects.models.handlers import check_create_roles_for_other_workbench_elements
 from eric.shared_elements.models import File, ValidationError
 
@@ -237,6 +238,83 @@ def ensure_parent_directory_is_within_same_drive(instance, *args, **kwargs):
         )
 
 
+@receiver(pre_save, sender=File)
+def remember_previous_directory_and_size_of_file(instance, *args, **kwargs):
+    """
+    Remembers the directory and size of a file before it is saved, so the cumulative file sizes of the directories can
+    be updated after saving
+    :param instance:
+    :param args:
+    :param kwargs:
+    :return:
+    """
+    instance._previous_directory_and_file_size = (
+        File.objects.filter(pk=instance.pk).values_list("directory_id", "file_size").first()
+    )
+
+
+@receiver(post_save, sender=File)
+def update_cumulative_file_sizes_after_file_save(instance, *args, **kwargs):
+    """
+    Updates the cumulative file sizes of the directory of the file and its parent directories
+    :param instance:
+    :param args:
+    :param kwargs:
+    :return:
+    """
+    previous = getattr(instance, "_previous_directory_and_file_size", None)
+    previous_directory_pk, previous_file_size = previous or (None, 0)
+
+    if previous_directory_pk == instance.directory_id and previous_file_size == instance.file_size:
+        return
+
+    if previous_directory_pk:
+        Directory.objects.ancestors_of(previous_directory_pk).add_to_cumulative_file_size(-previous_file_size)
+
+    if instance.directory_id:
+        Directory.objects.ancestors_of(instance.directory_id).add_to_cumulative_file_size(instance.file_size)
+
+
+@receiver(post_delete, sender=File)
+def update_cumulative_file_sizes_after_file_delete(instance, *args, **kwargs):
+    """
+    Removes the size of a deleted file from the cumulative file sizes of its directory and the parent directories
+    :param instance:
+    :param args:
+    :param kwargs:
+    :return:
+    """
+    if instance.directory_id:
+        Directory.objects.ancestors_of(instance.directory_id).add_to_cumulative_file_size(-instance.file_size)
+
+
+@receiver(post_delete, sender=Directory)
+def update_cumulative_file_sizes_after_directory_delete(instance, *args, **kwargs):
+    """
+    Recalculates the cumulative file sizes of the parent directories of a deleted directory (the files within the
+    directory are not deleted, but removed from the directory)
+    :param instance:
+    :param args:
+    :param kwargs:
+    :return:
+    """
+    if instance.directory_id:
+        Directory.objects.ancestors_of(instance.directory_id).update_cumulative_file_sizes()
+
+
+@receiver(post_save, sender=Directory)
+@receiver(post_delete, sender=Directory)
+def invalidate_directory_path_index_of_drive(instance, *args, **kwargs):
+    """
+    Invalidates the cached directory path index of the drive when a directory is created, changed or deleted
+    :param instance:
+    :param args:
+    :param kwargs:
+    :return:
+    """
+    invalidate_directory_path_index(instance.drive_id)
+
+
 @receiver(check_create_roles_for_other_workbench_elements)
 def check_create_roles_for_drive_directory(user, sender, instance, *args, **kwargs):
     """
@@ -2,8 +2,35 @@
 # Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
 # SPDX-License-Identifier: AGPL-3.0-or-later
 #
+from django.db import connections
+
+from mptt.managers import TreeManager
+
 from eric.core.models import BaseManager
 from eric.drives.models.querysets import DirectoryQuerySet, DriveQuerySet
 
+# database sequence of the tree ids of the directory trees (created by drives/migrations/0014_directory_tree.py)
+DIRECTORY_TREE_ID_SEQUENCE = "drives_directory_tree_id_seq"
+
 DriveManager = BaseManager.from_queryset(DriveQuerySet)
 DirectoryManager = BaseManager.from_queryset(DirectoryQuerySet)
+
+
+class DirectoryTreeManager(TreeManager):
+    """
+    Manages the nested set of the directories, every drive is a separate tree (with the virtual root directory as root)
+    """
+
+    def _get_next_tree_id(self):
+        """
+        Takes the tree id of a new drive from a database sequence, as the default (highest tree id + 1) would assign
+        the same tree id to drives that are created concurrently
+        """
+        connection = connections[self.db]
+
+        if connection.vendor != "postgresql":
+            return super()._get_next_tree_id()
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT nextval(%s)", [DIRECTORY_TREE_ID_SEQUENCE])
+            return cursor.fetchone()[0]
@@ -8,11 +8,11 @@ import uuid
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.db import models, transaction
-from django.db.models import Sum
 from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 
 from django_changeset.models import RevisionModelMixin
+from mptt.models import MPTTModel, TreeForeignKey
 
 from eric.core.models import BaseModel
 from eric.core.models.abstract import (
@@ -22,7 +22,7 @@ from eric.core.models.abstract import (
     SoftDeleteMixin,
     WorkbenchEntityMixin,
 )
-from eric.drives.models.managers import DirectoryManager, DriveManager
+from eric.drives.models.managers import DirectoryManager, DirectoryTreeManager, DriveManager
 from eric.metadata.models.fields import MetadataRelation
 from eric.model_privileges.models.abstract import ModelPrivilegeMixIn
 from eric.relations.models import RelationsMixIn
@@ -33,12 +33,17 @@ logger = logging.getLogger(__name__)
 User = get_user_model()
 
 
-class Directory(BaseModel, ChangeSetMixIn, RevisionModelMixin, ImportedDSSMixin):
+class Directory(MPTTModel, BaseModel, ChangeSetMixIn, RevisionModelMixin, ImportedDSSMixin):
     """
     Defines a Directory, which can contain other directories and files
+
+    The directories of a drive are stored as a nested set (one tree per drive, with the virtual root directory as
+    root), so sub directories and parent directories can be queried with a single query.
     """
 
+    # the default manager keeps ordering directories by name (the tree manager orders by the nested set)
     objects = DirectoryManager()
+    tree_objects = DirectoryTreeManager()
 
     class Meta:
         verbose_name = _("Directory")
@@ -49,37 +54,29 @@ class Directory(BaseModel, ChangeSetMixIn, RevisionModelMixin, ImportedDSSMixin)
         )
         ordering = ("name",)
 
+    class MPTTMeta:
+        parent_attr = "directory"
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
 
     def get_all_sub_directories(self):
-        dir_pk_list = []
-        dir_pk_list.append(str(self.pk))
-
-        # get all sub directories
-        sub_dirs = Directory.objects.filter(directory=self)
-
-        for dir in sub_dirs:
-            dir_pk_list += dir.get_all_sub_directories()
-
-        return dir_pk_list
+        """
+        Returns the pks (as strings) of this directory and all of its sub directories
+        """
+        return [str(pk) for pk in self.all_sub_directory_pks]
 
-    @cached_property
+    @property
     def file_size(self):
         """
         Returns the size of all files within that directory and its sub directories
         :return:
         """
-        from eric.shared_elements.models import File
-
-        # gather all files that are within this directory or its sub directories
-        return File.objects.filter(directory__in=self.get_all_sub_directories()).aggregate(Sum("file_size"))[
-            "file_size__sum"
-        ]
+        return self.cumulative_file_size
 
     name = models.CharField(max_length=128, verbose_name=_("Title of the directory"))
 
     # parent directory
-    directory = models.ForeignKey(
+    directory = TreeForeignKey(
         "self",
         on_delete=models.CASCADE,
         null=True,
@@ -101,49 +98,69 @@ class Directory(BaseModel, ChangeSetMixIn, RevisionModelMixin, ImportedDSSMixin)
         editable=False,
     )
 
+    cumulative_file_size = models.BigIntegerField(
+        verbose_name=_("Size of all files within the directory and its sub directories"),
+        default=0,
+        editable=False,
+    )
+
     @cached_property
     def full_directory_path(self):
         """
         Returns the full directory path
         :return:
         """
-        try:
-            # try to access the parent directory
-            return self.directory.full_directory_path + "/" + self.name
-        except Exception:
-            return self.name
+        if self._state.adding:
+            try:
+                # try to access the parent directory
+                return self.directory.full_directory_path + "/" + self.name
+            except Exception:
+                return self.name
 
-    def get_direct_sub_directory_pks(self, all_directories):
-        """
-        Returns pks of all child directories from the all_directories list
-        :param all_directories:
-        :return:
-        """
-        children = []
-
-        for directory in all_directories:
-            if directory.directory and directory.directory_id == self.pk:
-                # append current directory
-                children.append(directory.pk)
-                # and get all children of current directory
-                children += directory.get_direct_sub_directory_pks(all_directories)
-
-        return children
+        return "/".join(self.get_ancestors(include_self=True).values_list("name", flat=True))
 
     @property
     def all_sub_directory_pks(self):
         """
-        colelcts all sub directories and children of sub directories of the current directory
+        collects the pks of the current directory and all of its sub directories
         :return:
         """
-        # get all directories that are within the same drive
-        dirs = Directory.objects.filter(drive=self.drive)
+        return list(self.get_descendants(include_self=True).values_list("pk", flat=True))
 
-        pks_of_subdirectories = [self.pk]
+    def lock_tree(self):
+        """
+        Locks the drive of the directory until the end of the current transaction, as concurrent changes of the
+        nested set of a drive (inserts, moves and deletes) would corrupt it
+        """
+        list(Drive.objects.select_for_update().filter(pk=self.drive_id).values_list("pk", flat=True))
+
+        if not self._state.adding:
+            # the nested set values of this instance might have changed since it has been loaded
+            self._mptt_refresh()
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            self.lock_tree()
+
+            previous_parent_pk = None
+
+            if not self._state.adding:
+                previous_parent_pk = (
+                    Directory.objects.filter(pk=self.pk).values_list("directory_id", flat=True).first()
+                )
+
+            super().save(*args, **kwargs)
+
+            if previous_parent_pk and previous_parent_pk != self.directory_id:
+                # the directory has been moved, recalculate the sizes of the old and new parent directories
+                Directory.objects.ancestors_of(previous_parent_pk).update_cumulative_file_sizes()
+                Directory.objects.ancestors_of(self.directory_id).update_cumulative_file_sizes()
 
-        pks_of_subdirectories += self.get_direct_sub_directory_pks(dirs)
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            self.lock_tree()
 
-        return pks_of_subdirectories
+            return super().delete(*args, **kwargs)
 
     def __str__(self):
         return _("{}").format(self.name)
@@ -154,19 +171,20 @@ class Directory(BaseModel, ChangeSetMixIn, RevisionModelMixin, ImportedDSSMixin)
         within the
         :return:
         """
-        cur_directory = self
-        while cur_directory.directory:
-            if cur_directory.directory.pk == self.pk:
-                raise ValidationError(
-                    {
-                        "directory": ValidationError(
-                            _("Invalid parent folder %(directory)s - circular reference detected"),
-                            params={"directory": self.directory},
-                            code="invalid",
-                        )
-                    }
-                )
-            cur_directory = cur_directory.directory
+        if self.directory is None or self._state.adding:
+            return
+
+        # the new parent directory must not be this directory or one of its sub directories
+        if self.directory.is_descendant_of(self, include_self=True):
+            raise ValidationError(
+                {
+                    "directory": ValidationError(
+                        _("Invalid parent folder %(directory)s - circular reference detected"),
+                        params={"directory": self.directory},
+                        code="invalid",
+                    )
+                }
+            )
 
     def validate_unique_title(self):
         """
@@ -256,6 +274,7 @@ class Drive(
             ),
         )
         fts_template = "fts/drive.html"
+        fts_source_fields = ("title", "sub_directories__name")
         export_template = "export/drive.html"
 
         def get_default_serializer(*args, **kwargs):
@@ -299,9 +318,8 @@ class Drive(
 
     @cached_property
     def size(self):
-        from eric.shared_elements.models import File
-
-        return File.objects.filter(directory__drive=self).aggregate(Sum("file_size"))["file_size__sum"]
+        # the cumulative file size of the virtual root directory contains all files of the drive
+        return self.sub_directories.filter(is_virtual_root=True).values_list("cumulative_file_size", flat=True).first()
 
     def __str__(self):
         return _("{}").format(self.title)
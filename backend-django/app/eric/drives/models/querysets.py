@@ -2,7 +2,9 @@
 # Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
 # SPDX-License-Identifier: AGPL-3.0-or-later
 #
-from django.db.models import Q
+from django.db import models
+from django.db.models import F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
 
 from django_changeset.models.queryset import ChangeSetQuerySetMixin
 
@@ -84,4 +86,44 @@ class BaseDriveQuerySet(BaseProjectEntityPermissionQuerySet):
 
 
 class DirectoryQuerySet(BaseDriveQuerySet):
-    pass
+    def ancestors_of(self, directory_pk):
+        """
+        Returns the directory with the given pk and all of its parent directories (via the nested set of the directory
+        tree, without loading the directory first)
+        """
+        directory = self.model.objects.filter(pk=directory_pk)
+
+        return self.filter(
+            tree_id=Subquery(directory.values("tree_id")),
+            lft__lte=Subquery(directory.values("lft")),
+            rght__gte=Subquery(directory.values("rght")),
+        )
+
+    def add_to_cumulative_file_size(self, file_size):
+        """
+        Adds the given file size (may be negative) to the cumulative file size of the directories
+        """
+        return self.update(cumulative_file_size=F("cumulative_file_size") + file_size)
+
+    def update_cumulative_file_sizes(self):
+        """
+        Recalculates the cumulative file size (the size of all files within the directory and its sub directories) of
+        the directories with a single query
+        """
+        from eric.shared_elements.models import File
+
+        file_sizes = (
+            File.objects.filter(
+                directory__tree_id=OuterRef("tree_id"),
+                directory__lft__gte=OuterRef("lft"),
+                directory__rght__lte=OuterRef("rght"),
+            )
+            .order_by()
+            .values("directory__tree_id")
+            .annotate(file_size_sum=Sum("file_size"))
+            .values("file_size_sum")
+        )
+
+        return self.update(
+            cumulative_file_size=Coalesce(Subquery(file_sizes), 0, output_field=models.BigIntegerField())
+        )
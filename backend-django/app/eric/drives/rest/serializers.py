@@ -61,6 +61,7 @@ class DirectorySerializer(BaseModelWithCreatedByAndSoftDeleteSerializer):
             "download_directory",
             "is_virtual_root",
             "imported",
+            "file_size",
         )
         read_only_fields = ("is_virtual_root",)
 
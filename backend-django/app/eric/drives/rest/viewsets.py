@@ -8,9 +8,8 @@ from django.shortcuts import get_object_or_404
 
 from rest_framework.decorators import action
 
-import zipstream
-
 from eric.core.rest.viewsets import BaseAuthenticatedModelViewSet, DeletableViewSetMixIn, ExportableViewSetMixIn
+from eric.core.zip_export import ZipExport
 from eric.drives.models import Drive
 from eric.drives.models.models import Directory
 from eric.drives.rest.filters import DriveFilter
@@ -103,33 +102,40 @@ class DriveSubDirectoriesViewSet(BaseAuthenticatedModelViewSet):
     @action(detail=True, methods=["GET"], url_path="download", url_name="download")
     def download_directory_with_files_as_zipfile(self, request, format=None, *args, **kwargs):
         """Provides a detail route endpoint for downloading a directory with a zipfile"""
-        # get the picture
         directory = self.get_object()
 
-        root_directory_path = directory.full_directory_path
-
-        # get all directories that are sub directories
-        sub_directory_pks = directory.all_sub_directory_pks
-
         # get original file name for the header
-        print(f"Direcotry name='{directory.name}'")
-
         if directory.name == "/" and directory.is_virtual_root:
             original_file_name = f"{directory.drive.title}.zip"
         else:
             original_file_name = f"{directory.name}.zip"
 
-        files = File.objects.viewable().not_deleted().filter(directory__in=sub_directory_pks).order_by("directory")
+        # paths of the directory and all of its sub directories within the zip file (with a single query)
+        directory_paths = {}
+
+        for pk, name, parent_pk in directory.get_descendants(include_self=True).values_list(
+            "pk", "name", "directory_id"
+        ):
+            # the tree is ordered, parent directories are always listed before their sub directories
+            directory_paths[pk] = "" if pk == directory.pk else f"{directory_paths[parent_pk]}{name}/"
+
+        files = (
+            File.objects.viewable()
+            .not_deleted()
+            .filter(directory__in=list(directory_paths))
+            .only("pk", "path", "original_filename", "directory_id")
+            .order_by("directory__lft", "original_filename")
+        )
 
-        zs = zipstream.ZipFile(mode="w", compression=zipstream.ZIP_DEFLATED)
+        zip_export = ZipExport()
 
         for file in files:
-            directory_path = file.directory.full_directory_path.replace(root_directory_path, "")
-            actual_filename = f"{directory_path}/{file.original_filename}"
+            zip_export.add_file(file.path.path, f"{directory_paths[file.directory_id]}{file.original_filename}")
 
-            zs.write(file.path.path, arcname=actual_filename)
+        response = StreamingHttpResponse(zip_export, content_type="application/zip")
 
-        response = StreamingHttpResponse(zs, content_type="application/zip")
+        if zip_export.content_length is not None:
+            response["Content-Length"] = zip_export.content_length
 
         # set filename in header
         response["Content-Disposition"] = f'attachment; filename="{original_file_name}"'
@@ -9,6 +9,7 @@ from rest_framework.test import APITestCase
 
 from eric.core.tests import test_utils
 from eric.drives.models import Directory, Drive
+from eric.drives.models.cache import get_directory_path_index
 from eric.drives.tests.core import DriveMixin
 from eric.model_privileges.models import ModelPrivilege
 from eric.projects.tests.mixin_entity_generic_tests import EntityChangeRelatedProjectTestMixin
@@ -877,6 +878,17 @@ class TestGenericsDrives(APITestCase, EntityChangeRelatedProjectTestMixin, Drive
         self.assertTrue("another_file.txt" in all_file_names)
         self.assertTrue("my_file.txt" in all_file_names)
 
+        # downloads that only contain stored files are sent with a Content-Length
+        with self.settings(ZIP_EXPORT_COMPRESS_FILES=False):
+            response = self.rest_drive_download_directory(
+                self.token1, str(drive.pk), decoded_directory["pk"], HTTP_USER_AGENT, REMOTE_ADDR
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        content = b"".join(response.streaming_content)
+        self.assertEqual(int(response["Content-Length"]), len(content))
+        self.assertEqual(sorted(ZipFile(BytesIO(content)).namelist()), sorted(zipfile_names))
+
     def test_drives_with_special_characters(self):
         """
         Special characters such as / - äöü will cause problems with webdav urls
@@ -912,3 +924,102 @@ class TestGenericsDrives(APITestCase, EntityChangeRelatedProjectTestMixin, Drive
 
         decoded_response = json.loads(response.content.decode())
         self.assertEqual(len(decoded_response), 4)
+
+    def test_directory_path_index(self):
+        """
+        Tests that the cached directory path index of a drive follows created and renamed directories
+        """
+        drive, response = self.create_drive_orm(self.token1, None, "Path index", HTTP_USER_AGENT, REMOTE_ADDR)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        root_dir = drive.sub_directories.get(is_virtual_root=True)
+
+        response = self.rest_drive_create_directory(
+            self.token1, str(drive.pk), "Data", root_dir.pk, HTTP_USER_AGENT, REMOTE_ADDR
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        data_dir_pk = json.loads(response.content.decode())["pk"]
+
+        response = self.rest_drive_create_directory(
+            self.token1, str(drive.pk), "Raw", data_dir_pk, HTTP_USER_AGENT, REMOTE_ADDR
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        raw_dir_pk = json.loads(response.content.decode())["pk"]
+
+        index = get_directory_path_index(drive.pk)
+        self.assertEqual(index[()], root_dir.pk)
+        self.assertEqual(str(index[("Data",)]), data_dir_pk)
+        self.assertEqual(str(index[("Data", "Raw")]), raw_dir_pk)
+
+        # renaming a directory invalidates the cached index
+        response = self.rest_drive_update_directory(
+            self.token1, str(drive.pk), data_dir_pk, "Results", root_dir.pk, HTTP_USER_AGENT, REMOTE_ADDR
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        index = get_directory_path_index(drive.pk)
+        self.assertNotIn(("Data",), index)
+        self.assertEqual(str(index[("Results", "Raw")]), raw_dir_pk)
+
+    def test_directory_tree_and_cumulative_file_sizes(self):
+        """
+        Tests that the directory tree provides paths and sub directories and that the cumulative file sizes of the
+        directories follow file assignments and directory moves
+        """
+        drive, response = self.create_drive_orm(self.token1, None, "Sizes", HTTP_USER_AGENT, REMOTE_ADDR)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        root_dir = drive.sub_directories.get(is_virtual_root=True)
+
+        response = self.rest_drive_create_directory(
+            self.token1, str(drive.pk), "Data", root_dir.pk, HTTP_USER_AGENT, REMOTE_ADDR
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        data_dir_pk = json.loads(response.content.decode())["pk"]
+
+        response = self.rest_drive_create_directory(
+            self.token1, str(drive.pk), "Raw", data_dir_pk, HTTP_USER_AGENT, REMOTE_ADDR
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        raw_dir_pk = json.loads(response.content.decode())["pk"]
+
+        data_dir = Directory.objects.get(pk=data_dir_pk)
+        raw_dir = Directory.objects.get(pk=raw_dir_pk)
+
+        self.assertEqual(raw_dir.full_directory_path, "//Data/Raw")
+        self.assertEqual({str(pk) for pk in data_dir.all_sub_directory_pks}, {data_dir_pk, raw_dir_pk})
+        self.assertEqual(len(root_dir.all_sub_directory_pks), 3)
+
+        # assign a file to the sub directory
+        response = self.rest_create_file(
+            self.token1, None, "My file", "M description", "my_file.txt", 1024, HTTP_USER_AGENT, REMOTE_ADDR
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        file_pk = json.loads(response.content.decode())["pk"]
+
+        response = self.rest_update_file_set_directory(self.token1, file_pk, raw_dir_pk, HTTP_USER_AGENT, REMOTE_ADDR)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        file_size = File.objects.get(pk=file_pk).file_size
+        self.assertEqual(Directory.objects.get(pk=raw_dir_pk).file_size, file_size)
+        self.assertEqual(Directory.objects.get(pk=data_dir_pk).file_size, file_size)
+        self.assertEqual(Directory.objects.get(pk=root_dir.pk).file_size, file_size)
+
+        # move the sub directory to the root directory
+        response = self.rest_drive_update_directory(
+            self.token1, str(drive.pk), raw_dir_pk, "Raw", root_dir.pk, HTTP_USER_AGENT, REMOTE_ADDR
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(Directory.objects.get(pk=raw_dir_pk).full_directory_path, "//Raw")
+        self.assertEqual(Directory.objects.get(pk=raw_dir_pk).file_size, file_size)
+        self.assertEqual(Directory.objects.get(pk=data_dir_pk).file_size, 0)
+        self.assertEqual(Directory.objects.get(pk=root_dir.pk).file_size, file_size)
+
+        # deleting the directory removes the file from it
+        response = self.rest_drive_delete_directory(
+            self.token1, str(drive.pk), raw_dir_pk, HTTP_USER_AGENT, REMOTE_ADDR
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        self.assertEqual(Directory.objects.get(pk=root_dir.pk).file_size, 0)
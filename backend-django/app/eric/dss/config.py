@@ -18,3 +18,9 @@ GLOBUS_RABBITMQ_USER = cfg.get("GLOBUS_RABBITMQ_USER")
 GLOBUS_RABBITMQ_PASSWORD = cfg.get("GLOBUS_RABBITMQ_PASSWORD")
 GLOBUS_RABBITMQ_SSL_CA_CERT = cfg.get("GLOBUS_RABBITMQ_SSL_CA_CERT")
 GLOBUS_RABBITMQ_MESSAGE_FETCH_SIZE = cfg.get("GLOBUS_RABBITMQ_MESSAGE_FETCH_SIZE")
+SCAN_CHUNK_SIZE = cfg.get("SCAN_CHUNK_SIZE", 5000)
+INCREMENTAL_SCAN = cfg.get("INCREMENTAL_SCAN", False)
+IMPORT_BATCH_SIZE = cfg.get("IMPORT_BATCH_SIZE", 100)
+IMPORT_MAX_BATCHES = cfg.get("IMPORT_MAX_BATCHES", 10)
+IMPORT_WORKERS = cfg.get("IMPORT_WORKERS", 4)
+IMPORT_CLAIM_TIMEOUT = cfg.get("IMPORT_CLAIM_TIMEOUT", 60 * 60)
@@ -12,6 +12,7 @@ from urllib.parse import unquote
 
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from django.db import connection, transaction
 from django.db.models.signals import pre_save
 from django.template.loader import render_to_string
 from django.utils.translation import gettext_lazy as _
@@ -131,15 +132,36 @@ class MetadataFileFromEnvelopeModel(MetadataFile):
         return self.envelope.metadata_file_content
 
 
+class DSSImportCache:
+    """
+    Caches the containers, envelopes, drives and directories that were looked up or created while importing files,
+    so they are not loaded again for every file of a batch.
+    """
+
+    def __init__(self):
+        self.objects = {}
+
+    def get(self, key):
+        return self.objects.get(key)
+
+    def set(self, key, value):
+        # the object might have been created within a transaction that is rolled back if the import fails
+        transaction.on_commit(lambda: self.objects.__setitem__(key, value))
+
+
 class DSSFileImport:
-    def __init__(self, file_to_import: DSSFilesToImport):
+    def __init__(self, file_to_import: DSSFilesToImport, import_cache: DSSImportCache = None):
         # fully qualified DSS path, including container, storage, etc.
         # <container>/<envelope>/<storage>/<dirs>/<file>?
         self.dss_url = DSSURL(file_to_import.path)
+        self.import_cache = import_cache if import_cache is not None else DSSImportCache()
 
     def read_metadata_file(self):
         container = self._load_container()
-        envelope = DSSEnvelope.objects.filter(path=self.dss_url.envelope, container=container).first()
+        envelope = self.import_cache.get(("envelope", container.pk, self.dss_url.envelope))
+
+        if not envelope:
+            envelope = DSSEnvelope.objects.filter(path=self.dss_url.envelope, container=container).first()
 
         if envelope:
             metadata_file = MetadataFileFromEnvelopeModel(envelope)
@@ -187,16 +209,29 @@ class DSSFileImport:
         )
 
     def create_data(self, metadata_file: MetadataFile):
-        """Imports the file and creates the envelope, storage, and directories, if necessary."""
+        """
+        Imports the file and creates the envelope, storage, and directories, if necessary.
+        Must be called within a transaction, the envelope stays locked for other import workers until it is committed
+        """
         container = self._load_container()
-        envelope, _ = DSSEnvelope.objects.get_or_create(
-            path=self.dss_url.envelope,
-            container=container,
-            imported=True,
-            defaults={
-                "metadata_file_content": metadata_file.json_content,
-            },
-        )
+
+        # none of the looked up envelopes, drives, directories and files are unique in the database, so concurrent
+        # imports of files of the same envelope would create duplicates
+        self._lock_envelope(container)
+
+        envelope_key = ("envelope", container.pk, self.dss_url.envelope)
+        envelope = self.import_cache.get(envelope_key)
+
+        if not envelope:
+            envelope, _ = DSSEnvelope.objects.get_or_create(
+                path=self.dss_url.envelope,
+                container=container,
+                imported=True,
+                defaults={
+                    "metadata_file_content": metadata_file.json_content,
+                },
+            )
+            self.import_cache.set(envelope_key, envelope)
 
         valid_projects = self.validate_projects(metadata_file.projects, container)
 
@@ -207,14 +242,36 @@ class DSSFileImport:
 
         self._create_file(parent_directory, metadata_fields, projects=valid_projects)
 
+    def _lock_envelope(self, container: DSSContainer):
+        """
+        Acquires a transaction level advisory lock on the envelope path, which is released on commit or rollback
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_advisory_xact_lock(hashtext(%s))",
+                [f"dss_envelope:{container.path}/{self.dss_url.envelope}"],
+            )
+
     def _load_container(self):
+        container_key = ("container", self.dss_url.container_path)
+        container = self.import_cache.get(container_key)
+        if container:
+            return container
+
         container = DSSContainer.objects.filter(path=self.dss_url.container_path).first()
         if not container:
             raise ValidationError(f"Container <{self.dss_url.container_path}> does not exist.")
 
+        self.import_cache.set(container_key, container)
+
         return container
 
     def _get_or_create_drive(self, envelope: DSSEnvelope, metadata_fields, projects=None):
+        drive_key = ("drive", envelope.pk, self.dss_url.storage)
+        drive = self.import_cache.get(drive_key)
+        if drive:
+            return drive
+
         with DisableSignal(
             pre_save, check_directory_is_not_in_read_only_or_read_write_no_new_drive, Directory
         ), DisableSignal(pre_save, check_drive_is_not_in_read_only_or_read_write_no_new_container, Drive):
@@ -231,19 +288,33 @@ class DSSFileImport:
                     except Exception as error:
                         logger.error(error)
 
+            self.import_cache.set(drive_key, drive)
+
             return drive
 
     def _get_or_create_directories(self, drive: Drive):
         with DisableSignal(pre_save, check_directory_is_not_in_read_only_or_read_write_no_new_drive, Directory):
-            root_directory = Directory.objects.filter(drive=drive, is_virtual_root=True).first()
+            root_directory_key = ("directory", drive.pk, ())
+            root_directory = self.import_cache.get(root_directory_key)
+            if not root_directory:
+                root_directory = Directory.objects.filter(drive=drive, is_virtual_root=True).first()
+                self.import_cache.set(root_directory_key, root_directory)
+
             parent_directory = root_directory
-            for current_directory_name in self.dss_url.directories:
-                current_directory, directory_created = Directory.objects.get_or_create(
-                    name=current_directory_name,
-                    drive=drive,
-                    directory=parent_directory,
-                    imported=True,
-                )
+            directories = self.dss_url.directories
+            for index, current_directory_name in enumerate(directories):
+                # directories are cached by their path within the drive
+                directory_key = ("directory", drive.pk, tuple(directories[: index + 1]))
+                current_directory = self.import_cache.get(directory_key)
+
+                if not current_directory:
+                    current_directory, directory_created = Directory.objects.get_or_create(
+                        name=current_directory_name,
+                        drive=drive,
+                        directory=parent_directory,
+                        imported=True,
+                    )
+                    self.import_cache.set(directory_key, current_directory)
 
                 parent_directory = current_directory
 
@@ -143,6 +143,7 @@ class DSSContainer(
         )
         track_fields = ("name", "path", "projects", "deleted", "read_write_setting", "import_option")
         fts_template = "fts/container.html"
+        fts_source_fields = ("name", "path")
         export_template = "export/container.html"
 
         def get_default_serializer(*args, **kwargs):
@@ -10,8 +10,7 @@ from collections import Counter
 from contextlib import contextmanager
 from datetime import timedelta
 from hashlib import md5
-from subprocess import check_output
-from time import monotonic, sleep
+from time import monotonic, sleep, time
 
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
@@ -34,9 +33,15 @@ from eric.dss.config import (
     DSS_MOUNT_PATH,
     ERROR_EMAIL_RECEIVER_CLIENT,
     ERROR_EMAIL_RECEIVER_INTERNAL,
+    IMPORT_BATCH_SIZE,
+    IMPORT_CLAIM_TIMEOUT,
+    IMPORT_MAX_BATCHES,
+    IMPORT_WORKERS,
+    INCREMENTAL_SCAN,
     METADATA_FILE_NAME,
+    SCAN_CHUNK_SIZE,
 )
-from eric.dss.helper_classes import DSSFileImport, DSSFileWatch
+from eric.dss.helper_classes import DSSFileImport, DSSFileWatch, DSSImportCache
 from eric.dss.models.models import DSSContainer, DSSFilesToImport
 from eric.notifications.models import Notification, NotificationConfiguration
 from eric.notifications.utils import send_mail
@@ -72,35 +77,66 @@ def dss_task_lock(lock_id, oid):
 
 @shared_task
 def import_dss_files():
-    # gets the pks of all the paths to import that were 1) not already imported and 2) have not been tried to
-    # be imported more than 3 times
-    # The number of files to import in one batch can be limited by using slicing like [:1000].
-    # Set the number according to testing
-    files_to_import = DSSFilesToImport.objects.filter(
-        imported=False,
-        import_in_progress=False,
-        import_attempts__lte=3,
-    )[:1000]
+    """
+    Starts IMPORT_WORKERS import tasks, which claim and import the files to import in parallel
+    """
+    for _ in range(IMPORT_WORKERS):
+        import_dss_file_batches.delay()
 
-    # We cannot use a simple .update() on the queryset here, as this 1. won't work with slices and
-    # 2. only the count will the be returned and we lose access to the queryset.
-    # That's why we loop here and save single items.
-    for file_to_import in files_to_import:
-        file_to_import.import_in_progress = True
-        file_to_import.save()
 
-    for file_to_import in files_to_import:
-        file_to_import_hexdigest = md5(str(file_to_import.path).strip().encode()).hexdigest()
-        lock_id = f"dss_task_lock-{file_to_import_hexdigest}"
-        logger.info(f"Importing file: {file_to_import.path}")
-        with dss_task_lock(lock_id, app.oid) as acquired:
-            if acquired:
-                try:
-                    import_dss_file(file_to_import.path)
-                except Exception as error:
-                    logger.error(error)
-                    pass
-        logger.debug(f"File {file_to_import.path} is already being imported by another worker")
+def claim_files_to_import(batch_size):
+    """
+    Claims up to batch_size files to import that were 1) not already imported, 2) are not being imported by another
+    worker (or have been claimed more than IMPORT_CLAIM_TIMEOUT seconds ago, e.g. by a worker that died) and 3) have
+    not been tried to be imported more than 3 times.
+    Rows that are locked by a concurrent claim are skipped, so multiple workers never claim the same file.
+    :return: list of the claimed paths
+    """
+    now = timezone.now()
+
+    with transaction.atomic(), disable_permission_checks(DSSFilesToImport):
+        claimed = list(
+            DSSFilesToImport.objects.filter(
+                Q(import_in_progress=False) | Q(last_modified_at__lte=now - timedelta(seconds=IMPORT_CLAIM_TIMEOUT)),
+                imported=False,
+                import_attempts__lte=3,
+            )
+            .select_for_update(skip_locked=True)
+            .order_by("created_at")
+            .values_list("pk", "path")[:batch_size]
+        )
+
+        # last_modified_at is the time of the claim, update() does not set it automatically
+        DSSFilesToImport.objects.filter(pk__in=[pk for pk, path in claimed]).update(
+            import_in_progress=True, last_modified_at=now
+        )
+
+    return [path for pk, path in claimed]
+
+
+@shared_task
+def import_dss_file_batches(batch_size=None, max_batches=None):
+    """
+    Claims and imports batches of files to import until there are no files left or max_batches were imported.
+    Lookups of containers, envelopes, drives and directories are cached for all files of a batch.
+    """
+    batch_size = batch_size or IMPORT_BATCH_SIZE
+    max_batches = max_batches or IMPORT_MAX_BATCHES
+
+    for _ in range(max_batches):
+        paths = claim_files_to_import(batch_size)
+
+        if not paths:
+            break
+
+        import_cache = DSSImportCache()
+
+        for path in paths:
+            logger.info(f"Importing file: {path}")
+            try:
+                import_dss_file(path, import_cache=import_cache)
+            except Exception as error:
+                logger.error(error)
 
 
 def set_request_for_user(user):
@@ -118,9 +154,10 @@ def set_request_for_user(user):
 
 
 @disable_permission_checks(DSSFilesToImport)
-def import_dss_file(file_to_import_path):
+def import_dss_file(file_to_import_path, import_cache=None):
     """
     Imports a single DSS file. Creates a DSSEnvelope, storage and directories, if required.
+    :param import_cache: optional DSSImportCache that is shared by the files of a batch
     """
     try:
         file_to_import = DSSFilesToImport.objects.get(path=file_to_import_path)
@@ -135,7 +172,7 @@ def import_dss_file(file_to_import_path):
         )
 
     try:
-        file_import = DSSFileImport(file_to_import)
+        file_import = DSSFileImport(file_to_import, import_cache=import_cache)
         metadata_file = file_import.read_metadata_file()
 
         # set request user to user from metadata file
@@ -186,30 +223,100 @@ def scan_filesystem():
         logger.debug(f"Container path {container_mount_path} is already being scanned by another worker")
 
 
-def scan_using_find(path):
-    """Use the linux find command to get all the file paths within a path"""
-    find_command = f"find {path} -type f 2>&1 | grep -v 'Permission denied'"
-    return check_output(find_command, shell=True, timeout=360).decode("utf-8").splitlines()
+def scan_files(path, modified_since=None):
+    """
+    Walks the directory tree below path (without following symlinks) and yields the paths of all files
+    :param modified_since: optional timestamp, files are only yielded for directories that have been modified (i.e.,
+        files have been added, removed or renamed) since then; sub directories are still walked
+    """
+    directories = [path]
+
+    while directories:
+        directory = directories.pop()
+
+        try:
+            if modified_since is not None:
+                directory_is_modified = os.stat(directory, follow_symlinks=False).st_mtime >= modified_since
+            else:
+                directory_is_modified = True
+
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            directories.append(entry.path)
+                        elif directory_is_modified and entry.is_file(follow_symlinks=False):
+                            yield entry.path
+                    except OSError as error:
+                        logger.warning(error)
+        except OSError as error:
+            # e.g., permission denied
+            logger.warning(error)
+
+
+def iterate_in_chunks(iterable, chunk_size):
+    chunk = []
+
+    for item in iterable:
+        chunk.append(item)
+
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+def add_files_to_import(paths):
+    """
+    Adds the given absolute paths to DSSFilesToImport, unless they have already been imported or added
+    :return: the number of added paths
+    """
+    paths = {path for path in paths if os.path.basename(path) != METADATA_FILE_NAME}
+
+    if not paths:
+        return 0
+
+    file_paths = {os.path.relpath(path, start=DSS_MOUNT_PATH): path for path in paths}
+
+    # remove paths that have been imported already
+    paths -= {
+        file_paths[file_path]
+        for file_path in File.objects.filter(path__in=list(file_paths.keys())).values_list("path", flat=True)
+    }
+
+    # remove paths that have been added already (conflicts with concurrent inserts are ignored by bulk_create)
+    paths -= set(DSSFilesToImport.objects.filter(path__in=list(paths)).values_list("path", flat=True))
+
+    DSSFilesToImport.objects.bulk_create([DSSFilesToImport(path=path) for path in paths], ignore_conflicts=True)
+
+    return len(paths)
 
 
 def scan_container_path_and_add_files_to_import(container_path):
     """
     Scans a single container path for files and adds them to DSSFilesToImport
+    The paths are compared to the existing files in chunks of SCAN_CHUNK_SIZE paths (one query per table and chunk).
+    With INCREMENTAL_SCAN, only directories that have been modified since the last scan of the container are compared.
     """
+    container_path_hexdigest = md5(container_path.strip().encode()).hexdigest()
+    last_scan_cache_key = f"dss_scan_last_started-{container_path_hexdigest}"
+
+    modified_since = cache.get(last_scan_cache_key, None) if INCREMENTAL_SCAN else None
+    scan_started = time()
+    added = 0
+
     try:
-        paths = scan_using_find(container_path)
-        for path in paths:
-            file_is_metadata = os.path.basename(path) == METADATA_FILE_NAME
-            file_path = os.path.relpath(path, start=DSS_MOUNT_PATH)
-            file_exists = File.objects.filter(path=file_path).exists()
-            file_to_import_exists = DSSFilesToImport.objects.filter(path=path).exists()
-            if not file_is_metadata and not file_exists and not file_to_import_exists:
-                try:
-                    DSSFilesToImport.objects.create(path=path)
-                except Exception as error:
-                    logger.error(error)
+        for paths in iterate_in_chunks(scan_files(container_path, modified_since), SCAN_CHUNK_SIZE):
+            added += add_files_to_import(paths)
     except Exception as error:
         logger.error(error)
+    else:
+        if INCREMENTAL_SCAN:
+            cache.set(last_scan_cache_key, scan_started, None)
+
+    logger.info(f"Added {added} files of container path {container_path} to import")
 
 
 @shared_task
@@ -445,12 +552,11 @@ def requeue_hanging_files_to_import():
     If a FileToImport is still in progress and has not been imported, then set import_in_progress to false, so it is
     tried again in another import queue
     """
-    delta = 60 * 60 * 3  # 3 hours
     hanging_files_to_import = DSSFilesToImport.objects.filter(
         import_in_progress=True,
         imported=False,
         import_attempts__lte=3,
-        created_at__lte=timezone.now() - timedelta(seconds=delta),
+        last_modified_at__lte=timezone.now() - timedelta(seconds=IMPORT_CLAIM_TIMEOUT),
     )
     if hanging_files_to_import:
         count = hanging_files_to_import.count()
@@ -3,16 +3,19 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 #
 import json
+from datetime import timedelta
 from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 from django.utils import timezone
 
+from eric.core.models import disable_permission_checks
 from eric.core.tests.test_utils import FakeRequest, FakeRequestUser, NoRequest
 from eric.drives.models import Directory, Drive
+from eric.dss.config import IMPORT_CLAIM_TIMEOUT
 from eric.dss.models.models import DSSContainer, DSSEnvelope, DSSFilesToImport
-from eric.dss.tasks import import_dss_file
+from eric.dss.tasks import claim_files_to_import, import_dss_file, import_dss_file_batches
 from eric.dss.tests.dss_test_utils import TemporaryDSSFile
 from eric.metadata.models.models import MetadataField
 from eric.projects.models import Group, MyUser, Project, ProjectRoleUserAssignment, Role
@@ -554,3 +557,72 @@ class ImportTest(TestCase):
         files = list(file_qs)
         __assert_correct_projects_values(files[0].projects)
         __assert_correct_projects_values(files[1].projects)
+
+    def test_import_batches_claim_files_only_once(self):
+        container_path = "my/tumdss/container/10"  # must have 4 parts
+        envelope_path = "envelope10"
+        hierarchy_path = f"{envelope_path}/storage10/dir10/subdir10"
+        metadata_file_content = json.dumps({"tum_id": self.user1.username, "projects": [], "metadata_fields": []})
+
+        # create container
+        with FakeRequest(), FakeRequestUser(self.user1):
+            DSSContainer.objects.create(
+                name="Test Container 10",
+                path=container_path,
+                read_write_setting=DSSContainer.READ_ONLY,
+                import_option=DSSContainer.IMPORT_LIST,
+            )
+
+        # simulate automated API call from external service
+        with FakeRequest(), FakeRequestUser(self.bot_user):
+            file_to_import1 = DSSFilesToImport.objects.create(path=f"/dss/{container_path}/{hierarchy_path}/file1")
+            file_to_import2 = DSSFilesToImport.objects.create(path=f"/dss/{container_path}/{hierarchy_path}/file2")
+
+        # claimed files are marked as in progress and are not claimed again
+        self.assertEqual([file_to_import1.path], claim_files_to_import(1))
+        file_to_import1.refresh_from_db()
+        self.assertTrue(file_to_import1.import_in_progress)
+        self.assertEqual([file_to_import2.path], claim_files_to_import(10))
+        self.assertEqual([], claim_files_to_import(10))
+
+        with disable_permission_checks(DSSFilesToImport):
+            DSSFilesToImport.objects.update(import_in_progress=False)
+
+        # simulate import via celery task, the drive and directories are looked up once for both files
+        with NoRequest(), TemporaryDSSFile(
+            filename=f"{container_path}/{envelope_path}/metadata.json", content=metadata_file_content
+        ), TemporaryDSSFile(f"{container_path}/{hierarchy_path}/file1"), TemporaryDSSFile(
+            f"{container_path}/{hierarchy_path}/file2"
+        ), self.captureOnCommitCallbacks(execute=True):
+            import_dss_file_batches(batch_size=2)
+
+        file_to_import1.refresh_from_db()
+        file_to_import2.refresh_from_db()
+        self.assertTrue(file_to_import1.imported)
+        self.assertTrue(file_to_import2.imported)
+        self.assertFalse(file_to_import1.import_in_progress)
+        self.assertFalse(file_to_import2.import_in_progress)
+
+        self.assertEqual(1, Drive.objects.all().count())
+        self.assertEqual(2, Directory.objects.filter(is_virtual_root=False).count())
+        self.assertEqual(2, File.objects.all().count())
+        self.assertEqual(1, File.objects.values("directory").distinct().count())
+
+    def test_stale_claims_are_claimed_again(self):
+        container_path = "my/tumdss/container/11"  # must have 4 parts
+        hierarchy_path = "envelope11/storage11/dir11"
+
+        # simulate automated API call from external service
+        with FakeRequest(), FakeRequestUser(self.bot_user):
+            file_to_import = DSSFilesToImport.objects.create(path=f"/dss/{container_path}/{hierarchy_path}/file1")
+
+        self.assertEqual([file_to_import.path], claim_files_to_import(10))
+        self.assertEqual([], claim_files_to_import(10))
+
+        # the worker that claimed the file died
+        with disable_permission_checks(DSSFilesToImport):
+            claimed_at = timezone.now() - timedelta(seconds=IMPORT_CLAIM_TIMEOUT + 1)
+            DSSFilesToImport.objects.update(last_modified_at=claimed_at)
+
+        self.assertEqual([file_to_import.path], claim_files_to_import(10))
+        self.assertEqual([], claim_files_to_import(10))
@@ -0,0 +1,45 @@
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+import os
+import tempfile
+
+from django.test import TestCase
+
+from eric.dss.config import METADATA_FILE_NAME
+from eric.dss.models.models import DSSFilesToImport
+from eric.dss.tasks import scan_container_path_and_add_files_to_import, scan_files
+
+
+class ScanTest(TestCase):
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.container_path = self.temporary_directory.name
+
+        self.file_paths = [
+            os.path.join(self.container_path, "envelope", "storage", "file1.txt"),
+            os.path.join(self.container_path, "envelope", "storage", "sub", "file2.txt"),
+        ]
+        self.metadata_file_path = os.path.join(self.container_path, "envelope", METADATA_FILE_NAME)
+
+        for path in self.file_paths + [self.metadata_file_path]:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as file:
+                file.write("test")
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+    def test_scan_files(self):
+        self.assertSetEqual(set(scan_files(self.container_path)), set(self.file_paths + [self.metadata_file_path]))
+
+    def test_scan_adds_new_files_only_once(self):
+        scan_container_path_and_add_files_to_import(self.container_path)
+
+        # metadata files are not imported
+        self.assertSetEqual(set(DSSFilesToImport.objects.values_list("path", flat=True)), set(self.file_paths))
+
+        # scanning again does not add the files again
+        scan_container_path_and_add_files_to_import(self.container_path)
+        self.assertEqual(DSSFilesToImport.objects.count(), 2)
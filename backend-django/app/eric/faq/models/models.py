@@ -74,6 +74,7 @@ class FAQQuestionAndAnswer(BaseModel, ChangeSetMixIn, RevisionModelMixin, Orderi
             ),
         )
         fts_template = "fts/faq.html"
+        fts_source_fields = ("question", "answer", "slug", "category", "category__title", "category__slug")
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
 
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+from django.db import migrations, models
+
+import eric.projects.models.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0118_blob_store'),
+        ('kanban_boards', '0025_fts_index_gin'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='kanbanboard',
+            name='background_image',
+            field=models.ImageField(blank=True, max_length=512, null=True, storage=eric.projects.models.models.BlobStorageLimitByUser(), upload_to='', verbose_name='The background image of the Kanban Board'),
+        ),
+        migrations.AlterField(
+            model_name='kanbanboard',
+            name='background_image_thumbnail',
+            field=models.ImageField(blank=True, max_length=512, null=True, storage=eric.projects.models.models.BlobStorageLimitByUser(), upload_to='', verbose_name='Thumbnail of the kanban board background image'),
+        ),
+    ]
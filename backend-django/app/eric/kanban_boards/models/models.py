@@ -5,11 +5,10 @@
 import os
 import uuid
 
-from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 
 from django_changeset.models import RevisionModelMixin
@@ -32,7 +31,7 @@ from eric.kanban_boards.models.managers import (
     KanbanBoardUserSettingManager,
 )
 from eric.model_privileges.models.abstract import ModelPrivilegeMixIn
-from eric.projects.models import FileSystemStorageLimitByUser, scramble_uploaded_filename
+from eric.projects.models import BlobStorageLimitByUser
 from eric.relations.models import RelationsMixIn
 from eric.search.models import FTSMixin
 
@@ -81,6 +80,7 @@ class KanbanBoard(
             ),
         )
         fts_template = "fts/kanban_board.html"
+        fts_source_fields = ("title", "kanban_board_columns__title")
         export_template = "export/kanban_board.html"
 
         def get_default_serializer(*args, **kwargs):
@@ -111,7 +111,7 @@ class KanbanBoard(
         blank=True,
         null=True,
         max_length=512,
-        storage=FileSystemStorageLimitByUser(),
+        storage=BlobStorageLimitByUser(),
     )
 
     background_image_size = models.BigIntegerField(verbose_name=_("Size of the background image"), default=0)
@@ -121,7 +121,7 @@ class KanbanBoard(
         blank=True,
         null=True,
         max_length=512,
-        storage=FileSystemStorageLimitByUser(),
+        storage=BlobStorageLimitByUser(),
     )
 
     background_color = models.CharField(
@@ -178,30 +178,15 @@ class KanbanBoard(
 
     def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
         """
-        Rename the uploaded file, make sure it is stored in the proper directory
+        Store the size of a new background image and generate its thumbnail
         :param force_insert:
         :param force_update:
         :param using:
         :param update_fields:
         :return:
         """
-        # check if rendered image file has changed
+        # check if background image file has changed (it is stored in the blob store, see BlobStorageLimitByUser)
         if self.background_image and hasattr(self.background_image.file, "content_type"):
-            # rename shapes file
-            new_background_image_file_name = scramble_uploaded_filename(self.background_image.name)
-
-            new_background_image_file_path = settings.WORKBENCH_SETTINGS["project_file_upload_folder"] % {
-                "filename": new_background_image_file_name
-            }
-
-            # create folder if it does not exist
-            if not os.path.exists(os.path.dirname(new_background_image_file_path)):
-                os.makedirs(os.path.dirname(new_background_image_file_path))
-
-            # make sure the path we use is relative to the MEDIA_ROOT, we dont want to store the whole path
-            new_background_image_file_path = os.path.relpath(new_background_image_file_path, settings.MEDIA_ROOT)
-
-            self.background_image.name = new_background_image_file_path
             # store file size
             self.background_image_size = self.background_image.file.size
 
@@ -313,6 +298,38 @@ class KanbanBoardColumn(BaseModel, OrderingModelMixin, ChangeSetMixIn, RevisionM
             self.title, self.kanban_board.title if self.kanban_board else "-"
         )
 
+    def rebalance_task_assignment_orderings(self):
+        """
+        Spreads the orderings of the task assignments of this column evenly (ORDERING_GAP apart), keeping their order,
+        so there is room for moving task assignments between them again
+        :return: the number of updated task assignments
+        """
+        gap = KanbanBoardColumnTaskAssignment.ORDERING_GAP
+
+        with transaction.atomic():
+            # lock the column like move_assignment does, so a concurrent move does not pick an ordering between the
+            # neighbours it read before the rebalancing
+            KanbanBoardColumn.objects.select_for_update().get(pk=self.pk)
+
+            assignments = list(
+                KanbanBoardColumnTaskAssignment.objects.select_for_update()
+                .filter(kanban_board_column=self)
+                .order_by("ordering", "pk")
+                .only("pk", "ordering")
+            )
+
+            changed_assignments = []
+
+            for index, assignment in enumerate(assignments, start=1):
+                if assignment.ordering != index * gap:
+                    assignment.ordering = index * gap
+                    changed_assignments.append(assignment)
+
+            # one query per batch instead of one query per assignment (no changesets are created for rebalancing)
+            KanbanBoardColumnTaskAssignment.objects.bulk_update(changed_assignments, ["ordering"], batch_size=500)
+
+        return len(changed_assignments)
+
 
 class KanbanBoardColumnTaskAssignment(BaseModel, OrderingModelMixin, ChangeSetMixIn, RevisionModelMixin):
     """
@@ -321,6 +338,15 @@ class KanbanBoardColumnTaskAssignment(BaseModel, OrderingModelMixin, ChangeSetMi
 
     objects = KanbanBoardColumnTaskAssignmentManager()
 
+    # task assignments are ordered sparsely, so a task can be moved between two others by only changing its own ordering
+    ORDERING_GAP = 1024
+
+    # the column is rebalanced in the background once the gap to a neighbour gets smaller than this
+    ORDERING_MIN_GAP = 8
+
+    # the column is rebalanced in the background once an ordering exceeds this (the field is a positive integer)
+    ORDERING_MAX = 2**30
+
     class Meta:
         verbose_name = _("Kanban Board Column")
         verbose_name_plural = _("Kanban Board Columns")
@@ -15,9 +15,10 @@ from django.shortcuts import get_object_or_404
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
 
-from eric.core.models import disable_permission_checks
 from eric.core.rest.viewsets import BaseAuthenticatedReadOnlyModelViewSet, DeletableViewSetMixIn, ExportableViewSetMixIn
+from eric.core.thumbnails import get_thumbnail_response
 from eric.kanban_boards.models import KanbanBoard, KanbanBoardColumnTaskAssignment
 from eric.kanban_boards.models.models import KanbanBoardColumn, KanbanBoardUserFilterSetting, KanbanBoardUserSetting
 from eric.kanban_boards.rest.filters import KanbanBoardFilter
@@ -34,7 +35,7 @@ from eric.projects.rest.viewsets.base import (
     LockableViewSetMixIn,
 )
 from eric.relations.models import Relation
-from eric.shared_elements.models import Comment, Task
+from eric.shared_elements.models import Comment, Task, TaskAssignedUser, TaskCheckList
 
 logger = logging.getLogger("eric.kanban_boards")
 
@@ -104,6 +105,27 @@ class KanbanBoardViewSet(
             )
         )
 
+    def get_export_related_data(self, obj):
+        """
+        Includes the columns and the tasks (with their assignees, checklist items, labels and projects) of the board,
+        as they are part of the export
+        """
+        assignments = KanbanBoardColumnTaskAssignment.objects.filter(kanban_board_column__kanban_board=obj)
+        task_pks = assignments.values("task_id")
+
+        return [
+            (obj.kanban_board_columns.all(), ("title", "ordering")),
+            (assignments, ("kanban_board_column_id", "task_id", "ordering")),
+            (Task.objects.filter(pk__in=task_pks), ("version_number",)),
+            (TaskAssignedUser.objects.filter(task__in=task_pks), ("task_id", "assigned_user_id")),
+            (TaskCheckList.objects.filter(task__in=task_pks), ("task_id", "title", "checked", "ordering")),
+            (
+                Task.labels.through.objects.filter(task__in=task_pks),
+                ("task_id", "elementlabel__name", "elementlabel__color"),
+            ),
+            (Task.projects.through.objects.filter(task__in=task_pks), ("task_id", "project__name")),
+        ]
+
     def update(self, request, *args, **kwargs):
         self.handle_background_style(request)
         return super().update(request, *args, **kwargs)
@@ -127,13 +149,26 @@ class KanbanBoardViewSet(
 
     @action(detail=True, methods=["GET"], url_path="background_image.png", url_name="background-image.png")
     def download_background_image(self, request, format=None, *args, **kwargs):
-        """Responds with the background image of the board."""
+        """
+        Responds with the background image of the board, or with a thumbnail of the background image if the "size"
+        query parameter is set
+        """
 
         # get the picture
         picture_object = self.get_object()
         # get original file name for the header
         original_file_name = "background_image.png"
 
+        if picture_object.background_image and "size" in request.query_params:
+            # the background image of a board can be replaced, so browsers have to revalidate the thumbnail
+            return get_thumbnail_response(
+                request,
+                picture_object.background_image.name,
+                request.query_params["size"],
+                "background_image",
+                max_age=0,
+            )
+
         if picture_object.background_image:
             # create a file response
             file_path = os.path.join(settings.MEDIA_ROOT, picture_object.background_image.name)
@@ -276,6 +311,7 @@ class KanbanBoardViewSet(
                     KanbanBoardColumnTaskAssignment.objects.create(
                         kanban_board_column=new_column,
                         task=new_task,
+                        ordering=task_assignment.ordering,
                     )
 
         return response
@@ -353,16 +389,16 @@ class KanbanBoardColumnTaskAssignmentViewSet(BaseAuthenticatedModelViewSet):
         for result in max_ordering_qs:
             max_ordering[str(result["kanban_board_column"])] = result["max_ordering"]
 
-        # now fill in the max ordering
+        # now fill in the max ordering (leaving a gap to the previous assignment, see ORDERING_GAP)
         for assignment in self.request.data:
             column_id = assignment["kanban_board_column"]
 
             if column_id not in max_ordering:
-                # column_id not found in our max_ordering dict, setting value to 0
-                max_ordering[column_id] = 0
+                # column_id not found in our max_ordering dict, the assignment is the first one of the column
+                max_ordering[column_id] = KanbanBoardColumnTaskAssignment.ORDERING_GAP
             else:
-                # found! increase by 1 for the new assignment
-                max_ordering[column_id] += 1
+                # found! increase by the gap for the new assignment
+                max_ordering[column_id] += KanbanBoardColumnTaskAssignment.ORDERING_GAP
 
             assignment["ordering"] = max_ordering[column_id]
 
@@ -402,9 +438,9 @@ class KanbanBoardColumnTaskAssignmentViewSet(BaseAuthenticatedModelViewSet):
             )["max_ordering"]
 
             if max_ordering is None:
-                max_ordering = 0
+                max_ordering = KanbanBoardColumnTaskAssignment.ORDERING_GAP
             else:
-                max_ordering = max_ordering + 1
+                max_ordering = max_ordering + KanbanBoardColumnTaskAssignment.ORDERING_GAP
 
             # since Django 1.11, there is a weird behaviour of QueryDicts that are immutable
             if isinstance(request.data, QueryDict):  # however, some request.data objects are normal dictionaries...
@@ -433,33 +469,17 @@ class KanbanBoardColumnTaskAssignmentViewSet(BaseAuthenticatedModelViewSet):
         return super().update(request, *args, **kwargs)
 
     def destroy(self, request, *args, **kwargs):
-        """Removes a task from a board."""
-
-        # On destroy the ordering of the preceeding tasks in the same column needs to be decreased
-        obj = self.get_object()
-
-        # Step 1: Decrease
-        task_assignments = KanbanBoardColumnTaskAssignment.objects.filter(
-            kanban_board_column_id=obj.kanban_board_column, ordering__gte=obj.ordering
-        ).exclude(pk=obj.pk)
-
-        # Step 2: Let super class handle the real delete
-        response = super().destroy(request, *args, **kwargs)
-
-        task_assignments.update(ordering=F("ordering") - 1)
-
-        return response
-
-    def get_queryset(self, *args, **kwargs):
         """
-        Returns the queryset for viewable tasks of a given kanban board
-        Note: We are returning all tasks, even those that are soft_deleted,
-        so that the frontend can take care of this information
+        Removes a task from a board.
+        The orderings of the other tasks in the same column do not need to be changed, as they are sparse anyway.
         """
-        if not hasattr(self, "parent_object") or not self.parent_object:
-            return KanbanBoardColumnTaskAssignment.objects.none()
+        return super().destroy(request, *args, **kwargs)
 
-        assignments = (
+    def get_base_queryset(self):
+        """
+        Returns the viewable task assignments of the kanban board with their tasks
+        """
+        return (
             KanbanBoardColumnTaskAssignment.objects.viewable()
             .filter(kanban_board_column__kanban_board=self.parent_object.pk)
             .select_related("task", "kanban_board_column", "kanban_board_column__kanban_board")
@@ -475,6 +495,11 @@ class KanbanBoardColumnTaskAssignmentViewSet(BaseAuthenticatedModelViewSet):
             )
         )
 
+    @staticmethod
+    def set_relation_counts(assignments):
+        """
+        Sets num_related_comments and num_relations on the given task assignments
+        """
         tasks = []
 
         for task_assignment in assignments:
@@ -516,26 +541,24 @@ class KanbanBoardColumnTaskAssignmentViewSet(BaseAuthenticatedModelViewSet):
                 task_assignment.task.relations.count() - task_assignment.num_related_comments
             )
 
+    def get_queryset(self, *args, **kwargs):
+        """
+        Returns the queryset for viewable tasks of a given kanban board
+        Note: We are returning all tasks, even those that are soft_deleted,
+        so that the frontend can take care of this information
+        """
+        if not hasattr(self, "parent_object") or not self.parent_object:
+            return KanbanBoardColumnTaskAssignment.objects.none()
+
+        assignments = self.get_base_queryset()
+        self.set_relation_counts(assignments)
+
         return assignments
 
     def get_object(self):
         """Gets a task-board assignment."""
 
-        queryset = (
-            KanbanBoardColumnTaskAssignment.objects.viewable()
-            .filter(kanban_board_column__kanban_board=self.parent_object.pk)
-            .select_related("task", "kanban_board_column", "kanban_board_column__kanban_board")
-            .prefetch_related(
-                "task__projects",
-                "task__created_by",
-                "task__created_by__userprofile",
-                "task__last_modified_by",
-                "task__last_modified_by__userprofile",
-                "task__assigned_users",
-                "task__assigned_users__userprofile",
-                "task__checklist_items",
-            )
-        )
+        queryset = self.get_base_queryset()
 
         # Perform the lookup filtering (usually not needed, but we leave it here as the original get_object also has it)
         lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
@@ -571,147 +594,128 @@ class KanbanBoardColumnTaskAssignmentViewSet(BaseAuthenticatedModelViewSet):
 
         return obj
 
-    @action(detail=False, methods=["PUT"])
-    def move_assignment(self, *args, **kwargs):
-        """Moves a task from one column to another, also updates the ordering if necessary."""
-        from timeit import default_timer as timer
+    @staticmethod
+    def get_neighbour_orderings(column, assignment_pk, index):
+        """
+        Returns the (pk, ordering) tuples of the task assignments that would be before and after the given assignment,
+        if it was at the given index of the column (None if there is no such neighbour)
+        """
+        other_assignments = (
+            KanbanBoardColumnTaskAssignment.objects.filter(kanban_board_column=column)
+            .exclude(pk=assignment_pk)
+            .order_by("ordering", "pk")
+            .values_list("pk", "ordering")
+        )
 
-        start = timer()
+        if index <= 0:
+            return None, other_assignments.first()
 
+        neighbours = list(other_assignments[index - 1 : index + 1])
+
+        if not neighbours:
+            # the index is beyond the end of the column
+            return other_assignments.last(), None
+
+        return neighbours[0], neighbours[1] if len(neighbours) > 1 else None
+
+    @staticmethod
+    def get_ordering_between(previous_ordering, next_ordering):
+        """
+        Returns an ordering between the given orderings (either of them may be None), or None if there is no room left
+        """
+        if previous_ordering is None and next_ordering is None:
+            return KanbanBoardColumnTaskAssignment.ORDERING_GAP
+
+        if previous_ordering is None:
+            return next_ordering // 2 if next_ordering > 0 else None
+
+        if next_ordering is None:
+            return previous_ordering + KanbanBoardColumnTaskAssignment.ORDERING_GAP
+
+        if next_ordering - previous_ordering < 2:
+            return None
+
+        return (previous_ordering + next_ordering) // 2
+
+    @action(detail=False, methods=["PUT"])
+    @transaction.atomic
+    def move_assignment(self, *args, **kwargs):
+        """
+        Moves a task to the given index of a column (within the same column or from another column).
+        Only the moved assignment is updated, as its new ordering is chosen between the orderings of its new neighbours.
+        Returns the moved assignment and its new neighbours.
+        """
         to_column = self.request.data["to_column"]
-        to_index = self.request.data["to_index"]
+        to_index = int(self.request.data["to_index"])
         assignment_pk = self.request.data["assignment_pk"]
 
         # Check if to_column is in the same kanban board (if not, this will raise an exception)
-        real_column = self.parent_object.kanban_board_columns.filter(pk=to_column).first()
+        # the column is locked, so concurrent moves into the same column do not pick the same ordering
+        real_column = self.parent_object.kanban_board_columns.select_for_update().filter(pk=to_column).first()
 
         if not real_column:
             raise NotFound
 
         # get the assignment that we need to change (no need to call viewable here; if the user is allowed to access
         # the parent object, the user is also allowed to access the column)
-        assignment = KanbanBoardColumnTaskAssignment.objects.filter(pk=assignment_pk).select_related("task").first()
+        assignment = KanbanBoardColumnTaskAssignment.objects.filter(
+            pk=assignment_pk, kanban_board_column__kanban_board=self.parent_object
+        ).first()
 
         if not assignment:
             raise NotFound
 
-        # store current ordering (this is the index where the assignment is moved FROM)
-        from_index = assignment.ordering
-        # store current column of assignment
-        from_column = str(assignment.kanban_board_column_id)
-
-        if from_index == to_index and from_column == to_column:
-            # no changes
-            return self.list(self.request, *args, **kwargs)
-
-        if from_column != to_column:
-            # easy: if from_column != to_column, we just need to make space in to_column and fill the gap in from_column
-            # step 1: make space in the to_column: Shift everything in the to_column that is below to_index down by 1
-            task_assignments = KanbanBoardColumnTaskAssignment.objects.filter(
-                kanban_board_column_id=to_column, ordering__gte=to_index
-            ).exclude(pk=assignment_pk)
+        previous, following = self.get_neighbour_orderings(real_column, assignment.pk, to_index)
+        previous_ordering = previous[1] if previous else None
+        next_ordering = following[1] if following else None
+        ordering = self.get_ordering_between(previous_ordering, next_ordering)
 
-            task_assignments.update(ordering=F("ordering") + 1)
-
-            # step 2: now that we have made some room, we can set the ordering of our assignment
-            assignment.ordering = to_index
-            assignment.kanban_board_column_id = to_column
-
-            assignment.save()
-
-            # step 3: now that the original element was removed, close the gap in from_column by decreasing ordering
-            # of the assignments in from_column
-            task_assignments = KanbanBoardColumnTaskAssignment.objects.filter(
-                kanban_board_column_id=from_column, ordering__gte=from_index
-            ).exclude(pk=assignment_pk)
-
-            task_assignments.update(ordering=F("ordering") - 1)
-
-        else:  # from_column == to_column
-            # move within the same column
+        if ordering is None:
+            # there is no room left between the neighbours, rebalance the column right away
             logger.debug(
-                "KanbanBoardColumnTaskAssignmentViewSet.move_assignment(board_id={}): Moving assignment "
-                "within the same column ".format(self.parent_object.pk)
-            )
-
-            ########################################################################################################
-            # step 1: make space in the to_column: Shift everything in the to_column after to_index down by 1
-            ########################################################################################################
-            task_assignments = (
-                KanbanBoardColumnTaskAssignment.objects.viewable()
-                .filter(kanban_board_column_id=to_column)
-                .exclude(pk=assignment_pk)
-            )
-
-            if from_index < to_index:
-                # as we are moving down, we need to decrease to_index - else we move it too far
-                to_index -= 1
-                # move down within the same column
-                task_assignments = task_assignments.filter(ordering__gte=from_index, ordering__lte=to_index)
-
-                # just mass-decrease the ordering by 1
-                task_assignments.update(ordering=F("ordering") - 1)
-            else:
-                # move up within the same column
-                task_assignments = task_assignments.filter(
-                    ordering__gte=to_index,
-                    ordering__lte=from_index,
+                "KanbanBoardColumnTaskAssignmentViewSet.move_assignment(board_id={}): Rebalancing column {}".format(
+                    self.parent_object.pk, real_column.pk
                 )
-
-                # just mass-increase the ordering by 1
-                task_assignments.update(ordering=F("ordering") + 1)
-
-            ########################################################################################################
-            # step 2: now that we have made some room, we can set the ordering of the current assignment without
-            #         causing a DB/consistency conflict (uniqueness of ordering + kanban_board_column)
-            ########################################################################################################
-            assignment.ordering = to_index
-            assignment.kanban_board_column_id = to_column
-
-            assignment.save()
-
-            ########################################################################################################
-            # step 3: Consistency check - make sure the from_column has a consistent ordering again
-            #         in an optimal world, this should not never happen - so worst case it's just a READ QUERY, and
-            #         not an UPDATE QUERY
-            ########################################################################################################
-            task_assignments = (
-                KanbanBoardColumnTaskAssignment.objects.viewable()
-                .filter(kanban_board_column_id=from_column)
-                .order_by("ordering")
             )
+            real_column.rebalance_task_assignment_orderings()
+
+            previous, following = self.get_neighbour_orderings(real_column, assignment.pk, to_index)
+            previous_ordering = previous[1] if previous else None
+            next_ordering = following[1] if following else None
+            ordering = self.get_ordering_between(previous_ordering, next_ordering)
+        elif (
+            (previous_ordering is not None and ordering - previous_ordering < assignment.ORDERING_MIN_GAP)
+            or (next_ordering is not None and next_ordering - ordering < assignment.ORDERING_MIN_GAP)
+            or ordering > assignment.ORDERING_MAX
+        ):
+            # the column is about to run out of room, rebalance it in the background
+            from eric.kanban_boards.tasks import rebalance_kanban_board_column_task_assignments
+
+            column_pk = str(real_column.pk)
+            transaction.on_commit(lambda: rebalance_kanban_board_column_task_assignments.delay(column_pk))
+
+        if assignment.ordering != ordering or assignment.kanban_board_column_id != real_column.pk:
+            assignment.ordering = ordering
+            assignment.kanban_board_column = real_column
+            assignment.save()
 
-            # iterate over all task assignments of the current column and fix ordering (in case it needs to be fixed)
-            i = 0
-
-            with disable_permission_checks(KanbanBoardColumnTaskAssignment):
-                for a in task_assignments:
-                    # for this assignment we expect the ordering to be i
-                    if a.ordering != i:
-                        # wrong ordering detected, fix it
-                        logger.debug(
-                            "KanbanBoardColumnTaskAssignmentViewSet.move_assignment():  "
-                            "Detected ordering of assignment is {}, but expected it to be {}".format(a.ordering, i)
-                        )
-
-                        a.ordering = i
-                        a.save(update_fields=["ordering"])
+        affected_pks = [assignment.pk]
 
-                    i = i + 1
+        if previous:
+            affected_pks.append(previous[0])
 
-        end = timer()
+        if following:
+            affected_pks.append(following[0])
 
-        logger.debug(
-            "KanbanBoardColumnTaskAssignmentViewSet.move_assignment(board_id={}): "
-            "Moving took {} seconds".format(self.parent_object.pk, (end - start))
-        )
+        assignments = self.get_base_queryset().filter(pk__in=affected_pks).order_by("ordering", "pk")
+        self.set_relation_counts(assignments)
 
-        # return the QUERY/LIST api call
+        # return the moved assignment and its neighbours
         from django_changeset.models import RevisionModelMixin
 
-        # temporarily disable revision model mixin for the list api call
+        # temporarily disable revision model mixin for serializing the assignments
         RevisionModelMixin.set_enabled(False)
-        response = self.list(self.request, *args, **kwargs)
+        response = Response(self.get_serializer(assignments, many=True).data)
         RevisionModelMixin.set_enabled(True)
 
         return response
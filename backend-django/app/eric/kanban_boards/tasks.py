@@ -0,0 +1,25 @@
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+import logging
+
+from celery import shared_task
+
+from eric.kanban_boards.models import KanbanBoardColumn
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def rebalance_kanban_board_column_task_assignments(column_pk):
+    """
+    Spreads the orderings of the task assignments of a kanban board column evenly again
+    """
+    column = KanbanBoardColumn.objects.filter(pk=column_pk).first()
+
+    if not column:
+        logger.info(f"Not rebalancing kanban board column '{column_pk}' as it does not exist anymore")
+        return
+
+    column.rebalance_task_assignment_orderings()
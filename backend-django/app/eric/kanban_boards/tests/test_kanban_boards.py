@@ -489,12 +489,13 @@ class TestGenericsKanbanBoards(APITestCase, EntityChangeRelatedProjectTestMixin,
         self.assertEqual(len(decoded), 5, msg="The kanban board should have 5 tasks")
 
         # check if ordering of the tasks inside each column is correct
-        # the response is sorted after the ordering of the tasks so first comes all tasks with ordering 0, than 1, ...
-        self.assertEqual(decoded[0]["ordering"], 0, msg="Task ordering has to be 0")
-        self.assertEqual(decoded[1]["ordering"], 1, msg="Task ordering has to be 1")
-        self.assertEqual(decoded[2]["ordering"], 0, msg="Task ordering has to be 0")
-        self.assertEqual(decoded[3]["ordering"], 0, msg="Task ordering has to be 0")
-        self.assertEqual(decoded[4]["ordering"], 1, msg="Task ordering has to be 1")
+        # the response is sorted after the ordering of the tasks, the orderings are ORDERING_GAP apart
+        gap = KanbanBoardColumnTaskAssignment.ORDERING_GAP
+        self.assertEqual(decoded[0]["ordering"], gap, msg="Task ordering has to be gap")
+        self.assertEqual(decoded[1]["ordering"], 2 * gap, msg="Task ordering has to be 2 * gap")
+        self.assertEqual(decoded[2]["ordering"], gap, msg="Task ordering has to be gap")
+        self.assertEqual(decoded[3]["ordering"], gap, msg="Task ordering has to be gap")
+        self.assertEqual(decoded[4]["ordering"], 2 * gap, msg="Task ordering has to be 2 * gap")
 
         # check if task3 does not changed the task state from NEW to PROG because he was added to column with task
         # state PROG - state should still be NEW
@@ -630,25 +631,24 @@ class TestGenericsKanbanBoards(APITestCase, EntityChangeRelatedProjectTestMixin,
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         decoded = json.loads(response.content.decode())
 
-        # check if ordering of the tasks inside each column is correct
-        # the response is sorted after the ordering of the tasks so first comes all tasks with ordering 0, than 1, ...
-        # verify task 2
-        self.assertEqual(decoded[0]["ordering"], 0, msg="Task ordering has to be 0")
-        self.assertEqual(decoded[0]["kanban_board_column"], kanban_board_column_new_pk)
-        self.assertEqual(decoded[0]["task"]["pk"], task2_pk)
-        self.assertEqual(decoded[0]["pk"], task2_assignment_pk)
+        # only the moved assignment and its new neighbours are returned, sorted after the ordering
+        gap = KanbanBoardColumnTaskAssignment.ORDERING_GAP
+        self.assertEqual(len(decoded), 2)
 
         # verify task 3
-        self.assertEqual(decoded[1]["ordering"], 0, msg="Task ordering has to be 0")
-        self.assertEqual(decoded[1]["kanban_board_column"], kanban_board_column_prog_pk)
-        self.assertEqual(decoded[1]["task"]["pk"], task3_pk)
-        self.assertEqual(decoded[1]["pk"], task3_assignment_pk)
+        self.assertEqual(decoded[0]["ordering"], gap, msg="Task ordering has to be gap")
+        self.assertEqual(decoded[0]["kanban_board_column"], kanban_board_column_prog_pk)
+        self.assertEqual(decoded[0]["task"]["pk"], task3_pk)
+        self.assertEqual(decoded[0]["pk"], task3_assignment_pk)
 
         # verify task 1
-        self.assertEqual(decoded[2]["ordering"], 1, msg="Task ordering has to be 1")
-        self.assertEqual(decoded[2]["kanban_board_column"], kanban_board_column_prog_pk)
-        self.assertEqual(decoded[2]["task"]["pk"], task1_pk)
-        self.assertEqual(decoded[2]["pk"], task1_assignment_pk)
+        self.assertEqual(decoded[1]["ordering"], 2 * gap, msg="Task ordering has to be 2 * gap")
+        self.assertEqual(decoded[1]["kanban_board_column"], kanban_board_column_prog_pk)
+        self.assertEqual(decoded[1]["task"]["pk"], task1_pk)
+        self.assertEqual(decoded[1]["pk"], task1_assignment_pk)
+
+        # task 2 was not touched
+        self.assertEqual(KanbanBoardColumnTaskAssignment.objects.get(pk=task2_assignment_pk).ordering, 2 * gap)
 
         # move task2 from column NEW to DONE
         # column with task_state NEW
@@ -666,11 +666,11 @@ class TestGenericsKanbanBoards(APITestCase, EntityChangeRelatedProjectTestMixin,
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         decoded = json.loads(response.content.decode())
 
-        # check if ordering of the tasks inside each column is correct
-        # the response is sorted after the ordering of the tasks so first comes all tasks with ordering 0, than 1, ...
-        self.assertEqual(decoded[0]["ordering"], 0, msg="Task ordering has to be 0")
-        self.assertEqual(decoded[1]["ordering"], 1, msg="Task ordering has to be 1")
-        self.assertEqual(decoded[2]["ordering"], 0, msg="Task ordering has to be 0")
+        # task 2 is the only task in column DONE
+        self.assertEqual(len(decoded), 1)
+        self.assertEqual(decoded[0]["pk"], task2_assignment_pk)
+        self.assertEqual(decoded[0]["kanban_board_column"], kanban_board_column_done_pk)
+        self.assertEqual(decoded[0]["ordering"], gap, msg="Task ordering has to be gap")
 
         # move task2 from column DONE to PROG but between task3 and task1 (ordering of tasks)
         data = {"assignment_pk": task2_assignment_pk, "to_column": kanban_board_column_prog_pk, "to_index": 1}
@@ -681,14 +681,29 @@ class TestGenericsKanbanBoards(APITestCase, EntityChangeRelatedProjectTestMixin,
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         decoded = json.loads(response.content.decode())
 
-        # check if ordering of the tasks inside each column is correct
-        # the response is sorted after the ordering of the tasks so first comes all tasks with ordering 0, than 1, ...
-        self.assertEqual(decoded[0]["ordering"], 0, msg="Task ordering has to be 0")
-        self.assertEqual(decoded[1]["ordering"], 1, msg="Task ordering has to be 1")
-        self.assertEqual(decoded[2]["ordering"], 2, msg="Task ordering has to be 2")
+        # check if task2 was placed between task3 and task1 without changing their ordering
+        self.assertEqual(len(decoded), 3)
+        self.assertEqual(decoded[0]["ordering"], gap, msg="Task ordering has to be gap")
+        self.assertEqual(decoded[1]["ordering"], gap + gap // 2, msg="Task ordering has to be between its neighbours")
+        self.assertEqual(decoded[2]["ordering"], 2 * gap, msg="Task ordering has to be 2 * gap")
+        self.assertEqual(decoded[1]["task"]["pk"], task2_pk, msg="task2 is the task in the middle")
+
+        # move task1 to the top of column PROG, after taking away all room between the orderings of the column
+        KanbanBoardColumnTaskAssignment.objects.filter(pk=task3_assignment_pk).update(ordering=0)
+        KanbanBoardColumnTaskAssignment.objects.filter(pk=task2_assignment_pk).update(ordering=1)
+        data = {"assignment_pk": task1_assignment_pk, "to_column": kanban_board_column_prog_pk, "to_index": 1}
+
+        response = self.rest_move_tasks_between_kanbanboard_columns(
+            self.token1, kanban_board_pk, data, HTTP_USER_AGENT, REMOTE_ADDR
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        decoded = json.loads(response.content.decode())
 
-        # check if task2 has the ordering 1
-        self.assertEqual(decoded[1]["task"]["pk"], task2_pk, msg="task2 is the task with the ordering of 1")
+        # the column has been rebalanced, so task1 fits between task3 and task2 again
+        self.assertEqual([assignment["task"]["pk"] for assignment in decoded], [task3_pk, task1_pk, task2_pk])
+        self.assertEqual(decoded[0]["ordering"], gap)
+        self.assertEqual(decoded[1]["ordering"], gap + gap // 2)
+        self.assertEqual(decoded[2]["ordering"], 2 * gap)
 
     def test_delete_task_from_kanban_board(self):
         """Tests for removing tasks from the kanban board"""
@@ -257,7 +257,27 @@ class BaseLabBookPermissionQuerySet(BaseProjectEntityPermissionQuerySet):
 
 
 class LabBookChildElementQuerySet(BaseLabBookPermissionQuerySet):
-    pass
+    def sections(self):
+        """
+        Returns all child elements that are LabBook sections
+        """
+        from eric.labbooks.models import LabbookSection
+
+        return self.filter(child_object_content_type=LabbookSection.get_content_type())
+
+    def top_level(self):
+        """
+        Excludes all child elements that are contained in one of the sections of this QuerySet (with a single query)
+        Section child elements are matched by their child object, as sections restored from a version might reference
+        the child elements of another labbook
+        """
+        from eric.labbooks.models import LabBookChildElement
+
+        section_child_object_ids = LabBookChildElement.objects.filter(
+            labbooksection__in=self.sections().values("child_object_id")
+        ).values("child_object_id")
+
+        return self.exclude(child_object_id__in=section_child_object_ids)
 
 
 class LabbookSectionQuerySet(BaseProjectEntityPermissionQuerySet, ChangeSetQuerySetMixin):
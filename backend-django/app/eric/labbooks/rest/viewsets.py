@@ -2,23 +2,28 @@
 # Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
 # SPDX-License-Identifier: AGPL-3.0-or-later
 #
+import json
+
 from django.db import transaction
-from django.db.models import Count, F, Q
+from django.db.models import Count, F, Max, Q, Sum
 from django.http import QueryDict
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 
-from django_changeset.models import RevisionModelMixin
+from django_changeset.models import ChangeRecord, ChangeSet
 
 from eric.core.models import disable_permission_checks
 from eric.core.rest.viewsets import BaseAuthenticatedModelViewSet, DeletableViewSetMixIn, ExportableViewSetMixIn
 from eric.labbooks.models import LabBook, LabBookChildElement, LabbookSection
 from eric.labbooks.rest.filters import LabBookFilter, LabbookSectionFilter
 from eric.labbooks.rest.serializers import LabBookChildElementSerializer, LabbookSectionSerializer, LabBookSerializer
+from eric.labbooks.signals import labbook_child_elements_bulk_updated
+from eric.labbooks.utils import count_child_object_relations, get_child_elements_with_sections, load_child_objects
 from eric.projects.rest.viewsets.base import (
     BaseAuthenticatedCreateUpdateWithoutProjectModelViewSet,
     LockableViewSetMixIn,
@@ -37,6 +42,9 @@ class LabBookChildElementViewSet(BaseAuthenticatedModelViewSet):
     # disable pagination for this endpoint
     pagination_class = None
 
+    # the fields of a child element that can be changed by update_all
+    child_element_geometry_fields = ("position_x", "position_y", "width", "height")
+
     def initial(self, request, *args, **kwargs):
         """
         Fetches the parent object and raises Http404 if the parent object does not exist (or the user does not have
@@ -109,40 +117,76 @@ class LabBookChildElementViewSet(BaseAuthenticatedModelViewSet):
         if len(child_elements) != len(request_pk_list):
             raise ValidationError(_("Invalid primary key suplied - element does not belong to the labbook"))
 
+        changed_elements = []
+        old_values = []
+        new_values = []
+
+        for child_element in self.request.data:
+            # get item from existing child_elements
+            real_item = child_elements[child_element["pk"]]
+
+            old_value = self.get_child_element_geometry(real_item)
+
+            # check if anything has changed -> only update the element in database if it really needs to be changed
+            for field_name in self.child_element_geometry_fields:
+                setattr(real_item, field_name, child_element[field_name])
+
+            new_value = self.get_child_element_geometry(real_item)
+
+            if old_value != new_value:
+                changed_elements.append(real_item)
+                old_values.append(old_value)
+                new_values.append(new_value)
+
+        if changed_elements:
+            self.bulk_update_child_elements(changed_elements, old_values, new_values)
+
+        # only return the geometry of the elements that have changed
+        return Response({"changed": new_values})
+
+    def get_child_element_geometry(self, child_element):
+        geometry = {"pk": str(child_element.pk)}
+
+        for field_name in self.child_element_geometry_fields:
+            geometry[field_name] = getattr(child_element, field_name)
+
+        return geometry
+
+    def bulk_update_child_elements(self, changed_elements, old_values, new_values):
+        """
+        Updates the geometry of the given child elements with a single query, and stores one changeset on the labbook
+        Model signals (changesets, websockets, ...) are not sent for the single child elements, instead the
+        labbook_child_elements_bulk_updated signal is sent once
+        """
+        now = timezone.now()
+        user = self.request.user
+
+        for child_element in changed_elements:
+            child_element.last_modified_at = now
+            child_element.last_modified_by = user
+            child_element.version_number = F("version_number") + 1
+
         # the remainder of this can be done without permission checks (we already know the element is editable)
         with disable_permission_checks(LabBookChildElement):
-            for child_element in self.request.data:
-                pk = child_element["pk"]
-
-                # get item from existing child_elements
-                real_item = child_elements[pk]
-
-                # check if anything has changed -> only fire a database query if the element really needs to be changed
-                if (
-                    real_item.position_x != child_element["position_x"]
-                    or real_item.position_y != child_element["position_y"]
-                    or real_item.width != child_element["width"]
-                    or real_item.height != child_element["height"]
-                ):
-                    # something has changed -> update it in database
-                    real_item.position_x = child_element["position_x"]
-                    real_item.position_y = child_element["position_y"]
-                    real_item.width = child_element["width"]
-                    real_item.height = child_element["height"]
-
-                    real_item.save()
-
-        # call save method of parent object, such that the Django ChangeSet stores the changes on the "related_many"
-        # self.parent_object.save()
-        # commented out on purpose - this causes an issue with moving elements - see ticket-259775
-
-        # temporarily disable revision model to improve performance for providing the list endpoint here
-        RevisionModelMixin.set_enabled(False)
-        # ToDo: It is not necessary to return the whole list of elements here (needs frontend adaptation too)
-        response = Response(request_pk_list)
-        RevisionModelMixin.set_enabled(True)
-
-        return response
+            LabBookChildElement.objects.bulk_update(
+                changed_elements,
+                self.child_element_geometry_fields + ("last_modified_at", "last_modified_by", "version_number"),
+            )
+
+        # store the changes of all child elements on the labbook, like django changeset does for track_related_many
+        # (saving the labbook itself causes an issue with moving elements - see ticket-259775)
+        change_set = self.parent_object.changesets.create(user=user, changeset_type="U")
+        ChangeRecord.objects.create(
+            change_set=change_set,
+            field_name="child_elements",
+            old_value=json.dumps(old_values),
+            new_value=json.dumps(new_values),
+            is_related=True,
+        )
+
+        labbook_child_elements_bulk_updated.send(
+            sender=LabBookChildElement, lab_book=self.parent_object, child_elements=changed_elements
+        )
 
     def get_object(self):
         """
@@ -217,201 +261,15 @@ class LabBookChildElementViewSet(BaseAuthenticatedModelViewSet):
         child_elements = LabBookChildElement.objects.all().filter(lab_book=self.parent_object)
         # if this is a section request we filter child_elements to only return the child elements of the section
         if section_request:
-            section_child_elements_pks = (
-                LabbookSection.objects.all()
-                .filter(child_elements__labbooksection=section_request)
-                .values("child_elements")
-                .distinct()
-            )
-            child_elements = child_elements.filter(pk__in=section_child_elements_pks)
-
-        # possible child elements of a labbook are:
-        # - file
-        # - note
-        # - picture
-        # - plugin instance
-        # - section
-        from eric.pictures.models import Picture
-        from eric.plugins.models import PluginInstance
-        from eric.shared_elements.models import File, Note
-
-        file_content_type_id = File.get_content_type().id
-        note_content_type_id = Note.get_content_type().id
-        comment_content_type_id = Comment.get_content_type().id
-        picture_content_type_id = Picture.get_content_type().id
-        plugin_instance_content_type_id = PluginInstance.get_content_type().id
-
-        file_pks = []
-        note_pks = []
-        picture_pks = []
-        plugin_instance_pks = []
-        labbooksection_pks = []
-
-        # iterate over all child elements and collect the foreign keys of the referenced child_objects
-        for element in child_elements:
-            if element.child_object_content_type_id == file_content_type_id:
-                file_pks.append(element.child_object_id)
-            elif element.child_object_content_type_id == note_content_type_id:
-                note_pks.append(element.child_object_id)
-            elif element.child_object_content_type_id == picture_content_type_id:
-                picture_pks.append(element.child_object_id)
-            elif element.child_object_content_type_id == plugin_instance_content_type_id:
-                plugin_instance_pks.append(element.child_object_id)
-            elif element.is_labbook_section:
-                labbooksection_pks.append(element.child_object_id)
-            else:
-                # unexpected type
-                print(f"error: unexpected labbook childelement type {element.child_object_content_type_id}")
-
-        # now we need to filter out the child elements of all sections, so they are now returned
-        # and loaded in the frontend
-        # 1. get the a list of top level elements that are not sections
-        child_elements_pks = []
-        for element in child_elements:
-            if not element.is_labbook_section:
-                child_elements_pks.append(element.pk)
-
-        # 2. get all sections
-        sections = (
-            LabbookSection.objects.all()
-            .filter(child_elements__labbooksection__in=labbooksection_pks)
-            .values("child_elements")
-            .distinct()
-        )
-
-        # 3. get all section child elements
-        sections_child_elements = (
-            LabBookChildElement.objects.all().filter(pk__in=sections).values("child_object_id").distinct()
-        )
-        section_pks = []
-        for section_pk in sections_child_elements:
-            for note_pk in note_pks:
-                if str(note_pk) in str(section_pk):
-                    section_pks.append(note_pk)
-            for file_pk in file_pks:
-                if str(file_pk) in str(section_pk):
-                    section_pks.append(file_pk)
-            for picture_pk in picture_pks:
-                if str(picture_pk) in str(section_pk):
-                    section_pks.append(picture_pk)
-            for plugin_instance_pk in plugin_instance_pks:
-                if str(plugin_instance_pk) in str(section_pk):
-                    section_pks.append(plugin_instance_pk)
-        # 4. filter out the section child elements, so only top level LabBook child elements are left
-        child_elements = child_elements.exclude(child_object_id__in=section_pks)
-
-        # fetch all (viewable) notes (collected form child_elements), exclude section child elements
-        notes = (
-            Note.objects.viewable()
-            .filter(pk__in=note_pks)
-            .exclude(pk__in=section_pks)
-            .prefetch_common()
-            .prefetch_related(
-                "projects",
-            )
-            .in_bulk()
-        )
-
-        # fetch all (viewable) files (collected form child_elements), exclude section child elements
-        files = (
-            File.objects.viewable()
-            .filter(pk__in=file_pks)
-            .exclude(pk__in=section_pks)
-            .prefetch_common()
-            .prefetch_related(
-                "projects",
-            )
-            .in_bulk()
-        )
+            child_elements = child_elements.filter(labbooksection=section_request)
 
-        # fetch all (viewable) pictures (collected form child_elements), exclude section child elements
-        pictures = (
-            Picture.objects.viewable()
-            .filter(pk__in=picture_pks)
-            .exclude(pk__in=section_pks)
-            .prefetch_common()
-            .prefetch_related(
-                "projects",
-            )
-            .in_bulk()
-        )
-
-        # fetch all (viewable) plugin instances (collected form child_elements), exclude section child elements
-        plugin_instances = (
-            PluginInstance.objects.viewable()
-            .filter(pk__in=plugin_instance_pks)
-            .exclude(pk__in=section_pks)
-            .prefetch_common()
-            .prefetch_related(
-                "projects",
-            )
-            .in_bulk()
-        )
+        # filter out the child elements of all sections, so they are not returned and loaded in the frontend
+        child_elements = child_elements.top_level()
 
-        # fetch all (viewable) sections (collected form child_elements)
-        labbooksections = (
-            LabbookSection.objects.viewable().filter(pk__in=labbooksection_pks).prefetch_common().in_bulk()
-        )
-
-        # fetch related comments
-        related_left_comments = {
-            str(x["pk"]): x["num_related_left_comments"]
-            for x in Relation.objects.filter(
-                Q(
-                    Q(right_content_type=picture_content_type_id, right_object_id__in=pictures)
-                    | Q(right_content_type=file_content_type_id, right_object_id__in=files)
-                    | Q(right_content_type=note_content_type_id, right_object_id__in=notes)
-                    | Q(right_content_type=plugin_instance_content_type_id, right_object_id__in=plugin_instances)
-                )
-                & Q(left_content_type=comment_content_type_id)
-            )
-            .order_by("right_object_id", "right_content_type")
-            .values("right_object_id", "right_content_type")
-            .annotate(num_related_left_comments=Count("left_object_id"), pk=F("right_object_id"))
-            .values("pk", "num_related_left_comments")
-        }
-
-        related_right_comments = {
-            str(x["pk"]): x["num_related_right_comments"]
-            for x in Relation.objects.filter(
-                Q(
-                    Q(left_content_type=picture_content_type_id, left_object_id__in=pictures)
-                    | Q(left_content_type=file_content_type_id, left_object_id__in=files)
-                    | Q(left_content_type=note_content_type_id, left_object_id__in=notes)
-                    | Q(right_content_type=plugin_instance_content_type_id, right_object_id__in=plugin_instances)
-                )
-                & Q(right_content_type=comment_content_type_id)
-            )
-            .order_by("left_object_id", "left_content_type")
-            .values("left_object_id", "left_content_type")
-            .annotate(num_related_right_comments=Count("right_object_id"), pk=F("left_object_id"))
-            .values("pk", "num_related_right_comments")
-        }
-
-        # Performance Trick: iterate over child elements and set the child_object (else every element would be fetched
-        # individually by a django rest serializer)
-        for element in child_elements:
-            if element.child_object_content_type_id == file_content_type_id:
-                element.child_object = files.get(element.child_object_id, None)
-            elif element.child_object_content_type_id == note_content_type_id:
-                element.child_object = notes.get(element.child_object_id, None)
-            elif element.child_object_content_type_id == picture_content_type_id:
-                element.child_object = pictures.get(element.child_object_id, None)
-            elif element.child_object_content_type_id == plugin_instance_content_type_id:
-                element.child_object = plugin_instances.get(element.child_object_id, None)
-            elif element.is_labbook_section:
-                element.child_object = labbooksections.get(element.child_object_id, None)
-
-            # only set num_related_comments and num_relations if a child_object is available
-            if element.child_object and not element.is_labbook_section:
-                element.num_related_comments = related_left_comments.get(
-                    str(element.child_object_id), 0
-                ) + related_right_comments.get(str(element.child_object_id), 0)
-
-                element.num_relations = element.child_object.relations.count() - element.num_related_comments
-            else:
-                element.num_related_comments = 0
-                element.num_relations = 0
+        # Performance Trick: set the (viewable) child objects of all child elements (else every element would be
+        # fetched individually by a django rest serializer)
+        load_child_objects(child_elements)
+        count_child_object_relations(child_elements)
 
         return child_elements
 
@@ -432,6 +290,43 @@ class LabBookViewSet(
     def get_queryset(self):
         return LabBook.objects.viewable().prefetch_common().prefetch_related("projects")
 
+    def get_export_context(self, obj):
+        """
+        Provides the top level child elements and the child elements of all sections for the export template
+        """
+        context = super().get_export_context(obj)
+
+        labbook_child_elements, section_child_elements = get_child_elements_with_sections(obj)
+
+        context.update(
+            {
+                "labbook_child_elements": labbook_child_elements,
+                "section_child_elements": section_child_elements,
+            }
+        )
+
+        return context
+
+    def get_export_version(self, obj):
+        """
+        Includes the versions of the child elements and the latest change of their child objects, as they are part of
+        the export
+        """
+        child_elements = LabBookChildElement.objects.filter(lab_book=obj)
+
+        child_element_versions = child_elements.aggregate(count=Count("pk"), version=Sum("version_number"))
+
+        latest_child_object_change = ChangeSet.objects.filter(
+            object_uuid__in=child_elements.values("child_object_id")
+        ).aggregate(latest=Max("date"))["latest"]
+
+        return "{}:{}:{}:{}".format(
+            super().get_export_version(obj),
+            child_element_versions["count"],
+            child_element_versions["version"],
+            latest_child_object_change.isoformat() if latest_child_object_change else None,
+        )
+
 
 class LabbookSectionViewSet(
     BaseAuthenticatedCreateUpdateWithoutProjectModelViewSet, DeletableViewSetMixIn, LockableViewSetMixIn
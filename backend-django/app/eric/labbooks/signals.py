@@ -0,0 +1,9 @@
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+from django.dispatch import Signal
+
+# sent after child elements of a labbook have been updated with bulk_update (which does not send post_save for each
+# child element), provides the labbook as "lab_book" and the list of updated child elements as "child_elements"
+labbook_child_elements_bulk_updated = Signal()
@@ -37,6 +37,30 @@ class LabBookMixin:
             REMOTE_ADDR=REMOTE_ADDR,
         )
 
+    def rest_start_labbook_export_job(self, auth_token, labbook_pk, HTTP_USER_AGENT, REMOTE_ADDR):
+        """
+        Wrapper for starting an export job of a labbook
+        """
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + auth_token)
+
+        return self.client.post(
+            f"/api/labbooks/{labbook_pk}/export_jobs/",
+            HTTP_USER_AGENT=HTTP_USER_AGENT,
+            REMOTE_ADDR=REMOTE_ADDR,
+        )
+
+    def rest_get_labbook_export_job(self, auth_token, labbook_pk, job_id, HTTP_USER_AGENT, REMOTE_ADDR):
+        """
+        Wrapper for getting the status of an export job of a labbook
+        """
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + auth_token)
+
+        return self.client.get(
+            f"/api/labbooks/{labbook_pk}/export_jobs/{job_id}/",
+            HTTP_USER_AGENT=HTTP_USER_AGENT,
+            REMOTE_ADDR=REMOTE_ADDR,
+        )
+
     def rest_search_labbooks(self, auth_token, search_string, HTTP_USER_AGENT, REMOTE_ADDR):
         """
         Wrapper for searching the labbooks endpoint
@@ -138,6 +162,20 @@ class LabBookMixin:
             REMOTE_ADDR=REMOTE_ADDR,
         )
 
+    def rest_update_all_labbook_elements(self, auth_token, labbook_pk, data, HTTP_USER_AGENT, REMOTE_ADDR):
+        """
+        Wrapper for updating the positions of several labbook elements at once
+        """
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + auth_token)
+
+        return self.client.put(
+            f"/api/labbooks/{labbook_pk}/elements/update_all/",
+            json.dumps(data, default=custom_json_handler),
+            content_type="application/json",
+            HTTP_USER_AGENT=HTTP_USER_AGENT,
+            REMOTE_ADDR=REMOTE_ADDR,
+        )
+
     def rest_remove_labbook_element(self, auth_token, labbook_pk, element_pk, HTTP_USER_AGENT, REMOTE_ADDR):
         """
         Wrapper for removing a labbook element
@@ -12,8 +12,10 @@ from rest_framework import status
 from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_403_FORBIDDEN
 from rest_framework.test import APITestCase
 
+from eric.core.tests.test_utils import FakeRequest, FakeRequestUser
 from eric.labbooks.models import LabBook, LabbookSection
 from eric.labbooks.tests.core import LabBookMixin, LabbookSectionMixin
+from eric.labbooks.utils import get_child_elements_with_sections
 from eric.model_privileges.models import ModelPrivilege
 from eric.projects.models import Permission, Project, Role
 from eric.projects.tests.core import AuthenticationMixin, ModelPrivilegeMixin, ProjectsMixin
@@ -225,3 +227,17 @@ class TestLabBookSections(
         self.assertEqual(decoded_list[0]["child_object"]["date"], self.dates["today"].isoformat())
         self.assertEqual(decoded_list[0]["child_object"]["title"], "Section 1")
         self.assertEqual(decoded_list[0]["child_object"]["child_elements"], [labbook_child_element_file["pk"]])
+
+        # the export resolves the same top level elements and the child elements of the section
+        with FakeRequest(), FakeRequestUser(self.user1):
+            top_level_child_elements, section_child_elements = get_child_elements_with_sections(labbook)
+
+        self.assertEqual(len(top_level_child_elements), 1)
+        section_element = top_level_child_elements[0]
+        self.assertEqual(section_element.child_object, labbooksection)
+        self.assertEqual(list(section_child_elements.keys()), [section_element.pk])
+        self.assertEqual(
+            [str(element.pk) for element in section_child_elements[section_element.pk]],
+            [labbook_child_element_file["pk"]],
+        )
+        self.assertEqual(section_child_elements[section_element.pk][0].child_object.name, "test.txt")
@@ -3,14 +3,17 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 #
 import json
+import tempfile
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
+from django.test import override_settings
 
 from rest_framework import status
 from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_403_FORBIDDEN
 from rest_framework.test import APITestCase
 
+from eric.core.tasks import render_export_job
 from eric.labbooks.models import LabBook
 from eric.labbooks.tests.core import LabBookMixin
 from eric.model_privileges.models import ModelPrivilege
@@ -206,6 +209,108 @@ class TestGenericsLabBooks(APITestCase, EntityChangeRelatedProjectTestMixin, Lab
         decoded_response = json.loads(response.content.decode())
         self.assertEqual(len(decoded_response), 1, msg="There should be one element in the labbook")
 
+    def test_labbook_elements_update_all(self):
+        """
+        Tests that repositioning several labbook elements at once only updates the changed elements and stores a
+        single changeset on the labbook
+        :return:
+        """
+        labbook, response = self.create_labbook_orm(self.token1, None, "LabBook 1", False, **self.http_data)
+
+        elements = []
+
+        for i in range(3):
+            note, response = self.create_note_orm(self.token1, None, f"Note {i}", "<p>Content</p>", **self.http_data)
+
+            response = self.rest_add_labbook_element(
+                self.token1, labbook.pk, note.get_content_type().id, note.pk, 0, i * 10, 20, 10, **self.http_data
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            elements.append(json.loads(response.content.decode()))
+
+        number_of_changesets = labbook.changesets.count()
+
+        # move the first element and resize the last one, the second element stays where it is
+        data = [
+            {"pk": element["pk"], "position_x": 0, "position_y": element["position_y"], "width": 20, "height": 10}
+            for element in elements
+        ]
+        data[0]["position_x"] = 5
+        data[2]["height"] = 15
+
+        response = self.rest_update_all_labbook_elements(self.token1, labbook.pk, data, **self.http_data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        changed = json.loads(response.content.decode())["changed"]
+        self.assertEqual([element["pk"] for element in changed], [elements[0]["pk"], elements[2]["pk"]])
+        self.assertEqual(changed[0]["position_x"], 5)
+        self.assertEqual(changed[1]["height"], 15)
+
+        child_elements = {str(element.pk): element for element in labbook.child_elements.all()}
+        self.assertEqual(child_elements[elements[0]["pk"]].position_x, 5)
+        self.assertEqual(child_elements[elements[1]["pk"]].position_x, 0)
+        self.assertEqual(child_elements[elements[2]["pk"]].height, 15)
+
+        # one changeset containing the changes of both elements is stored on the labbook
+        self.assertEqual(labbook.changesets.count(), number_of_changesets + 1)
+        change_record = labbook.changesets.order_by("-date").first().change_records.get()
+        self.assertEqual(change_record.field_name, "child_elements")
+        self.assertEqual(json.loads(change_record.new_value), changed)
+
+    @override_settings(EXPORT_CACHE_FOLDER=tempfile.mkdtemp())
+    def test_labbook_export_job(self):
+        """
+        Tests rendering the export of a labbook with an export job, and that the rendered export is cached until the
+        labbook changes
+        :return:
+        """
+        labbook, response = self.create_labbook_orm(self.token1, None, "LabBook 1", False, **self.http_data)
+
+        note, response = self.create_note_orm(self.token1, None, "Demo Note", "<p>Some note content", **self.http_data)
+        response = self.rest_add_labbook_element(
+            self.token1, labbook.pk, note.get_content_type().id, note.pk, 0, 0, 20, 10, **self.http_data
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        # start an export job, it is rendered in the background
+        response = self.rest_start_labbook_export_job(self.token1, labbook.pk, **self.http_data)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job = json.loads(response.content.decode())
+        self.assertEqual(job["status"], "pending")
+        self.assertIsNone(job["url"])
+
+        render_export_job(job["job_id"])
+
+        response = self.rest_get_labbook_export_job(self.token1, labbook.pk, job["job_id"], **self.http_data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        job = json.loads(response.content.decode())
+        self.assertEqual(job["status"], "finished")
+        self.assertIn(f"/export_jobs/{job['job_id']}/download/", job["url"])
+
+        # the export can be downloaded (partially) via the link
+        response = self.client.get(job["url"], HTTP_RANGE="bytes=0-3", **self.http_data)
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response.content, b"%PDF")
+
+        # other users can not access the export job
+        response = self.rest_get_labbook_export_job(self.token2, labbook.pk, job["job_id"], **self.http_data)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        # the export of the unchanged labbook is cached, so another export job is finished right away
+        response = self.rest_start_labbook_export_job(self.token1, labbook.pk, **self.http_data)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(json.loads(response.content.decode())["status"], "finished")
+
+        # changing a child element of the labbook invalidates the cached export
+        response = self.rest_update_note(
+            self.token1, note.pk, None, "Demo Note", "<p>Changed note content</p>", **self.http_data
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.rest_start_labbook_export_job(self.token1, labbook.pk, **self.http_data)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(json.loads(response.content.decode())["status"], "pending")
+
     def test_labbook_change_projects_changes_projects_of_all_child_elements(self):
         """
         Tests that changing the projects of a labbook also changes the projects of all child elements
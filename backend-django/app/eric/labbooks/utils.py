@@ -0,0 +1,176 @@
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db.models import Count, Q
+
+from eric.relations.models import Relation
+
+
+def get_child_object_models():
+    """
+    Returns the possible models of the child objects of a labbook:
+    - file
+    - note
+    - picture
+    - plugin instance
+    - section
+    """
+    from eric.labbooks.models import LabbookSection
+    from eric.pictures.models import Picture
+    from eric.plugins.models import PluginInstance
+    from eric.shared_elements.models import File, Note
+
+    return File, Note, Picture, PluginInstance, LabbookSection
+
+
+def load_child_objects(child_elements):
+    """
+    Loads the (viewable) child objects of the given labbook child elements with one query per child object model and
+    sets them as child_object, else every child object would be fetched individually via the generic foreign key
+    The child object is set to None if the current user is not allowed to view it
+    :param child_elements: iterable of LabBookChildElement
+    """
+    from eric.labbooks.models import LabbookSection
+
+    models = {model.get_content_type().id: model for model in get_child_object_models()}
+
+    # collect the primary keys of the child objects per content type
+    child_object_pks = defaultdict(list)
+
+    for element in child_elements:
+        child_object_pks[element.child_object_content_type_id].append(element.child_object_id)
+
+    child_objects = {}
+
+    for content_type_id, pks in child_object_pks.items():
+        model = models.get(content_type_id)
+
+        if model is None:
+            # unexpected type
+            print(f"error: unexpected labbook childelement type {content_type_id}")
+            continue
+
+        queryset = model.objects.viewable().filter(pk__in=pks).prefetch_common()
+
+        if model is not LabbookSection:
+            queryset = queryset.prefetch_related("projects")
+
+        child_objects[content_type_id] = queryset.in_bulk()
+
+    for element in child_elements:
+        objects = child_objects.get(element.child_object_content_type_id, {})
+        element.child_object = objects.get(element.child_object_id, None)
+
+
+def get_child_elements_with_sections(lab_book):
+    """
+    Resolves the viewable child elements of a labbook into the top level child elements and the child elements of the
+    sections with a fixed number of queries, the child objects of all returned child elements are loaded already
+    :param eric.labbooks.models.LabBook lab_book:
+    :return: a tuple of the list of top level child elements and a dictionary of section child element pk -> list of
+        child elements within the section
+    :rtype: tuple
+    """
+    from eric.labbooks.models import LabBookChildElement, LabbookSection
+
+    top_level_child_elements = list(lab_book.child_elements.viewable().top_level())
+
+    # section child element pk by the pk of the section (the child object)
+    section_element_pks = {
+        element.child_object_id: element.pk for element in top_level_child_elements if element.is_labbook_section
+    }
+
+    # resolve the section memberships with one query on the many to many table
+    memberships = list(
+        LabbookSection.child_elements.through.objects.filter(
+            labbooksection_id__in=section_element_pks.keys()
+        ).values_list("labbooksection_id", "labbookchildelement_id")
+    )
+
+    section_child_elements = LabBookChildElement.objects.viewable().in_bulk(
+        [child_element_pk for section_pk, child_element_pk in memberships]
+    )
+
+    child_elements_by_section = defaultdict(list)
+
+    for section_pk, child_element_pk in memberships:
+        if child_element_pk in section_child_elements:
+            child_elements_by_section[section_element_pks[section_pk]].append(section_child_elements[child_element_pk])
+
+    # keep the ordering of the child elements within the sections
+    for child_elements in child_elements_by_section.values():
+        child_elements.sort(key=lambda element: (element.position_y, element.position_x))
+
+    load_child_objects(top_level_child_elements + list(section_child_elements.values()))
+
+    return top_level_child_elements, dict(child_elements_by_section)
+
+
+def count_child_object_relations(child_elements):
+    """
+    Sets num_related_comments and num_relations on the given child elements (with loaded child objects) with a fixed
+    number of aggregate queries, sections and child elements without a child object get 0
+    :param child_elements: iterable of LabBookChildElement
+    """
+    from eric.labbooks.models import LabbookSection
+    from eric.shared_elements.models import Comment
+
+    comment_content_type_id = Comment.get_content_type().id
+    section_content_type_id = LabbookSection.get_content_type().id
+
+    child_object_pks = defaultdict(list)
+
+    for element in child_elements:
+        if element.child_object and element.child_object_content_type_id != section_content_type_id:
+            child_object_pks[element.child_object_content_type_id].append(element.child_object_id)
+
+    num_related_comments = defaultdict(int)
+    num_relations = defaultdict(int)
+
+    if child_object_pks:
+        for side, other_side in (("left", "right"), ("right", "left")):
+            side_filter = reduce(
+                or_,
+                (
+                    Q(**{f"{side}_content_type": content_type_id, f"{side}_object_id__in": pks})
+                    for content_type_id, pks in child_object_pks.items()
+                ),
+            )
+
+            # comments are counted regardless of whether the relation is private
+            comment_counts = (
+                Relation.objects.filter(side_filter, **{f"{other_side}_content_type": comment_content_type_id})
+                .order_by()
+                .values(f"{side}_object_id")
+                .annotate(count=Count("pk"))
+                .values_list(f"{side}_object_id", "count")
+            )
+
+            for object_id, count in comment_counts:
+                num_related_comments[object_id] += count
+
+            relation_counts = (
+                Relation.objects.viewable()
+                .filter(side_filter)
+                .order_by()
+                .values(f"{side}_object_id")
+                .annotate(count=Count("pk"))
+                .values_list(f"{side}_object_id", "count")
+            )
+
+            for object_id, count in relation_counts:
+                num_relations[object_id] += count
+
+    for element in child_elements:
+        if element.child_object and element.child_object_content_type_id != section_content_type_id:
+            element.num_related_comments = num_related_comments[element.child_object_id]
+            # all other relations
+            element.num_relations = num_relations[element.child_object_id] - element.num_related_comments
+        else:
+            element.num_related_comments = 0
+            element.num_relations = 0
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+from django.utils.dateparse import parse_date, parse_datetime
+
+TYPED_VALUE_FIELDS = ('numeric_value', 'date_value', 'datetime_value', 'text_value', 'tag_values')
+
+# base types of metadata fields whose value is stored as a number (time is stored as sum of minutes)
+NUMERIC_BASE_TYPES = ('whole_number', 'decimal_number', 'currency', 'percentage', 'time')
+
+
+def get_typed_values(base_type, values):
+    """
+    Converts the values of a metadata field with the given base type into the typed values that are used for searching
+    (a copy of Metadata.get_typed_values at the time of this migration)
+    """
+    typed_values = {field_name: None for field_name in TYPED_VALUE_FIELDS}
+
+    if not isinstance(values, dict):
+        return typed_values
+
+    value = values.get('value', None)
+
+    try:
+        if base_type in NUMERIC_BASE_TYPES:
+            if value is not None:
+                typed_values['numeric_value'] = float(value)
+
+        elif base_type == 'fraction':
+            numerator = values.get('numerator', None)
+            denominator = values.get('denominator', None)
+
+            if numerator is not None and denominator is not None and float(denominator) != 0:
+                typed_values['numeric_value'] = float(numerator) / float(denominator)
+
+        elif base_type == 'checkbox':
+            if value is not None:
+                typed_values['numeric_value'] = 1.0 if value else 0.0
+
+        elif base_type == 'date':
+            if value:
+                typed_values['datetime_value'] = parse_datetime(value)
+
+        elif base_type == 'real_date':
+            if value:
+                typed_values['date_value'] = parse_date(value)
+
+        elif base_type == 'text':
+            if value is not None:
+                typed_values['text_value'] = str(value).upper()
+
+        elif base_type == 'gps':
+            typed_values['text_value'] = f"{values.get('x', '') or ''};{values.get('y', '') or ''}".upper()
+
+        elif base_type == 'tag':
+            typed_values['tag_values'] = [str(tag).upper() for tag in values.get('answers', None) or []]
+
+    except (ValueError, TypeError):
+        # invalid values can not be searched for
+        pass
+
+    return typed_values
+
+
+def fill_typed_values(apps, schema_editor):
+    Metadata = apps.get_model('metadata', 'Metadata')
+
+    changed_metadata = []
+
+    for metadata in Metadata.objects.select_related('field').iterator():
+        for field_name, value in get_typed_values(metadata.field.base_type, metadata.values).items():
+            setattr(metadata, field_name, value)
+
+        changed_metadata.append(metadata)
+
+        if len(changed_metadata) >= 1000:
+            Metadata.objects.bulk_update(changed_metadata, TYPED_VALUE_FIELDS)
+            changed_metadata = []
+
+    Metadata.objects.bulk_update(changed_metadata, TYPED_VALUE_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metadata', '0010_metadata_tags'),
+        # the trigram extension is installed by the search app
+        ('search', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='metadata',
+            name='numeric_value',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='Numeric value (numbers, time, fractions and checkboxes)'),
+        ),
+        migrations.AddField(
+            model_name='metadata',
+            name='date_value',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Date value'),
+        ),
+        migrations.AddField(
+            model_name='metadata',
+            name='datetime_value',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Date and time value'),
+        ),
+        migrations.AddField(
+            model_name='metadata',
+            name='text_value',
+            field=models.TextField(blank=True, editable=False, null=True, verbose_name='Upper case text value (text and GPS)'),
+        ),
+        migrations.AddField(
+            model_name='metadata',
+            name='tag_values',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=128), blank=True, editable=False, null=True, size=None, verbose_name='Upper case tag names'),
+        ),
+        migrations.RunPython(fill_typed_values, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='metadata',
+            index=models.Index(fields=['field', 'numeric_value'], name='metadata_numeric_value_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='metadata',
+            index=models.Index(fields=['field', 'date_value'], name='metadata_date_value_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='metadata',
+            index=models.Index(fields=['field', 'datetime_value'], name='metadata_datetime_value_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='metadata',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['text_value'], name='metadata_text_value_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='metadata',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tag_values'], name='metadata_tag_values_idx'),
+        ),
+    ]
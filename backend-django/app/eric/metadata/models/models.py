@@ -7,7 +7,10 @@ from typing import Iterable
 
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
+from django.utils.dateparse import parse_date, parse_datetime
 from django.utils.translation import gettext_lazy as _
 
 from django_changeset.models import CreatedModifiedByMixIn
@@ -145,6 +148,14 @@ class Metadata(BaseModel, CreatedModifiedByMixIn, OrderingModelMixin):
             "ordering",
             "created_at",  # fallback for default ordering
         ]
+        indexes = [
+            # typed values for the metadata search (see get_typed_values)
+            models.Index(fields=["field", "numeric_value"], name="metadata_numeric_value_idx"),
+            models.Index(fields=["field", "date_value"], name="metadata_date_value_idx"),
+            models.Index(fields=["field", "datetime_value"], name="metadata_datetime_value_idx"),
+            GinIndex(fields=["text_value"], name="metadata_text_value_trgm_idx", opclasses=["gin_trgm_ops"]),
+            GinIndex(fields=["tag_values"], name="metadata_tag_values_idx"),
+        ]
 
     id = models.UUIDField(
         primary_key=True,
@@ -175,12 +186,122 @@ class Metadata(BaseModel, CreatedModifiedByMixIn, OrderingModelMixin):
         null=False,
     )
 
+    # typed copies of the values, which are used (and indexed) for searching metadata
+    numeric_value = models.FloatField(
+        verbose_name=_("Numeric value (numbers, time, fractions and checkboxes)"),
+        null=True,
+        blank=True,
+        editable=False,
+    )
+
+    date_value = models.DateField(
+        verbose_name=_("Date value"),
+        null=True,
+        blank=True,
+        editable=False,
+    )
+
+    datetime_value = models.DateTimeField(
+        verbose_name=_("Date and time value"),
+        null=True,
+        blank=True,
+        editable=False,
+    )
+
+    text_value = models.TextField(
+        verbose_name=_("Upper case text value (text and GPS)"),
+        null=True,
+        blank=True,
+        editable=False,
+    )
+
+    tag_values = ArrayField(
+        models.CharField(max_length=128),
+        verbose_name=_("Upper case tag names"),
+        null=True,
+        blank=True,
+        editable=False,
+    )
+
+    TYPED_VALUE_FIELDS = ("numeric_value", "date_value", "datetime_value", "text_value", "tag_values")
+
     def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
         if not self.values:
             self.values = self.field.get_default_value()
 
+        for field_name, value in self.get_typed_values(self.field.base_type, self.values).items():
+            setattr(self, field_name, value)
+
+        if update_fields is not None and "values" in update_fields:
+            update_fields = set(update_fields) | set(self.TYPED_VALUE_FIELDS)
+
         return super().save(force_insert, force_update, using, update_fields)
 
+    @staticmethod
+    def get_typed_values(base_type, values):
+        """
+        Converts the values of a metadata field with the given base type into the typed values that are used for
+        searching (texts and tags are upper case, so case insensitive searches can use an index)
+        :return: a dictionary with the values of all TYPED_VALUE_FIELDS
+        :rtype: dict
+        """
+        typed_values = {field_name: None for field_name in Metadata.TYPED_VALUE_FIELDS}
+
+        if not isinstance(values, dict):
+            return typed_values
+
+        value = values.get("value", None)
+
+        try:
+            if base_type in [
+                MetadataField.BASE_TYPE_WHOLE_NUMBER,
+                MetadataField.BASE_TYPE_DECIMAL_NUMBER,
+                MetadataField.BASE_TYPE_CURRENCY,
+                MetadataField.BASE_TYPE_PERCENTAGE,
+                MetadataField.BASE_TYPE_TIME,  # stored as sum of minutes
+            ]:
+                if value is not None:
+                    typed_values["numeric_value"] = float(value)
+
+            elif base_type == MetadataField.BASE_TYPE_FRACTION:
+                numerator = values.get("numerator", None)
+                denominator = values.get("denominator", None)
+
+                if numerator is not None and denominator is not None and float(denominator) != 0:
+                    typed_values["numeric_value"] = float(numerator) / float(denominator)
+
+            elif base_type == MetadataField.BASE_TYPE_CHECKBOX:
+                if value is not None:
+                    typed_values["numeric_value"] = 1.0 if value else 0.0
+
+            elif base_type == MetadataField.BASE_TYPE_DATE:
+                if value:
+                    typed_values["datetime_value"] = parse_datetime(value)
+
+            elif base_type == MetadataField.BASE_TYPE_REAL_DATE:
+                if value:
+                    typed_values["date_value"] = parse_date(value)
+
+            elif base_type == MetadataField.BASE_TYPE_TEXT:
+                if value is not None:
+                    typed_values["text_value"] = str(value).upper()
+
+            elif base_type == MetadataField.BASE_TYPE_GPS:
+                typed_values["text_value"] = Metadata.get_gps_text_value(values.get("x", ""), values.get("y", ""))
+
+            elif base_type == MetadataField.BASE_TYPE_TAG:
+                typed_values["tag_values"] = [str(tag).upper() for tag in values.get("answers", None) or []]
+
+        except (ValueError, TypeError):
+            # invalid values can not be searched for
+            pass
+
+        return typed_values
+
+    @staticmethod
+    def get_gps_text_value(x, y):
+        return f"{x or ''};{y or ''}".upper()
+
     def __str__(self):
         return str(self.pk)
 
@@ -3,25 +3,51 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 #
 from abc import abstractmethod
+from datetime import timedelta
 
-from django.contrib.postgres.fields.jsonb import KeyTextTransform, KeyTransform
-from django.db.models import ExpressionWrapper, F, FloatField, Q, Value
-from django.db.models.functions import Cast
+from django.db.models import Q
 from django.utils.dateparse import parse_date, parse_datetime
 
-from eric.metadata.models.models import MetadataField
+from eric.metadata.models.models import Metadata, MetadataField
 from eric.metadata.rest.errors import InvalidFieldInputError, InvalidOperatorError
-from eric.metadata.utils import KeyDecimalTransform
 
 
 class MetadataQuerySetFilterMethod:
+    """
+    Builds the condition for a search parameter, the conditions use the typed values of the metadata (see
+    Metadata.get_typed_values) so they can be answered with an index
+    """
+
     @abstractmethod
-    def filter(self, queryset, values, operator):
+    def get_condition(self, values, operator):
         pass
 
+    def filter(self, queryset, values, operator):
+        return queryset.filter(self.get_condition(values, operator))
+
+
+def get_comparison_condition(field_name, value, operator):
+    if operator == "=":
+        return Q(**{field_name: value})
+
+    elif operator == "<":
+        return Q(**{f"{field_name}__lt": value})
+
+    elif operator == "<=":
+        return Q(**{f"{field_name}__lte": value})
+
+    elif operator == ">":
+        return Q(**{f"{field_name}__gt": value})
+
+    elif operator == ">=":
+        return Q(**{f"{field_name}__gte": value})
+
+    else:
+        raise InvalidOperatorError()
+
 
 class NumberFilterMethod(MetadataQuerySetFilterMethod):
-    def filter(self, queryset, values, operator):
+    def get_condition(self, values, operator):
         value = values.get("value", None)
         if value is None:
             raise InvalidFieldInputError()
@@ -31,27 +57,11 @@ class NumberFilterMethod(MetadataQuerySetFilterMethod):
         except (ValueError, TypeError):
             raise InvalidFieldInputError()
 
-        if operator == "=":
-            return queryset.filter(values__value=float_value)
-
-        elif operator == "<":
-            return queryset.filter(values__value__lt=float_value)
-
-        elif operator == "<=":
-            return queryset.filter(values__value__lte=float_value)
-
-        elif operator == ">":
-            return queryset.filter(values__value__gt=float_value)
-
-        elif operator == ">=":
-            return queryset.filter(values__value__gte=float_value)
-
-        else:
-            raise InvalidOperatorError()
+        return get_comparison_condition("numeric_value", float_value, operator)
 
 
 class TextFilterMethod(MetadataQuerySetFilterMethod):
-    def filter(self, queryset, values, operator):
+    def get_condition(self, values, operator):
         # allow equality operator only
         if operator != "=":
             raise InvalidOperatorError()
@@ -60,13 +70,12 @@ class TextFilterMethod(MetadataQuerySetFilterMethod):
         if value == "":
             raise InvalidFieldInputError()
 
-        queryset = queryset.annotate(text_value=KeyTextTransform("value", "values")).filter(text_value__icontains=value)
-
-        return queryset
+        # text values are stored in upper case, so the trigram index can be used for case insensitive searches
+        return Q(text_value__contains=str(value).upper())
 
 
 class FractionFilterMethod(MetadataQuerySetFilterMethod):
-    def filter(self, queryset, values, operator):
+    def get_condition(self, values, operator):
         numerator = values.get("numerator", None)
         denominator = values.get("denominator", None)
         if numerator is None or denominator is None:
@@ -81,39 +90,13 @@ class FractionFilterMethod(MetadataQuerySetFilterMethod):
         if denominator == 0:
             raise InvalidFieldInputError()
 
-        # Numerator and denominator must be transformed to decimals, otherwise the SQL division will return an integer.
-        # The input fraction must be computed in SQL, to avoid problems caused by different precision levels.
-        queryset = (
-            queryset.annotate(numerator=Cast(KeyTextTransform("numerator", "values"), FloatField()))
-            .annotate(denominator=Cast(KeyTextTransform("denominator", "values"), FloatField()))
-            .filter(~Q(denominator=0))
-            .annotate(fraction=F("numerator") / F("denominator"))
-            .annotate(
-                input_fraction=ExpressionWrapper(Value(numerator) / Value(denominator), output_field=FloatField())
-            )
-        )
-
-        if operator == "=":
-            return queryset.filter(fraction=F("input_fraction"))
-
-        elif operator == "<":
-            return queryset.filter(fraction__lt=F("input_fraction"))
-
-        elif operator == "<=":
-            return queryset.filter(fraction__lte=F("input_fraction"))
-
-        elif operator == ">":
-            return queryset.filter(fraction__gt=F("input_fraction"))
-
-        elif operator == ">=":
-            return queryset.filter(fraction__gte=F("input_fraction"))
-
-        else:
-            raise InvalidOperatorError()
+        # fractions are stored as the (floating point) result of the division, fractions with a denominator of 0 are
+        # not stored at all
+        return get_comparison_condition("numeric_value", numerator / denominator, operator)
 
 
 class GPSFilterMethod(MetadataQuerySetFilterMethod):
-    def filter(self, queryset, values, operator):
+    def get_condition(self, values, operator):
         if operator != "=":
             raise InvalidOperatorError()
 
@@ -123,16 +106,11 @@ class GPSFilterMethod(MetadataQuerySetFilterMethod):
         if x == "" and y == "":
             raise InvalidFieldInputError()
 
-        return (
-            queryset.annotate(x=KeyTransform("x", "values"))
-            .annotate(y=KeyTransform("y", "values"))
-            .filter(x__iexact=x)
-            .filter(y__iexact=y)
-        )
+        return Q(text_value=Metadata.get_gps_text_value(x, y))
 
 
 class SelectionFilterMethod(MetadataQuerySetFilterMethod):
-    def filter(self, queryset, values, operator):
+    def get_condition(self, values, operator):
         if operator != "=":
             raise InvalidOperatorError()
 
@@ -150,109 +128,91 @@ class SelectionFilterMethod(MetadataQuerySetFilterMethod):
         # Iterate over answers to delete selected: false values.
         # If a user selects and unselects a checkbox the selected: false value is set, which is not in the db
         if not single_selected:
-            for answer in answers:
+            for answer in answers or []:
                 selected = answer.get("selected", None)
                 if selected is False:
                     answer.pop("selected")
 
         if answers and custom_input:
-            return queryset.filter(values__answers=answers).filter(values__custom_input__icontains=custom_input)
+            return Q(values__answers=answers) & Q(values__custom_input__icontains=custom_input)
         elif answers and not custom_input:
-            return queryset.filter(values__answers=answers)
+            return Q(values__answers=answers)
         elif single_selected and custom_input:
-            return queryset.filter(values__single_selected=single_selected).filter(
-                values__custom_input__icontains=custom_input
-            )
+            return Q(values__single_selected=single_selected) & Q(values__custom_input__icontains=custom_input)
         elif single_selected and not custom_input:
-            return queryset.filter(values__single_selected=single_selected)
+            return Q(values__single_selected=single_selected)
+        else:
+            raise InvalidFieldInputError()
 
 
 # this is actually the Filter for Datetime not Date, which is found in RealDateFilterMethod
 class DateFilterMethod(MetadataQuerySetFilterMethod):
-    def filter(self, queryset, values, operator):
+    def get_condition(self, values, operator):
         date = values.get("value", None)
         if date is None:
             raise InvalidFieldInputError()
 
         try:
-            date_value = parse_datetime(date).isoformat()
-        except (ValueError, TypeError):
+            date_value = parse_datetime(date)
+            # dates are compared with a precision of minutes
+            minute_start = date_value.replace(second=0, microsecond=0)
+        except (AttributeError, ValueError, TypeError):
             raise InvalidFieldInputError()
 
-        # Truncate the isoformated date_value string from 2019-04-03T10:58:00+00:00 to 2019-04-03T10:58
-        date_value_truncated = date_value[:16]
+        minute_end = minute_start + timedelta(minutes=1)
 
         if operator == "=":
-            # Exact match when the value in the db starts with the truncated input value.
-            return queryset.filter(values__value__startswith=date_value_truncated)
+            # Exact match when the value in the db is within the same minute
+            return Q(datetime_value__gte=minute_start, datetime_value__lt=minute_end)
 
         elif operator == "<":
-            # This works as before. The string comparison stops at the latest when a lower minute value is found.
-            return queryset.filter(values__value__lt=date_value)
+            return Q(datetime_value__lt=date_value)
 
         elif operator == "<=":
-            # Using Q to filter for a lower value OR an exact match using the truncated input value.
-            return queryset.filter(Q(values__value__lt=date_value) | Q(values__value__startswith=date_value_truncated))
+            # a lower value OR an exact match within the same minute
+            return Q(datetime_value__lt=minute_end)
 
         elif operator == ">":
-            # Excluding the truncated input value to avoid exact (=) matches.
-            return queryset.filter(values__value__gt=date_value).exclude(values__value__startswith=date_value_truncated)
+            # greater values, excluding exact (=) matches within the same minute
+            return Q(datetime_value__gte=minute_end)
 
         elif operator == ">=":
-            # Using Q to filter for a greater value OR an exact match using the truncated input value.
-            return queryset.filter(Q(values__value__gt=date_value) | Q(values__value__startswith=date_value_truncated))
+            # a greater value OR an exact match within the same minute
+            return Q(datetime_value__gte=minute_start)
 
         else:
             raise InvalidOperatorError()
 
 
 class RealDateFilterMethod(MetadataQuerySetFilterMethod):
-    def filter(self, queryset, values, operator):
+    def get_condition(self, values, operator):
         date = values.get("value", None)
         if date is None:
             raise InvalidFieldInputError()
 
         try:
-            date_value = parse_date(date).isoformat()
+            date_value = parse_date(date)
         except (ValueError, TypeError):
             raise InvalidFieldInputError()
 
-        if operator == "=":
-            # Exact match when the value in the db starts with the truncated input value.
-            return queryset.filter(values__value__startswith=date_value)
-
-        elif operator == "<":
-            # This works as before. The string comparison stops at the latest when a lower minute value is found.
-            return queryset.filter(values__value__lt=date_value)
-
-        elif operator == "<=":
-            # Using Q to filter for a lower value OR an exact match using the truncated input value.
-            return queryset.filter(Q(values__value__lt=date_value) | Q(values__value__startswith=date_value))
-
-        elif operator == ">":
-            # Excluding the truncated input value to avoid exact (=) matches.
-            return queryset.filter(values__value__gt=date_value).exclude(values__value__startswith=date_value)
-
-        elif operator == ">=":
-            # Using Q to filter for a greater value OR an exact match using the truncated input value.
-            return queryset.filter(Q(values__value__gt=date_value) | Q(values__value__startswith=date_value))
+        if date_value is None:
+            raise InvalidFieldInputError()
 
-        else:
-            raise InvalidOperatorError()
+        return get_comparison_condition("date_value", date_value, operator)
 
 
 class BooleanFilterMethod(MetadataQuerySetFilterMethod):
-    def filter(self, queryset, values, operator):
+    def get_condition(self, values, operator):
         value = values.get("value", None)
 
         if operator == "=":
-            return queryset.filter(values__value=bool(value))
+            return Q(numeric_value=1.0 if value else 0.0)
         else:
             raise InvalidOperatorError()
 
 
 class TagFilterMethod(MetadataQuerySetFilterMethod):
-    def filter(self, queryset, values, operator):
+    def get_condition(self, values, operator):
         if not values:
             raise InvalidFieldInputError()
 
@@ -262,10 +222,8 @@ class TagFilterMethod(MetadataQuerySetFilterMethod):
             raise InvalidFieldInputError()
 
         if operator == "=":
-            query = Q()
-            for answer in answers:
-                query.add(Q(values__answers__icontains=answer), Q.AND)
-            return queryset.filter(query)
+            # all given tags need to be set (tags are stored in upper case)
+            return Q(tag_values__contains=[str(answer).upper() for answer in answers])
         else:
             raise InvalidOperatorError()
 
@@ -310,11 +268,14 @@ class MetadataQuerySetFilter:
         elif base_type == MetadataField.BASE_TYPE_TAG:
             self.method = TagFilterMethod()
 
-    def filter(self, queryset, values, operator):
+    def get_condition(self, values, operator):
         if self.method is None:
             raise NotImplementedError(f"No filter method defined for {self.field.base_type}")
 
         if values is None:
             raise InvalidFieldInputError()
 
-        return self.method.filter(queryset, values, operator)
+        return Q(field=self.field) & self.method.get_condition(values, operator)
+
+    def filter(self, queryset, values, operator):
+        return queryset.filter(self.get_condition(values, operator))
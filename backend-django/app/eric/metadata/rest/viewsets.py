@@ -3,10 +3,13 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 #
 import logging
+from functools import reduce
+from operator import or_
 
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.core.mail import EmailMultiAlternatives
+from django.db.models import Count, Q
 from django.http import Http404, HttpResponse, QueryDict
 from django.shortcuts import get_object_or_404
 from django.template.loader import render_to_string
@@ -177,32 +180,14 @@ class MetadataSearchViewSet(CreateModelMixin, GenericViewSet):
     queryset = Metadata.objects.all()
     serializer_class = MetadataSerializer
 
-    def filter_base_queryset_by_model(self, content_type_name):
+    def get_content_type(self, content_type_name):
         content_type = ContentType.objects.filter(model=content_type_name).first()
         if content_type is None:
             raise ValidationError("Unknown content type")
 
-        self.queryset = self.queryset.filter(entity_content_type=content_type)
+        return content_type
 
-    def build_queryset_for_or_combination(self, or_combination):
-        queryset = Metadata.objects.none()
-
-        for and_combination in or_combination:
-            and_queryset = self.build_queryset_for_and_combination(and_combination)
-            queryset = queryset.union(and_queryset)
-
-        return queryset
-
-    def build_queryset_for_and_combination(self, and_combination):
-        queryset = self.queryset
-
-        for parameter in and_combination:
-            entity_ids = self.build_queryset_for_parameter(parameter).values("entity_id")
-            queryset = queryset.filter(entity_id__in=entity_ids)
-
-        return queryset
-
-    def build_queryset_for_parameter(self, param):
+    def get_condition_for_parameter(self, param):
         if not {"field", "values", "operator", "parameter_index"}.issubset(param):
             raise ValidationError(
                 'Attributes "field", "operator", "values" and "parameter_index" are required per parameter.'
@@ -213,14 +198,13 @@ class MetadataSearchViewSet(CreateModelMixin, GenericViewSet):
         operator = param["operator"]  # = | < | <= | > | >=
         parameter_index = param["parameter_index"]
 
-        param_queryset = self.queryset.filter(field__pk=field_pk)
         field = MetadataField.objects.filter(pk=field_pk).first()
 
         if field is None:
             raise SearchParameterError(parameter_index, _("Invalid field: {field_pk}").format(field_pk=field_pk))
 
         try:
-            return MetadataQuerySetFilter(field).filter(param_queryset, values, operator)
+            return MetadataQuerySetFilter(field).get_condition(values, operator)
 
         except InvalidFieldInputError:
             raise SearchParameterError(parameter_index, _("Invalid field input"))
@@ -228,41 +212,83 @@ class MetadataSearchViewSet(CreateModelMixin, GenericViewSet):
         except InvalidOperatorError:
             raise SearchParameterError(parameter_index, _("Invalid operator for field"))
 
-    def extract_viewable_entities_from_queryset(self, metadata_queryset):
-        # check .viewable() for metadata results in bulk to boost performance
-        # Implemented just like relations.models.RelationsMixIn.get_relations()
+    @staticmethod
+    def get_viewable_entities_condition(content_type=None):
+        """
+        Restricts the metadata to metadata of entities the current user is allowed to view
+        """
+        condition = Q()
+
+        for param, model_details in get_all_workbench_models_with_args(WorkbenchEntityMixin).items():
+            if content_type is not None and model_details["content_type"] != content_type:
+                continue
+
+            condition |= Q(
+                entity_content_type=model_details["content_type"],
+                entity_id__in=model_details["entity"].objects.viewable().values("pk"),
+            )
+
+        return condition
+
+    def build_queryset_for_or_combination(self, or_combination, content_type=None):
+        """
+        Builds a single query that returns the content type and id of all entities matching the search:
+        Every metadata row matching any of the parameters is counted per entity and parameter, an entity matches an
+        AND-combination if all of its parameters have been counted at least once
+        """
+        parameter_conditions = []
+        or_entity_conditions = []
+
+        for and_combination in or_combination:
+            and_entity_condition = Q()
+
+            for param in and_combination:
+                annotation_name = f"parameter_{len(parameter_conditions)}"
+                parameter_conditions.append((annotation_name, self.get_condition_for_parameter(param)))
+                and_entity_condition &= Q(**{f"{annotation_name}__gt": 0})
+
+            or_entity_conditions.append(and_entity_condition)
 
-        metadata_list = list(metadata_queryset)
+        queryset = Metadata.objects.all()
 
+        if content_type is not None:
+            queryset = queryset.filter(entity_content_type=content_type)
+
+        return (
+            queryset.filter(reduce(or_, (condition for annotation_name, condition in parameter_conditions)))
+            .filter(self.get_viewable_entities_condition(content_type))
+            .values("entity_content_type", "entity_id")
+            .annotate(
+                **{
+                    annotation_name: Count("pk", filter=condition)
+                    for annotation_name, condition in parameter_conditions
+                }
+            )
+            .filter(reduce(or_, or_entity_conditions))
+            .order_by("entity_content_type", "entity_id")
+        )
+
+    @staticmethod
+    def get_entities(entity_rows):
+        """
+        Loads the entities of the search result in bulk (one query per content type), keeping the order of the result
+        """
         pks_by_ct = {}
-        model_by_ct = {}
-        prefetched_objects_by_ct = {}
-
-        # build map of models for content types
-        workbench_models = get_all_workbench_models_with_args(WorkbenchEntityMixin)
-        for param, model_details in workbench_models.items():
-            ct = model_details["content_type"].id
-            pks_by_ct[ct] = []
-            model_by_ct[ct] = model_details["entity"]
-
-        # collect pks of search result entities
-        for metadata in metadata_list:
-            pks_by_ct[metadata.entity_content_type_id].append(metadata.entity_id)
-
-        # prefetch viewable objects
-        for ct in pks_by_ct:
-            pks = pks_by_ct[ct]
-            if len(pks) > 0:
-                prefetched_objects_by_ct[ct] = model_by_ct[ct].objects.viewable().filter(pk__in=pks).prefetch_common()
-
-                # retrieve the prefetched objects (via in_bulk)
-                prefetched_objects_by_ct[ct] = prefetched_objects_by_ct[ct].in_bulk()
-
-        return {
-            metadata.entity
-            for metadata in metadata_list
-            if metadata.entity_id in prefetched_objects_by_ct[metadata.entity_content_type_id]
-        }
+
+        for row in entity_rows:
+            pks_by_ct.setdefault(row["entity_content_type"], []).append(row["entity_id"])
+
+        entities_by_ct = {}
+
+        for ct, pks in pks_by_ct.items():
+            model = ContentType.objects.get_for_id(ct).model_class()
+            entities_by_ct[ct] = model.objects.viewable().filter(pk__in=pks).prefetch_common().in_bulk()
+
+        return [
+            entities_by_ct[row["entity_content_type"]][row["entity_id"]]
+            for row in entity_rows
+            if row["entity_id"] in entities_by_ct[row["entity_content_type"]]
+        ]
 
     def serialize_entities(self, entities):
         serialized_entities = []
@@ -302,6 +328,8 @@ class MetadataSearchViewSet(CreateModelMixin, GenericViewSet):
             parameter_index: <parameter index for error reporting>
         }
         ```
+
+        The results can be paginated with the "limit" and "offset" query parameters.
         """
 
         search_params = request.data
@@ -311,13 +339,18 @@ class MetadataSearchViewSet(CreateModelMixin, GenericViewSet):
         if not or_combination or not or_combination[0] or len(or_combination[0]) <= 0:
             raise ValidationError("At least one search parameter is required")
 
-        if content_type_name:
-            self.filter_base_queryset_by_model(content_type_name)
+        content_type = self.get_content_type(content_type_name) if content_type_name else None
+
+        entity_queryset = self.build_queryset_for_or_combination(or_combination, content_type)
+
+        # pagination is optional, as the search has always returned all results
+        if self.paginator is not None and self.paginator.limit_query_param in request.query_params:
+            page = self.paginate_queryset(entity_queryset)
+            data = self.serialize_entities(self.get_entities(page))
 
-        or_queryset = self.build_queryset_for_or_combination(or_combination)
-        entities = self.extract_viewable_entities_from_queryset(or_queryset)
+            return self.get_paginated_response(data)
 
-        data = self.serialize_entities(entities)
+        data = self.serialize_entities(self.get_entities(list(entity_queryset)))
 
         return Response(data)
 
@@ -66,14 +66,14 @@ class SearchTestMixin(AuthenticationMixin, ModelPrivilegeMixin, HelperMixin, Pro
         )
         self.assertEqual(response.status_code, HTTP_200_OK, response.content.decode())
 
-    def send_search_request(self, data, content_type=None, expected_status_code=HTTP_200_OK):
+    def send_search_request(self, data, content_type=None, expected_status_code=HTTP_200_OK, query_string=""):
         full_data = {
             "content_type": content_type,
             "parameters": data,
         }
 
         response = self.client.post(
-            path="/api/metadata-search/",
+            path=f"/api/metadata-search/{query_string}",
             data=json.dumps(full_data, default=custom_json_handler),
             content_type="application/json",
             **http_info,
@@ -1283,6 +1283,35 @@ class EmptySearchTest(SearchTestMixin, APITestCase):
         )
 
 
+class PaginatedSearchTest(SearchTestMixin, APITestCase):
+    def test_paginated_search(self):
+        for note in [self.note1, self.note2, self.note3]:
+            self.patch_metadata(
+                note,
+                [
+                    {"field": self.whole_number_field.pk, "values": {"value": 23}, "parameter_index": "0"},
+                    {"field": self.whole_number_field.pk, "values": {"value": 42}, "parameter_index": "1"},
+                ],
+            )
+
+        parameters = [
+            [
+                {"field": self.whole_number_field.pk, "operator": ">", "values": {"value": 0}, "parameter_index": "0"},
+            ]
+        ]
+
+        # every entity is returned once, even if multiple metadata values match
+        first_page = self.send_search_request(parameters, query_string="?limit=2&offset=0")
+        self.assertEqual(first_page["count"], 3)
+        self.assertEqual(len(first_page["results"]), 2)
+
+        second_page = self.send_search_request(parameters, query_string="?limit=2&offset=2")
+        self.assertEqual(second_page["count"], 3)
+        self.assertEqual(len(second_page["results"]), 1)
+
+        self.assert_result_list(first_page["results"] + second_page["results"], [self.note1, self.note2, self.note3])
+
+
 class MultiParameterSearchTest(SearchTestMixin, APITestCase):
     def test_multiple_and_parameters(self):
         self.patch_metadata(
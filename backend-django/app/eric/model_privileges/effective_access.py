@@ -0,0 +1,237 @@
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+"""
+Maintains the denormalized :class:`~eric.model_privileges.models.EffectiveAccess` table.
+
+Each row stores whether a user can view/edit an entity based on
+- the project roles of the user (including sub projects) and
+- the model privileges (allow and deny) of the user on the entity.
+
+If ``EFFECTIVE_ACCESS_TABLE_ENABLED`` is set, ``viewable()`` and ``editable()`` of
+:class:`~eric.projects.models.querysets.BaseProjectEntityPermissionQuerySet` use this table instead of joining
+projects and model privileges. Run ``manage.py rebuild_effective_access`` before enabling it.
+"""
+import logging
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+# ModelPrivilege columns of the privileges
+PRIVILEGE_FIELDS = {
+    "view": "view_privilege",
+    "edit": "edit_privilege",
+}
+
+# permission prefixes (e.g., change_task) the project roles grant the privileges with
+PRIVILEGE_PERMISSIONS = {
+    "view": "view",
+    "edit": "change",
+}
+
+
+def effective_access_enabled():
+    return settings.EFFECTIVE_ACCESS_TABLE_ENABLED
+
+
+@lru_cache(maxsize=None)
+def get_effective_access_models():
+    """
+    Returns all workbench models whose permissions are derived from projects and model privileges
+    """
+    from eric.core.models.abstract import get_workbench_models_with_special_permissions
+    from eric.projects.models.querysets import BaseProjectEntityPermissionQuerySet
+
+    return [
+        model
+        for model in get_workbench_models_with_special_permissions()
+        if hasattr(model, "projects") and isinstance(model.objects.all(), BaseProjectEntityPermissionQuerySet)
+    ]
+
+
+def filter_by_effective_access(queryset, user, privilege, extended_filters):
+    """
+    Filters the queryset by the effective access table
+    :param queryset: a queryset of an effective access model
+    :param user: the current user
+    :param privilege: either "view" or "edit"
+    :param extended_filters: the extended queryset filters (which are not materialized in the table)
+    :type extended_filters: django.db.models.Q
+    :return: the filtered queryset
+    """
+    from eric.model_privileges.models import EffectiveAccess
+
+    accesses = EffectiveAccess.objects.filter(user=user, content_type=queryset.model.get_content_type())
+    allowed_pks = accesses.filter(**{f"can_{privilege}": True}).values("object_id")
+
+    if not extended_filters:
+        # denied entities have already been removed from the allowed rows
+        return queryset.filter(pk__in=allowed_pks)
+
+    denied_pks = accesses.filter(**{f"{privilege}_denied": True}).values("object_id")
+
+    return queryset.filter(Q(pk__in=allowed_pks) | extended_filters).exclude(pk__in=denied_pks).distinct()
+
+
+def _get_project_pks(user, content_type, permission):
+    from eric.projects.models import Project, ProjectRoleUserAssignment
+
+    project_pks = ProjectRoleUserAssignment.objects.filter(
+        user=user,
+        role__permissions__content_type=content_type,
+        role__permissions__codename=permission,
+    ).values_list("project__id", flat=True)
+
+    return Project.get_all_projects_with_descendants(project_pks).values_list("pk", flat=True)
+
+
+def _get_allowed_and_denied_pks(user, model, privilege, object_ids=None):
+    from eric.core.models.utils import get_permission_name_without_app_label
+    from eric.model_privileges.models import ModelPrivilege
+
+    privilege_field = PRIVILEGE_FIELDS[privilege]
+    project_pks = _get_project_pks(
+        user, model.get_content_type(), get_permission_name_without_app_label(model, PRIVILEGE_PERMISSIONS[privilege])
+    )
+
+    allowed = model.objects.filter(
+        Q(projects__pk__in=project_pks)
+        | Q(model_privileges__full_access_privilege=ModelPrivilege.ALLOW, model_privileges__user=user)
+        | Q(**{f"model_privileges__{privilege_field}": ModelPrivilege.ALLOW, "model_privileges__user": user})
+    )
+    denied = ModelPrivilege.objects.for_model(model).filter(user=user, **{privilege_field: ModelPrivilege.DENY})
+
+    if object_ids is not None:
+        allowed = allowed.filter(pk__in=object_ids)
+        denied = denied.filter(object_id__in=object_ids)
+
+    return (
+        set(allowed.values_list("pk", flat=True).distinct()),
+        set(denied.values_list("object_id", flat=True)),
+    )
+
+
+def compute_effective_access(user, model, object_ids=None):
+    """
+    Computes the (unsaved) effective access rows of a user for a model
+    :param object_ids: optional list of object ids to restrict the computation to
+    :return: list of EffectiveAccess
+    """
+    from eric.model_privileges.models import EffectiveAccess
+
+    view_allowed, view_denied = _get_allowed_and_denied_pks(user, model, "view", object_ids)
+    edit_allowed, edit_denied = _get_allowed_and_denied_pks(user, model, "edit", object_ids)
+
+    content_type = model.get_content_type()
+
+    return [
+        EffectiveAccess(
+            user=user,
+            content_type=content_type,
+            object_id=object_id,
+            can_view=object_id in view_allowed and object_id not in view_denied,
+            can_edit=object_id in edit_allowed and object_id not in edit_denied,
+            view_denied=object_id in view_denied,
+            edit_denied=object_id in edit_denied,
+        )
+        for object_id in view_allowed | view_denied | edit_allowed | edit_denied
+    ]
+
+
+def refresh_effective_access(user, model, object_ids=None):
+    """
+    Replaces the effective access rows of a user for a model (optionally restricted to object_ids)
+    """
+    from eric.model_privileges.models import EffectiveAccess
+
+    with transaction.atomic():
+        rows = EffectiveAccess.objects.filter(user=user, content_type=model.get_content_type())
+
+        if object_ids is not None:
+            rows = rows.filter(object_id__in=object_ids)
+
+        rows.delete_without_signals()
+
+        # superusers can view and edit everything anyway
+        if not user.is_superuser:
+            # a concurrent refresh of the same rows might have inserted them in the meantime, they are up to date too
+            EffectiveAccess.objects.bulk_create(
+                compute_effective_access(user, model, object_ids), batch_size=1000, ignore_conflicts=True
+            )
+
+
+def refresh_effective_access_for_user(user):
+    """
+    Refreshes the effective access rows of a user for all models (e.g., after project role user assignments changed)
+    """
+    for model in get_effective_access_models():
+        refresh_effective_access(user, model)
+
+
+def refresh_effective_access_for_object(instance):
+    """
+    Refreshes the effective access rows of a single entity (e.g., after its projects changed) for all users that
+    either had access before or might have access now
+    """
+    from eric.model_privileges.models import EffectiveAccess, ModelPrivilege
+    from eric.projects.models import ProjectRoleUserAssignment
+
+    model = instance.__class__
+    content_type = model.get_content_type()
+
+    project_pks = set()
+
+    for project in instance.projects.all():
+        project_pks.update(project.get_ancestors(include_self=True).values_list("pk", flat=True))
+
+    user_pks = set(
+        EffectiveAccess.objects.filter(content_type=content_type, object_id=instance.pk).values_list(
+            "user_id", flat=True
+        )
+    )
+    user_pks.update(
+        ModelPrivilege.objects.filter(content_type=content_type, object_id=instance.pk).values_list(
+            "user_id", flat=True
+        )
+    )
+    user_pks.update(
+        ProjectRoleUserAssignment.objects.filter(project__pk__in=project_pks).values_list("user_id", flat=True)
+    )
+
+    for user in User.objects.filter(pk__in=user_pks):
+        refresh_effective_access(user, model, [instance.pk])
+
+
+def rebuild_effective_access(models=None, users=None):
+    """
+    Rebuilds the effective access table from scratch
+    :param models: optional list of models to rebuild (defaults to all effective access models)
+    :param users: optional queryset of users to rebuild (defaults to all users with project roles or privileges)
+    """
+    from eric.model_privileges.models import EffectiveAccess
+
+    if models is None:
+        models = get_effective_access_models()
+
+    if users is None:
+        users = User.objects.filter(
+            Q(assigned_projects_roles__isnull=False) | Q(model_privileges_new__isnull=False)
+        ).distinct()
+
+        # users without any roles or privileges must not keep stale rows
+        EffectiveAccess.objects.exclude(user__in=users).filter(
+            content_type__in=[model.get_content_type() for model in models]
+        ).delete_without_signals()
+
+    for user in users:
+        for model in models:
+            logger.debug(f"Rebuilding effective access of user {user.pk} for {model.__name__}")
+            refresh_effective_access(user, model)
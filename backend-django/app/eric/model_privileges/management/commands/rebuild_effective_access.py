@@ -0,0 +1,53 @@
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from eric.model_privileges.effective_access import get_effective_access_models, rebuild_effective_access
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the denormalized effective access table from project roles and model privileges"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model",
+            action="append",
+            dest="models",
+            default=[],
+            help="Only rebuild the given model (e.g., Task), can be used multiple times",
+        )
+
+        parser.add_argument(
+            "--user",
+            action="append",
+            dest="usernames",
+            default=[],
+            help="Only rebuild the given user (username), can be used multiple times",
+        )
+
+    def handle(self, *args, **options):
+        models = get_effective_access_models()
+
+        if options["models"]:
+            model_names = [model_name.lower() for model_name in options["models"]]
+            models = [model for model in models if model.__name__.lower() in model_names]
+
+            if not models:
+                self.stderr.write("Could not find any of the given models")
+                return
+
+        users = None
+
+        if options["usernames"]:
+            users = User.objects.filter(username__in=options["usernames"])
+
+        self.stdout.write(f"Rebuilding effective access for {', '.join(model.__name__ for model in models)}")
+
+        rebuild_effective_access(models=models, users=users)
+
+        self.stdout.write("Done")
@@ -3,6 +3,8 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 #
 from eric.core.models import BaseManager
-from eric.model_privileges.querysets import ModelPrivilegeQuerySet
+from eric.model_privileges.querysets import EffectiveAccessQuerySet, ModelPrivilegeQuerySet
 
 ModelPrivilegeManager = BaseManager.from_queryset(ModelPrivilegeQuerySet)
+
+EffectiveAccessManager = BaseManager.from_queryset(EffectiveAccessQuerySet)
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+import uuid
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('model_privileges', '0008_fix_legacy_privileges'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EffectiveAccess',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('object_id', models.UUIDField(verbose_name='Object id of the entity')),
+                ('can_view', models.BooleanField(default=False, verbose_name='Whether the user is allowed to view the entity')),
+                ('can_edit', models.BooleanField(default=False, verbose_name='Whether the user is allowed to edit the entity')),
+                ('view_denied', models.BooleanField(default=False, verbose_name='Whether viewing the entity is explicitly denied for the user')),
+                ('edit_denied', models.BooleanField(default=False, verbose_name='Whether editing the entity is explicitly denied for the user')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype', verbose_name='Content type of the entity')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='effective_accesses', to=settings.AUTH_USER_MODEL, verbose_name='User for this effective access entry')),
+            ],
+            options={
+                'unique_together': {('user', 'content_type', 'object_id')},
+            },
+        ),
+    ]
@@ -2,4 +2,4 @@
 # Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
 # SPDX-License-Identifier: AGPL-3.0-or-later
 #
-from eric.model_privileges.models.models import ModelPrivilege
+from eric.model_privileges.models.models import EffectiveAccess, ModelPrivilege
@@ -5,14 +5,27 @@
 import logging
 
 from django.core.exceptions import PermissionDenied, ValidationError
-from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 
 from django_userforeignkey.request import get_current_user
 
 from eric.core.models import permission_checks_disabled
+from eric.model_privileges.effective_access import (
+    effective_access_enabled,
+    get_effective_access_models,
+    refresh_effective_access,
+)
 from eric.model_privileges.models.models import ModelPrivilege
+from eric.model_privileges.tasks import (
+    rebuild_effective_access_task,
+    refresh_effective_access_for_object_task,
+    refresh_effective_access_for_user_task,
+)
+from eric.projects.models import Project, ProjectRoleUserAssignment, Role, RolePermissionAssignment
+from eric.projects.models.cache import invalidate_model_privilege_version_for_user
 
 logger = logging.getLogger("eric.model_privileges.handlers")
 
@@ -204,3 +217,137 @@ def fix_privileges(instance, *args, **kwargs):
         instance.restore_privilege = ModelPrivilege.DENY
     elif instance.trash_privilege == ModelPrivilege.DENY:
         instance.restore_privilege = ModelPrivilege.DENY
+
+
+@receiver(post_save, sender=ModelPrivilege)
+@receiver(post_delete, sender=ModelPrivilege)
+def invalidate_model_privilege_version_on_model_privilege_change(instance, *args, **kwargs):
+    """
+    Changes the model privilege version of the user (e.g., so cached exports of the user are not served anymore)
+    """
+    if kwargs.get("raw"):
+        return
+
+    invalidate_model_privilege_version_for_user(instance.user_id)
+
+
+@receiver(post_save, sender=ModelPrivilege)
+@receiver(post_delete, sender=ModelPrivilege)
+def update_effective_access_on_model_privilege_change(instance, *args, **kwargs):
+    """
+    Refreshes the effective access of the user on the entity of the model privilege
+    """
+    if kwargs.get("raw") or not effective_access_enabled():
+        return
+
+    model = instance.content_type.model_class()
+
+    if model not in get_effective_access_models():
+        return
+
+    user, object_id = instance.user, instance.object_id
+    transaction.on_commit(lambda: refresh_effective_access(user, model, [object_id]))
+
+
+@receiver(m2m_changed)
+def update_effective_access_on_projects_change(sender, instance, action, model, *args, **kwargs):
+    """
+    Refreshes the effective access of all affected users when the projects of an entity change
+    (asynchronously, as this affects all members of the projects)
+    """
+    if action not in ["post_add", "post_remove", "post_clear"] or model != Project:
+        return
+
+    if not effective_access_enabled() or instance.__class__ not in get_effective_access_models():
+        return
+
+    content_type_pk, object_pk = instance.get_content_type().pk, instance.pk
+    transaction.on_commit(lambda: refresh_effective_access_for_object_task.delay(content_type_pk, object_pk))
+
+
+@receiver(m2m_changed, sender=Role.permissions.through)
+def update_effective_access_on_role_permissions_change(sender, instance, action, reverse, pk_set, *args, **kwargs):
+    """
+    Refreshes the effective access of all users that are assigned to a role whose permissions changed
+    (asynchronously, as this affects all entities of the users)
+    """
+    if action not in ["post_add", "post_remove", "post_clear"] or not effective_access_enabled():
+        return
+
+    if not reverse:
+        role_pks = {instance.pk}
+    elif pk_set is not None:
+        role_pks = set(pk_set)
+    else:
+        # the roles of a cleared permission are not known anymore
+        transaction.on_commit(lambda: rebuild_effective_access_task.delay())
+        return
+
+    user_pks = set(ProjectRoleUserAssignment.objects.filter(role__pk__in=role_pks).values_list("user_id", flat=True))
+
+    for user_pk in user_pks:
+        transaction.on_commit(lambda user_pk=user_pk: refresh_effective_access_for_user_task.delay(user_pk))
+
+
+@receiver(pre_save, sender=ProjectRoleUserAssignment)
+def remember_assigned_user_for_effective_access(instance, *args, **kwargs):
+    if kwargs.get("raw") or not effective_access_enabled() or not instance.pk:
+        return
+
+    instance._effective_access_old_user_id = (
+        ProjectRoleUserAssignment.objects.filter(pk=instance.pk).values_list("user_id", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=ProjectRoleUserAssignment)
+@receiver(post_delete, sender=ProjectRoleUserAssignment)
+def update_effective_access_on_project_assignment_change(instance, *args, **kwargs):
+    """
+    Refreshes the effective access of the assigned user (asynchronously, as this affects all entities of the user)
+    Updates of an existing assignment might have changed the user, then the previous user is refreshed too
+    """
+    if kwargs.get("raw") or not effective_access_enabled():
+        return
+
+    user_pks = {instance.user_id, getattr(instance, "_effective_access_old_user_id", None)} - {None}
+
+    for user_pk in user_pks:
+        transaction.on_commit(lambda user_pk=user_pk: refresh_effective_access_for_user_task.delay(user_pk))
+
+
+@receiver(pre_save, sender=Project)
+def remember_parent_project_for_effective_access(instance, *args, **kwargs):
+    if kwargs.get("raw") or not effective_access_enabled() or not instance.pk:
+        return
+
+    instance._effective_access_old_parent_project_id = (
+        Project.objects.filter(pk=instance.pk).values_list("parent_project_id", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Project)
+def update_effective_access_on_project_tree_change(instance, created, *args, **kwargs):
+    """
+    Moving a project within the project tree changes the inherited roles of all sub projects
+    """
+    if kwargs.get("raw") or created or not effective_access_enabled():
+        return
+
+    old_parent_project_id = getattr(instance, "_effective_access_old_parent_project_id", None)
+
+    if old_parent_project_id != instance.parent_project_id:
+        transaction.on_commit(lambda: rebuild_effective_access_task.delay())
+
+
+@receiver(post_delete, sender=Project)
+@receiver(post_save, sender=RolePermissionAssignment)
+@receiver(post_delete, sender=RolePermissionAssignment)
+@receiver(post_delete, sender=Role)
+def update_effective_access_on_role_or_project_change(*args, **kwargs):
+    """
+    Changes of role permissions or deleted projects affect the effective access of many users
+    """
+    if kwargs.get("raw") or not effective_access_enabled():
+        return
+
+    transaction.on_commit(lambda: rebuild_effective_access_task.delay())
@@ -15,7 +15,7 @@ from django_changeset.models import RevisionModelMixin
 from eric.core.admin.is_deleteable import IsDeleteableMixin
 from eric.core.models import BaseModel
 from eric.core.models.abstract import ChangeSetMixIn
-from eric.model_privileges.managers import ModelPrivilegeManager
+from eric.model_privileges.managers import EffectiveAccessManager, ModelPrivilegeManager
 
 
 class ModelPrivilege(BaseModel, ChangeSetMixIn, RevisionModelMixin, IsDeleteableMixin):
@@ -171,3 +171,62 @@ class ModelPrivilege(BaseModel, ChangeSetMixIn, RevisionModelMixin, IsDeleteable
             )
             .exists()
         )
+
+
+class EffectiveAccess(BaseModel):
+    """
+    Denormalized view and edit access of a user on an entity, derived from the project roles of the user and the
+    model privileges of the entity (see ``eric.model_privileges.effective_access``)
+    Extended queryset filters are not materialized, they are still evaluated by ``viewable()`` and ``editable()``
+    """
+
+    objects = EffectiveAccessManager()
+
+    class Meta:
+        unique_together = (("user", "content_type", "object_id"),)
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        verbose_name=_("User for this effective access entry"),
+        related_name="effective_accesses",
+        on_delete=models.CASCADE,
+    )
+
+    content_type = models.ForeignKey(
+        ContentType,
+        on_delete=models.CASCADE,
+        verbose_name=_("Content type of the entity"),
+    )
+
+    object_id = models.UUIDField(
+        verbose_name=_("Object id of the entity"),
+    )
+
+    can_view = models.BooleanField(
+        verbose_name=_("Whether the user is allowed to view the entity"),
+        default=False,
+    )
+
+    can_edit = models.BooleanField(
+        verbose_name=_("Whether the user is allowed to edit the entity"),
+        default=False,
+    )
+
+    view_denied = models.BooleanField(
+        verbose_name=_("Whether viewing the entity is explicitly denied for the user"),
+        default=False,
+    )
+
+    edit_denied = models.BooleanField(
+        verbose_name=_("Whether editing the entity is explicitly denied for the user"),
+        default=False,
+    )
+
+    def __str__(self):
+        return _("Effective access of user %(username)s on %(content_type)s %(object_id)s") % {
+            "username": self.user.username,
+            "content_type": self.content_type,
+            "object_id": self.object_id,
+        }
@@ -33,3 +33,29 @@ class ModelPrivilegeQuerySet(BaseQuerySet, ChangeSetQuerySetMixin):
         """
 
         return self.filter(content_type=model_class.get_content_type())
+
+
+class EffectiveAccessQuerySet(BaseQuerySet):
+    """
+    QuerySet for the denormalized effective access table, which is only maintained by the application itself
+    """
+
+    def viewable(self, *args, **kwargs):
+        return self.all()
+
+    def editable(self, *args, **kwargs):
+        return self.none()
+
+    def deletable(self, *args, **kwargs):
+        return self.none()
+
+    def for_model(self, model_class, *args, **kwargs):
+        return self.filter(content_type=model_class.get_content_type())
+
+    def delete_without_signals(self):
+        """
+        Deletes all rows of this queryset with a single DELETE statement
+        The global pre_delete/post_delete handlers (e.g., permission checks) would otherwise load and check every
+        single row, which is not necessary for denormalized data
+        """
+        return self._raw_delete(self.db)
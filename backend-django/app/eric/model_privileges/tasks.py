@@ -0,0 +1,48 @@
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+import logging
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+
+from celery import shared_task
+
+from eric.model_privileges.effective_access import (
+    rebuild_effective_access,
+    refresh_effective_access_for_object,
+    refresh_effective_access_for_user,
+)
+
+User = get_user_model()
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def refresh_effective_access_for_user_task(user_pk):
+    user = User.objects.filter(pk=user_pk).first()
+
+    if not user:
+        logger.warning(f"Could not refresh effective access: user {user_pk} does not exist")
+        return
+
+    refresh_effective_access_for_user(user)
+
+
+@shared_task
+def refresh_effective_access_for_object_task(content_type_pk, object_pk):
+    model = ContentType.objects.get_for_id(content_type_pk).model_class()
+    instance = model._base_manager.filter(pk=object_pk).first()
+
+    if not instance:
+        logger.warning(f"Could not refresh effective access: {model.__name__} {object_pk} does not exist")
+        return
+
+    refresh_effective_access_for_object(instance)
+
+
+@shared_task
+def rebuild_effective_access_task():
+    rebuild_effective_access()
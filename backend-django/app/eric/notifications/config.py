@@ -10,3 +10,12 @@ cfg = getattr(settings, "NOTIFICATIONS_SETTINGS", dict())
 
 MINIMUM_TIME_BETWEEN_EMAILS = cfg.get("MINIMUM_TIME_BETWEEN_EMAILS", timedelta(minutes=5))
 SINGLE_MAIL_NOTIFICATIONS = cfg.get("SINGLE_MAIL_NOTIFICATIONS", list())
+
+# number of users whose notification mails are sent with one connection to the mail server (and within one task)
+MAIL_BATCH_SIZE = cfg.get("MAIL_BATCH_SIZE", 100)
+# send the notification mails via celery tasks instead of within the send_notifications command
+SEND_MAILS_ASYNC = cfg.get("SEND_MAILS_ASYNC", False)
+# rate limit of the celery task that sends a batch of notification mails (see celery task rate_limit)
+MAIL_TASK_RATE_LIMIT = cfg.get("MAIL_TASK_RATE_LIMIT", "30/m")
+# send_notifications runs are skipped while another run holds the lock (the lock expires after this time)
+SEND_NOTIFICATIONS_LOCK_TIMEOUT = cfg.get("SEND_NOTIFICATIONS_LOCK_TIMEOUT", timedelta(minutes=10))
@@ -4,8 +4,8 @@
 #
 import logging
 
-from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.management import BaseCommand
 from django.db.models import Q, Subquery
 from django.template.loader import render_to_string
@@ -14,20 +14,39 @@ from django.utils.timezone import timedelta
 from django.utils.translation import gettext as _
 
 from eric.core.templatetags.date_filters import date_short
-from eric.notifications.config import MINIMUM_TIME_BETWEEN_EMAILS, SINGLE_MAIL_NOTIFICATIONS
+from eric.notifications.config import (
+    MAIL_BATCH_SIZE,
+    MINIMUM_TIME_BETWEEN_EMAILS,
+    SEND_MAILS_ASYNC,
+    SEND_NOTIFICATIONS_LOCK_TIMEOUT,
+)
 from eric.notifications.models import Notification, NotificationConfiguration, ScheduledNotification
-from eric.notifications.utils import is_user_notification_allowed, send_mail
+from eric.notifications.tasks import send_notification_mails_task
+from eric.notifications.utils import build_mail, is_user_notification_allowed, send_mails, send_notification_mails
 from eric.shared_elements.models import Meeting, Task
 from eric.site_preferences.models import options as site_preferences
 
 User = get_user_model()
 LOGGER = logging.getLogger(__name__)
 
+SEND_NOTIFICATIONS_LOCK_CACHE_KEY = "send_notifications_lock"
+
 
 class Command(BaseCommand):
     help = "Sends unprocessed notifications"
 
     def handle(self, *args, **options):
+        # make sure that a long running run does not overlap with the next run
+        if not cache.add(SEND_NOTIFICATIONS_LOCK_CACHE_KEY, True, SEND_NOTIFICATIONS_LOCK_TIMEOUT.total_seconds()):
+            print(f"[{timezone.now().isoformat()}] Skipping, notifications are already being sent by another run")
+            return
+
+        try:
+            self.send_notifications()
+        finally:
+            cache.delete(SEND_NOTIFICATIONS_LOCK_CACHE_KEY)
+
+    def send_notifications(self):
         self.process_scheduled_notifications()
         self.process_task_reminders()
 
@@ -54,7 +73,7 @@ class Command(BaseCommand):
             self.aggregate_and_send_notifications(notifications, notification_count)
 
     @staticmethod
-    def send_mail_to_contact(title, contact, html_message):
+    def build_mail_to_contact(title, contact, html_message):
         context = {
             "title": title,
             "message": html_message,
@@ -63,10 +82,8 @@ class Command(BaseCommand):
         }
         html = render_to_string("email/single_notification_email.html", context)
         plaintext = render_to_string("email/single_notification_email.txt", context)
-        try:
-            send_mail(subject=title, message=plaintext, to_email=contact.email, html_message=html)
-        except Exception as exc:
-            LOGGER.exception(exc)
+
+        return build_mail(subject=title, message=plaintext, to_email=contact.email, html_message=html)
 
     @classmethod
     def process_task_reminders(cls):
@@ -75,92 +92,131 @@ class Command(BaseCommand):
             remind_assignees=True,
             reminder_datetime__lte=now + timedelta(seconds=60),
             reminder_datetime__gte=now - timedelta(seconds=60),
+        ).prefetch_related("assigned_users")
+
+        if not tasks:
+            return
+
+        task_content_type = Task.get_content_type()
+
+        # (user pk, task pk) of reminders that have already been created
+        existing_reminders = set(
+            Notification.objects.filter(
+                content_type=task_content_type,
+                object_id__in=[task.pk for task in tasks],
+                notification_type=NotificationConfiguration.NOTIFICATION_CONF_TASK_REMINDER,
+                created_at__gte=now - timedelta(seconds=90),
+            ).values_list("user_id", "object_id")
         )
+
+        notifications = []
+
         for task in tasks:
-            assigned_users = task.assigned_users.all()
             title = _(f"Reminder: Task {task.title}")
             html_message = render_to_string("notification/task_reminder.html", {"instance": task})
-            for assigned_user in assigned_users:
-                Notification.objects.get_or_create(
-                    user=assigned_user,
-                    content_type=task.get_content_type(),
-                    object_id=task.pk,
-                    notification_type=NotificationConfiguration.NOTIFICATION_CONF_TASK_REMINDER,
-                    created_at__gte=now - timedelta(seconds=90),
-                    defaults={"title": title, "message": html_message, "created_at": now},
+
+            for assigned_user in task.assigned_users.all():
+                if (assigned_user.pk, task.pk) in existing_reminders:
+                    continue
+
+                notifications.append(
+                    Notification(
+                        user=assigned_user,
+                        content_type=task_content_type,
+                        object_id=task.pk,
+                        notification_type=NotificationConfiguration.NOTIFICATION_CONF_TASK_REMINDER,
+                        title=title,
+                        message=html_message,
+                        created_at=now,
+                    )
                 )
 
+        Notification.objects.bulk_create_notifications(notifications)
+
     @classmethod
     def process_scheduled_notifications(cls):
+        now = timezone.now()
         scheduled_notifications = ScheduledNotification.objects.filter(
             processed=False,
-            scheduled_date_time__lte=timezone.now(),
+            scheduled_date_time__lte=now,
             deleted=False,
             active=True,
         )
 
-        for scheduled_notification in scheduled_notifications:
-            meeting = Meeting.objects.prefetch_common().get(pk=scheduled_notification.object_id)
+        meetings = (
+            Meeting.objects.prefetch_common()
+            .prefetch_related("attending_users", "attending_contacts")
+            .filter(pk__in=scheduled_notifications.values("object_id"))
+        )
 
+        meeting_content_type = Meeting.get_content_type()
+
+        # unsent reminders that have been created within the last minute are updated instead of being created again
+        existing_reminders = {
+            (user_pk, object_id): pk
+            for pk, user_pk, object_id in Notification.objects.filter(
+                content_type=meeting_content_type,
+                object_id__in=[meeting.pk for meeting in meetings],
+                read=False,
+                sent__isnull=True,
+                notification_type=NotificationConfiguration.NOTIFICATION_CONF_MEETING_REMINDER,
+                created_at__gte=now - timedelta(seconds=60),
+            ).values_list("pk", "user_id", "object_id")
+        }
+
+        notifications = []
+        contact_mails = []
+
+        for meeting in meetings:
             # only send reminders for meetings that are still in the future
-            if meeting.local_date_time_start > timezone.now():
-                attending_users = meeting.attending_users.all()
-                attending_contacts = meeting.attending_contacts.all()
-                title = _(
-                    "Reminder: Appointment {title} starts at {date_time_start}".format(
-                        title=meeting.title, date_time_start=date_short(meeting.local_date_time_start)
-                    )
+            if meeting.local_date_time_start <= now:
+                continue
+
+            title = _(
+                "Reminder: Appointment {title} starts at {date_time_start}".format(
+                    title=meeting.title, date_time_start=date_short(meeting.local_date_time_start)
                 )
-                html_message = render_to_string("notification/meeting_reminder.html", {"instance": meeting})
+            )
+            html_message = render_to_string("notification/meeting_reminder.html", {"instance": meeting})
+
+            existing_reminder_pks = []
 
-                for attending_user in attending_users:
-                    Notification.objects.update_or_create(
+            for attending_user in meeting.attending_users.all():
+                existing_reminder_pk = existing_reminders.get((attending_user.pk, meeting.pk))
+
+                if existing_reminder_pk:
+                    existing_reminder_pks.append(existing_reminder_pk)
+                    continue
+
+                notifications.append(
+                    Notification(
                         user=attending_user,
-                        content_type=meeting.get_content_type(),
+                        content_type=meeting_content_type,
                         object_id=meeting.pk,
-                        read=False,
-                        sent__isnull=True,
                         notification_type=NotificationConfiguration.NOTIFICATION_CONF_MEETING_REMINDER,
-                        created_at__gte=timezone.now() - timedelta(seconds=60),
-                        defaults={"title": title, "message": html_message, "created_at": timezone.now()},
+                        title=title,
+                        message=html_message,
+                        created_at=now,
                     )
+                )
 
-                for contact in attending_contacts:
-                    if contact.email:
-                        cls.send_mail_to_contact(title, contact, html_message)
+            if existing_reminder_pks:
+                Notification.objects.filter(pk__in=existing_reminder_pks).update(
+                    title=title, message=html_message, created_at=now
+                )
 
-        scheduled_notifications.update(processed=True)
+            for contact in meeting.attending_contacts.all():
+                if contact.email:
+                    contact_mails.append(cls.build_mail_to_contact(title, contact, html_message))
 
-    @staticmethod
-    def send_single_notification_to_user(user, notification):
-        """Sends a single notification to the provided user"""
-        context = {
-            "title": notification.title,
-            "message": notification.message,
-            "user": str(user),
-            "workbench_url": settings.WORKBENCH_SETTINGS["url"],
-            "workbench_title": site_preferences.site_name,
-            "notification": notification,
-        }
-        html = render_to_string("email/single_notification_email.html", context)
-        plaintext = render_to_string("email/single_notification_email.txt", context)
-        send_mail(subject=notification.title, message=plaintext, html_message=html, to_email=user.email)
+        Notification.objects.bulk_create_notifications(notifications)
+        send_mails(contact_mails)
 
-    @staticmethod
-    def send_multiple_notifications_to_user(user, notifications):
-        context = {
-            "user": str(user),
-            "notifications": notifications,
-            "workbench_url": settings.WORKBENCH_SETTINGS["url"],
-            "workbench_title": site_preferences.site_name,
-        }
-        html = render_to_string("email/multiple_notifications_email.html", context)
-        plaintext = render_to_string("email/multiple_notifications_email.txt", context)
-        send_mail(subject=_("Multiple notifications"), message=plaintext, to_email=user.email, html_message=html)
+        scheduled_notifications.update(processed=True)
 
     @classmethod
     def aggregate_and_send_notifications(cls, notifications_qs, notification_count):
-        notifications_by_user, users_by_pk = cls.aggregate_notifications_and_users(notifications_qs)
+        notifications_by_user = cls.aggregate_notifications_by_user(notifications_qs)
 
         if notification_count > 0:
             print(
@@ -174,49 +230,35 @@ class Command(BaseCommand):
         # update all notifications, mark them as processed
         notifications_qs.update(processed=True)
 
-        for user_pk in notifications_by_user.keys():
-            user = users_by_pk[user_pk]
-            user_notifications = notifications_by_user[user_pk]
-            notification_pk_list = []
+        user_pks = list(notifications_by_user.keys())
 
-            # process single notifications
-            single_notifications = [
+        # send the mails of MAIL_BATCH_SIZE users at once (using a single connection to the mail server)
+        for i in range(0, len(user_pks), MAIL_BATCH_SIZE):
+            batch = [
                 notification
-                for notification in user_notifications
-                if notification.notification_type in SINGLE_MAIL_NOTIFICATIONS
+                for user_pk in user_pks[i : i + MAIL_BATCH_SIZE]
+                for notification in notifications_by_user[user_pk]
             ]
-            for notification in single_notifications:
-                cls.send_single_notification_to_user(user, notification)
-                notification_pk_list.append(notification.pk)
-                user_notifications.remove(notification)
-
-            # process normal notifications
-            if len(user_notifications) == 1:
-                # only one notification -> send notification with full details to the user
-                cls.send_single_notification_to_user(user, user_notifications[0])
-                notification_pk_list.append(user_notifications[0].pk)
-            elif len(user_notifications) > 1:
-                # multiple notifications -> compile a message with aggregated notifications
-                cls.send_multiple_notifications_to_user(user, user_notifications)
-                for notification in user_notifications:
-                    notification_pk_list.append(notification.pk)
-
-            # update 'sent' attribute of the processed notifications
-            Notification.objects.filter(pk__in=notification_pk_list).update(sent=timezone.now())
+
+            if not batch:
+                continue
+
+            if SEND_MAILS_ASYNC:
+                send_notification_mails_task.delay([str(notification.pk) for notification in batch])
+            else:
+                send_notification_mails(batch)
 
     @staticmethod
-    def aggregate_notifications_and_users(notifications_qs):
+    def aggregate_notifications_by_user(notifications_qs):
         notifications_by_user = {}
-        users_by_pk = {}
 
         for notification in notifications_qs:
             user = notification.user
 
             if user.pk not in notifications_by_user:
                 notifications_by_user[user.pk] = []
-                users_by_pk[user.pk] = user
 
             if is_user_notification_allowed(user, notification.notification_type):
                 notifications_by_user[user.pk].append(notification)
 
-        return notifications_by_user, users_by_pk
+        return notifications_by_user
@@ -47,6 +47,22 @@ class NotificationQuerySet(BaseQuerySet):
     def deletable(self, *args, **kwargs):
         return self.none()
 
+    def bulk_create_notifications(self, notifications, batch_size=1000):
+        """
+        Creates the given notifications with as few queries as possible and sends the notifications_bulk_created
+        signal (post_save is not sent by bulk_create)
+        :return: the created notifications
+        """
+        from eric.notifications.signals import notifications_bulk_created
+
+        if not notifications:
+            return []
+
+        notifications = self.bulk_create(notifications, batch_size=batch_size)
+        notifications_bulk_created.send(sender=self.model, notifications=notifications)
+
+        return notifications
+
 
 class ScheduledNotificationQuerySet(BaseQuerySet):
     """
@@ -0,0 +1,9 @@
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+from django.dispatch import Signal
+
+# sent after notifications have been created with bulk_create (which does not send post_save for each notification)
+# provides the list of created notifications as "notifications"
+notifications_bulk_created = Signal()
@@ -0,0 +1,21 @@
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+from celery import shared_task
+
+from eric.notifications.config import MAIL_TASK_RATE_LIMIT
+from eric.notifications.models import Notification
+from eric.notifications.utils import send_notification_mails
+
+
+@shared_task(rate_limit=MAIL_TASK_RATE_LIMIT)
+def send_notification_mails_task(notification_pks):
+    """
+    Sends the mails of a batch of processed notifications (see send_notifications command)
+    """
+    notifications = Notification.objects.filter(pk__in=notification_pks, sent__isnull=True).prefetch_related(
+        "user", "user__userprofile", "created_by", "created_by__userprofile"
+    )
+
+    send_notification_mails(notifications)
@@ -3,10 +3,13 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 #
 import unittest
+from smtplib import SMTPException
+from unittest import mock
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
 from django.core import mail
+from django.core.cache import cache
 from django.utils import timezone
 from django.utils.timezone import localtime
 
@@ -576,6 +579,69 @@ class AppointmentConfirmationMailTest(
         self.assertEqual(self.user2.email, mail.outbox[1].to[0])
         self.assertIn("has changed", mail.outbox[1].subject)
 
+    def test_send_notifications_is_skipped_while_locked(self):
+        from eric.notifications.management.commands.send_notifications import SEND_NOTIFICATIONS_LOCK_CACHE_KEY
+        from eric.notifications.management.commands.send_notifications import Command as send_notifications_command
+
+        # user1 creates an appointment with user2 as attending user, which creates a notification for user2
+        meeting, response = self.create_meeting_orm(
+            auth_token=self.token1,
+            project_pk=None,
+            title="Group Session",
+            description="Test Desc",
+            location="Conference Room",
+            start_date=naive_dt(2020, 10, 1),
+            end_date=naive_dt(2020, 10, 3),
+            **HTTP_INFO,
+            attending_users=[self.user2.pk],
+        )
+        self.assert_response_status(response, expected_status_code=status.HTTP_201_CREATED)
+        mail.outbox.clear()
+
+        # another run is in progress
+        cache.set(SEND_NOTIFICATIONS_LOCK_CACHE_KEY, True, 60)
+        send_notifications_command().handle()
+        self.assertEqual(0, len(mail.outbox))
+        self.assertEqual(1, Notification.objects.filter(user=self.user2, sent__isnull=True).count())
+
+        # the lock has been released
+        cache.delete(SEND_NOTIFICATIONS_LOCK_CACHE_KEY)
+        send_notifications_command().handle()
+        self.assertEqual(1, len(mail.outbox))
+        self.assertEqual(0, Notification.objects.filter(user=self.user2, sent__isnull=True).count())
+
+    def test_notifications_stay_unsent_if_mails_can_not_be_sent(self):
+        from eric.notifications.management.commands.send_notifications import Command as send_notifications_command
+
+        # user1 creates an appointment with user2 as attending user, which creates a notification for user2
+        meeting, response = self.create_meeting_orm(
+            auth_token=self.token1,
+            project_pk=None,
+            title="Group Session",
+            description="Test Desc",
+            location="Conference Room",
+            start_date=naive_dt(2020, 10, 1),
+            end_date=naive_dt(2020, 10, 3),
+            **HTTP_INFO,
+            attending_users=[self.user2.pk],
+        )
+        self.assert_response_status(response, expected_status_code=status.HTTP_201_CREATED)
+        mail.outbox.clear()
+
+        # the mail server refuses the mails
+        with mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages", side_effect=SMTPException("refused")
+        ):
+            send_notifications_command().handle()
+
+        self.assertEqual(0, len(mail.outbox))
+        self.assertEqual(1, Notification.objects.filter(user=self.user2, sent__isnull=True, processed=False).count())
+
+        # the notification is sent by the next run
+        send_notifications_command().handle()
+        self.assertEqual(1, len(mail.outbox))
+        self.assertEqual(0, Notification.objects.filter(user=self.user2, sent__isnull=True).count())
+
     def assert_appointment_data_in_mail(self, email, meeting, resource=None):
         # check that there is plaintext and html
         self.assertEqual(1, len(email.alternatives))
@@ -5,8 +5,11 @@
 import logging
 
 from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.core.mail import send_mail as django_send_mail
-from django.template.loader import render_to_string
+from django.template.loader import get_template, render_to_string
+from django.utils import timezone
+from django.utils.translation import gettext as _
 
 from eric.site_preferences.models import options as site_preferences
 
@@ -26,6 +29,41 @@ def send_mail(subject, message, to_email, html_message=None):
         LOGGER.exception(exc)
 
 
+def build_mail(subject, message, to_email, html_message=None):
+    """
+    Builds (but does not send) an email like send_mail does, e.g. for sending multiple mails with send_mails
+    :rtype: django.core.mail.EmailMultiAlternatives
+    """
+    mail = EmailMultiAlternatives(
+        subject=f"{site_preferences.site_name}: {subject}",
+        body=message,
+        from_email=site_preferences.no_reply_email,
+        to=[to_email],
+    )
+
+    if html_message:
+        mail.attach_alternative(html_message, "text/html")
+
+    return mail
+
+
+def send_mails(mails):
+    """
+    Sends multiple emails using a single connection to the mail server
+    :return: the number of sent mails
+    """
+    if not mails:
+        return 0
+
+    try:
+        with get_connection() as connection:
+            return connection.send_messages(mails)
+    except Exception as exc:
+        LOGGER.exception(exc)
+
+    return 0
+
+
 def send_notification_mail(user, title, message, notification=None):
     context = {
         "title": title,
@@ -43,6 +81,131 @@ def send_notification_mail(user, title, message, notification=None):
         LOGGER.exception(exc)
 
 
+def build_notification_mails(user, notifications, templates):
+    """
+    Builds the notification mails for a single user: notifications of the types in SINGLE_MAIL_NOTIFICATIONS are sent
+    in a single mail each, all other notifications are aggregated into one mail
+    :param templates: dictionary of the (already loaded) email templates, see send_notification_mails
+    :return: list of tuples of the mail and the notifications it contains
+    :rtype: list
+    """
+    from eric.notifications.config import SINGLE_MAIL_NOTIFICATIONS
+
+    context = {
+        "user": str(user),
+        "workbench_url": settings.WORKBENCH_SETTINGS["url"],
+        "workbench_title": site_preferences.site_name,
+    }
+
+    single_notifications = []
+    other_notifications = []
+
+    for notification in notifications:
+        if notification.notification_type in SINGLE_MAIL_NOTIFICATIONS:
+            single_notifications.append(notification)
+        else:
+            other_notifications.append(notification)
+
+    # only one notification -> send notification with full details to the user
+    if len(other_notifications) == 1:
+        single_notifications += other_notifications
+        other_notifications = []
+
+    mails = []
+
+    for notification in single_notifications:
+        single_context = {
+            **context,
+            "title": notification.title,
+            "message": notification.message,
+            "notification": notification,
+        }
+        mails.append(
+            (
+                build_mail(
+                    subject=notification.title,
+                    message=templates["single_txt"].render(single_context),
+                    html_message=templates["single_html"].render(single_context),
+                    to_email=user.email,
+                ),
+                [notification],
+            )
+        )
+
+    # multiple notifications -> compile a message with aggregated notifications
+    if other_notifications:
+        multiple_context = {**context, "notifications": other_notifications}
+        mails.append(
+            (
+                build_mail(
+                    subject=_("Multiple notifications"),
+                    message=templates["multiple_txt"].render(multiple_context),
+                    html_message=templates["multiple_html"].render(multiple_context),
+                    to_email=user.email,
+                ),
+                other_notifications,
+            )
+        )
+
+    return mails
+
+
+def send_notification_mails(notifications):
+    """
+    Sends the mails for the given notifications (aggregated per user) using a single connection to the mail server.
+    Only the notifications whose mail has been sent are marked as sent, all other notifications are marked as not
+    processed, so they are sent again by the next run of the send_notifications command
+    :param notifications: iterable of notifications (with prefetched users)
+    """
+    from eric.notifications.models import Notification
+
+    # load the templates only once for all users
+    templates = {
+        "single_html": get_template("email/single_notification_email.html"),
+        "single_txt": get_template("email/single_notification_email.txt"),
+        "multiple_html": get_template("email/multiple_notifications_email.html"),
+        "multiple_txt": get_template("email/multiple_notifications_email.txt"),
+    }
+
+    notifications_by_user = {}
+    users_by_pk = {}
+
+    for notification in notifications:
+        users_by_pk[notification.user_id] = notification.user
+        notifications_by_user.setdefault(notification.user_id, []).append(notification)
+
+    notification_pk_list = [
+        notification.pk for user_notifications in notifications_by_user.values() for notification in user_notifications
+    ]
+    sent_notification_pk_list = []
+
+    try:
+        with get_connection() as connection:
+            for user_pk, user_notifications in notifications_by_user.items():
+                for mail, mail_notifications in build_notification_mails(
+                    users_by_pk[user_pk], user_notifications, templates
+                ):
+                    try:
+                        connection.send_messages([mail])
+                    except Exception as exc:
+                        LOGGER.exception(exc)
+                        continue
+
+                    sent_notification_pk_list += [notification.pk for notification in mail_notifications]
+    except Exception as exc:
+        # e.g., the connection to the mail server could not be opened
+        LOGGER.exception(exc)
+
+    # update 'sent' attribute of the notifications whose mail has been sent
+    Notification.objects.filter(pk__in=sent_notification_pk_list).update(sent=timezone.now())
+
+    # all other notifications are sent again by the next run
+    unsent_notification_pk_list = set(notification_pk_list) - set(sent_notification_pk_list)
+
+    if unsent_notification_pk_list:
+        Notification.objects.filter(pk__in=unsent_notification_pk_list).update(processed=False)
+
+
 def is_user_notification_allowed(user, notification_type):
     from eric.notifications.models import NotificationConfiguration
 
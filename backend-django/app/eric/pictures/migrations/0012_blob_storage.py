@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+from django.db import migrations, models
+
+import eric.projects.models.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0118_blob_store'),
+        ('pictures', '0011_fts_index_gin'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='picture',
+            name='background_image',
+            field=models.ImageField(blank=True, max_length=512, null=True, storage=eric.projects.models.models.BlobStorageLimitByUser(), upload_to='', verbose_name='The background image of the picture'),
+        ),
+        migrations.AlterField(
+            model_name='picture',
+            name='rendered_image',
+            field=models.ImageField(blank=True, max_length=512, null=True, storage=eric.projects.models.models.BlobStorageLimitByUser(), upload_to='', verbose_name='The rendered image of the picture'),
+        ),
+        migrations.AlterField(
+            model_name='picture',
+            name='shapes_image',
+            field=models.FileField(blank=True, max_length=512, null=True, storage=eric.projects.models.models.BlobStorageLimitByUser(), upload_to='', verbose_name='The shapes of the image'),
+        ),
+        migrations.AlterField(
+            model_name='uploadedpictureentry',
+            name='background_image',
+            field=models.ImageField(blank=True, max_length=512, null=True, storage=eric.projects.models.models.BlobStorageLimitByUser(), upload_to='', verbose_name='The background image of the picture'),
+        ),
+        migrations.AlterField(
+            model_name='uploadedpictureentry',
+            name='rendered_image',
+            field=models.ImageField(blank=True, max_length=512, null=True, storage=eric.projects.models.models.BlobStorageLimitByUser(), upload_to='', verbose_name='The rendered image of the picture'),
+        ),
+        migrations.AlterField(
+            model_name='uploadedpictureentry',
+            name='shapes_image',
+            field=models.FileField(blank=True, max_length=512, null=True, storage=eric.projects.models.models.BlobStorageLimitByUser(), upload_to='', verbose_name='The shapes of the image'),
+        ),
+    ]
@@ -4,10 +4,12 @@
 #
 import os
 
-from django.db.models.signals import post_delete
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
+from eric.core.thumbnails import delete_thumbnails, schedule_thumbnail_generation
 from eric.pictures.models.models import Picture, UploadedPictureEntry
+from eric.projects.models import is_blob_name
 
 
 @receiver(post_delete)
@@ -20,22 +22,30 @@ def auto_delete_file_on_delete(sender, instance, **kwargs):
     if not sender == Picture and not sender == UploadedPictureEntry:
         return
 
-    if instance.background_image and os.path.isfile(instance.background_image.path):
-        os.remove(instance.background_image.path)
-
-    if instance.shapes_image and os.path.isfile(instance.shapes_image.path):
-        os.remove(instance.shapes_image.path)
-
-    if instance.rendered_image and os.path.isfile(instance.rendered_image.path):
-        os.remove(instance.rendered_image.path)
+    # files of the blob store are deleted once they are no longer referenced (see eric.projects.models.handlers)
+    for image in (instance.background_image, instance.shapes_image, instance.rendered_image):
+        if image and not is_blob_name(image.name) and os.path.isfile(image.path):
+            os.remove(image.path)
+            delete_thumbnails(image.name)
 
     # the worst part comes now: we might have to iterate over all changeset entries in order to find all previous files
     for cs in instance.changesets.all():
         print(cs)
         for cr in cs.change_records.filter(field_name__in=["background_image", "shapes_image", "rendered_image"]):
             # check if old-value is a file and delete it
-            if cr.old_value and os.path.isfile(cr.old_value):
+            if cr.old_value and not is_blob_name(cr.old_value) and os.path.isfile(cr.old_value):
                 os.remove(cr.old_value)
             # check if new-value is a file and delete it
-            if cr.new_value and os.path.isfile(cr.new_value):
+            if cr.new_value and not is_blob_name(cr.new_value) and os.path.isfile(cr.new_value):
                 os.remove(cr.new_value)
+
+
+@receiver(post_save, sender=UploadedPictureEntry)
+def generate_thumbnails_of_uploaded_picture(sender, instance, created, **kwargs):
+    """
+    Generates the thumbnails of a newly uploaded picture (background image and rendered image) in the background
+    """
+    if not created:
+        return
+
+    schedule_thumbnail_generation(instance.background_image.name, instance.rendered_image.name)
@@ -7,7 +7,6 @@ import os
 import uuid
 from io import BytesIO
 
-from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.db import models
@@ -23,10 +22,9 @@ from eric.metadata.models.fields import MetadataRelation
 from eric.metadata.models.models import Metadata
 from eric.model_privileges.models.abstract import ModelPrivilegeMixIn
 from eric.pictures.models.managers import PictureManager
-from eric.projects.models import FileSystemStorageLimitByUser, Project
+from eric.projects.models import BlobStorageLimitByUser, Project
 from eric.relations.models import RelationsMixIn
 from eric.search.models import FTSMixin
-from eric.shared_elements.models import scramble_uploaded_filename
 
 METADATA_VERSION_KEY = "metadata_version"
 UNHANDLED_VERSION_ERROR = NotImplementedError("Unhandled metadata version")
@@ -95,6 +93,7 @@ class Picture(
             ),
         )
         fts_template = "fts/picture.html"
+        fts_source_fields = ("title",)
         export_template = "export/picture.html"
 
         def get_default_serializer(*args, **kwargs):
@@ -115,7 +114,7 @@ class Picture(
         blank=True,
         null=True,
         max_length=512,
-        storage=FileSystemStorageLimitByUser(),
+        storage=BlobStorageLimitByUser(),
     )
 
     background_image_size = models.BigIntegerField(verbose_name=_("Size of the background image"), default=0)
@@ -125,7 +124,7 @@ class Picture(
         blank=True,
         null=True,
         max_length=512,
-        storage=FileSystemStorageLimitByUser(),
+        storage=BlobStorageLimitByUser(),
     )
 
     rendered_image_size = models.BigIntegerField(verbose_name=_("Size of the rendered image"), default=0)
@@ -135,7 +134,7 @@ class Picture(
         blank=True,
         null=True,
         max_length=512,
-        storage=FileSystemStorageLimitByUser(),
+        storage=BlobStorageLimitByUser(),
     )
 
     shapes_image_size = models.BigIntegerField(verbose_name=_("Size of the background image"), default=0)
@@ -220,7 +219,8 @@ class Picture(
 
     def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
         """
-        Rename the uploaded file, make sure it is stored in the proper directory
+        Stores a new picture entry if any of the files changed (the files are stored in the blob store, so unchanged
+        files are shared by the picture entries)
         :param force_insert:
         :param force_update:
         :param using:
@@ -240,20 +240,17 @@ class Picture(
         if self.shapes_image and hasattr(self.shapes_image.file, "content_type"):
             validate_file_is_json(self.shapes_image)
             do_store_new_picture_entry = True
-            self.shapes_image.name = self.store_image_file(self.shapes_image)
             # store file size
             self.shapes_image_size = self.shapes_image.file.size
 
         # check if rendered image file has changed
         if self.rendered_image and hasattr(self.rendered_image.file, "content_type"):
             do_store_new_picture_entry = True
-            self.rendered_image.name = self.store_image_file(self.rendered_image)
             self.rendered_image_size = self.rendered_image.file.size
 
         # check if background image file has changed
         if self.background_image and hasattr(self.background_image.file, "content_type"):
             do_store_new_picture_entry = True
-            self.background_image.name = self.store_image_file(self.background_image)
             self.background_image_size = self.background_image.file.size
 
         if do_store_new_picture_entry:
@@ -271,19 +268,6 @@ class Picture(
 
         super().save(force_insert=force_insert, force_update=force_update, using=using, update_fields=update_fields)
 
-    def store_image_file(self, image):
-        # rename shapes file
-        new_name = scramble_uploaded_filename(image.name)
-        new_path = settings.WORKBENCH_SETTINGS["project_file_upload_folder"] % {"filename": new_name}
-
-        # create folder if it does not exist
-        if not os.path.exists(os.path.dirname(new_path)):
-            os.makedirs(os.path.dirname(new_path))
-
-        # make sure the path we use is relative to the MEDIA_ROOT, we don't want to store the whole path
-        new_path = os.path.relpath(new_path, settings.MEDIA_ROOT)
-        return new_path
-
     def create_uploaded_picture_entry(self):
         entry = UploadedPictureEntry(
             picture=self,
@@ -329,7 +313,7 @@ class UploadedPictureEntry(BaseModel, ChangeSetMixIn, RevisionModelMixin):
         blank=True,
         null=True,
         max_length=512,
-        storage=FileSystemStorageLimitByUser(),
+        storage=BlobStorageLimitByUser(),
     )
 
     background_image_size = models.BigIntegerField(verbose_name=_("Size of the background image"), default=0)
@@ -339,7 +323,7 @@ class UploadedPictureEntry(BaseModel, ChangeSetMixIn, RevisionModelMixin):
         blank=True,
         null=True,
         max_length=512,
-        storage=FileSystemStorageLimitByUser(),
+        storage=BlobStorageLimitByUser(),
     )
 
     rendered_image_size = models.BigIntegerField(verbose_name=_("Size of the rendered image"), default=0)
@@ -349,7 +333,7 @@ class UploadedPictureEntry(BaseModel, ChangeSetMixIn, RevisionModelMixin):
         blank=True,
         null=True,
         max_length=512,
-        storage=FileSystemStorageLimitByUser(),
+        storage=BlobStorageLimitByUser(),
     )
 
     shapes_image_size = models.BigIntegerField(verbose_name=_("Size of the background image"), default=0)
@@ -13,6 +13,7 @@ from rest_framework.decorators import action
 from rest_framework.exceptions import NotFound
 
 from eric.core.rest.viewsets import DeletableViewSetMixIn, ExportableViewSetMixIn
+from eric.core.thumbnails import get_thumbnail_response
 from eric.pictures.models import Picture, UploadedPictureEntry
 from eric.pictures.rest.filters import PictureFilter
 from eric.pictures.rest.serializers import PictureSerializer
@@ -50,6 +51,9 @@ class PictureViewSet(
 
     ordering_fields = ("title", "created_at", "created_by", "last_modified_at", "last_modified_by", "height", "width")
 
+    # query parameter of the image downloads for requesting a thumbnail (see eric.core.thumbnails)
+    thumbnail_size_param = "size"
+
     def create(self, request, *args, **kwargs):
         # since Django 1.11, there is a weird behaviour of QueryDicts that are immutable
         if isinstance(request.data, QueryDict):  # however, some request.data objects are normal dictionaries...
@@ -120,13 +124,13 @@ class PictureViewSet(
         if not uploaded_picture_entry.background_image:
             image = uploaded_picture_entry.picture.background_image
 
-        return self.build_download_response("background_image.png", image)
+        return self.build_image_download_response(request, "background_image", image)
 
     @action(detail=True, methods=["GET"], url_path="rendered_image.png", url_name="rendered-image")
     def download_rendered_image(self, request, format=None, *args, **kwargs):
         """Provides a detail route endpoint for downloading the rendered image"""
         uploaded_picture_entry = self.get_picture_entry(**kwargs)
-        return self.build_download_response("rendered_image.png", uploaded_picture_entry.rendered_image)
+        return self.build_image_download_response(request, "rendered_image", uploaded_picture_entry.rendered_image)
 
     @staticmethod
     def get_picture_entry(**kwargs):
@@ -139,6 +143,16 @@ class PictureViewSet(
 
         return entry
 
+    def build_image_download_response(self, request, file_name, image):
+        """
+        Responds with the image, or with a thumbnail of the image if the "size" query parameter is set
+        """
+        if image and self.thumbnail_size_param in request.query_params:
+            size = request.query_params[self.thumbnail_size_param]
+            return get_thumbnail_response(request, image.name, size, file_name)
+
+        return self.build_download_response(f"{file_name}.png", image)
+
     @staticmethod
     def build_download_response(download_file_name, image):
         if image:
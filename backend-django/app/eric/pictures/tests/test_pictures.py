@@ -156,6 +156,26 @@ class TestGenericsPictures(APITestCase, EntityChangeRelatedProjectTestMixin, Pic
         response = self.client.get(decoded_response["download_rendered_image"])
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+        # thumbnail of the rendered image
+        response = self.client.get(
+            decoded_response["download_rendered_image"] + "&size=100", HTTP_ACCEPT="image/jpeg"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertIn("private", response["Cache-Control"])
+
+        # the thumbnail has not changed
+        response = self.client.get(
+            decoded_response["download_rendered_image"] + "&size=100",
+            HTTP_ACCEPT="image/jpeg",
+            HTTP_IF_NONE_MATCH=response["ETag"],
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # invalid thumbnail size
+        response = self.client.get(decoded_response["download_rendered_image"] + "&size=abc")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
         # try to generate the rendered image url using djangos reverse function
         bg_img_url = reverse("picture-background-image", kwargs={"pk": picture.uploaded_picture_entry.pk})
         rendered_img_url = reverse("picture-rendered-image", kwargs={"pk": picture.uploaded_picture_entry.pk})
@@ -220,7 +240,9 @@ class TestGenericsPictures(APITestCase, EntityChangeRelatedProjectTestMixin, Pic
         response = self.rest_trash_picture(self.token1, picture.pk, HTTP_USER_AGENT, REMOTE_ADDR)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
-        response = self.rest_delete_picture(self.superuser_token, picture.pk, HTTP_USER_AGENT, REMOTE_ADDR)
+        # the files are deleted once the transaction is committed
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.rest_delete_picture(self.superuser_token, picture.pk, HTTP_USER_AGENT, REMOTE_ADDR)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
 
         # now the files should not exist anymore
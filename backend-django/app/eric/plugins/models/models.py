@@ -227,6 +227,7 @@ class PluginInstance(
             ),
         )
         fts_template = "fts/plugin_instance.html"
+        fts_source_fields = ("title",)
         export_template = "export/plugin_instance.html"
 
         def get_default_serializer(*args, **kwargs):
@@ -333,6 +333,7 @@ class UserStorageLimitAdmin(admin.ModelAdmin):
     list_display = (
         "user",
         "storage_megabyte",
+        "used_storage",
         "comment",
     )
     raw_id_fields = ("user",)
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Adds a GIN index on the FTS index (used by the typeahead search)"""
+
+    dependencies = [
+        ('projects', '0116_fts_fingerprint'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS projects_project_fts_index_gin ON projects_project USING gin (fts_index);',
+            reverse_sql='DROP INDEX IF EXISTS projects_project_fts_index_gin;',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS projects_resource_fts_index_gin ON projects_resource USING gin (fts_index);',
+            reverse_sql='DROP INDEX IF EXISTS projects_resource_fts_index_gin;',
+        ),
+    ]
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+import operator
+from functools import reduce
+
+from django.db import migrations, models
+from django.db.models import BigIntegerField, Case, F, OuterRef, Q, Subquery, Sum, When
+from django.db.models.functions import Coalesce
+
+# file fields (and the fields of their sizes) of the models whose files count towards the storage limit of the user
+# who created them
+USED_STORAGE_FIELDS = {
+    'shared_elements.uploadedfileentry': (('path', 'file_size'),),
+    'pictures.uploadedpictureentry': (
+        ('background_image', 'background_image_size'),
+        ('rendered_image', 'rendered_image_size'),
+        ('shapes_image', 'shapes_image_size'),
+    ),
+    'kanban_boards.kanbanboard': (('background_image', 'background_image_size'),),
+}
+
+
+def calculate_used_storage(apps, schema_editor):
+    UserStorageLimit = apps.get_model('projects', 'UserStorageLimit')
+
+    used_storage_per_model = []
+
+    for model_label, fields in USED_STORAGE_FIELDS.items():
+        # only count the sizes of files that are set
+        file_sizes = [
+            Case(
+                When(~Q(**{file_field: ''}) & Q(**{f'{file_field}__isnull': False}), then=F(size_field)),
+                default=0,
+                output_field=BigIntegerField(),
+            )
+            for file_field, size_field in fields
+        ]
+
+        used_storage_per_model.append(
+            Coalesce(
+                Subquery(
+                    apps.get_model(model_label).objects.filter(created_by=OuterRef('user'))
+                    .order_by()
+                    .values('created_by')
+                    .annotate(used_storage=Sum(reduce(operator.add, file_sizes)))
+                    .values('used_storage')
+                ),
+                0,
+                output_field=BigIntegerField(),
+            )
+        )
+
+    UserStorageLimit.objects.update(used_storage=reduce(operator.add, used_storage_per_model))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kanban_boards', '0025_fts_index_gin'),
+        ('pictures', '0011_fts_index_gin'),
+        ('shared_elements', '0047_file_path_hash_index'),
+        ('projects', '0117_fts_index_gin'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='SHA-256 checksum of the content')),
+                ('name', models.CharField(max_length=512, unique=True, verbose_name='Path of the file (relative to the media root)')),
+                ('size', models.BigIntegerField(verbose_name='Size of the file')),
+                ('reference_count', models.IntegerField(default=0, verbose_name='Number of file fields that reference the blob')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date when the blob was created')),
+            ],
+            options={
+                'verbose_name': 'Blob',
+                'verbose_name_plural': 'Blobs',
+            },
+        ),
+        migrations.AddField(
+            model_name='userstoragelimit',
+            name='used_storage',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Used storage in bytes'),
+        ),
+        migrations.RunPython(
+            calculate_used_storage,
+            migrations.RunPython.noop
+        ),
+    ]
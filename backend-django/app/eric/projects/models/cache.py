@@ -0,0 +1,129 @@
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+"""
+Persistent (cross-request) cache for the project ids a user has a certain permission on.
+
+Cache keys are versioned with a global generation (bumped on role and project tree changes) and a per-user generation
+(bumped on changes of the project role user assignments of the user). Invalidating therefore never needs to know
+which keys exist, it only increments the generation counters and stale entries expire via their timeout.
+
+In addition, a per-user generation of the model privileges of the user is kept, so data that depends on the model
+privileges of a user (e.g., cached PDF exports) can be versioned as well.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# project_permission_cache:<global generation>:<user generation>:<user pk>:<content type pk>:<permission>
+PROJECT_PERMISSION_CACHE_KEY = "project_permission_cache:%s:%s:%s:%s:%s"
+PROJECT_PERMISSION_GLOBAL_GENERATION_CACHE_KEY = "project_permission_cache_generation"
+PROJECT_PERMISSION_USER_GENERATION_CACHE_KEY = "project_permission_cache_generation_user_%s"
+MODEL_PRIVILEGE_USER_GENERATION_CACHE_KEY = "model_privilege_generation_user_%s"
+
+
+def _get_generation(cache_key):
+    generation = cache.get(cache_key, None)
+
+    if generation is None:
+        generation = uuid.uuid4().hex
+        # add() makes sure concurrent requests agree on one generation
+        if not cache.add(cache_key, generation, None):
+            generation = cache.get(cache_key, generation)
+
+    return generation
+
+
+def _get_cache_key(user_pk, content_type_pk, permission):
+    return PROJECT_PERMISSION_CACHE_KEY % (
+        _get_generation(PROJECT_PERMISSION_GLOBAL_GENERATION_CACHE_KEY),
+        _get_generation(PROJECT_PERMISSION_USER_GENERATION_CACHE_KEY % user_pk),
+        user_pk,
+        content_type_pk,
+        permission,
+    )
+
+
+def get_cached_project_ids_with_permission(user, content_type, permission, compute_func):
+    """
+    Returns the list of project pks for (user, content_type, permission), calling ``compute_func`` on a cache miss
+    :param user: the user to look up
+    :param content_type: the content type of the entity
+    :type content_type: django.contrib.contenttypes.models.ContentType
+    :param permission: the permission codename (e.g., view_project)
+    :param compute_func: callable that returns an iterable of project pks
+    :return: a list of project primary keys
+    :rtype: list
+    """
+    timeout = settings.PROJECT_PERMISSION_CACHE_TIMEOUT
+
+    if not timeout:
+        return list(compute_func())
+
+    cache_key = _get_cache_key(user.pk, content_type.pk, permission)
+
+    project_pks = cache.get(cache_key, None)
+
+    if project_pks is None:
+        project_pks = list(compute_func())
+        cache.set(cache_key, project_pks, timeout)
+
+    return project_pks
+
+
+def get_project_permission_cache_version(user):
+    """
+    Returns a version string of the project permissions of the user, which changes whenever the cached project
+    permissions of the user are invalidated (e.g., to build cache keys of data that depends on these permissions)
+    :rtype: str
+    """
+    return "%s:%s" % (
+        _get_generation(PROJECT_PERMISSION_GLOBAL_GENERATION_CACHE_KEY),
+        _get_generation(PROJECT_PERMISSION_USER_GENERATION_CACHE_KEY % user.pk),
+    )
+
+
+def get_model_privilege_version(user):
+    """
+    Returns a version string of the model privileges of the user, which changes whenever a model privilege of the user
+    is created, changed or deleted
+    :rtype: str
+    """
+    return _get_generation(MODEL_PRIVILEGE_USER_GENERATION_CACHE_KEY % user.pk)
+
+
+def _bump_generation(cache_key):
+    cache.set(cache_key, uuid.uuid4().hex, None)
+
+
+def invalidate_project_permission_cache_for_user(user_pk):
+    """
+    Invalidates all cached project permissions of a single user (e.g., when a project role user assignment changes)
+    The invalidation is repeated after the current transaction has been committed, so that concurrent requests can not
+    re-populate the cache with data that has not been committed yet.
+    """
+    cache_key = PROJECT_PERMISSION_USER_GENERATION_CACHE_KEY % user_pk
+
+    _bump_generation(cache_key)
+    transaction.on_commit(lambda: _bump_generation(cache_key))
+
+
+def invalidate_project_permission_cache():
+    """
+    Invalidates the cached project permissions of all users (e.g., when a role or the project tree changes)
+    """
+    _bump_generation(PROJECT_PERMISSION_GLOBAL_GENERATION_CACHE_KEY)
+    transaction.on_commit(lambda: _bump_generation(PROJECT_PERMISSION_GLOBAL_GENERATION_CACHE_KEY))
+
+
+def invalidate_model_privilege_version_for_user(user_pk):
+    """
+    Changes the version of the model privileges of a single user (see get_model_privilege_version)
+    """
+    cache_key = MODEL_PRIVILEGE_USER_GENERATION_CACHE_KEY % user_pk
+
+    _bump_generation(cache_key)
+    transaction.on_commit(lambda: _bump_generation(cache_key))
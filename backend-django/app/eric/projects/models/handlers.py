@@ -5,6 +5,7 @@
 """ contains the handlers for eric.projects"""
 import logging
 import uuid
+from collections import Counter
 
 import django.dispatch
 from django.conf import settings
@@ -26,7 +27,23 @@ from eric.core.models import LockMixin, disable_permission_checks, permission_ch
 from eric.core.models.abstract import SoftDeleteMixin
 from eric.core.models.utils import get_permission_name
 from eric.notifications.models import Notification, NotificationConfiguration
-from eric.projects.models import ElementLock, MyUser, Project, ProjectRoleUserAssignment, Role, UserStorageLimit
+from eric.projects.models import (
+    BLOB_REFERENCE_FIELDS,
+    USED_STORAGE_FIELDS,
+    Blob,
+    ElementLock,
+    MyUser,
+    Project,
+    ProjectRoleUserAssignment,
+    Role,
+    RolePermissionAssignment,
+    UserStorageLimit,
+    is_blob_name,
+)
+from eric.projects.models.cache import (
+    invalidate_project_permission_cache,
+    invalidate_project_permission_cache_for_user,
+)
 from eric.relations.models import Relation
 from eric.shared_elements.models import Comment, File, Metadata
 from eric.site_preferences.models import options as site_preferences
@@ -569,6 +586,135 @@ def create_user_storage_limit(sender, instance, created, *args, **kwargs):
             )
 
 
+@receiver(post_save)
+def calculate_used_storage_of_new_user_storage_limit(sender, instance, created, *args, **kwargs):
+    """
+    Calculates the used storage of a new storage limit, as the user might already have uploaded files
+    """
+    if sender == UserStorageLimit and created:
+        UserStorageLimit.objects.filter(pk=instance.pk).update_used_storage()
+
+
+def _get_file_name(value):
+    """
+    Returns the name of a file field value (a FieldFile of an instance or the name from the database)
+    """
+    return getattr(value, "name", value) or ""
+
+
+def _get_used_storage(values, used_storage_fields):
+    return sum(
+        values[size_field] or 0 for file_field, size_field in used_storage_fields if _get_file_name(values[file_field])
+    )
+
+
+def _get_tracked_file_fields(sender):
+    """
+    Returns the fields that reference blobs and the fields that count towards the storage limit of the given model
+    """
+    model_label = sender._meta.label_lower
+
+    return BLOB_REFERENCE_FIELDS.get(model_label, ()), USED_STORAGE_FIELDS.get(model_label, ())
+
+
+def update_blob_reference_counts(reference_count_changes):
+    """
+    Updates the reference counts of blobs and deletes the blobs that are no longer referenced
+    :param reference_count_changes: a dict of blob name to the change of its reference count
+    """
+    released_blob_names = []
+
+    for name, change in reference_count_changes.items():
+        if not change or not is_blob_name(name):
+            continue
+
+        Blob.objects.filter(name=name).add_to_reference_count(change)
+
+        if change < 0:
+            released_blob_names.append(name)
+
+    if released_blob_names:
+        Blob.objects.filter(name__in=released_blob_names).delete_unreferenced()
+
+
+@receiver(pre_save)
+def remember_previous_file_fields(sender, instance, *args, **kwargs):
+    """
+    Remembers the file fields of an element that reference blobs or count towards the storage limit of the user before
+    it is saved, so the reference counts and the used storage can be updated after saving
+    """
+    blob_reference_fields, used_storage_fields = _get_tracked_file_fields(sender)
+
+    if not blob_reference_fields and not used_storage_fields:
+        return
+
+    instance._previous_file_fields = None
+
+    if not instance._state.adding:
+        field_names = set(blob_reference_fields).union(*used_storage_fields)
+        instance._previous_file_fields = sender._base_manager.filter(pk=instance.pk).values(*field_names).first()
+
+
+@receiver(post_save)
+def update_blob_references_and_used_storage_on_save(sender, instance, *args, **kwargs):
+    """
+    Updates the reference counts of the blobs and the used storage of the user who created the element, if the files
+    of the element changed
+    """
+    blob_reference_fields, used_storage_fields = _get_tracked_file_fields(sender)
+
+    if not blob_reference_fields and not used_storage_fields:
+        return
+
+    previous = getattr(instance, "_previous_file_fields", None)
+    current = {field_name: getattr(instance, field_name) for field_name in set().union(*used_storage_fields)}
+
+    reference_count_changes = Counter()
+
+    for field_name in blob_reference_fields:
+        previous_name = _get_file_name(previous[field_name]) if previous else ""
+        current_name = _get_file_name(getattr(instance, field_name))
+
+        if previous_name != current_name:
+            reference_count_changes[previous_name] -= 1
+            reference_count_changes[current_name] += 1
+
+    update_blob_reference_counts(reference_count_changes)
+
+    if used_storage_fields and instance.created_by_id:
+        used_storage = _get_used_storage(current, used_storage_fields)
+
+        if previous:
+            used_storage -= _get_used_storage(previous, used_storage_fields)
+
+        UserStorageLimit.objects.filter(user_id=instance.created_by_id).add_to_used_storage(used_storage)
+
+
+@receiver(post_delete)
+def update_blob_references_and_used_storage_on_delete(sender, instance, *args, **kwargs):
+    """
+    Releases the blobs of a deleted element and removes its files from the used storage of the user who created it
+    """
+    blob_reference_fields, used_storage_fields = _get_tracked_file_fields(sender)
+
+    if not blob_reference_fields and not used_storage_fields:
+        return
+
+    reference_count_changes = Counter()
+
+    for field_name in blob_reference_fields:
+        reference_count_changes[_get_file_name(getattr(instance, field_name))] -= 1
+
+    update_blob_reference_counts(reference_count_changes)
+
+    if used_storage_fields and instance.created_by_id:
+        current = {field_name: getattr(instance, field_name) for field_name in set().union(*used_storage_fields)}
+
+        UserStorageLimit.objects.filter(user_id=instance.created_by_id).add_to_used_storage(
+            -_get_used_storage(current, used_storage_fields)
+        )
+
+
 @receiver(post_save)
 def auto_create_element_lock(instance, *args, **kwargs):
     """
@@ -607,6 +753,73 @@ def update_project_cache_after_delete(*args, **kwargs):
         Project.objects.rebuild()
 
 
+@receiver(pre_save, sender=ProjectRoleUserAssignment)
+def remember_assigned_user_for_project_permission_cache(instance, *args, **kwargs):
+    if kwargs.get("raw") or not instance.pk:
+        return
+
+    instance._project_permission_cache_old_user_id = (
+        ProjectRoleUserAssignment.objects.filter(pk=instance.pk).values_list("user_id", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=ProjectRoleUserAssignment)
+@receiver(post_delete, sender=ProjectRoleUserAssignment)
+def invalidate_project_permission_cache_on_assignment_change(instance, *args, **kwargs):
+    """
+    Invalidates the cached project permissions of the assigned user
+    Updates of an existing assignment might have changed the user, then the cache of the previous user is invalidated
+    too
+    """
+    user_pks = {instance.user_id, getattr(instance, "_project_permission_cache_old_user_id", None)} - {None}
+
+    for user_pk in user_pks:
+        invalidate_project_permission_cache_for_user(user_pk)
+
+
+@receiver(pre_save, sender=Project)
+def remember_parent_project_for_project_permission_cache(instance, *args, **kwargs):
+    if kwargs.get("raw") or not instance.pk:
+        return
+
+    instance._project_permission_cache_old_parent_project_id = (
+        Project.objects.filter(pk=instance.pk).values_list("parent_project_id", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Project)
+def invalidate_project_permission_cache_on_project_tree_change(instance, created, *args, **kwargs):
+    """
+    New projects and projects that are moved within the project tree change the inherited permissions of the members
+    of the parent projects. Other changes of a project (e.g., its name) do not affect the cached project permissions.
+    """
+    old_parent_project_id = getattr(instance, "_project_permission_cache_old_parent_project_id", None)
+
+    if created or old_parent_project_id != instance.parent_project_id:
+        invalidate_project_permission_cache()
+
+
+@receiver(post_delete, sender=Project)
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+@receiver(post_save, sender=RolePermissionAssignment)
+@receiver(post_delete, sender=RolePermissionAssignment)
+def invalidate_project_permission_cache_on_role_or_project_change(*args, **kwargs):
+    """
+    Changes of roles, their permissions or deleted projects affect the cached project permissions of all users
+    """
+    invalidate_project_permission_cache()
+
+
+@receiver(m2m_changed, sender=Role.permissions.through)
+def invalidate_project_permission_cache_on_role_permissions_change(action, *args, **kwargs):
+    """
+    Role permissions might also be changed via the m2m manager (e.g., ``role.permissions.add(...)``)
+    """
+    if action in ["post_add", "post_remove", "post_clear"]:
+        invalidate_project_permission_cache()
+
+
 @receiver(post_save, sender=Project)
 def populate_project_fts_parent_index(instance, *args, **kwargs):
     """
@@ -621,8 +834,8 @@ def populate_project_fts_parent_index(instance, *args, **kwargs):
     # populate the project parent's FTS index with the `SearchVector` containing the
     # rendered search document
     with disable_permission_checks(Project):
-        if instance.parent_project:
-            instance.parent_project.fts_index = instance.parent_project._get_search_vector()
+        # the parent (and therefore its parents) only needs to be saved if its search document has changed
+        if instance.parent_project and instance.parent_project._update_fts_index():
             instance.parent_project.save()
 
 
@@ -6,6 +6,7 @@ from mptt.managers import TreeManager
 
 from eric.core.models import BaseManager
 from eric.projects.models.querysets import (
+    BlobQuerySet,
     ElementLockQuerySet,
     ProjectQuerySet,
     ProjectRoleUserAssignmentQuerySet,
@@ -21,3 +22,4 @@ ResourceManager = BaseManager.from_queryset(ResourceQuerySet)
 RoleManager = BaseManager.from_queryset(RoleQuerySet)
 UserStorageLimitManager = BaseManager.from_queryset(UserStorageLimitQuerySet)
 ElementLockManager = BaseManager.from_queryset(ElementLockQuerySet)
+BlobManager = BaseManager.from_queryset(BlobQuerySet)
@@ -5,8 +5,10 @@
 """ Contains the project models for eRIC """
 import logging
 import os
+import re
 import uuid
 from datetime import timedelta
+from hashlib import sha256
 from math import ceil
 
 from django.conf import settings
@@ -16,7 +18,7 @@ from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ValidationError
 from django.core.files.storage import FileSystemStorage
-from django.core.files.uploadhandler import MemoryFileUploadHandler
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models, transaction
 from django.db.models import Case, Value, When
@@ -38,6 +40,7 @@ from eric.metadata.models.fields import MetadataRelation
 from eric.model_privileges.models.abstract import ModelPrivilegeMixIn
 from eric.projects.models.exceptions import MaxFileSizeReachedException, UserStorageLimitReachedException
 from eric.projects.models.managers import (
+    BlobManager,
     ElementLockManager,
     ProjectManager,
     ProjectRoleUserAssignmentManager,
@@ -272,6 +275,7 @@ class Project(
         track_fields = ("name", "description", "project_state", "start_date", "stop_date", "parent_project", "deleted")
         track_soft_delete_by = "deleted"
         fts_template = "fts/project.html"
+        fts_source_fields = ("name", "description", "sub_projects__name", "sub_projects__fts_fingerprint")
         is_relatable = True  # Can be linked to other elements
         can_have_special_permissions = False  # No model privileges for projects
 
@@ -429,6 +433,7 @@ class Project(
         del project_dict["version_number"]
         del project_dict["fts_index"]
         del project_dict["fts_language"]
+        del project_dict["fts_fingerprint"]
         del project_dict["_state"]
         del project_dict["__original_data__"]
         del project_dict["_mptt_cached_fields"]
@@ -819,6 +824,12 @@ class UserStorageLimit(BaseModel, ChangeSetMixIn, RevisionModelMixin):
 
     storage_megabyte = models.IntegerField(verbose_name=_("Maximum available storage in megabyte"))
 
+    used_storage = models.BigIntegerField(
+        verbose_name=_("Used storage in bytes"),
+        default=0,
+        editable=False,
+    )
+
     comment = models.TextField(verbose_name=_("Comment about the storage limit"), blank=True)
 
     def __str__(self):
@@ -830,49 +841,115 @@ class UserStorageLimit(BaseModel, ChangeSetMixIn, RevisionModelMixin):
     @staticmethod
     def calculate_used_storage(user):
         """
-        Calculates the used storage of the user (in megabyte)
+        Returns the used storage of the user (in megabyte)
 
-        This counts all files and pictures of the user
+        This counts all files and pictures of the user (see USED_STORAGE_FIELDS), the used storage is maintained
+        whenever a file is added or deleted (see eric.projects.models.handlers)
         :param user: MyUser
         :return: float megabytes of used storage
         """
-        from eric.kanban_boards.models import KanbanBoard
-        from eric.pictures.models import UploadedPictureEntry
-        from eric.shared_elements.models import UploadedFileEntry
+        used_storage = UserStorageLimit.objects.filter(user=user).values_list("used_storage", flat=True).first()
+
+        return (used_storage or 0) / (1024 * 1024)  # convert bytes into MegaBytes
+
+
+# file fields (and the fields of their sizes) of the models whose files count towards the storage limit of the user
+# who created them
+USED_STORAGE_FIELDS = {
+    "shared_elements.uploadedfileentry": (("path", "file_size"),),
+    "pictures.uploadedpictureentry": (
+        ("background_image", "background_image_size"),
+        ("rendered_image", "rendered_image_size"),
+        ("shapes_image", "shapes_image_size"),
+    ),
+    "kanban_boards.kanbanboard": (("background_image", "background_image_size"),),
+}
+
+# file fields of the models that reference blobs of the blob store (see BlobStorageLimitByUser)
+BLOB_REFERENCE_FIELDS = {
+    "shared_elements.file": ("path",),
+    "shared_elements.uploadedfileentry": ("path",),
+    "pictures.picture": ("background_image", "rendered_image", "shapes_image"),
+    "pictures.uploadedpictureentry": ("background_image", "rendered_image", "shapes_image"),
+    "kanban_boards.kanbanboard": ("background_image", "background_image_thumbnail"),
+}
+
+
+def get_blob_name(checksum, file_name):
+    """
+    Returns the name (relative to MEDIA_ROOT) of the blob with the given SHA-256 checksum, the blobs are sharded into
+    sub folders by the first characters of the checksum, and keep the extension of the file they were uploaded as
+    """
+    extension = os.path.splitext(file_name)[1].lower()
 
-        used_storage = 0
+    if not re.fullmatch(r"\.[a-z0-9]{1,10}", extension):
+        extension = ""
 
-        # get all uploaded file entries which are created by the user
-        # (contains also the active file which is saved in File)
-        uploaded_file_entries = UploadedFileEntry.objects.filter(created_by=user)
+    return os.path.join(settings.BLOB_STORE_FOLDER, checksum[:2], checksum[2:4], f"{checksum}{extension}")
 
-        # calculates the used storage of the uploaded file entries
-        for uploaded_file_entry in uploaded_file_entries:
-            used_storage = used_storage + uploaded_file_entry.file_size
 
-        # get all pictures which are created by the user
-        pictures = UploadedPictureEntry.objects.filter(created_by=user)
+def is_blob_name(name):
+    """
+    Returns True if the given file name (relative to MEDIA_ROOT) is a blob of the blob store
+    """
+    return bool(name) and name.startswith(f"{settings.BLOB_STORE_FOLDER}/")
 
-        # calculates the used storage of the pictures
-        for picture in pictures:
-            if picture.background_image:
-                used_storage += picture.background_image_size
 
-            if picture.rendered_image:
-                used_storage += picture.rendered_image_size
+def get_file_checksum(content):
+    """
+    Returns the SHA-256 checksum of a file, uploaded files already provide the checksum that was calculated while
+    receiving the upload (see FileSystemStorageLimitByUserUploadHandler)
+    """
+    checksum = getattr(content, "sha256", None)
+
+    if checksum:
+        return checksum
 
-            if picture.shapes_image:
-                used_storage += picture.shapes_image_size
+    checksum = sha256()
 
-        # get all kanban boards which are created by the user
-        kanban_boards = KanbanBoard.objects.filter(created_by=user)
+    for chunk in content.chunks():
+        checksum.update(chunk)
 
-        # calculate the used storage of the background images of KanbanBoard
-        for kanban_board in kanban_boards:
-            if kanban_board.background_image:
-                used_storage += kanban_board.background_image_size
+    return checksum.hexdigest()
 
-        return used_storage / (1024 * 1024)  # convert bytes into MegaBytes
+
+class Blob(BaseModel):
+    """
+    A file of the content addressed blob store (see BlobStorageLimitByUser)
+
+    Blobs are identified by the SHA-256 checksum of their content, so identical files are only stored once. Blobs count
+    how many file fields reference them (see BLOB_REFERENCE_FIELDS) and are deleted once they are no longer referenced.
+    """
+
+    objects = BlobManager()
+
+    class Meta:
+        verbose_name = _("Blob")
+        verbose_name_plural = _("Blobs")
+
+    sha256 = models.CharField(
+        max_length=64,
+        primary_key=True,
+        verbose_name=_("SHA-256 checksum of the content"),
+    )
+
+    name = models.CharField(
+        max_length=512,
+        unique=True,
+        verbose_name=_("Path of the file (relative to the media root)"),
+    )
+
+    size = models.BigIntegerField(verbose_name=_("Size of the file"))
+
+    reference_count = models.IntegerField(
+        default=0,
+        verbose_name=_("Number of file fields that reference the blob"),
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Date when the blob was created"))
+
+    def __str__(self):
+        return self.name
 
 
 class FileSystemStorageLimitByUser(FileSystemStorage):
@@ -891,12 +968,9 @@ class FileSystemStorageLimitByUser(FileSystemStorage):
 
     """
 
-    def _save(self, name, content):
+    def check_storage_limit(self, content):
         """
-        Save method, called when a file is "saved in this storage".
-        In this method we determine whether the content size of the file that is being saved still fits within the
-        users quota
-        :param name:
+        Determines whether the content size of the file that is being saved still fits within the users quota
         :param content:
         :return:
         """
@@ -916,26 +990,108 @@ class FileSystemStorageLimitByUser(FileSystemStorage):
             # how much storage is available
             raise UserStorageLimitReachedException(maximum_allowed_storage - current_used_storage)
 
+    def _save(self, name, content):
+        """
+        Save method, called when a file is "saved in this storage".
+        In this method we determine whether the content size of the file that is being saved still fits within the
+        users quota
+        :param name:
+        :param content:
+        :return:
+        """
+        self.check_storage_limit(content)
+
         # user has enough space - save file
         return super()._save(name, content)
 
 
-class FileSystemStorageLimitByUserUploadHandler(MemoryFileUploadHandler):
+class BlobStorageLimitByUser(FileSystemStorageLimitByUser):
+    """
+    FileSystemStorageLimitByUser that stores files in the content addressed blob store
+
+    The given name is ignored, files are stored under the SHA-256 checksum of their content (see get_blob_name), so
+    identical files (e.g., unchanged images of a new picture revision or a re-uploaded file) are only stored once.
+    The storage limit of the user is checked for every file, regardless whether the blob already exists.
+
+    Example::
+
+        some_file = models.FileField(
+            storage=BlobStorageLimitByUser()
+        )
+
+    """
+
+    def _save(self, name, content):
+        self.check_storage_limit(content)
+
+        checksum = get_file_checksum(content)
+
+        with transaction.atomic():
+            # the blob stays locked until the surrounding transaction (e.g., of the REST request) is committed, so it
+            # can not be deleted before the element that is being saved references it
+            blob, created = Blob.objects.select_for_update().get_or_create(
+                sha256=checksum,
+                defaults={
+                    "name": get_blob_name(checksum, name),
+                    "size": content.size,
+                },
+            )
+
+            # a new blob always writes its file, as the file of a previously deleted blob of the same content might
+            # still be about to be removed
+            if created or not self.exists(blob.name):
+                # write the file under a temporary name first, so the blob is never visible with partial content
+                temporary_name = super(FileSystemStorageLimitByUser, self)._save(
+                    f"{blob.name}.{uuid.uuid4().hex}.tmp", content
+                )
+                os.replace(self.path(temporary_name), self.path(blob.name))
+
+        return blob.name
+
+
+class UserUploadLimit:
+    """
+    Checks the size of an upload of a user against the maximum upload size (site preferences) and the storage limit of
+    the user. The check is repeated with the number of bytes received so far while an upload is streamed, so uploads
+    are rejected as soon as they exceed a limit, regardless of the (untrusted) content length the client announced.
+    """
+
+    def __init__(self, user):
+        self.max_upload_size = options.max_upload_size_in_megabyte * 1024 * 1024 * 1024
+        self.maximum_allowed_storage = None
+        self.current_used_storage = 0
+
+        if user and not user.is_anonymous:
+            # get current storage limit and how much is used right now (only once per upload)
+            self.maximum_allowed_storage = user.user_storage_limit.storage_megabyte
+            self.current_used_storage = UserStorageLimit.calculate_used_storage(user)
+
+    def check(self, size):
+        """
+        Raises MaxFileSizeReachedException or UserStorageLimitReachedException if an upload with the given size (in
+        bytes) is not allowed
+        """
+        if size > self.max_upload_size:
+            raise MaxFileSizeReachedException(options.max_upload_size_in_megabyte)
+
+        if self.maximum_allowed_storage is not None:
+            # check if the user storage limit is hit with the new size
+            if self.current_used_storage + size / 1024 / 1024 > self.maximum_allowed_storage:
+                raise UserStorageLimitReachedException(self.maximum_allowed_storage - self.current_used_storage)
+
+
+class FileSystemStorageLimitByUserUploadHandler(TemporaryFileUploadHandler):
     """
     File Upload handler that checks whether the uploaded file can be stored based on the users storage limit
 
     This Upload Handler prevents users from abusing server resources by uploading large files. For instance, if the
     user uploads a 10 GB file, although the user only has a 100 MB quota, that 10 GB file can be rejected straight
     away.
-    The default behaviour of MemoryFileUploadHandler aswell as TemporaryFileUploadHandler (both used by default in
-    ``settings.FILE_UPLOAD_HANDLERS``) would result in a file created in Djangos Temp Folder (usually /tmp). This file
-    would be removed, once the upload has completed (or failed). But the question is: Why store the file initially,
-    when we already know that the user is not allowed to upload any more files?
-
-    To achieve this, we extended the existing MemoryFileUploadHandler, which manages POST/FILE requests in memory,
-    if the content_length is less than ``settings.FILE_UPLOAD_MAX_MEMORY_SIZE``.
 
-    In handle_raw_input() we then determine whether the user has enough storage to finish the upload or not.
+    In handle_raw_input() we determine whether the announced content length still fits into the users storage. As the
+    content length can not be trusted, the received bytes are checked again for every chunk in receive_data_chunk().
+    Chunks are streamed into a temporary file (see TemporaryFileUploadHandler), so uploads are never held in memory,
+    and the SHA-256 checksum of every file is calculated on the fly (available as ``sha256`` of the uploaded file).
 
     If the user storage limit is hit with this request, an UserStorageLimitReachedException is stored in self.exception,
     and it is raised in upload_complete(). In addition, None is returned in receive_data_chunk(), which tells the
@@ -946,6 +1102,9 @@ class FileSystemStorageLimitByUserUploadHandler(MemoryFileUploadHandler):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.exception = None
+        self.upload_limit = None
+        self.received_size = 0
+        self.checksum = None
 
     def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
         """
@@ -960,45 +1119,48 @@ class FileSystemStorageLimitByUserUploadHandler(MemoryFileUploadHandler):
         :param encoding:
         :return:
         """
-        # file size must be lower than options.max_upload_size_in_megabyte
-        if content_length / 1024 / 1024 / 1024 > options.max_upload_size_in_megabyte:
-            self.exception = MaxFileSizeReachedException(options.max_upload_size_in_megabyte)
-            # make sure the super class ``MemoryFileUploadHandler`` is not active
-            self.activated = False
-        else:
-            # get current users storage limit
-            user = get_current_user()
+        self.upload_limit = UserUploadLimit(get_current_user())
+
+        try:
+            self.upload_limit.check(content_length or 0)
+        except (MaxFileSizeReachedException, UserStorageLimitReachedException) as exception:
+            self.exception = exception
 
-            if not user.is_anonymous:
-                # get current storage limit and how much is used right now
-                maximum_allowed_storage = user.user_storage_limit.storage_megabyte
-                current_used_storage = UserStorageLimit.calculate_used_storage(user)
+        return super().handle_raw_input(input_data, META, content_length, boundary, encoding)
 
-                # check if the user storage limit is hit with the new content length
-                if current_used_storage + content_length / 1024 / 1024 > maximum_allowed_storage:
-                    # it is hit, create an exception and store it in self.exception
-                    self.exception = UserStorageLimitReachedException(maximum_allowed_storage - current_used_storage)
-                    # make sure the super class ``MemoryFileUploadHandler`` is not active
-                    self.activated = False
+    def new_file(self, *args, **kwargs):
+        if self.exception:
+            return
 
-        # else: let the super class ``MemoryFileUploadHandler`` handle this
-        super().handle_raw_input(input_data, META, content_length, boundary, encoding)
+        super().new_file(*args, **kwargs)
+        self.checksum = sha256()
 
     def receive_data_chunk(self, raw_data, start):
         """
         On receive data chunk, decide what to do with the chunk
-        If we got an exception, we discard the chunk. Else we let the super class ``MemoryFileUploadHandler``
-        process the chunk
+        If we got an exception, we discard the chunk. Else the limits are checked with the total number of bytes
+        received so far and the chunk is written to the temporary file
         :param raw_data:
         :param start:
         :return:
         """
+        if not self.exception:
+            self.received_size += len(raw_data)
+
+            try:
+                self.upload_limit.check(self.received_size)
+            except (MaxFileSizeReachedException, UserStorageLimitReachedException) as exception:
+                self.exception = exception
+                self.file.close()
+
         if self.exception:
             # return None, signaling that this chunk has been consumed, therefore preventing that this chunk is
             # consumed by any other handler (temp file handler)
             return None
 
-        # else: let the super class ``MemoryFileUploadHandler`` handle this
+        self.checksum.update(raw_data)
+
+        # else: let the super class ``TemporaryFileUploadHandler`` handle this
         return super().receive_data_chunk(raw_data, start)
 
     def file_complete(self, file_size):
@@ -1012,8 +1174,11 @@ class FileSystemStorageLimitByUserUploadHandler(MemoryFileUploadHandler):
             # return None, we do not have a file to process
             return None
 
-        # else: let the super class ``MemoryFileUploadHandler`` handle this
-        return super().file_complete(file_size)
+        # else: let the super class ``TemporaryFileUploadHandler`` handle this
+        uploaded_file = super().file_complete(file_size)
+        uploaded_file.sha256 = self.checksum.hexdigest()
+
+        return uploaded_file
 
     def upload_complete(self):
         """
@@ -1024,7 +1189,7 @@ class FileSystemStorageLimitByUserUploadHandler(MemoryFileUploadHandler):
         if self.exception:
             raise self.exception
 
-        # else: let the super class ``MemoryFileUploadHandler`` handle this
+        # else: let the super class ``TemporaryFileUploadHandler`` handle this
         return super().upload_complete()
 
 
@@ -1091,6 +1256,7 @@ class Resource(
         )
         track_soft_delete_by = "deleted"
         fts_template = "fts/resource.html"
+        fts_source_fields = ("name", "description", "type", "responsible_unit", "location", "contact")
         export_template = "export/resource.html"
 
         def get_default_serializer(*args, **kwargs):
@@ -3,8 +3,14 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 #
 import logging
-
-from django.db.models import Q
+import operator
+from functools import reduce
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import BigIntegerField, Case, F, OuterRef, Q, Subquery, Sum, When
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 from django_changeset.models.queryset import ChangeSetQuerySetMixin
@@ -14,6 +20,8 @@ from django_userforeignkey.request import get_current_user
 from eric.core.models import BaseQuerySet
 from eric.core.models.base import SoftDeleteQuerySetMixin
 from eric.core.models.utils import get_permission_name_without_app_label
+from eric.core.thumbnails import delete_thumbnails
+from eric.projects.models.cache import get_cached_project_ids_with_permission
 from eric.site_preferences.models import options as site_preferences
 
 logger = logging.getLogger(__name__)
@@ -80,20 +88,25 @@ class BaseProjectPermissionQuerySet(BaseQuerySet, SoftDeleteQuerySetMixin):
                 ["all"],
             )
         else:
-            # access ProjectRoleUserAssignment and get all projects where user has the permission
-            projects_ids = (
-                ProjectRoleUserAssignment.objects.filter(
-                    user=user,
-                    role__permissions__content_type=entity.get_content_type(),
-                    role__permissions__codename=permission,
+            content_type = entity.get_content_type()
+
+            def get_project_ids():
+                # access ProjectRoleUserAssignment and get all projects where user has the permission
+                projects_ids = (
+                    ProjectRoleUserAssignment.objects.filter(
+                        user=user,
+                        role__permissions__content_type=content_type,
+                        role__permissions__codename=permission,
+                    )
+                    .distinct()
+                    .values_list("project__id", flat=True)
                 )
-                .distinct()
-                .values_list("project__id", flat=True)
-            )
 
-            pk_list_with_subprojects = Project.get_all_projects_with_descendants(projects_ids)
+                return Project.get_all_projects_with_descendants(projects_ids).values_list("pk", flat=True)
 
-            return pk_list_with_subprojects
+            # the result is cached across requests and invalidated on role, assignment and project tree changes
+            # (see eric.projects.models.handlers)
+            return get_cached_project_ids_with_permission(user, content_type, permission, get_project_ids)
 
     def for_project(self, project_pk, *args, **kwargs):
         """
@@ -339,6 +352,16 @@ class BaseProjectEntityPermissionQuerySet(
         if "all" in project_pks:
             return self.all()
 
+        from eric.model_privileges.effective_access import (
+            effective_access_enabled,
+            filter_by_effective_access,
+            get_effective_access_models,
+        )
+
+        if effective_access_enabled() and self.model in get_effective_access_models():
+            # use the denormalized effective access table instead of joining projects and model privileges
+            return filter_by_effective_access(self, user, "view", self._get_extended_viewable_filters())
+
         from eric.model_privileges.models import ModelPrivilege
 
         # get all object ids where view_privilege is set to deny
@@ -396,6 +419,16 @@ class BaseProjectEntityPermissionQuerySet(
         if "all" in project_pks:
             return self.all()
 
+        from eric.model_privileges.effective_access import (
+            effective_access_enabled,
+            filter_by_effective_access,
+            get_effective_access_models,
+        )
+
+        if effective_access_enabled() and self.model in get_effective_access_models():
+            # use the denormalized effective access table instead of joining projects and model privileges
+            return filter_by_effective_access(self, user, "edit", self._get_extended_editable_filters())
+
         from eric.model_privileges.models import ModelPrivilege
 
         # get all object ids where edit_privilege is set to deny
@@ -881,7 +914,99 @@ class UserStorageLimitQuerySet(BaseQuerySet, ChangeSetQuerySetMixin):
     QuerySet for user storage limit - does not need any special permissions
     """
 
-    pass
+    def add_to_used_storage(self, size):
+        """
+        Adds the given size (in bytes, negative for removed files) to the used storage of all storage limits of the
+        queryset
+        """
+        if not size:
+            return 0
+
+        return self.update(used_storage=F("used_storage") + size)
+
+    def update_used_storage(self):
+        """
+        Recalculates the used storage of all storage limits of the queryset from the files of the users
+        (see eric.projects.models.USED_STORAGE_FIELDS)
+        """
+        from eric.projects.models.models import USED_STORAGE_FIELDS
+
+        used_storage_per_model = []
+
+        for model_label, fields in USED_STORAGE_FIELDS.items():
+            # only count the sizes of files that are set
+            file_sizes = [
+                Case(
+                    When(~Q(**{file_field: ""}) & Q(**{f"{file_field}__isnull": False}), then=F(size_field)),
+                    default=0,
+                    output_field=BigIntegerField(),
+                )
+                for file_field, size_field in fields
+            ]
+
+            used_storage_per_model.append(
+                Coalesce(
+                    Subquery(
+                        apps.get_model(model_label)
+                        .objects.filter(created_by=OuterRef("user"))
+                        .order_by()
+                        .values("created_by")
+                        .annotate(used_storage=Sum(reduce(operator.add, file_sizes)))
+                        .values("used_storage")
+                    ),
+                    0,
+                    output_field=BigIntegerField(),
+                )
+            )
+
+        return self.update(used_storage=reduce(operator.add, used_storage_per_model))
+
+
+class BlobQuerySet(BaseQuerySet):
+    """
+    QuerySet for the blobs of the blob store - does not need any special permissions
+    """
+
+    def add_to_reference_count(self, count):
+        """
+        Adds the given count (negative for released references) to the reference count of all blobs of the queryset
+        """
+        if not count:
+            return 0
+
+        return self.update(reference_count=F("reference_count") + count)
+
+    def unreferenced(self):
+        return self.filter(reference_count__lte=0)
+
+    def delete_unreferenced(self):
+        """
+        Deletes the blobs of the queryset that are not referenced anymore, their files are deleted once the transaction
+        is committed (so a rolled back transaction never leaves a blob without its file)
+        The blobs are locked and their reference counts are checked again after locking, so a concurrent upload of the
+        same content either waits for the deletion (and stores the file again) or references the blob before it is
+        deleted.
+        """
+        model = self.model
+
+        def delete_files(name):
+            # the same content might have been stored again in the meantime
+            if model.objects.filter(name=name).exists():
+                return
+
+            FileSystemStorage().delete(name)
+            delete_thumbnails(name)
+
+        with transaction.atomic():
+            for blob in self.unreferenced().select_for_update():
+                # select_for_update waits for concurrent transactions, re-check the reference count of the locked blob
+                blob.refresh_from_db(fields=["reference_count"])
+
+                if blob.reference_count > 0:
+                    continue
+
+                blob.delete()
+                transaction.on_commit(lambda name=blob.name: delete_files(name))
 
 
 class RoleQuerySet(BaseQuerySet, ChangeSetQuerySetMixin):
@@ -47,6 +47,9 @@ class ResourceViewSet(
         """
         return Resource.objects.viewable().prefetch_common().prefetch_related("projects")
 
+    def get_export_related_data(self, obj):
+        return [(obj.usage_setting_selected_user_groups.all(), ("name",))]
+
     @action(detail=True, methods=["GET"], url_path="terms-of-use-download", url_name="terms-of-use-download")
     def terms_of_use_download(self, request, *args, **kwargs):
         """
@@ -0,0 +1,29 @@
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+import logging
+
+from django.conf import settings
+from django.utils import timezone
+
+from celery import shared_task
+
+from eric.projects.models import Blob
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def delete_unreferenced_blobs():
+    """
+    Deletes the blobs that are not referenced by any element, e.g. as saving the element failed after the upload
+    Blobs younger than BLOB_STORE_UNREFERENCED_BLOB_MAX_AGE are kept, as they might still be about to be referenced
+    """
+    blobs = Blob.objects.unreferenced().filter(
+        created_at__lt=timezone.now() - timezone.timedelta(seconds=settings.BLOB_STORE_UNREFERENCED_BLOB_MAX_AGE)
+    )
+
+    logger.info(f"Deleting {blobs.count()} unreferenced blobs")
+
+    blobs.delete_unreferenced()
@@ -0,0 +1,177 @@
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+import hashlib
+import json
+import os
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from eric.projects.models import Blob, UserStorageLimit, get_blob_name, is_blob_name
+from eric.projects.tasks import delete_unreferenced_blobs
+from eric.projects.tests.core import AuthenticationMixin
+from eric.shared_elements.models import File
+from eric.shared_elements.tests.core import FileMixin
+
+User = get_user_model()
+
+HTTP_USER_AGENT = "APITestClient"
+REMOTE_ADDR = "127.0.0.1"
+
+
+class BlobStoreTest(APITestCase, AuthenticationMixin, FileMixin):
+    """Testing of the content addressed blob store and the maintained used storage"""
+
+    def setUp(self):
+        self.user_group = Group.objects.get(name="User")
+
+        self.user1 = User.objects.create_user(username="student_1", email="student_1@email.com", password="top_secret")
+        self.user1.groups.add(self.user_group)
+
+        self.superuser = User.objects.create_user(
+            username="superuser", email="super@user.com", password="sudo", is_superuser=True
+        )
+
+        self.token1 = self.login_and_return_token("student_1", "top_secret", HTTP_USER_AGENT, REMOTE_ADDR)
+        self.superuser_token = self.login_and_return_token("superuser", "sudo", HTTP_USER_AGENT, REMOTE_ADDR)
+
+    def rest_create_file_with_content(self, auth_token, file_name, content):
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + auth_token)
+
+        upload = BytesIO(content)
+        upload.name = file_name
+
+        response = self.client.post(
+            "/api/files/",
+            {"title": file_name, "name": file_name, "path": upload},
+            format="multipart",
+            HTTP_USER_AGENT=HTTP_USER_AGENT,
+            REMOTE_ADDR=REMOTE_ADDR,
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        return File.objects.get(pk=json.loads(response.content.decode())["pk"])
+
+    def delete_file(self, file):
+        response = self.rest_trash_file(self.token1, file.pk, HTTP_USER_AGENT, REMOTE_ADDR)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # the files of deleted blobs are removed once the transaction is committed
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.rest_delete_file(self.superuser_token, file.pk, HTTP_USER_AGENT, REMOTE_ADDR)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    def create_unreferenced_blob(self, content):
+        checksum = hashlib.sha256(content).hexdigest()
+        name = FileSystemStorage().save(get_blob_name(checksum, "orphan.txt"), ContentFile(content))
+
+        return Blob.objects.create(sha256=checksum, name=name, size=len(content))
+
+    def get_used_storage(self):
+        return UserStorageLimit.objects.get(user=self.user1).used_storage
+
+    def test_identical_files_are_stored_once(self):
+        content = os.urandom(4096)
+
+        file1 = self.rest_create_file_with_content(self.token1, "first.txt", content)
+        file2 = self.rest_create_file_with_content(self.token1, "second.txt", content)
+
+        # both files (and their file entries) reference the same blob
+        self.assertTrue(is_blob_name(file1.path.name))
+        self.assertEqual(file1.path.name, file2.path.name)
+        self.assertEqual(file1.original_filename, "first.txt")
+        self.assertEqual(file2.original_filename, "second.txt")
+
+        blob = Blob.objects.get()
+        self.assertEqual(blob.name, file1.path.name)
+        self.assertEqual(blob.size, len(content))
+        self.assertEqual(blob.reference_count, 4)
+
+        blob_path = file1.path.path
+        with open(blob_path, "rb") as f:
+            self.assertEqual(f.read(), content)
+
+        # every upload counts towards the storage limit of the user
+        self.assertEqual(self.get_used_storage(), 2 * len(content))
+
+        # the blob is kept as long as it is referenced
+        self.delete_file(file1)
+
+        self.assertEqual(Blob.objects.get().reference_count, 2)
+        self.assertTrue(os.path.exists(blob_path))
+        self.assertEqual(self.get_used_storage(), len(content))
+
+        self.delete_file(file2)
+
+        self.assertFalse(Blob.objects.exists())
+        self.assertFalse(os.path.exists(blob_path))
+        self.assertEqual(self.get_used_storage(), 0)
+
+    def test_used_storage_is_maintained_incrementally(self):
+        file = self.rest_create_file_with_content(self.token1, "first.txt", os.urandom(1000))
+        self.rest_create_file_with_content(self.token1, "second.txt", os.urandom(2000))
+
+        # add a file entry to the first file
+        response = self.rest_update_file(
+            self.token1, file.pk, None, "Title", "Description", "third.txt", 3000, HTTP_USER_AGENT, REMOTE_ADDR
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(self.get_used_storage(), 1000 + 2000 + 3000)
+        self.assertEqual(Blob.objects.count(), 3)
+
+        # the maintained used storage matches the recalculated one
+        UserStorageLimit.objects.filter(user=self.user1).update(used_storage=0)
+        UserStorageLimit.objects.filter(user=self.user1).update_used_storage()
+
+        self.assertEqual(self.get_used_storage(), 1000 + 2000 + 3000)
+
+    def test_duplicated_file_references_the_same_blob(self):
+        file = self.rest_create_file_with_content(self.token1, "first.txt", os.urandom(1000))
+
+        response = self.rest_duplicate_file(
+            self.token1, None, "Duplicate", "Description", str(file.pk), HTTP_USER_AGENT, REMOTE_ADDR
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        duplicated_file = File.objects.get(pk=json.loads(response.content.decode())["pk"])
+
+        self.assertEqual(duplicated_file.path.name, file.path.name)
+        self.assertEqual(Blob.objects.get().reference_count, 4)
+
+    def test_unreferenced_blobs_are_deleted_after_max_age(self):
+        """
+        Blobs that are left unreferenced (e.g., as saving the element failed after the upload) are deleted by the
+        delete_unreferenced_blobs task once they are older than BLOB_STORE_UNREFERENCED_BLOB_MAX_AGE
+        """
+        old_blob = self.create_unreferenced_blob(os.urandom(1000))
+        new_blob = self.create_unreferenced_blob(os.urandom(1000))
+        referenced_blob = self.create_unreferenced_blob(os.urandom(1000))
+
+        Blob.objects.filter(pk__in=[old_blob.pk, referenced_blob.pk]).update(
+            created_at=timezone.now() - timezone.timedelta(days=2)
+        )
+        Blob.objects.filter(pk=referenced_blob.pk).add_to_reference_count(1)
+
+        storage = FileSystemStorage()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            delete_unreferenced_blobs()
+
+        self.assertQuerysetEqual(
+            Blob.objects.order_by("name"),
+            sorted([new_blob.name, referenced_blob.name]),
+            transform=lambda blob: blob.name,
+        )
+        self.assertFalse(storage.exists(old_blob.name))
+        self.assertTrue(storage.exists(new_blob.name))
+        self.assertTrue(storage.exists(referenced_blob.name))
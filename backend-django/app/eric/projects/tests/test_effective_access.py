@@ -0,0 +1,224 @@
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+import json
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.test import override_settings
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from eric.model_privileges.effective_access import rebuild_effective_access
+from eric.model_privileges.models import EffectiveAccess, ModelPrivilege
+from eric.core.tests.test_utils import FakeRequest, FakeRequestUser
+from eric.model_privileges.tasks import rebuild_effective_access_task, refresh_effective_access_for_user_task
+from eric.projects.models import Project, ProjectRoleUserAssignment, Role, RolePermissionAssignment
+from eric.projects.tests.core import AuthenticationMixin, ModelPrivilegeMixin, ProjectsMixin
+from eric.shared_elements.models import Contact
+from eric.shared_elements.tests.core import ContactMixin
+
+User = get_user_model()
+
+HTTP_USER_AGENT = "APITestClient"
+REMOTE_ADDR = "127.0.0.1"
+
+
+class EffectiveAccessTest(APITestCase, AuthenticationMixin, ContactMixin, ModelPrivilegeMixin, ProjectsMixin):
+    """Tests viewable() based on the denormalized effective access table"""
+
+    def setUp(self):
+        self.user_group = Group.objects.get(name="User")
+
+        self.user1 = User.objects.create_user(username="student_1", email="student_1@email.com", password="top_secret")
+        self.user1.groups.add(self.user_group)
+        self.token1 = self.login_and_return_token("student_1", "top_secret")
+
+        self.user2 = User.objects.create_user(username="student_2", email="student_2@email.com", password="foobar")
+        self.user2.groups.add(self.user_group)
+        self.token2 = self.login_and_return_token("student_2", "foobar")
+
+        self.contact, response = self.create_contact_orm(
+            self.token1, None, "Dr.", "Max", "Mustermann", "max@mustermann.com", HTTP_USER_AGENT, REMOTE_ADDR
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        rebuild_effective_access()
+
+    def get_contact_pks(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token)
+        response = self.client.get("/api/contacts/", HTTP_USER_AGENT=HTTP_USER_AGENT, REMOTE_ADDR=REMOTE_ADDR)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [contact["pk"] for contact in json.loads(response.content.decode())["results"]]
+
+    def test_rebuild(self):
+        """the owner of the contact gets a row with view and edit access"""
+        access = EffectiveAccess.objects.get(content_type=Contact.get_content_type(), object_id=self.contact.pk)
+        self.assertEqual(access.user, self.user1)
+        self.assertTrue(access.can_view)
+        self.assertTrue(access.can_edit)
+        self.assertFalse(access.view_denied)
+
+    @override_settings(EFFECTIVE_ACCESS_TABLE_ENABLED=True)
+    def test_viewable_uses_effective_access(self):
+        """viewable() returns the same contacts as before and follows model privilege changes"""
+        self.assertEqual(self.get_contact_pks(self.token1), [str(self.contact.pk)])
+        self.assertEqual(self.get_contact_pks(self.token2), [])
+
+        # give user2 view access
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.rest_create_privilege(
+                self.token1, "contacts", self.contact.pk, self.user2.pk, HTTP_USER_AGENT, REMOTE_ADDR
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.rest_update_privilege(
+                self.token1,
+                "contacts",
+                self.contact.pk,
+                self.user2.pk,
+                {"view_privilege": ModelPrivilege.ALLOW},
+                HTTP_USER_AGENT,
+                REMOTE_ADDR,
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(self.get_contact_pks(self.token2), [str(self.contact.pk)])
+
+        # deny view access again
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.rest_update_privilege(
+                self.token1,
+                "contacts",
+                self.contact.pk,
+                self.user2.pk,
+                {"view_privilege": ModelPrivilege.DENY},
+                HTTP_USER_AGENT,
+                REMOTE_ADDR,
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(self.get_contact_pks(self.token2), [])
+
+    def get_contact_permission(self, codename):
+        return Permission.objects.get(codename=codename, content_type=Contact.get_content_type())
+
+    def get_access(self, user, contact):
+        return EffectiveAccess.objects.filter(
+            user=user, content_type=Contact.get_content_type(), object_id=contact.pk
+        ).first()
+
+    @override_settings(EFFECTIVE_ACCESS_TABLE_ENABLED=True)
+    def test_project_role_grants_edit_access(self):
+        """a project member can edit a contact of the project based on the permissions of the role only"""
+        project = self.create_project(
+            self.token1, "Project", "Description", Project.STARTED, HTTP_USER_AGENT, REMOTE_ADDR
+        )
+        contact, response = self.create_contact_orm(
+            self.token1, project.pk, "Dr.", "Erika", "Musterfrau", "erika@musterfrau.com", HTTP_USER_AGENT, REMOTE_ADDR
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        role = Role.objects.create(name="Contact Editor")
+        for codename in ("view_contact", "change_contact"):
+            RolePermissionAssignment.objects.create(role=role, permission=self.get_contact_permission(codename))
+
+        self.validate_assign_user_to_project(self.token1, project, self.user2, role, HTTP_USER_AGENT, REMOTE_ADDR)
+
+        rebuild_effective_access()
+
+        # user2 has no model privilege on the contact
+        self.assertFalse(
+            ModelPrivilege.objects.filter(
+                user=self.user2, content_type=Contact.get_content_type(), object_id=contact.pk
+            ).exists()
+        )
+
+        access = self.get_access(self.user2, contact)
+        self.assertTrue(access.can_view)
+        self.assertTrue(access.can_edit)
+
+        response = self.rest_update_contact(
+            self.token2,
+            contact.pk,
+            [project.pk],
+            "Prof.",
+            "Erika",
+            "Musterfrau",
+            "erika@musterfrau.com",
+            HTTP_USER_AGENT,
+            REMOTE_ADDR,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(EFFECTIVE_ACCESS_TABLE_ENABLED=True)
+    def test_role_permission_changes_refresh_effective_access(self):
+        """adding or removing a permission of a role refreshes the effective access of the users of the role"""
+        project = self.create_project(
+            self.token1, "Project", "Description", Project.STARTED, HTTP_USER_AGENT, REMOTE_ADDR
+        )
+        contact, response = self.create_contact_orm(
+            self.token1, project.pk, "Dr.", "Erika", "Musterfrau", "erika@musterfrau.com", HTTP_USER_AGENT, REMOTE_ADDR
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        role = Role.objects.create(name="Contact Observer")
+        RolePermissionAssignment.objects.create(role=role, permission=self.get_contact_permission("view_contact"))
+
+        self.validate_assign_user_to_project(self.token1, project, self.user2, role, HTTP_USER_AGENT, REMOTE_ADDR)
+
+        rebuild_effective_access()
+
+        self.assertFalse(self.get_access(self.user2, contact).can_edit)
+
+        # run the refresh tasks right away instead of sending them to celery
+        with mock.patch.object(
+            refresh_effective_access_for_user_task, "delay", side_effect=refresh_effective_access_for_user_task
+        ):
+            with self.captureOnCommitCallbacks(execute=True):
+                role.permissions.add(self.get_contact_permission("change_contact"))
+
+            self.assertTrue(self.get_access(self.user2, contact).can_edit)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                role.permissions.remove(self.get_contact_permission("change_contact"))
+
+            self.assertFalse(self.get_access(self.user2, contact).can_edit)
+
+    @override_settings(EFFECTIVE_ACCESS_TABLE_ENABLED=True)
+    def test_assignment_changes_refresh_only_the_assigned_users(self):
+        """changing a project role user assignment refreshes the previous and the new user instead of everyone"""
+        project = self.create_project(
+            self.token1, "Project", "Description", Project.STARTED, HTTP_USER_AGENT, REMOTE_ADDR
+        )
+        observer_role = Role.objects.create(name="Contact Observer")
+        editor_role = Role.objects.create(name="Contact Editor")
+
+        self.validate_assign_user_to_project(
+            self.token1, project, self.user2, observer_role, HTTP_USER_AGENT, REMOTE_ADDR
+        )
+        assignment = ProjectRoleUserAssignment.objects.get(project=project, user=self.user2)
+
+        user3 = User.objects.create_user(username="student_3", email="student_3@email.com", password="secret")
+
+        with mock.patch.object(refresh_effective_access_for_user_task, "delay") as refresh_delay, mock.patch.object(
+            rebuild_effective_access_task, "delay"
+        ) as rebuild_delay:
+            with FakeRequest(), FakeRequestUser(self.user1), self.captureOnCommitCallbacks(execute=True):
+                assignment.role = editor_role
+                assignment.save()
+
+            refresh_delay.assert_called_once_with(self.user2.pk)
+            refresh_delay.reset_mock()
+
+            with FakeRequest(), FakeRequestUser(self.user1), self.captureOnCommitCallbacks(execute=True):
+                assignment.user = user3
+                assignment.save()
+
+            self.assertEqual({call.args[0] for call in refresh_delay.call_args_list}, {self.user2.pk, user3.pk})
+
+        rebuild_delay.assert_not_called()
@@ -0,0 +1,114 @@
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from eric.core.tests.test_utils import FakeRequest, FakeRequestUser
+from eric.projects.models import Project, ProjectRoleUserAssignment, RolePermissionAssignment
+from eric.projects.models.cache import get_project_permission_cache_version
+from eric.projects.tests.core import AuthenticationMixin, ProjectsMixin
+
+User = get_user_model()
+
+HTTP_USER_AGENT = "APITestClient"
+REMOTE_ADDR = "127.0.0.1"
+
+
+class ProjectPermissionCacheTest(APITestCase, AuthenticationMixin, ProjectsMixin):
+    """Tests that the cross-request project permission cache is invalidated on role and assignment changes"""
+
+    def setUp(self):
+        cache.clear()
+
+        self.user_group = Group.objects.get(name="User")
+
+        self.user1 = User.objects.create_user(username="student_1", email="student_1@email.com", password="top_secret")
+        self.user1.groups.add(self.user_group)
+        self.token1 = self.login_and_return_token("student_1", "top_secret")
+
+        self.user2 = User.objects.create_user(username="student_2", email="student_2@email.com", password="foobar")
+        self.user2.groups.add(self.user_group)
+        self.token2 = self.login_and_return_token("student_2", "foobar")
+
+        self.student_role = self.create_student_role()
+
+        self.project = self.create_project(
+            self.token1, "Test Project", "Project Description", Project.INITIALIZED, HTTP_USER_AGENT, REMOTE_ADDR
+        )
+
+    def test_cache_is_invalidated_on_assignment_change(self):
+        """user2 sees the project only while being assigned to it"""
+        # populate the cache for user2
+        self.assertEqual(len(self.get_all_projects_from_rest(self.token2, HTTP_USER_AGENT, REMOTE_ADDR)), 0)
+
+        assignment = self.validate_assign_user_to_project(
+            self.token1, self.project, self.user2, self.student_role, HTTP_USER_AGENT, REMOTE_ADDR
+        )
+        self.assertEqual(len(self.get_all_projects_from_rest(self.token2, HTTP_USER_AGENT, REMOTE_ADDR)), 1)
+
+        response = self.rest_delete_user_from_project(
+            self.token1, self.project.pk, assignment.pk, HTTP_USER_AGENT, REMOTE_ADDR
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(len(self.get_all_projects_from_rest(self.token2, HTTP_USER_AGENT, REMOTE_ADDR)), 0)
+
+    def test_cache_is_invalidated_on_role_permission_change(self):
+        """removing view_project from a role hides the project from all users with that role"""
+        self.validate_assign_user_to_project(
+            self.token1, self.project, self.user2, self.student_role, HTTP_USER_AGENT, REMOTE_ADDR
+        )
+        self.assertEqual(len(self.get_all_projects_from_rest(self.token2, HTTP_USER_AGENT, REMOTE_ADDR)), 1)
+
+        view_project_permission = Permission.objects.get(
+            codename="view_project", content_type=Project.get_content_type()
+        )
+        RolePermissionAssignment.objects.filter(role=self.student_role, permission=view_project_permission).delete()
+
+        self.assertEqual(len(self.get_all_projects_from_rest(self.token2, HTTP_USER_AGENT, REMOTE_ADDR)), 0)
+
+    def test_cache_is_invalidated_on_project_tree_change(self):
+        """a new sub project of an assigned project is visible immediately"""
+        self.validate_assign_user_to_project(
+            self.token1, self.project, self.user2, self.student_role, HTTP_USER_AGENT, REMOTE_ADDR
+        )
+        self.assertEqual(len(self.get_all_projects_from_rest(self.token2, HTTP_USER_AGENT, REMOTE_ADDR)), 1)
+
+        sub_project = self.create_project(
+            self.token1, "Sub Project", "Sub Project Description", Project.INITIALIZED, HTTP_USER_AGENT, REMOTE_ADDR
+        )
+        response = self.rest_set_parent_project(self.token1, sub_project, self.project)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(len(self.get_all_projects_from_rest(self.token2, HTTP_USER_AGENT, REMOTE_ADDR)), 2)
+
+    def test_cache_is_kept_on_other_changes(self):
+        """renaming a project or changing the role of an assignment keeps the cached permissions of other users"""
+        observer_role = self.create_strict_observer_role()
+        self.validate_assign_user_to_project(
+            self.token1, self.project, self.user2, self.student_role, HTTP_USER_AGENT, REMOTE_ADDR
+        )
+        cache_version_user1 = get_project_permission_cache_version(self.user1)
+        cache_version_user2 = get_project_permission_cache_version(self.user2)
+
+        with FakeRequest(), FakeRequestUser(self.user1):
+            self.project.name = "Renamed Project"
+            self.project.save()
+
+        self.assertEqual(get_project_permission_cache_version(self.user1), cache_version_user1)
+        self.assertEqual(get_project_permission_cache_version(self.user2), cache_version_user2)
+
+        # changing the role of user2 only invalidates the cache of user2
+        assignment = ProjectRoleUserAssignment.objects.get(project=self.project, user=self.user2)
+
+        with FakeRequest(), FakeRequestUser(self.user1):
+            assignment.role = observer_role
+            assignment.save()
+
+        self.assertEqual(get_project_permission_cache_version(self.user1), cache_version_user1)
+        self.assertNotEqual(get_project_permission_cache_version(self.user2), cache_version_user2)
@@ -10,7 +10,7 @@ from django.contrib.auth.models import Group
 from rest_framework import status
 from rest_framework.test import APITestCase
 
-from eric.projects.models import Project
+from eric.projects.models import Project, UserStorageLimitReachedException, UserUploadLimit
 from eric.projects.tests.core import AuthenticationMixin, MeMixin, ProjectsMixin
 from eric.shared_elements.tests.core import FileMixin
 
@@ -257,3 +257,13 @@ class UserStorageLimitTest(APITestCase, AuthenticationMixin, ProjectsMixin, File
         response = self.rest_get_me(self.token1)
         decoded = json.loads(response.content.decode())
         self.assertEqual(decoded["used_storage_megabyte"], 115000 / 1024 / 1024, msg="The used storage is 0.115")
+
+    def test_upload_limit_is_checked_with_the_received_size(self):
+        """checks that the upload limit rejects an upload as soon as the received bytes exceed the storage limit"""
+        upload_limit = UserUploadLimit(self.user1)
+
+        # 50 MB still fit into the storage limit of 100 MB
+        upload_limit.check(50 * MB_factor)
+
+        with self.assertRaises(UserStorageLimitReachedException):
+            upload_limit.check(101 * MB_factor)
@@ -4,11 +4,14 @@
 #
 import logging
 import uuid
+from collections import defaultdict
+from functools import lru_cache
 
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import Case, Count, F, When
 from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch.dispatcher import receiver
 from django.utils.translation import gettext_lazy as _
@@ -205,6 +208,75 @@ def on_delete_relations(sender, instance, *args, **kwargs):
             ).delete()
 
 
+@lru_cache(maxsize=None)
+def get_relatable_models_by_content_type_id():
+    """
+    Returns a dictionary of all models that can be related, indexed by their content type id
+    The result is cached for the lifetime of the process, as the workbench models do not change at runtime
+    """
+    from eric.projects.models import Project
+
+    models_by_content_type_id = {
+        model_details["content_type"].id: model_details["entity"]
+        for model_details in get_all_workbench_models_with_args(WorkbenchEntityMixin).values()
+    }
+
+    # add projects to the list
+    models_by_content_type_id[Project.get_content_type().id] = Project
+
+    return models_by_content_type_id
+
+
+def load_related_objects(relations):
+    """
+    Loads the left and right content objects of the given relations with one query per content type and fills them
+    into left_content_object and right_content_object. Objects the current user is not allowed to view are set to None.
+    :param relations: an iterable of relations (e.g., a page of relations)
+    :return: the relations as list
+    """
+    relations = list(relations)
+
+    models_by_content_type_id = get_relatable_models_by_content_type_id()
+
+    # collect all PKs of related objects
+    pks_by_ct = defaultdict(set)
+
+    for relation in relations:
+        assert relation.left_content_type_id in models_by_content_type_id, "Left Content Type ID is not valid"
+        assert relation.right_content_type_id in models_by_content_type_id, "Right Content Type ID is not valid"
+
+        pks_by_ct[relation.left_content_type_id].add(relation.left_object_id)
+        pks_by_ct[relation.right_content_type_id].add(relation.right_object_id)
+
+    from eric.projects.models import Project
+
+    # prefetch all models
+    prefetched_objects_by_ct = {}
+
+    for ct, pks in pks_by_ct.items():
+        model = models_by_content_type_id[ct]
+        queryset = model.objects.related_viewable().filter(pk__in=pks).prefetch_common()
+
+        # prefetch projects (for most relations)
+        if model is not Project:
+            queryset = queryset.prefetch_related("projects")
+
+        # retrieve the prefetched objects (via in_bulk)
+        prefetched_objects_by_ct[ct] = queryset.in_bulk()
+
+    # fill in the prefetched elements in left_content_object/right_content_object
+    for relation in relations:
+        # get the object, or None if not available
+        relation.left_content_object = prefetched_objects_by_ct[relation.left_content_type_id].get(
+            relation.left_object_id, None
+        )
+        relation.right_content_object = prefetched_objects_by_ct[relation.right_content_type_id].get(
+            relation.right_object_id, None
+        )
+
+    return relations
+
+
 class RelationsMixIn(models.Model):
     """
     Mixin for relations
@@ -215,11 +287,16 @@ class RelationsMixIn(models.Model):
         abstract = True
         is_relatable = None
 
-    def get_relations(self, filter_by_pk=None):
+    def get_relations_queryset(self, filter_by_pk=None):
+        """
+        Returns a QuerySet with all relations of the current object, without loading the related objects
+        (see :func:`load_related_objects`), e.g. for filtering and paginating the relations first
+        """
         # get all relations and prefetch the changesets
         relations = (
             Relation.objects.viewable()
             .for_model(self.__class__, self.pk)
+            .select_related("left_content_type", "right_content_type")
             .prefetch_related(
                 "created_by", "created_by__userprofile", "last_modified_by", "last_modified_by__userprofile"
             )
@@ -228,57 +305,42 @@ class RelationsMixIn(models.Model):
         if filter_by_pk:
             relations = relations.filter(pk__in=filter_by_pk)
 
-        workbench_models = get_all_workbench_models_with_args(WorkbenchEntityMixin)
-
-        pks_by_ct = {}
-        model_by_ct = {}
-        prefetched_objects_by_ct = {}
-
-        for param, model_details in workbench_models.items():
-            ct = model_details["content_type"].id
-            pks_by_ct[ct] = []
-            model_by_ct[ct] = model_details["entity"]
-
-        from eric.projects.models import Project
+        return relations
 
-        # add projects to the list
-        project_content_type_id = Project.get_content_type().id
-        pks_by_ct[project_content_type_id] = []
-        model_by_ct[project_content_type_id] = Project
+    def get_relation_counts(self, relations=None):
+        """
+        Counts the relations of the current object per content type of the related (other) object
+        :param relations: optional (filtered) relations QuerySet of the current object
+        :return: a dictionary of content type id -> number of relations
+        """
+        if relations is None:
+            relations = self.get_relations_queryset()
 
-        # collect all PKs of related objects
-        for relation in relations:
-            assert relation.left_content_type_id in pks_by_ct, "Left Content Type ID is not valid"
-            assert relation.right_content_type_id in pks_by_ct, "Right Content Type ID is not valid"
+        content_type = self.__class__.get_content_type()
 
-            pks_by_ct[relation.left_content_type_id].append(relation.left_object_id)
-            pks_by_ct[relation.right_content_type_id].append(relation.right_object_id)
+        other_content_type = Case(
+            When(
+                left_content_type=content_type,
+                left_object_id=self.pk,
+                then=F("right_content_type"),
+            ),
+            default=F("left_content_type"),
+        )
 
-        # prefetch all models
-        for ct in pks_by_ct:
-            pks = pks_by_ct[ct]
-            if len(pks) > 0:
-                prefetched_objects_by_ct[ct] = (
-                    model_by_ct[ct].objects.related_viewable().filter(pk__in=pks).prefetch_common()
-                )
+        counts = (
+            relations.order_by()
+            .annotate(other_content_type=other_content_type)
+            .values("other_content_type")
+            .annotate(count=Count("pk"))
+        )
 
-                # prefetch projects (for most relations)
-                if ct != project_content_type_id:
-                    prefetched_objects_by_ct[ct] = prefetched_objects_by_ct[ct].prefetch_related("projects")
+        return {row["other_content_type"]: row["count"] for row in counts}
 
-                # retrieve the prefetched objects (via in_bulk)
-                prefetched_objects_by_ct[ct] = prefetched_objects_by_ct[ct].in_bulk()
+    def get_relations(self, filter_by_pk=None):
+        relations = self.get_relations_queryset(filter_by_pk)
 
-        # iterate over all relations and fill in the prefetched elements in left_content_object/right_content_object
-        for relation in relations:
-            # prefetch the left content object
-            relation.left_content_object = prefetched_objects_by_ct[relation.left_content_type_id].get(
-                relation.left_object_id, None  # get the object, or None if not available
-            )
-            # prefetch the right content object
-            relation.right_content_object = prefetched_objects_by_ct[relation.right_content_type_id].get(
-                relation.right_object_id, None  # get the object, or None if not available
-            )
+        # evaluates the queryset and fills in the related objects into its result cache
+        load_related_objects(relations)
 
         return relations
 
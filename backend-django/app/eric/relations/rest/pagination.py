@@ -0,0 +1,16 @@
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+from rest_framework.pagination import CursorPagination
+
+
+class RelationCursorPagination(CursorPagination):
+    """
+    Cursor pagination for relations (newest first), which allows loading the relations of an element lazily
+    """
+
+    ordering = "-created_at"
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 1000
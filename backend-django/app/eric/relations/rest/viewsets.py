@@ -6,13 +6,16 @@
 from django.http import Http404
 from django.shortcuts import get_object_or_404
 
+from rest_framework.decorators import action
 from rest_framework.exceptions import NotFound
 from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
 
 from eric.core.models.abstract import parse_parameters_for_workbench_models
 from eric.core.rest.viewsets import BaseAuthenticatedModelViewSet
-from eric.relations.models import Relation
+from eric.relations.models import Relation, get_relatable_models_by_content_type_id, load_related_objects
 from eric.relations.rest.filters import RelationFilter
+from eric.relations.rest.pagination import RelationCursorPagination
 from eric.relations.rest.serializers import RelationSerializerExtended
 
 
@@ -28,6 +31,22 @@ class RelationViewSet(BaseAuthenticatedModelViewSet):
     ordering_fields = ("display", "created_at", "created_by")
     filterset_class = RelationFilter
 
+    # ?pagination=cursor switches to cursor based pagination
+    pagination_param = "pagination"
+    cursor_pagination_class = RelationCursorPagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            if self.request.query_params.get(self.pagination_param) == "cursor":
+                self._paginator = self.cursor_pagination_class()
+            elif self.pagination_class is None:
+                self._paginator = None
+            else:
+                self._paginator = self.pagination_class()
+
+        return self._paginator
+
     @staticmethod
     def get_parent_object_or_404(*args, **kwargs):
         """
@@ -69,21 +88,62 @@ class RelationViewSet(BaseAuthenticatedModelViewSet):
             "attribute on the view correctly." % (self.__class__.__name__, lookup_url_kwarg)
         )
 
-        # fetch relations using our "fast" get_relations prefetch logic
-        obj = self.parent.get_relations([self.kwargs[lookup_url_kwarg]]).first()
+        obj = self.parent.get_relations_queryset([self.kwargs[lookup_url_kwarg]]).first()
 
         if not obj:
             raise NotFound
 
+        # load the related objects using our "fast" prefetch logic
+        load_related_objects([obj])
+
         return obj
 
     def get_queryset(self):
         """
-        Return the relations QuerySet, which is a property on the respective model
+        Return the relations QuerySet of the parent object
+        The related objects are only loaded for the current page (see list)
         :return:
         """
 
         if not hasattr(self, "parent") or not self.parent:
             return Relation.objects.none()
 
-        return self.parent.relations
+        return self.parent.get_relations_queryset()
+
+    def list(self, request, *args, **kwargs):
+        """
+        Lists the relations of the parent object, the related objects are only loaded for the current page
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+
+        page = self.paginate_queryset(queryset)
+
+        if page is not None:
+            serializer = self.get_serializer(load_related_objects(page), many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer(load_related_objects(queryset), many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=["GET"])
+    def counts(self, request, *args, **kwargs):
+        """
+        Returns the number of relations of the parent object per content type of the related objects
+        """
+        relations = RelationFilter(request.query_params, queryset=self.get_queryset(), request=request).qs
+        models_by_content_type_id = get_relatable_models_by_content_type_id()
+
+        data = []
+
+        for content_type_id, count in self.parent.get_relation_counts(relations).items():
+            content_type = models_by_content_type_id[content_type_id].get_content_type()
+
+            data.append(
+                {
+                    "content_type": content_type_id,
+                    "content_type_model": f"{content_type.app_label}.{content_type.model}",
+                    "count": count,
+                }
+            )
+
+        return Response(data)
@@ -3,19 +3,25 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 #
 import json
+import os
+import tempfile
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group, Permission
 from django.db import transaction
+from django.test import override_settings
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from eric.core.exports import get_export_job
+from eric.core.tasks import render_export_job
 from eric.core.tests import test_utils
+from eric.model_privileges.models import ModelPrivilege
 from eric.projects.models import Project, Role
-from eric.projects.tests.core import AuthenticationMixin, ProjectsMixin
+from eric.projects.tests.core import AuthenticationMixin, ModelPrivilegeMixin, ProjectsMixin
 from eric.relations.models import Relation
 from eric.relations.tests.core import RelationsMixin
 from eric.shared_elements.models import Contact, File, Meeting, Note, Task
@@ -30,6 +36,7 @@ REMOTE_ADDR = "127.0.0.1"
 class RelationsTest(
     APITestCase,
     AuthenticationMixin,
+    ModelPrivilegeMixin,
     ProjectsMixin,
     RelationsMixin,
     TaskMixin,
@@ -1466,3 +1473,140 @@ class RelationsTest(
 
         # however, the personal note still exists
         self.assertEqual(Note.objects.filter(pk=personal_note.pk).exists(), True)
+
+    def test_relation_counts_and_cursor_pagination(self):
+        """
+        Counts the relations of a note per content type and loads them lazily with cursor pagination
+        """
+        for content_type, object_id in [
+            (Task.get_content_type(), self.task1.pk),
+            (Task.get_content_type(), self.task2.pk),
+            (Note.get_content_type(), self.note2.pk),
+        ]:
+            self.create_note_relation(
+                self.token1,
+                self.note1.pk,
+                Note.get_content_type(),
+                self.note1.pk,
+                content_type,
+                object_id,
+                False,
+                HTTP_USER_AGENT,
+                REMOTE_ADDR,
+            )
+
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token1)
+
+        response = self.client.get(
+            f"/api/notes/{self.note1.pk}/relations/counts/", HTTP_USER_AGENT=HTTP_USER_AGENT, REMOTE_ADDR=REMOTE_ADDR
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        counts = {count["content_type_model"]: count["count"] for count in response.data}
+        self.assertDictEqual(counts, {"shared_elements.task": 2, "shared_elements.note": 1})
+
+        response = self.client.get(
+            f"/api/notes/{self.note1.pk}/relations/?pagination=cursor&page_size=2",
+            HTTP_USER_AGENT=HTTP_USER_AGENT,
+            REMOTE_ADDR=REMOTE_ADDR,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        decoded_content = json.loads(response.content.decode())
+        self.assertEqual(len(decoded_content["results"]), 2)
+        self.assertIsNotNone(decoded_content["next"])
+
+        # the related objects are loaded for the current page
+        for relation in decoded_content["results"]:
+            self.assertNotIn("error", relation["right_content_object"])
+
+        response = self.client.get(decoded_content["next"], HTTP_USER_AGENT=HTTP_USER_AGENT, REMOTE_ADDR=REMOTE_ADDR)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        decoded_content = json.loads(response.content.decode())
+        self.assertEqual(len(decoded_content["results"]), 1)
+        self.assertIsNone(decoded_content["next"])
+
+    @override_settings(EXPORT_CACHE_FOLDER=tempfile.mkdtemp())
+    def test_create_relation_invalidates_cached_export(self):
+        """
+        Tests that the cached export of a note is not served anymore once a relation is added to the note or the
+        related object changes, as the relations are part of the export
+        """
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token1)
+        export_jobs_url = f"/api/notes/{self.note1.pk}/export_jobs/"
+
+        response = self.client.post(export_jobs_url, HTTP_USER_AGENT=HTTP_USER_AGENT, REMOTE_ADDR=REMOTE_ADDR)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        render_export_job(json.loads(response.content.decode())["job_id"])
+
+        # the export of the unchanged note is cached
+        response = self.client.post(export_jobs_url, HTTP_USER_AGENT=HTTP_USER_AGENT, REMOTE_ADDR=REMOTE_ADDR)
+        self.assertEqual(json.loads(response.content.decode())["status"], "finished")
+
+        self.create_note_relation(
+            self.token1,
+            self.note1.pk,
+            Note.get_content_type(),
+            self.note1.pk,
+            Task.get_content_type(),
+            self.task1.pk,
+            False,
+            HTTP_USER_AGENT,
+            REMOTE_ADDR,
+        )
+
+        # the note itself did not change, but its export does
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token1)
+        response = self.client.post(export_jobs_url, HTTP_USER_AGENT=HTTP_USER_AGENT, REMOTE_ADDR=REMOTE_ADDR)
+        job = json.loads(response.content.decode())
+        self.assertEqual(job["status"], "pending")
+        render_export_job(job["job_id"])
+
+        # changing the related task invalidates the cached export as well
+        with test_utils.FakeRequest(), test_utils.FakeRequestUser(self.user1):
+            self.task1.title = "A renamed Task"
+            self.task1.save()
+
+        response = self.client.post(export_jobs_url, HTTP_USER_AGENT=HTTP_USER_AGENT, REMOTE_ADDR=REMOTE_ADDR)
+        self.assertEqual(json.loads(response.content.decode())["status"], "pending")
+
+    def grant_view_privilege(self, note, user):
+        response = self.rest_create_privilege(self.token1, "notes", note.pk, user.pk, HTTP_USER_AGENT, REMOTE_ADDR)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.rest_update_privilege(
+            self.token1,
+            "notes",
+            note.pk,
+            user.pk,
+            {"view_privilege": ModelPrivilege.ALLOW},
+            HTTP_USER_AGENT,
+            REMOTE_ADDR,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(EXPORT_CACHE_FOLDER=tempfile.mkdtemp())
+    def test_model_privilege_change_invalidates_cached_export(self):
+        """
+        Tests that the cached export of a user is not served anymore once the model privileges of the user change, and
+        that the outdated export of the user is removed
+        """
+        self.grant_view_privilege(self.note1, self.user2)
+
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token2)
+        export_jobs_url = f"/api/notes/{self.note1.pk}/export_jobs/"
+
+        response = self.client.post(export_jobs_url, HTTP_USER_AGENT=HTTP_USER_AGENT, REMOTE_ADDR=REMOTE_ADDR)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        render_export_job(json.loads(response.content.decode())["job_id"])
+
+        # user2 can view another note now, which might be linked in the export
+        self.grant_view_privilege(self.note4, self.user2)
+
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token2)
+        response = self.client.post(export_jobs_url, HTTP_USER_AGENT=HTTP_USER_AGENT, REMOTE_ADDR=REMOTE_ADDR)
+        new_job = json.loads(response.content.decode())
+        self.assertEqual(new_job["status"], "pending")
+        render_export_job(new_job["job_id"])
+
+        # only the export with the current privileges of user2 is kept
+        file_path = get_export_job(new_job["job_id"])["file_path"]
+        self.assertEqual(os.listdir(os.path.dirname(file_path)), [os.path.basename(file_path)])
@@ -3,46 +3,220 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 #
 import logging
+import time
+from multiprocessing import Pool
 
 from django.apps import apps
-from django.core.management import BaseCommand
+from django.core.cache import cache
+from django.core.management import BaseCommand, CommandError
+from django.db import connections
 
 from eric.search.models import FTSMixin
 
 logger = logging.getLogger(__name__)
 
+# stores the last processed primary key per model, so an interrupted rebuild can be resumed with --resume
+FTS_REBUILD_PROGRESS_CACHE_KEY = "ftsrebuild_last_pk_%s"
+FTS_REBUILD_PROGRESS_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+
+def get_fts_model_classes(model_names=None):
+    """
+    Returns all model classes that inherit FTSMixin, optionally filtered by (case-insensitive) model names
+    """
+    model_classes = [
+        model_class
+        for model_class in apps.get_models(include_auto_created=False)
+        if issubclass(model_class, FTSMixin) and getattr(model_class._meta, "fts_template", None)
+    ]
+
+    if model_names:
+        model_names = [model_name.lower() for model_name in model_names]
+        model_classes = [
+            model_class
+            for model_class in model_classes
+            if model_class.__name__.lower() in model_names or model_class._meta.label_lower in model_names
+        ]
+
+    return model_classes
+
+
+def rebuild_fts_index_for_range(model_label, start_after_pk, end_pk, batch_size, store_progress):
+    """
+    Rebuilds the FTS index of all instances of a model with start_after_pk < pk <= end_pk (both optional)
+    Instances are processed in batches ordered by pk, each batch is written with a single bulk UPDATE
+    :return: tuple of (model label, number of processed instances, last processed pk)
+    """
+    model_class = apps.get_model(model_label)
+
+    queryset = model_class.objects.all().order_by("pk")
+
+    if end_pk is not None:
+        queryset = queryset.filter(pk__lte=end_pk)
+
+    processed = 0
+    last_pk = start_after_pk
+
+    while True:
+        batch_queryset = queryset
+
+        if last_pk is not None:
+            batch_queryset = batch_queryset.filter(pk__gt=last_pk)
+
+        batch = list(batch_queryset[:batch_size])
+
+        if not batch:
+            break
+
+        instances = []
+
+        for instance in batch:
+            try:
+                instance._update_fts_index(force=True)
+            except AttributeError as e:
+                # attribute error might be raised for DB rows of models that do not exist anymore in code
+                logger.error(e)
+                continue
+
+            instances.append(instance)
+
+        # bulk_update does not trigger any model signals
+        model_class.objects.bulk_update(instances, ["fts_index", "fts_fingerprint"])
+
+        processed += len(batch)
+        last_pk = batch[-1].pk
+
+        if store_progress:
+            cache.set(FTS_REBUILD_PROGRESS_CACHE_KEY % model_label, last_pk, FTS_REBUILD_PROGRESS_CACHE_TIMEOUT)
+
+        logger.debug(f"Updated FTS index for {len(batch)} '{model_label}' instances up to pk {last_pk}")
+
+    return model_label, processed, last_pk
+
+
+def _rebuild_fts_index_for_range_star(arguments):
+    return rebuild_fts_index_for_range(*arguments)
+
 
 class Command(BaseCommand):
     help = "Rebuilds the FTS index for all models"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model",
+            action="append",
+            dest="models",
+            default=[],
+            help="Only rebuild the FTS index of the given model (e.g., Task or shared_elements.task), "
+            "can be used multiple times",
+        )
+
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            dest="batch_size",
+            default=500,
+            help="Number of instances that are rendered and updated at once (default: 500)",
+        )
+
+        parser.add_argument(
+            "--workers",
+            type=int,
+            dest="workers",
+            default=1,
+            help="Number of worker processes; each model is split into pk ranges that are processed in parallel",
+        )
+
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            dest="resume",
+            default=False,
+            help="Resume from the last processed pk of a previous (sequential) run",
+        )
+
     def handle(self, *args, **options):
-        # get all model classes the Django ORM knowns about
-        model_classes = apps.get_models(include_auto_created=False)
+        batch_size = options["batch_size"]
+        workers = options["workers"]
+
+        if batch_size < 1 or workers < 1:
+            raise CommandError("--batch-size and --workers need to be positive")
+
+        if options["resume"] and workers > 1:
+            raise CommandError("--resume can only be used with a single worker")
+
+        model_classes = get_fts_model_classes(options["models"])
+
+        if not model_classes:
+            raise CommandError("Could not find any FTS model")
+
+        jobs = []
 
         for model_class in model_classes:
-            # skip model classes that do not inherit FTSMixin
-            if not issubclass(model_class, FTSMixin):
-                continue
+            model_label = model_class._meta.label_lower
+
+            if workers == 1:
+                start_after_pk = None
 
-            # get all model instances for each model class
-            model_instances = model_class.objects.all()
+                if options["resume"]:
+                    start_after_pk = cache.get(FTS_REBUILD_PROGRESS_CACHE_KEY % model_label, None)
 
-            for model_instance in model_instances:
-                logger.info(
-                    "Update FTS index for '%(model)s' instance '%(pk)s'."
-                    % {
-                        "model": model_class.__name__,
-                        "pk": model_instance.pk,
-                    }
+                jobs.append((model_label, start_after_pk, None, batch_size, True))
+            else:
+                jobs.extend(
+                    (model_label, start_after_pk, end_pk, batch_size, False)
+                    for start_after_pk, end_pk in self.get_pk_ranges(model_class, workers)
                 )
 
-                # use `update` to not trigger any model signals
-                try:
-                    model_class.objects.filter(pk=model_instance.pk).update(
-                        **{
-                            "fts_index": model_instance._get_search_vector(),
-                        }
-                    )
-                except AttributeError as e:
-                    # attribute error might be raised for DB rows of models that do not exist anymore in code
-                    logger.error(e)
+        start_time = time.monotonic()
+        total = 0
+
+        if workers == 1:
+            results = map(_rebuild_fts_index_for_range_star, jobs)
+        else:
+            # forked worker processes must not share the DB connections of the parent process
+            connections.close_all()
+            pool = Pool(processes=workers)
+            results = pool.imap_unordered(_rebuild_fts_index_for_range_star, jobs)
+
+        for model_label, processed, last_pk in results:
+            total += processed
+            elapsed = time.monotonic() - start_time
+
+            self.stdout.write(
+                f"{model_label}: updated {processed} instances (last pk: {last_pk}), "
+                f"total {total} instances in {elapsed:.1f}s ({total / max(elapsed, 0.001):.1f} instances/s)"
+            )
+
+        if workers > 1:
+            pool.close()
+            pool.join()
+
+        # the rebuild is complete, a new run starts from the beginning again
+        for model_class in model_classes:
+            cache.delete(FTS_REBUILD_PROGRESS_CACHE_KEY % model_class._meta.label_lower)
+
+    @staticmethod
+    def get_pk_ranges(model_class, number_of_ranges):
+        """
+        Splits the pks of a model into (start_after_pk, end_pk) ranges of roughly the same size
+        """
+        count = model_class.objects.all().count()
+        range_size = max(count // number_of_ranges, 1)
+
+        # the last pk of every range (except the last one, which is open-ended)
+        boundaries = []
+
+        for offset in range(range_size - 1, count - 1, range_size)[: number_of_ranges - 1]:
+            boundaries.append(model_class.objects.all().order_by("pk").values_list("pk", flat=True)[offset])
+
+        ranges = []
+        start_after_pk = None
+
+        for end_pk in boundaries:
+            ranges.append((start_after_pk, end_pk))
+            start_after_pk = end_pk
+
+        ranges.append((start_after_pk, None))
+
+        return ranges
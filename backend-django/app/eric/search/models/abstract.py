@@ -2,30 +2,37 @@
 # Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
 # SPDX-License-Identifier: AGPL-3.0-or-later
 #
+import hashlib
 import logging
 
 import django.db.models.options as options
+from django.conf import settings
 from django.contrib.postgres.search import SearchVector, SearchVectorField
-from django.db import models
+from django.db import models, transaction
 from django.db.models import TextField
+from django.db.models.constants import LOOKUP_SEP
 from django.db.models.expressions import Func, Value
-from django.db.models.signals import pre_save
+from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 from django.template.loader import get_template
 from django.utils.translation import gettext_lazy as _
 
 logger = logging.getLogger(__name__)
 
-# allow the `fts_template` attributes on the `Meta` class of models.
-# This field contains the path to a template used to render the content
-# of the FTS index field.
-options.DEFAULT_NAMES += ("fts_template",)
+# allow the `fts_template` and `fts_source_fields` attributes on the `Meta` class of models.
+# `fts_template` contains the path to a template used to render the content of the FTS index field,
+# `fts_source_fields` lists the fields (or lookups of related fields) the template renders.
+options.DEFAULT_NAMES += ("fts_template", "fts_source_fields")
 
 
 class FTSMixin(models.Model):
     """
-    Mixin model for models with Full-Text-Search capability. Use the `fts_fields` attribute
-    on the `Meta` class to define the fields used for populating the FTS index.
+    Mixin model for models with Full-Text-Search capability. Use the `fts_template` attribute
+    on the `Meta` class to define the template used for populating the FTS index.
+
+    The `fts_source_fields` attribute on the `Meta` class lists the fields (e.g., "title") and lookups of related
+    fields (e.g., "checklist_items__title") the template renders. The template is only rendered if their values have
+    changed, models without `fts_source_fields` render the template on every save and compare the rendered document.
     """
 
     FTS_LANGUAGE_GERMAN = _("German")
@@ -57,14 +64,23 @@ class FTSMixin(models.Model):
         verbose_name=_("FTS Language"),
     )
 
+    fts_fingerprint = models.CharField(
+        max_length=64,
+        editable=False,
+        blank=True,
+        default="",
+        verbose_name=_("Fingerprint of the rendered FTS document"),
+    )
+
     class Meta:
         abstract = True
         fts_template = None
+        fts_source_fields = None
 
-    def _get_search_vector(self):
+    def _get_fts_document(self):
         """
-        Gets a `SearchVector` instance containing the rendered search document.
-        :return: SearchVector
+        Renders the search document from the FTS template
+        :return: str or None if the model has no FTS template
         """
         fts_template = getattr(self._meta, "fts_template", None)
 
@@ -74,30 +90,141 @@ class FTSMixin(models.Model):
                 "'%(model)s' is FTSMixin instance but has no fts_template assigned."
                 % {"model": self.__class__.__name__}
             )
-            return
+            return None
 
         # render the FTS document from the FTS template
         fts_template = get_template(fts_template)
 
         context = {"instance": self}
 
-        fts_document = fts_template.render(context)
+        return fts_template.render(context)
+
+    def _get_fts_fingerprint(self, fts_document):
+        """
+        Gets the fingerprint of a rendered search document (including the FTS language)
+        :return: str
+        """
+        return hashlib.sha256(f"{self.fts_language}\n{fts_document}".encode()).hexdigest()
+
+    def _get_fts_source_fingerprint(self):
+        """
+        Gets the fingerprint of the values the FTS template renders (see `fts_source_fields`, including the FTS
+        language), without rendering the template
+        Local fields are read from the instance, lookups of related fields from the database (as the template would).
+        :return: str or None if the model does not define `fts_source_fields`
+        """
+        fts_source_fields = getattr(self._meta, "fts_source_fields", None)
+
+        if not fts_source_fields:
+            return None
+
+        values = [self.fts_language, self._meta.fts_template]
+
+        for name in fts_source_fields:
+            if LOOKUP_SEP in name:
+                related_values = []
+
+                if self.pk is not None:
+                    related_values = self.__class__._base_manager.filter(pk=self.pk).values_list(name, flat=True)
+
+                values.append(sorted(str(value) for value in related_values))
+            else:
+                values.append(self._meta.get_field(name).value_from_object(self))
+
+        return hashlib.sha256(repr(values).encode()).hexdigest()
 
+    def _get_search_vector_for_document(self, fts_document):
         return SearchVector(
             Func(Value(fts_document), function="unaccent", output_field=TextField()), config=self.fts_language
         )
 
+    def _get_search_vector(self):
+        """
+        Gets a `SearchVector` instance containing the rendered search document.
+        :return: SearchVector
+        """
+        fts_document = self._get_fts_document()
+
+        if fts_document is None:
+            return
+
+        return self._get_search_vector_for_document(fts_document)
+
+    def _update_fts_index(self, force=False):
+        """
+        Renders the search document and updates `fts_index` and `fts_fingerprint` of this instance, unless the values
+        the template renders (see `fts_source_fields`) or, for models without `fts_source_fields`, the rendered
+        document are the same as the ones that are already indexed
+        :param force: update the index even if the fingerprint did not change
+        :return: True if the index has been updated, else False
+        """
+        compare_fingerprint = not force and not self._state.adding
+        fts_fingerprint = self._get_fts_source_fingerprint()
+
+        if compare_fingerprint and fts_fingerprint is not None and fts_fingerprint == self.fts_fingerprint:
+            # the template does not need to be rendered, the tsvector of this document is already stored in the DB
+            return False
+
+        fts_document = self._get_fts_document()
+
+        if fts_document is None:
+            self.fts_index = None
+            self.fts_fingerprint = ""
+            return True
+
+        if fts_fingerprint is None:
+            fts_fingerprint = self._get_fts_fingerprint(fts_document)
+
+            if compare_fingerprint and fts_fingerprint == self.fts_fingerprint:
+                # the tsvector of this document is already stored in the DB
+                return False
+
+        self.fts_index = self._get_search_vector_for_document(fts_document)
+        self.fts_fingerprint = fts_fingerprint
+
+        return True
+
+    @classmethod
+    def _fts_render_async(cls):
+        """
+        Whether the FTS index of this model is rendered by a Celery task after the transaction has been committed
+        (see FTS_ASYNC_RENDERING_MODELS in the settings)
+        """
+        return cls._meta.label_lower in settings.FTS_ASYNC_RENDERING_MODELS
+
     @staticmethod
     @receiver(pre_save)
     def _populate_fts_index(sender, instance, *args, **kwargs):
         """
         Populates the FTS index of the model instance before saving to the DB.
-        :return: SearchVector
+        The search document is only rendered and converted into a new tsvector if its fingerprint has changed.
         """
         # make sure we receive a signal from a FTSMixin inheriting class
         if not isinstance(instance, FTSMixin):
             return
 
+        # the index would not be written anyway
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "fts_index" not in update_fields:
+            return
+
+        if instance._fts_render_async():
+            return
+
         # populate the FTS index with the `SearchVector` containing the
         # rendered search document
-        instance.fts_index = instance._get_search_vector()
+        instance._update_fts_index()
+
+    @staticmethod
+    @receiver(post_save)
+    def _populate_fts_index_async(sender, instance, *args, **kwargs):
+        """
+        Schedules rendering the FTS index of large documents (e.g., LabBooks) after the transaction has been committed
+        """
+        if not isinstance(instance, FTSMixin) or kwargs.get("raw") or not instance._fts_render_async():
+            return
+
+        from eric.search.tasks import update_fts_index
+
+        model_label, pk = instance._meta.label_lower, instance.pk
+        transaction.on_commit(lambda: update_fts_index.delay(model_label, pk))
@@ -2,30 +2,42 @@
 # Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
 # SPDX-License-Identifier: AGPL-3.0-or-later
 #
+import hashlib
+import json
 import logging
-from itertools import chain
-from operator import attrgetter
+from collections import defaultdict
 
 from django.apps.registry import apps
+from django.conf import settings
 from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
 from django.db import models
-from django.db.models import Q
+from django.db.models import Q, Value
 
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.serializers import Serializer
 
 from eric.core.models.abstract import WorkbenchEntityMixin, get_all_workbench_models
 from eric.core.rest.viewsets import BaseGenericViewSet
+from eric.projects.models.cache import get_project_permission_cache_version
 from eric.search.models import FTSMixin
-from eric.search.utils import convert_search_terms
+from eric.search.utils import convert_search_terms, convert_search_terms_to_prefix_query
 
 logger = logging.getLogger(__name__)
 
+SEARCH_RESULT_CACHE_KEY = "search_results_%s"
+
 
 class SearchViewSet(BaseGenericViewSet):
     search_limit_per_model = 10
     search_param = "search"
     search_model_param = "model"
+    limit_param = "limit"
+    offset_param = "offset"
+    max_limit = 100
+    typeahead_limit = 10
 
     ordering_fields = ()
     filter_backends = ()
@@ -73,10 +85,31 @@ class SearchViewSet(BaseGenericViewSet):
             if model_name.lower() in available_models
         ]
 
-    def queryset_for_model(self, model, request=None):
+    def get_int_param(self, request, param, default, maximum=None):
         """
-        Builds a search queryset for the given model class
-        using the search terms from the request.
+        Gets a non-negative integer query parameter, falls back to the default for missing or invalid values
+        """
+        if not request:
+            return default
+
+        try:
+            value = int(request.query_params.get(param, default))
+        except (TypeError, ValueError):
+            return default
+
+        if value < 0:
+            return default
+
+        if maximum is not None:
+            return min(value, maximum)
+
+        return value
+
+    def search_queryset_for_model(self, model, request=None, typeahead=False):
+        """
+        Builds the (unordered and unlimited) search queryset for the given model class
+        using the search terms from the request, annotated with `fts_rank`.
+        For typeahead, every search term is matched as prefix of a word.
         """
         search_terms = self.get_search_terms(request)
 
@@ -84,16 +117,30 @@ class SearchViewSet(BaseGenericViewSet):
         if not search_terms:
             return model.objects.none()
 
-        plain_search_terms = convert_search_terms(search_terms)
-        search_query = SearchQuery(plain_search_terms, config=models.F("fts_language"))
-
-        queryset = (
+        if typeahead:
+            search_query = SearchQuery(
+                convert_search_terms_to_prefix_query(search_terms), config=models.F("fts_language"), search_type="raw"
+            )
+            # only use the tsquery match, so the GIN index on fts_index can be used
+            search_filter = Q(fts_index=search_query)
+        else:
+            plain_search_terms = convert_search_terms(search_terms)
+            search_query = SearchQuery(plain_search_terms, config=models.F("fts_language"))
+            search_filter = Q(fts_index=search_query) | Q(fts_index__contains=plain_search_terms)
+
+        return (
             model.objects.viewable()
             .annotate(fts_rank=SearchRank(models.F("fts_index"), search_query))
-            .filter(Q(fts_index=search_query) | Q(fts_index__contains=plain_search_terms))
-            .order_by("-fts_rank")
+            .filter(search_filter)
         )
 
+    def queryset_for_model(self, model, request=None):
+        """
+        Builds a search queryset for the given model class
+        using the search terms from the request.
+        """
+        queryset = self.search_queryset_for_model(model, request=request).order_by("-fts_rank")
+
         # do common prefetches on the querysets
         queryset = queryset.prefetch_common()
 
@@ -103,6 +150,118 @@ class SearchViewSet(BaseGenericViewSet):
 
         return queryset[: self.search_limit_per_model]
 
+    def hits_queryset_for_model(self, model, request=None, typeahead=False):
+        """
+        Builds the part of the unified search query for the given model class, which only selects
+        the pk, the content type and the rank of the found elements
+        """
+        content_type = ContentType.objects.get_for_model(model)
+
+        return (
+            self.search_queryset_for_model(model, request=request, typeahead=typeahead)
+            .annotate(search_content_type_id=Value(content_type.pk, output_field=models.IntegerField()))
+            .prefetch_related(None)
+            .order_by()
+            .values("pk", "search_content_type_id", "fts_rank")
+        )
+
+    def get_hits_cache_key(self, searchable_models, request, typeahead, limit, offset):
+        """
+        Builds the cache key of the search hits for the current user, search terms, models and pagination.
+        The cache key changes whenever the project permissions of the user change.
+        """
+        user = request.user
+
+        key_data = [
+            user.pk,
+            get_project_permission_cache_version(user),
+            convert_search_terms(self.get_search_terms(request)),
+            sorted(model._meta.label_lower for model in searchable_models),
+            typeahead,
+            limit,
+            offset,
+        ]
+
+        return SEARCH_RESULT_CACHE_KEY % hashlib.sha256(json.dumps(key_data).encode()).hexdigest()
+
+    def get_hits(self, searchable_models, request=None, typeahead=False):
+        """
+        Searches on all given models with a single UNION ALL query, which is ranked and paginated in the DB.
+        Returns a tuple of (hits, cached), where hits is a list of dicts with the keys pk, search_content_type_id
+        and fts_rank and cached tells whether the hits have been taken from the search result cache.
+        """
+        querysets = [
+            self.hits_queryset_for_model(model, request=request, typeahead=typeahead) for model in searchable_models
+        ]
+
+        if not querysets:
+            return [], False
+
+        # by default, return at most as many elements as the previous per model search did
+        default_limit = self.typeahead_limit if typeahead else self.search_limit_per_model * len(querysets)
+        limit = self.get_int_param(request, self.limit_param, default_limit, maximum=self.max_limit)
+        offset = self.get_int_param(request, self.offset_param, 0)
+
+        timeout = settings.SEARCH_RESULT_CACHE_TIMEOUT
+        cache_key = None
+
+        if timeout and request and request.user.is_authenticated:
+            cache_key = self.get_hits_cache_key(searchable_models, request, typeahead, limit, offset)
+            hits = cache.get(cache_key, None)
+
+            if hits is not None:
+                return hits, True
+
+        queryset = querysets[0].union(*querysets[1:], all=True).order_by("-fts_rank", "pk")
+
+        hits = list(queryset[offset : offset + limit])
+
+        if cache_key:
+            cache.set(cache_key, hits, timeout)
+
+        return hits, False
+
+    def instances_for_hits(self, hits, prefetch=True, check_permissions=False):
+        """
+        Loads the model instances of the given search hits (one query per found model) in the order of the hits
+        :param prefetch: whether the common relations for serializing the instances should be prefetched
+        :param check_permissions: whether the view permission needs to be checked again (e.g., for cached hits)
+        """
+        pks_by_content_type = defaultdict(list)
+
+        for hit in hits:
+            pks_by_content_type[hit["search_content_type_id"]].append(hit["pk"])
+
+        instances = {}
+
+        for content_type_id, pks in pks_by_content_type.items():
+            model = ContentType.objects.get_for_id(content_type_id).model_class()
+
+            queryset = model.objects.viewable() if check_permissions else model.objects.all()
+            queryset = queryset.filter(pk__in=pks)
+
+            if prefetch:
+                queryset = queryset.prefetch_common()
+
+                # if the model has a "projects" attribute, prefetch this as well
+                if hasattr(model, "projects"):
+                    queryset = queryset.prefetch_related("projects")
+
+            for instance in queryset:
+                instances[(content_type_id, instance.pk)] = instance
+
+        results = []
+
+        for hit in hits:
+            instance = instances.get((hit["search_content_type_id"], hit["pk"]))
+
+            # the element might have been deleted in the meantime
+            if instance is not None:
+                instance.fts_rank = hit["fts_rank"]
+                results.append(instance)
+
+        return results
+
     def serializer_for_instance(self, instance, request=None):
         """
         Gets the configured serializer for the model
@@ -122,22 +281,28 @@ class SearchViewSet(BaseGenericViewSet):
         serializer_class = meta.get_default_serializer()
         return serializer_class(instance=instance, context={"request": request})
 
-    def get_results(self, request=None):
+    def get_searchable_models(self, request=None):
         """
-        Searches on the selected models from the request using the search terms
-        from the request. Returns a list of found objects.
+        Gets the FTS model classes selected by the request
         """
         searchable_models = self.get_search_models(request)
 
         models = apps.get_models(include_auto_created=False)
-        models = [model for model in models if issubclass(model, FTSMixin) and model in searchable_models]
 
-        querysets = [self.queryset_for_model(model, request=request) for model in models]
+        return [model for model in models if issubclass(model, FTSMixin) and model in searchable_models]
 
-        results = chain(*querysets)
-        results = sorted(results, key=attrgetter("fts_rank"))
+    def get_results(self, request=None, typeahead=False):
+        """
+        Searches on the selected models from the request using the search terms
+        from the request. Returns a list of found objects, ordered by rank.
+        """
+        if not self.get_search_terms(request):
+            return []
 
-        return results
+        hits, cached = self.get_hits(self.get_searchable_models(request), request=request, typeahead=typeahead)
+
+        # cached hits might contain elements the user can not view anymore
+        return self.instances_for_hits(hits, prefetch=not typeahead, check_permissions=cached)
 
     def get_data(self, request=None):
         """
@@ -160,7 +325,37 @@ class SearchViewSet(BaseGenericViewSet):
         URL parameters:
             * search = you url-encoded search term
             * model = task | note | contact | ... (optional)
+            * limit = maximum number of elements (optional)
+            * offset = number of elements to skip (optional)
         """
 
         data = self.get_data(request=request)
         return Response(data)
+
+    @action(detail=False, methods=["GET"])
+    def typeahead(self, request, *args, **kwargs):
+        """
+        Searches for elements whose words start with the search terms, e.g. while the user is typing.
+        Only returns the pk, the display name and the content type of the found elements.
+
+        URL parameters:
+            * search = you url-encoded search term
+            * model = task | note | contact | ... (optional)
+            * limit = maximum number of elements (optional)
+            * offset = number of elements to skip (optional)
+        """
+        data = []
+
+        for instance in self.get_results(request=request, typeahead=True):
+            content_type = instance.get_content_type()
+
+            data.append(
+                {
+                    "pk": instance.pk,
+                    "display": str(instance),
+                    "content_type": content_type.pk,
+                    "content_type_model": f"{content_type.app_label}.{content_type.model}",
+                }
+            )
+
+        return Response(data)
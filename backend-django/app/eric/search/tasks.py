@@ -0,0 +1,28 @@
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+import logging
+
+from django.apps import apps
+
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def update_fts_index(model_label, pk):
+    """
+    Renders the FTS index of a single instance (see FTS_ASYNC_RENDERING_MODELS in the settings)
+    """
+    model_class = apps.get_model(model_label)
+    instance = model_class.objects.filter(pk=pk).first()
+
+    if not instance:
+        logger.info(f"Not updating FTS index of '{model_label}' instance '{pk}' as it does not exist anymore")
+        return
+
+    if instance._update_fts_index():
+        # use `update` to not trigger any model signals
+        model_class.objects.filter(pk=pk).update(fts_index=instance.fts_index, fts_fingerprint=instance.fts_fingerprint)
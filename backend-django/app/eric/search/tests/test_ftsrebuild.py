@@ -2,12 +2,15 @@
 # Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
 # SPDX-License-Identifier: AGPL-3.0-or-later
 #
+from unittest import mock
+
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
 from django.core.management import call_command
 
 from rest_framework.test import APITestCase
 
+from eric.projects.models import Project
 from eric.projects.tests.core import AuthenticationMixin
 from eric.search.tests.core import FTSDataMixin
 
@@ -47,3 +50,43 @@ class FTSRebuildTest(APITestCase, AuthenticationMixin, FTSDataMixin):
 
         # asserts the projects do have a filled fts_index again
         self.assertEqual(len([p for p in projects.all() if p.fts_index]), 3)
+
+    def test_ftsrebuild_batched_for_single_model(self):
+        http_user_agent = "APITestClient"
+        http_remote_addr = "127.0.0.1"
+
+        auth_token = self.login_and_return_token(self.user1.username, "top_secret", http_user_agent, http_remote_addr)
+        projects = self.create_test_projects(auth_token)
+
+        projects.update(fts_index="")
+
+        # rebuild with batches smaller than the number of projects
+        call_command("ftsrebuild", "--model", "project", "--batch-size", "2")
+
+        # asserts the projects do have a filled fts_index again
+        self.assertEqual(len([p for p in projects.all() if p.fts_index]), 3)
+
+    def test_fts_index_is_only_rendered_on_content_change(self):
+        http_user_agent = "APITestClient"
+        http_remote_addr = "127.0.0.1"
+
+        auth_token = self.login_and_return_token(self.user1.username, "top_secret", http_user_agent, http_remote_addr)
+        project = self.create_test_projects(auth_token).first()
+
+        fingerprint = project.fts_fingerprint
+        self.assertTrue(fingerprint)
+
+        # an unchanged document keeps the stored index, without rendering the template
+        with mock.patch.object(Project, "_get_fts_document") as get_fts_document:
+            self.assertFalse(project._update_fts_index())
+            project.save()
+
+        get_fts_document.assert_not_called()
+        project.refresh_from_db()
+        self.assertEqual(project.fts_fingerprint, fingerprint)
+
+        # a changed document is rendered into a new index
+        project.name = "A completely different project name"
+        project.save()
+        project.refresh_from_db()
+        self.assertNotEqual(project.fts_fingerprint, fingerprint)
@@ -61,3 +61,46 @@ class FTSSearchTest(APITestCase, AuthenticationMixin, FTSDataMixin):
 
         # searching for a words in the wrong order should also match
         self.assertEqual(len(self.rest_search(auth_token, "rats cat", http_remote_addr, http_user_agent).data), 1)
+
+    def test_global_search_pagination(self):
+        http_user_agent = "APITestClient"
+        http_remote_addr = "127.0.0.1"
+
+        auth_token = self.login_and_return_token(self.user1.username, "top_secret", http_user_agent, http_remote_addr)
+        self.create_test_projects(auth_token)
+
+        # all three projects contain the word "project"
+        results = self.rest_search(auth_token, "project", http_remote_addr, http_user_agent).data
+        self.assertEqual(len(results), 3)
+
+        # the results are paginated within the search query
+        first_page = self.rest_search(auth_token, "project&limit=2", http_remote_addr, http_user_agent).data
+        second_page = self.rest_search(auth_token, "project&limit=2&offset=2", http_remote_addr, http_user_agent).data
+        self.assertEqual(len(first_page), 2)
+        self.assertEqual(len(second_page), 1)
+        self.assertSetEqual(
+            {result["pk"] for result in first_page + second_page}, {result["pk"] for result in results}
+        )
+
+    def test_typeahead_search(self):
+        http_user_agent = "APITestClient"
+        http_remote_addr = "127.0.0.1"
+
+        auth_token = self.login_and_return_token(self.user1.username, "top_secret", http_user_agent, http_remote_addr)
+        self.create_test_projects(auth_token)
+
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + auth_token)
+
+        # incomplete words match as prefix
+        response = self.client.get(
+            "/api/search/typeahead/?search=woodch", HTTP_USER_AGENT=http_user_agent, REMOTE_ADDR=http_remote_addr
+        )
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]["display"], "The woodchuck project")
+        self.assertSetEqual(set(response.data[0].keys()), {"pk", "display", "content_type", "content_type_model"})
+
+        # all terms need to match
+        response = self.client.get(
+            "/api/search/typeahead/?search=woodch fo", HTTP_USER_AGENT=http_user_agent, REMOTE_ADDR=http_remote_addr
+        )
+        self.assertEqual(len(response.data), 0)
@@ -7,6 +7,10 @@ import re
 from unidecode import unidecode
 
 
+# only allow -, _, . and words for our search values
+regex_strip = re.compile(r"(?!-)(?!\.)(?!_)[\W]+", re.UNICODE)
+
+
 def convert_search_terms(search_terms):
     """
     Converts a list of search terms to a single search string and filters illegal characters.
@@ -14,8 +18,19 @@ def convert_search_terms(search_terms):
     :param search_terms: Array of strings to search for
     :return:
     """
-    # only allow -, _, . and words for our search values
-    regex_strip = re.compile(r"(?!-)(?!\.)(?!_)[\W]+", re.UNICODE)
     search_terms = [unidecode(regex_strip.sub("", term)) for term in search_terms]
 
     return " ".join(search_terms).lower()
+
+
+def convert_search_terms_to_prefix_query(search_terms):
+    """
+    Converts a list of search terms to a raw tsquery, where every term is matched as prefix (e.g., for typeahead).
+
+    :param search_terms: Array of strings to search for
+    :return: tsquery string (e.g., "'fat':* & 'ra':*")
+    """
+    search_terms = [unidecode(regex_strip.sub("", term)).lower() for term in search_terms]
+
+    # the terms can not contain quotes anymore, so quoting them is safe
+    return " & ".join(f"'{term}':*" for term in search_terms if term)
@@ -53,12 +53,72 @@ DSS_SETTINGS = {
     "GLOBUS_RABBITMQ_PASSWORD": "",
     "GLOBUS_RABBITMQ_SSL_CA_CERT": "",
     "GLOBUS_RABBITMQ_MESSAGE_FETCH_SIZE": "",
+    # number of scanned paths that are compared to the existing files at once
+    "SCAN_CHUNK_SIZE": 5000,
+    # only compare files of directories that have been modified since the last scan of a container
+    "INCREMENTAL_SCAN": False,
+    # number of files that are claimed by an import worker at once
+    "IMPORT_BATCH_SIZE": 100,
+    # maximum number of batches an import worker imports before it stops (until the next scheduled import)
+    "IMPORT_MAX_BATCHES": 10,
+    # number of import workers that are started in parallel by the scheduled import
+    "IMPORT_WORKERS": 4,
+    # files that have been claimed longer ago (in seconds) are claimed again, e.g. if the import worker has died
+    "IMPORT_CLAIM_TIMEOUT": 60 * 60,
 }
 
 MAX_FILE_SIZE_PER_USE = "50G"
 
+# Folder (relative to MEDIA_ROOT) of the content addressed blob store that stores the files of Files, Pictures and
+# Kanban Boards (see eric.projects.models.BlobStorageLimitByUser), identical files are only stored once
+BLOB_STORE_FOLDER = "blob_store"
+
+# Age (in seconds) after which blobs that are not referenced by any element (e.g., as saving the element failed after
+# the upload) are deleted by the delete_unreferenced_blobs task, younger blobs might still be about to be referenced
+BLOB_STORE_UNREFERENCED_BLOB_MAX_AGE = 60 * 60 * 24
+
 DEFAULT_QUOTA_PER_USER_MEGABYTE = 100
 
+# Timeout (in seconds) of the cross-request cache of project ids a user has a certain permission on
+# (see eric.projects.models.cache), set to 0 to disable the cache
+PROJECT_PERMISSION_CACHE_TIMEOUT = 60 * 60
+
+# Use the denormalized effective access table for viewable() and editable() of workbench entities
+# (see eric.model_privileges.effective_access), run "python manage.py rebuild_effective_access" before enabling it
+EFFECTIVE_ACCESS_TABLE_ENABLED = False
+
+# FTS models (app_label.model_name) whose FTS index is rendered by a Celery task after saving, instead of within the
+# request (e.g., "labbooks.labbook" for LabBooks with many child elements)
+FTS_ASYNC_RENDERING_MODELS = []
+
+# Timeout (in seconds) of the per user search result cache of the global search and typeahead, 0 disables the cache
+SEARCH_RESULT_CACHE_TIMEOUT = 30
+
+# Timeout (in seconds) of the per user cache of the dashboard sections (see eric.dashboard.cache), 0 disables the cache
+DASHBOARD_CACHE_TIMEOUT = 60
+
+# Number of threads that load the dashboard sections which are not cached concurrently, each thread uses its own
+# database connection, set to 1 to load the sections one after another
+DASHBOARD_SECTION_WORKERS = 3
+
+# Whether files in uncompressed formats are deflated in ZIP downloads (see eric.core.zip_export), downloads that only
+# contain stored files (e.g., if this is disabled) are sent with a Content-Length
+ZIP_EXPORT_COMPRESS_FILES = True
+
+# Size (in bytes) of the chunks files are read in for ZIP downloads
+ZIP_EXPORT_BUFFER_SIZE = 1024 * 1024
+
+# Timeout (in seconds) of the cross-request cache of the directory tree of a drive, which is used to resolve WebDAV
+# paths (see eric.drives.models.cache), set to 0 to disable the cache
+DIRECTORY_PATH_INDEX_CACHE_TIMEOUT = 60 * 60
+
+# Timeout (in seconds) of the shared cache of successful WebDAV basic authentications
+WEBDAV_AUTH_CACHE_TIMEOUT = 600
+
+# Size and timeout (in seconds) of the in-process cache of successful WebDAV basic authentications per worker
+WEBDAV_AUTH_LOCAL_CACHE_SIZE = 1024
+WEBDAV_AUTH_LOCAL_CACHE_TIMEOUT = 60
+
 INSTALLED_APPS = [
     # Django
     "django_light",
@@ -229,6 +289,26 @@ MEDIA_URL = "/uploaded_media/"
 STATIC_ROOT = os.path.join(os.path.dirname(BASE_DIR), "htdocs", "static")
 MEDIA_ROOT = os.path.join(STATIC_ROOT, "uploaded_media")
 
+# Folder of the cached PDF exports (see eric.core.exports), exports are cached per element version and per user
+EXPORT_CACHE_FOLDER = os.path.join(MEDIA_ROOT, "export_cache")
+
+# Timeout (in seconds) of the status of export jobs, which render PDF exports in the background
+EXPORT_JOB_TIMEOUT = 60 * 60
+
+# Sizes (maximum width and height in pixels) of the thumbnails of uploaded images (see eric.core.thumbnails), a
+# requested size is rounded up to the next size
+THUMBNAIL_SIZES = (64, 128, 256, 512, 1024)
+
+# Sizes of the thumbnails that are generated by a Celery task once an image has been uploaded, all other sizes are
+# generated on their first request
+THUMBNAIL_PREGENERATE_SIZES = (256, 1024)
+
+# Quality of the WebP and JPEG thumbnails
+THUMBNAIL_QUALITY = 80
+
+# max-age (in seconds) of the Cache-Control header of thumbnails
+THUMBNAIL_CACHE_MAX_AGE = 60 * 60 * 24
+
 # avatar size
 AVATAR_SIZE = (512, 512)
 
@@ -457,9 +537,9 @@ DB_LOGGING_SETTINGS = {
 
 AUTHENTICATION_BACKENDS = ("django.contrib.auth.backends.ModelBackend",)
 
+# uploads are streamed into temporary files while the storage limit of the user is checked
 FILE_UPLOAD_HANDLERS = [
     "eric.projects.models.models.FileSystemStorageLimitByUserUploadHandler",
-    "django.core.files.uploadhandler.TemporaryFileUploadHandler",
 ]
 
 # CKEditor config
@@ -536,6 +616,12 @@ NOTIFICATIONS_SETTINGS = {
         "MAIL_CONF_MEETING_CONFIRMATION",  # appointment confirmation mails for the creator
         "NOTIFICATION_CONF_MEETING_USER_CHANGED",  # appointment confirmation mails for attending users
     ],
+    # number of users whose notification mails are sent with one connection to the mail server
+    "MAIL_BATCH_SIZE": 100,
+    # send the notification mails via celery tasks (one task per batch) instead of within send_notifications
+    "SEND_MAILS_ASYNC": False,
+    # rate limit of the celery task that sends a batch of notification mails
+    "MAIL_TASK_RATE_LIMIT": "30/m",
 }
 
 # Timespan a password reset token is valid (also used for user invites)
@@ -914,6 +1000,10 @@ CHANNEL_LAYERS = {
     }
 }
 
+# element_changed events for the same element are sent to a websocket at most once per window (in seconds), further
+# changes within the window are coalesced into one event with the latest version (0 disables the coalescing)
+WEBSOCKET_ELEMENT_CHANGED_COALESCE_WINDOW = 0.5
+
 # Password validation
 # https://docs.djangoproject.com/en/1.11/ref/settings/#auth-password-validators
 
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Adds a GIN index on the FTS index (used by the typeahead search)"""
+
+    dependencies = [
+        ('shared_elements', '0045_fts_fingerprint'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS shared_elements_comment_fts_index_gin ON shared_elements_comment USING gin (fts_index);',
+            reverse_sql='DROP INDEX IF EXISTS shared_elements_comment_fts_index_gin;',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS shared_elements_contact_fts_index_gin ON shared_elements_contact USING gin (fts_index);',
+            reverse_sql='DROP INDEX IF EXISTS shared_elements_contact_fts_index_gin;',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS shared_elements_file_fts_index_gin ON shared_elements_file USING gin (fts_index);',
+            reverse_sql='DROP INDEX IF EXISTS shared_elements_file_fts_index_gin;',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS shared_elements_meeting_fts_index_gin ON shared_elements_meeting USING gin (fts_index);',
+            reverse_sql='DROP INDEX IF EXISTS shared_elements_meeting_fts_index_gin;',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS shared_elements_note_fts_index_gin ON shared_elements_note USING gin (fts_index);',
+            reverse_sql='DROP INDEX IF EXISTS shared_elements_note_fts_index_gin;',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS shared_elements_task_fts_index_gin ON shared_elements_task USING gin (fts_index);',
+            reverse_sql='DROP INDEX IF EXISTS shared_elements_task_fts_index_gin;',
+        ),
+    ]
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shared_elements', '0046_fts_index_gin'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='file',
+            index=django.contrib.postgres.indexes.HashIndex(fields=['path'], name='shared_file_path_hash'),
+        ),
+    ]
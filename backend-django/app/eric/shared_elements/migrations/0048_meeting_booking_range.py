@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+import logging
+
+import django.contrib.postgres.constraints
+import django.contrib.postgres.fields.ranges
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+# Existing double bookings would violate the exclusion constraint: only the first booking (by creation date) of
+# overlapping bookings gets a booking range, the others keep their times but are no longer part of the constraint.
+# The validation of new bookings still takes them into account (see Meeting.get_resource_booking_conflicts), they are
+# logged so they can be resolved manually.
+FILL_BOOKING_RANGES = """
+WITH bookings AS (
+    SELECT id, resource_id, created_at, tstzrange(
+        date_time_start, date_time_end, CASE WHEN date_time_end > date_time_start THEN '[)' ELSE '[]' END
+    ) AS booking_range
+    FROM shared_elements_meeting
+    WHERE resource_id IS NOT NULL AND NOT deleted AND date_time_end >= date_time_start
+)
+UPDATE shared_elements_meeting meeting
+SET booking_range = booking.booking_range
+FROM bookings booking
+WHERE meeting.id = booking.id
+AND NOT EXISTS (
+    SELECT 1 FROM bookings other
+    WHERE other.resource_id = booking.resource_id
+    AND other.booking_range && booking.booking_range
+    AND (other.created_at, other.id) < (booking.created_at, booking.id)
+);
+"""
+
+
+def log_double_bookings(apps, schema_editor):
+    Meeting = apps.get_model('shared_elements', 'Meeting')
+
+    double_bookings = Meeting.objects.filter(
+        resource__isnull=False,
+        deleted=False,
+        booking_range__isnull=True,
+        date_time_end__gte=F('date_time_start'),
+    ).values_list('pk', 'resource_id', 'date_time_start', 'date_time_end')
+
+    for pk, resource_pk, date_time_start, date_time_end in double_bookings:
+        logger.warning(
+            f"Meeting {pk} double books resource {resource_pk} ({date_time_start} - {date_time_end}), "
+            f"it can not be saved until it has been moved or the resource has been changed"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shared_elements', '0047_file_path_hash_index'),
+    ]
+
+    operations = [
+        BtreeGistExtension(),
+        migrations.AddField(
+            model_name='meeting',
+            name='booking_range',
+            field=django.contrib.postgres.fields.ranges.DateTimeRangeField(blank=True, editable=False, null=True, verbose_name='Booked time of the resource'),
+        ),
+        migrations.RunSQL(
+            sql=FILL_BOOKING_RANGES,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RunPython(
+            log_double_bookings,
+            migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='meeting',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(expressions=[('resource', '='), ('booking_range', '&&')], name='shared_meeting_resource_booking_excl'),
+        ),
+    ]
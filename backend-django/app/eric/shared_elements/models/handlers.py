@@ -19,8 +19,10 @@ from django_userforeignkey.request import get_current_request
 
 from eric.base64_image_extraction.utils import convert_text_with_base64_images_to_file_references
 from eric.core.tests import custom_json_handler
+from eric.core.thumbnails import THUMBNAIL_SOURCE_MIME_TYPES, delete_thumbnails, schedule_thumbnail_generation
 from eric.model_privileges.models import ModelPrivilege
 from eric.ms_office_handling.models.handlers import OFFICE_TEMP_FILE_PREFIX
+from eric.projects.models import is_blob_name
 from eric.shared_elements.models import CalendarAccess, Comment, File, Meeting, Note, Task, UploadedFileEntry
 from eric.versions.models import Version
 
@@ -87,18 +89,34 @@ def auto_delete_file_on_delete(sender, instance, **kwargs):
     """
     Deletes physical file from filesystem
     when corresponding `File` or `UploadedFileEntry` object is deleted.
+    Files of the blob store are deleted once they are no longer referenced (see eric.projects.models.handlers).
     """
     if sender != File and sender != UploadedFileEntry:
         return
 
+    if is_blob_name(instance.path.name):
+        return
+
     # we should never delete files on dss containers
     if instance.path and os.path.isfile(instance.path.path) and not instance.is_dss_file:
         try:
             os.remove(instance.path.path)
+            delete_thumbnails(instance.path.name)
         except OSError as error:
             logger.error(f"ERROR: OSError in auto_delete_file_on_delete: {error}")
 
 
+@receiver(post_save, sender=UploadedFileEntry)
+def generate_thumbnails_of_uploaded_image_file(sender, instance, created, *args, **kwargs):
+    """
+    Generates the thumbnails of a newly uploaded image file in the background (files on dss containers are skipped)
+    """
+    if not created or instance.mime_type not in THUMBNAIL_SOURCE_MIME_TYPES or instance.is_dss_file:
+        return
+
+    schedule_thumbnail_generation(instance.path.name)
+
+
 @receiver(pre_save, sender=File)
 def convert_file_description_with_base64_images_to_file_references(sender, instance, *args, **kwargs):
     """
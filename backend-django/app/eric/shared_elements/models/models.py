@@ -13,15 +13,18 @@ from datetime import time
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.fields import GenericRelation
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateTimeRangeField, RangeOperators
+from django.contrib.postgres.indexes import HashIndex
 from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator
-from django.db import models
-from django.db.models import Q
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, Count, F, Func, Q, Value, When
 from django.db.models.fields.files import FieldFile
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.dateparse import parse_datetime
-from django.utils.timezone import datetime, localdate, localtime, timedelta
+from django.utils.timezone import datetime, localdate, localtime, make_aware, timedelta
 from django.utils.translation import gettext_lazy as _
 
 import vobject
@@ -29,6 +32,7 @@ from django_changeset.models import RevisionModelMixin
 from django_changeset.models.mixins import CreatedModifiedByMixIn
 from django_cleanhtmlfield.fields import HTMLField
 from django_userforeignkey.request import get_current_user
+from psycopg2.extras import DateTimeTZRange
 
 from eric.base64_image_extraction.models import ExtractedImage
 from eric.core.models import BaseModel, LockMixin, disable_permission_checks
@@ -73,6 +77,9 @@ from eric.shared_elements.models.managers import (
 METADATA_VERSION_KEY = "metadata_version"
 UNHANDLED_VERSION_ERROR = NotImplementedError("Unhandled metadata version")
 
+# name of the exclusion constraint that prevents overlapping bookings of a resource (see Meeting.booking_range)
+RESOURCE_BOOKING_CONSTRAINT = "shared_meeting_resource_booking_excl"
+
 logger = logging.getLogger(__name__)
 
 User = get_user_model()
@@ -145,6 +152,7 @@ class Contact(
             ),
         )
         fts_template = "fts/contact.html"
+        fts_source_fields = ("academic_title", "first_name", "last_name", "email", "company", "phone")
         export_template = "export/contact.html"
 
         def get_default_serializer(*args, **kwargs):
@@ -286,6 +294,7 @@ class Note(
             ),
         )
         fts_template = "fts/note.html"
+        fts_source_fields = ("subject", "content")
         export_template = "export/note.html"
 
         def get_default_serializer(*args, **kwargs):
@@ -399,6 +408,7 @@ class Comment(
             ),
         )
         fts_template = "fts/comment.html"
+        fts_source_fields = ("content",)
         export_template = "export/comment.html"
 
         def get_default_serializer(*args, **kwargs):
@@ -471,7 +481,7 @@ class DynamicStorageFieldFile(FieldFile):
         if instance.is_dss_file:
             self.storage = dss_storage
         else:
-            self.storage = FileSystemStorageLimitByUser()
+            self.storage = BlobStorageLimitByUser()
 
 
 class DynamicStorageFileField(models.FileField):
@@ -486,7 +496,7 @@ class DynamicStorageFileField(models.FileField):
         if model_instance.is_dss_file:
             self.storage = dss_storage
         else:
-            self.storage = FileSystemStorageLimitByUser()
+            self.storage = BlobStorageLimitByUser()
         file = super().pre_save(model_instance, add)
         return file
 
@@ -561,6 +571,11 @@ class File(
         verbose_name = _("File")
         verbose_name_plural = _("Files")
         ordering = ["name", "original_filename"]
+        indexes = [
+            # paths can be longer than a btree index entry allows, a hash index supports the equality lookups of the
+            # DSS filesystem scan
+            HashIndex(fields=["path"], name="shared_file_path_hash"),
+        ]
         permissions = (
             ("trash_file", "Can trash a file"),
             ("restore_file", "Can restore a file"),
@@ -589,6 +604,7 @@ class File(
             ),
         )
         fts_template = "fts/file.html"
+        fts_source_fields = ("title", "name", "original_filename", "description", "file_entries__original_filename")
         export_template = "export/file.html"
 
         def get_default_serializer(*args, **kwargs):
@@ -714,22 +730,8 @@ class File(
             self.mime_type = self.path.file.content_type
             # store file size
             self.file_size = self.path.file.size
-
-            if not self.is_dss_file:
-                # move the file to a project folder
-                new_file_path = File.generate_file_name(self.path.name)
-
-                # create folder if it does not exist
-                if not os.path.exists(os.path.dirname(new_file_path)):
-                    os.makedirs(os.path.dirname(new_file_path))
-
-                # make sure the path we use is relative to the MEDIA_ROOT, we dont want to store the whole path
-                new_file_path = os.path.relpath(new_file_path, settings.MEDIA_ROOT)
-
-                # rename old file path to the new file path
-                # os.rename(self.path.path, new_file_path)
-
-                self.path.name = new_file_path
+            # files that are not stored in a DSS container are stored in the blob store, which determines the path of
+            # the file by its content (see BlobStorageLimitByUser)
 
         # when a file is uploaded from webdav, give it a title
         if self.title == "":
@@ -941,6 +943,7 @@ class Task(
             ),
         )
         fts_template = "fts/task.html"
+        fts_source_fields = ("task_id", "title", "description", "checklist_items__title")
         export_template = "export/task.html"
 
         def get_default_serializer(*args, **kwargs):
@@ -1250,6 +1253,13 @@ class Meeting(
         verbose_name = _("Meeting")
         verbose_name_plural = _("Meetings")
         ordering = ["title", "date_time_start", "date_time_end", "text"]
+        constraints = [
+            # the GiST index of the constraint also backs the conflict queries of the resource booking validation
+            ExclusionConstraint(
+                name=RESOURCE_BOOKING_CONSTRAINT,
+                expressions=[("resource", RangeOperators.EQUAL), ("booking_range", RangeOperators.OVERLAPS)],
+            ),
+        ]
         permissions = (
             ("trash_meeting", "Can trash a meeting"),
             ("restore_meeting", "Can restore a meeting"),
@@ -1278,6 +1288,7 @@ class Meeting(
             ),
         )
         fts_template = "fts/meeting.html"
+        fts_source_fields = ("title", "text", "location")
         export_template = "export/meeting.html"
 
         def get_default_serializer(*args, **kwargs):
@@ -1317,6 +1328,14 @@ class Meeting(
         on_delete=models.CASCADE,
     )
 
+    # the booked time of the resource (only set for resource bookings that are not trashed, see get_booking_range)
+    booking_range = DateTimeRangeField(
+        verbose_name=_("Booked time of the resource"),
+        blank=True,
+        null=True,
+        editable=False,
+    )
+
     # reference to many projects (can be 0 projects, too)
     projects = models.ManyToManyField(
         "projects.Project",
@@ -1583,28 +1602,6 @@ class Meeting(
                     }
                 )
 
-    def validate_resource_booking_doesnt_exist_already(self):
-        """
-        Validates that the ResourceBooking doesn't already exist for the resource at this time
-        exclude if pk is the same to allow patching (editing)
-        filter only if the resource is the same
-        then look if times overlap
-        if entries exist raise ValidationError on the times
-        :return:
-        """
-        resource_booking_objects = (
-            Meeting.objects.exclude(pk=self.pk)
-            .exclude(deleted=True)
-            .filter(resource=self.resource)
-            .filter(date_time_start__lt=self.date_time_end)
-            .filter(date_time_end__gt=self.date_time_start)
-        )
-
-        if resource_booking_objects.exists():
-            raise ValidationError(
-                {"resource": ValidationError(_("This resource is already booked at this time"), code="invalid")}
-            )
-
     def validate_resource_booking_rule_minimum_duration(self):
         """
         Validates the booking rule for minimum duration if it exists
@@ -1854,138 +1851,175 @@ class Meeting(
                 }
             )
 
-    def validate_resource_booking_rule_time_between(self):
+    @staticmethod
+    def build_booking_range(date_time_start, date_time_end):
         """
-        Validates the booking rule for time between if it exists
-        raise ValidationError on the times
-        :return:
+        Builds the range [date_time_start, date_time_end) of a booking (bookings without a duration contain their start)
         """
-        try:
-            time_between = self.resource.booking_rule_time_between.duration
-        except AttributeError:
-            time_between = None
+        if date_time_end > date_time_start:
+            return DateTimeTZRange(date_time_start, date_time_end, "[)")
 
-        if not time_between:
-            return
+        return DateTimeTZRange(date_time_start, date_time_start, "[]")
 
-        q_not_enough_time_between = Q(
-            # Looks for bookings before the new booking that don't have enough time between
-            date_time_end__lte=self.date_time_start,
-            date_time_end__gt=self.date_time_start - time_between,
-        ) | Q(
-            # Looks for bookings after the new booking that don't have enough time between
-            date_time_start__gte=self.date_time_end,
-            date_time_start__lt=self.date_time_end + time_between,
-        )
+    def get_booking_range(self):
+        """
+        Returns the booked time of the resource, or None if the meeting does not book a resource (or is trashed)
+        """
+        if not self.resource_id or self.deleted or not self.date_time_start or not self.date_time_end:
+            return None
 
-        resource_booking_objects = (
-            Meeting.objects.exclude(pk=self.pk)
-            .exclude(deleted=True)
-            .filter(resource=self.resource)
-            .filter(q_not_enough_time_between)
-        )
+        if self.date_time_end < self.date_time_start:
+            return None
 
-        if resource_booking_objects.exists():
-            duration_str = get_duration_str(time_between)
-            raise ValidationError(
-                {
-                    "resource": ValidationError(
-                        _("This resource needs at least {duration_str} between bookings").format(
-                            duration_str=duration_str
-                        ),
-                        code="invalid",
-                    )
-                }
-            )
+        return self.build_booking_range(self.date_time_start, self.date_time_end)
 
     @staticmethod
-    def get_resource_booking_count_per_user(pk, resource, user, date_time_start, unit):
-        resource_booking_objects = 0
-
+    def get_booking_count_period(date_time_start, unit):
+        """
+        Returns the start (inclusive) and end (exclusive) of the day, week or month (in local time) of date_time_start
+        """
         date_time_start = localtime(date_time_start)
+        start_of_the_day = datetime(date_time_start.year, date_time_start.month, date_time_start.day)
 
         if unit == "DAY":
-            # calculate the start datetime of the day in relation to date_time_start
-            start_of_the_day = datetime(date_time_start.year, date_time_start.month, date_time_start.day)
-            # calculate the end datetime of the day in relation to date_time_start
-            end_of_the_day = start_of_the_day + timedelta(days=1) - timedelta(seconds=1)
-            # now get the objects that are relevant to the day of date_time_start
-            resource_booking_objects = (
-                Meeting.objects.exclude(pk=pk)
-                .exclude(deleted=True)
-                .filter(resource=resource)
-                .filter(created_by=user)
-                .filter(date_time_start__gte=start_of_the_day)
-                .filter(date_time_start__lte=end_of_the_day)
-            )
-
+            start, end = start_of_the_day, start_of_the_day + timedelta(days=1)
         elif unit == "WEEK":
-            # calculate the start datetime of the week in relation to date_time_start
-            start_of_the_week = date_time_start - timedelta(days=date_time_start.weekday())
-            start_of_the_week = datetime(start_of_the_week.year, start_of_the_week.month, start_of_the_week.day)
-            # calculate the end datetime of the week in relation to date_time_start
-            end_of_the_week = start_of_the_week + timedelta(days=7) - timedelta(seconds=1)
-            # now get the objects that are relevant to the week of date_time_start
-            resource_booking_objects = (
-                Meeting.objects.exclude(pk=pk)
-                .exclude(deleted=True)
-                .filter(resource=resource)
-                .filter(created_by=user)
-                .filter(date_time_start__gte=start_of_the_week)
-                .filter(date_time_start__lte=end_of_the_week)
-            )
-
+            start = start_of_the_day - timedelta(days=date_time_start.weekday())
+            end = start + timedelta(days=7)
         elif unit == "MONTH":
-            # calculate the start datetime of the month in relation to date_time_start
-            start_of_the_month = datetime(date_time_start.year, date_time_start.month, 1)
-            # calculate the end datetime of the month in relation to date_time_start
-            days_in_the_month = calendar.monthrange(date_time_start.year, date_time_start.month)[1]
-            end_of_the_month = start_of_the_month + timedelta(days=days_in_the_month) - timedelta(seconds=1)
-            # now get the objects that are relevant to the month of date_time_start
-            resource_booking_objects = (
-                Meeting.objects.exclude(pk=pk)
-                .exclude(deleted=True)
-                .filter(resource=resource)
-                .filter(created_by=user)
-                .filter(date_time_start__gte=start_of_the_month)
-                .filter(date_time_start__lte=end_of_the_month)
+            start = start_of_the_day.replace(day=1)
+            end = start + timedelta(days=calendar.monthrange(start.year, start.month)[1])
+        else:
+            return None
+
+        return make_aware(start), make_aware(end)
+
+    def get_resource_booking_conflicts(self, time_between=None, booking_count_periods=None):
+        """
+        Counts the existing bookings of the resource that conflict with this booking within a single query, which only
+        looks at the bookings around this booking (using the GiST index of the resource booking exclusion constraint)
+        :param time_between: the minimum time between bookings of the resource (or None)
+        :param booking_count_periods: dictionary of unit -> (start, end) of the periods bookings per user are counted in
+        :return: dictionary with the number of overlapping bookings ("overlapping"), bookings without enough time
+            between them and this booking ("time_between") and bookings of the current user per unit
+        """
+        booking_range = self.build_booking_range(self.date_time_start, self.date_time_end)
+        window_start, window_end = self.date_time_start, max(self.date_time_start, self.date_time_end)
+
+        aggregates = {
+            "overlapping": Count("pk", filter=Q(booked_range__overlap=booking_range)),
+        }
+
+        if time_between:
+            # bookings that end less than time_between before this booking or start less than time_between after it
+            aggregates["time_between"] = Count(
+                "pk",
+                filter=Q(booked_range__overlap=DateTimeTZRange(window_start - time_between, window_end + time_between))
+                & ~Q(booked_range__overlap=booking_range),
             )
+            window_start, window_end = window_start - time_between, window_end + time_between
 
-        return resource_booking_objects.count()
+        if booking_count_periods:
+            user = get_current_user()
 
-    def validate_resource_booking_rule_bookings_per_user(self):
+            for unit, (period_start, period_end) in booking_count_periods.items():
+                aggregates[unit] = Count(
+                    "pk",
+                    filter=Q(created_by=user, date_time_start__gte=period_start, date_time_start__lt=period_end),
+                )
+                window_start, window_end = min(window_start, period_start), max(window_end, period_end)
+
+        # bookings that already overlapped other bookings before the exclusion constraint was added have no booking
+        # range (see migration 0048_meeting_booking_range), their times are used instead
+        legacy_booking = Q(
+            booking_range__isnull=True,
+            deleted=False,
+            date_time_start__lte=window_end,
+            date_time_end__gte=window_start,
+        ) & Q(date_time_end__gte=F("date_time_start"))
+        booked_range = Case(
+            When(booking_range__isnull=False, then=F("booking_range")),
+            When(
+                date_time_end__gt=F("date_time_start"),
+                then=Func(F("date_time_start"), F("date_time_end"), Value("[)"), function="tstzrange"),
+            ),
+            default=Func(F("date_time_start"), F("date_time_end"), Value("[]"), function="tstzrange"),
+            output_field=DateTimeRangeField(),
+        )
+
+        # only bookings that are not trashed have a booking range, the window includes its end, so it is not empty for
+        # bookings without a duration
+        return (
+            Meeting.objects.exclude(pk=self.pk)
+            .filter(resource=self.resource)
+            .filter(Q(booking_range__overlap=DateTimeTZRange(window_start, window_end, "[]")) | legacy_booking)
+            .annotate(booked_range=booked_range)
+            .aggregate(**aggregates)
+        )
+
+    def validate_resource_booking(self):
         """
-        Validates the booking rule for bookings per user if it exists
-        raise ValidationError on the start time
+        Validates the resource booking against the existing bookings and the booking rules of the resource
+        All violated rules are collected and raised within a single ValidationError
         :return:
         """
+        errors = []
+
         try:
-            bookings_per_user_list = self.resource.booking_rule_bookings_per_user
+            time_between = self.resource.booking_rule_time_between.duration
         except AttributeError:
-            bookings_per_user_list = None
+            time_between = None
 
-        if not bookings_per_user_list:
-            return
+        bookings_per_user_list = []
+        booking_count_periods = {}
 
-        user = get_current_user()
-        bookings_per_user_list = bookings_per_user_list.all()
+        try:
+            bookings_per_user_list = list(self.resource.booking_rule_bookings_per_user.all())
+        except AttributeError:
+            pass
 
-        # check if there is a bookings_per_user_list, then iterate through the list to get
-        # the count and unit objects to compare with what already exists for this user
         for bookings_per_user in bookings_per_user_list:
             unit = bookings_per_user.unit.upper()
+            period = self.get_booking_count_period(self.date_time_start, unit)
+
+            if period:
+                booking_count_periods[unit] = period
 
-            db_count = self.get_resource_booking_count_per_user(
-                self.pk, self.resource, user, self.date_time_start, unit
+        conflicts = self.get_resource_booking_conflicts(time_between, booking_count_periods)
+
+        if conflicts["overlapping"]:
+            errors.append(ValidationError(_("This resource is already booked at this time"), code="invalid"))
+
+        for validate in (
+            self.validate_resource_booking_rule_minimum_duration,
+            self.validate_resource_booking_rule_maximum_duration,
+            self.validate_resource_booking_rule_bookable_hours,
+            self.validate_resource_booking_rule_minimum_time_before,
+            self.validate_resource_booking_rule_maximum_time_before,
+        ):
+            try:
+                validate()
+            except ValidationError as error:
+                errors.extend(error.error_dict["resource"])
+
+        if conflicts.get("time_between"):
+            duration_str = get_duration_str(time_between)
+            errors.append(
+                ValidationError(
+                    _("This resource needs at least {duration_str} between bookings").format(duration_str=duration_str),
+                    code="invalid",
+                )
             )
-            if db_count >= bookings_per_user.count:
+
+        for bookings_per_user in bookings_per_user_list:
+            unit = bookings_per_user.unit.upper()
+
+            if unit in booking_count_periods and conflicts[unit] >= bookings_per_user.count:
                 error = _(f"You have reached the maximum amount of bookings for this resource for this {unit.lower()}")
+                errors.append(ValidationError(error, code="invalid"))
 
-                raise ValidationError(
-                    {
-                        "resource": ValidationError(error, code="invalid"),
-                    }
-                )
+        if errors:
+            raise ValidationError({"resource": errors})
 
     def clean(self):
         """validate the meetings date_time"""
@@ -1993,14 +2027,26 @@ class Meeting(
         # if there is a resource in the data, lets validate if bookings are possible
         if self.resource:
             # self.validate_resource_booking_is_not_in_the_past()
-            self.validate_resource_booking_doesnt_exist_already()
-            self.validate_resource_booking_rule_minimum_duration()
-            self.validate_resource_booking_rule_maximum_duration()
-            self.validate_resource_booking_rule_bookable_hours()
-            self.validate_resource_booking_rule_minimum_time_before()
-            self.validate_resource_booking_rule_maximum_time_before()
-            self.validate_resource_booking_rule_time_between()
-            self.validate_resource_booking_rule_bookings_per_user()
+            self.validate_resource_booking()
+
+    def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
+        self.booking_range = self.get_booking_range()
+
+        if update_fields:
+            update_fields = set(update_fields) | {"booking_range"}
+
+        try:
+            # use a savepoint, so the surrounding transaction can still be used if the booking is rejected
+            with transaction.atomic(using=using):
+                super().save(force_insert, force_update, using, update_fields)
+        except IntegrityError as error:
+            # a concurrent booking of the resource at this time has been committed after this booking was validated
+            if RESOURCE_BOOKING_CONSTRAINT not in str(error):
+                raise
+
+            raise ValidationError(
+                {"resource": ValidationError(_("This resource is already booked at this time"), code="invalid")}
+            )
 
     def export_metadata(self):
         """Exports in the latest format"""
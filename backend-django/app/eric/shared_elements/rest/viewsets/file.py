@@ -3,6 +3,7 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 #
 import logging
+import os
 import uuid
 
 from django.core.files.uploadedfile import UploadedFile
@@ -13,6 +14,7 @@ from rest_framework.decorators import action
 from rest_framework.exceptions import APIException, NotFound
 
 from eric.core.rest.viewsets import DeletableViewSetMixIn, ExportableViewSetMixIn
+from eric.core.thumbnails import THUMBNAIL_SOURCE_MIME_TYPES, get_thumbnail_response
 from eric.core.utils import rfc5987_content_disposition
 from eric.dss.models import DSSContainer
 from eric.projects.models.exceptions import ContainerReadWriteException
@@ -118,10 +120,25 @@ class FileViewSet(
 
     @action(detail=True, methods=["GET"], url_path="download", url_name="download")
     def download(self, request, format=None, *args, **kwargs):
-        """Starts a download for the file."""
+        """
+        Starts a download for the file
+        Responds with a thumbnail (see eric.core.thumbnails) of an image if the "size" query parameter is set
+        """
 
         file_entry = self.get_file_entry(**kwargs)
 
+        if "size" in request.query_params:
+            # thumbnails are only available for images that are stored in the workbench (not in a DSS container)
+            if file_entry.mime_type not in THUMBNAIL_SOURCE_MIME_TYPES or file_entry.is_dss_file:
+                raise NotFound
+
+            return get_thumbnail_response(
+                request,
+                file_entry.path.name,
+                request.query_params["size"],
+                os.path.splitext(file_entry.original_filename)[0],
+            )
+
         file_path = file_entry.path.path
 
         # create a file response
@@ -26,6 +26,7 @@ from eric.core.rest.viewsets import (
 from eric.core.utils import convert_html_to_text
 from eric.jwt_auth.jwt_utils import build_jwt_url
 from eric.model_privileges.models import ModelPrivilege
+from eric.projects.models import Resource
 from eric.projects.rest.viewsets.base import (
     BaseAuthenticatedCreateUpdateWithoutProjectModelViewSet,
     LockableViewSetMixIn,
@@ -36,10 +37,23 @@ from eric.shared_elements.rest.serializers import MeetingSerializer
 from eric.shared_elements.rest.serializers.meeting import AnonymousResourceBookingSerializer
 
 
+class MeetingExportableViewSetMixIn(ExportableViewSetMixIn):
+    """
+    Exports meetings and resource bookings, including the attendees and the resource rendered by the export template
+    """
+
+    def get_export_related_data(self, obj):
+        return [
+            (obj.attending_users.all(), ()),
+            (obj.attending_contacts.viewable(), ("version_number",)),
+            (Resource.objects.filter(pk=obj.resource_id), ("name",)),
+        ]
+
+
 class MeetingViewSet(
     BaseAuthenticatedCreateUpdateWithoutProjectModelViewSet,
     DeletableViewSetMixIn,
-    ExportableViewSetMixIn,
+    MeetingExportableViewSetMixIn,
     LockableViewSetMixIn,
 ):
     serializer_class = MeetingSerializer
@@ -164,7 +178,7 @@ class MyMeetingViewSet(viewsets.ReadOnlyModelViewSet):
         return Meeting.objects.viewable().prefetch_common().prefetch_related("projects")
 
 
-class MyResourceBookingViewSet(BaseAuthenticatedModelViewSet, ExportableViewSetMixIn):
+class MyResourceBookingViewSet(BaseAuthenticatedModelViewSet, MeetingExportableViewSetMixIn):
     serializer_class = MeetingSerializer
     filterset_class = MeetingFilter
     search_fields = ()
@@ -272,7 +286,7 @@ class AllResourceBookingViewSet(BaseViewSetMixin, mixins.ListModelMixin, Generic
         return Response(full_info_meetings + limited_info_meetings)
 
 
-class EditorResourceBookingViewSet(BaseAuthenticatedModelViewSet, ExportableViewSetMixIn):
+class EditorResourceBookingViewSet(BaseAuthenticatedModelViewSet, MeetingExportableViewSetMixIn):
     serializer_class = MeetingSerializer
     filterset_class = MeetingFilter
     search_fields = ()
@@ -35,6 +35,13 @@ class TaskViewSet(
         """
         return Task.objects.viewable().prefetch_common().prefetch_related("projects")
 
+    def get_export_related_data(self, obj):
+        return [
+            (obj.assigned_users.all(), ()),
+            (obj.checklist_items.all(), ("title", "checked", "ordering")),
+            (obj.labels.all(), ("name", "color")),
+        ]
+
 
 class MyTaskViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = TaskSerializer
@@ -282,6 +282,30 @@ class TestGenericsFiles(APITestCase, EntityChangeRelatedProjectTestMixin, FileMi
 
         self.assertEqual(File.objects.all().count(), 3, msg="there should now be three files")
 
+    def test_thumbnail_of_file_that_is_not_an_image(self):
+        """
+        Tries to get a thumbnail of a file that has been uploaded with an image MIME type, but is not an image
+        """
+        file, response = self.create_file_orm(
+            self.token1, None, "Test Title", "Test Description", "notanimage.png", 1024, HTTP_USER_AGENT, REMOTE_ADDR
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(file.mime_type, "image/png")
+
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token1)
+
+        response = self.client.get(
+            f"/api/files/{file.file_entries.first().pk}/download/",
+            {"size": 256},
+            HTTP_USER_AGENT=HTTP_USER_AGENT,
+            REMOTE_ADDR=REMOTE_ADDR,
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        # the file itself can still be downloaded
+        response = self.rest_download_file(self.token1, file.file_entries.first().pk, HTTP_USER_AGENT, REMOTE_ADDR)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
     def test_create_file_with_unicode_characters(self):
         """
         Tries to create a file with unicode characters in the filename
@@ -326,7 +350,9 @@ class TestGenericsFiles(APITestCase, EntityChangeRelatedProjectTestMixin, FileMi
         response = self.rest_trash_file(self.token1, file.pk, HTTP_USER_AGENT, REMOTE_ADDR)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
-        response = self.rest_delete_file(self.superuser_token, file.pk, HTTP_USER_AGENT, REMOTE_ADDR)
+        # the file is deleted once the transaction is committed
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.rest_delete_file(self.superuser_token, file.pk, HTTP_USER_AGENT, REMOTE_ADDR)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
 
         # now the file should not exist anymore
@@ -6,6 +6,7 @@ import calendar
 import json
 import unittest
 from datetime import datetime
+from unittest import mock
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group, Permission
@@ -526,6 +527,156 @@ class ResourceBookingsTest(APITestCase, CommonTestMixin, AuthenticationMixin, Us
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(Meeting.objects.all().count(), 2, msg="There should be two resourcebookings")
 
+    def test_resourcebooking_returns_all_rule_violations(self):
+        ResourceBookingRuleMinimumDuration.objects.create(
+            duration="01:00:00",
+            resource=self.resource1,
+        )
+        ResourceBookingRuleTimeBetween.objects.create(
+            duration="02:00:00",
+            resource=self.resource1,
+        )
+
+        response = self.rest_create_resource_booking(
+            auth_token=self.token1,
+            title="Appointment",
+            date_time_start=self.date_time_start,
+            date_time_end=self.date_time_end_1_hour,
+            resource_pk=self.resource1.pk,
+            **HTTP_INFO,
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        # overlapping and too short (an overlapping booking is not reported as not enough time between as well)
+        response = self.rest_create_resource_booking(
+            auth_token=self.token1,
+            title="Appointment",
+            date_time_start=self.date_time_end_1_hour - timedelta(minutes=10),
+            date_time_end=self.date_time_end_1_hour + timedelta(minutes=10),
+            resource_pk=self.resource1.pk,
+            **HTTP_INFO,
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            json.loads(response.content.decode())["resource"],
+            [
+                "This resource is already booked at this time",
+                "This resource has a minimum booking duration of 1:00 hours",
+            ],
+        )
+
+        # too short and not enough time between
+        response = self.rest_create_resource_booking(
+            auth_token=self.token1,
+            title="Appointment",
+            date_time_start=self.date_time_end_1_hour + timedelta(hours=1),
+            date_time_end=self.date_time_end_1_hour + timedelta(hours=1, minutes=30),
+            resource_pk=self.resource1.pk,
+            **HTTP_INFO,
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            json.loads(response.content.decode())["resource"],
+            [
+                "This resource has a minimum booking duration of 1:00 hours",
+                "This resource needs at least 2:00 hours between bookings",
+            ],
+        )
+        self.assertEqual(Meeting.objects.all().count(), 1, msg="There should be one resourcebooking")
+
+    def test_resourcebooking_overlapping_bookings_are_rejected_by_the_database(self):
+        response = self.rest_create_resource_booking(
+            auth_token=self.token1,
+            title="Appointment",
+            date_time_start=self.date_time_start,
+            date_time_end=self.date_time_end_1_hour,
+            resource_pk=self.resource1.pk,
+            **HTTP_INFO,
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        meeting = Meeting.objects.get()
+        self.assertEqual(meeting.booking_range.lower, meeting.date_time_start)
+        self.assertEqual(meeting.booking_range.upper, meeting.date_time_end)
+
+        # a concurrent booking passes the validation, as it does not see the uncommitted booking
+        with mock.patch.object(Meeting, "validate_resource_booking"):
+            response = self.rest_create_resource_booking(
+                auth_token=self.token1,
+                title="Appointment",
+                date_time_start=self.date_time_start + timedelta(minutes=30),
+                date_time_end=self.date_time_end_2_hours,
+                resource_pk=self.resource1.pk,
+                **HTTP_INFO,
+            )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            json.loads(response.content.decode())["resource"][0],
+            "This resource is already booked at this time",
+        )
+        self.assertEqual(Meeting.objects.all().count(), 1, msg="There should be one resourcebooking")
+
+        # trashed bookings do not block the resource
+        response = self.rest_trash_meeting(self.token1, meeting.pk, **HTTP_INFO)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        meeting.refresh_from_db()
+        self.assertIsNone(meeting.booking_range)
+
+        response = self.rest_create_resource_booking(
+            auth_token=self.token1,
+            title="Appointment",
+            date_time_start=self.date_time_start + timedelta(minutes=30),
+            date_time_end=self.date_time_end_2_hours,
+            resource_pk=self.resource1.pk,
+            **HTTP_INFO,
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_resourcebooking_legacy_double_bookings_are_validated(self):
+        response = self.rest_create_resource_booking(
+            auth_token=self.token1,
+            title="Appointment",
+            date_time_start=self.date_time_start,
+            date_time_end=self.date_time_end_1_hour,
+            resource_pk=self.resource1.pk,
+            **HTTP_INFO,
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        # double bookings from before the exclusion constraint have no booking range (see migration 0048)
+        Meeting.objects.update(booking_range=None)
+
+        response = self.rest_create_resource_booking(
+            auth_token=self.token1,
+            title="Appointment",
+            date_time_start=self.date_time_start + timedelta(minutes=30),
+            date_time_end=self.date_time_end_2_hours,
+            resource_pk=self.resource1.pk,
+            **HTTP_INFO,
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            json.loads(response.content.decode())["resource"],
+            ["This resource is already booked at this time"],
+        )
+
+    def test_resourcebooking_without_duration_conflicts_with_overlapping_booking(self):
+        response = self.rest_create_resource_booking(
+            auth_token=self.token1,
+            title="Appointment",
+            date_time_start=self.date_time_start,
+            date_time_end=self.date_time_end_1_hour,
+            resource_pk=self.resource1.pk,
+            **HTTP_INFO,
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        booking = Meeting(
+            resource=self.resource1, date_time_start=self.date_time_start, date_time_end=self.date_time_start
+        )
+        self.assertEqual(booking.get_resource_booking_conflicts()["overlapping"], 1)
+
     def test_resourcebooking_validate_booking_rule_bookings_per_user(self):
         ResourceBookingRuleBookingsPerUser.objects.create(
             count=2,
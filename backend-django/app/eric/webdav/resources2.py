@@ -2,19 +2,23 @@
 # Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
 # SPDX-License-Identifier: AGPL-3.0-or-later
 #
+import hmac
 import os
 import re
 import shutil
+import threading
+from collections import OrderedDict, defaultdict
 from hashlib import sha256
 from mimetypes import guess_type
+from time import monotonic
 from urllib.parse import quote
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.contrib.auth.hashers import make_password
 from django.core.cache import cache
-from django.core.files.uploadedfile import SimpleUploadedFile, UploadedFile
+from django.core.files.uploadedfile import TemporaryUploadedFile, UploadedFile
 from django.db import transaction
+from django.db.models import BigIntegerField, BooleanField, F, Sum, Value
 from django.http import Http404, HttpResponseBadRequest
 from django.utils.decorators import method_decorator
 from django.utils.encoding import force_bytes
@@ -26,16 +30,71 @@ from rest_framework.authentication import BasicAuthentication, SessionAuthentica
 from django_userforeignkey.request import get_current_request
 
 from eric.drives.models import Directory, Drive
-from eric.projects.models import Project
+from eric.drives.models.cache import get_directory_path_index
+from eric.projects.models import (
+    MaxFileSizeReachedException,
+    Project,
+    UserStorageLimitReachedException,
+    UserUploadLimit,
+)
 from eric.shared_elements.models import File
+from eric.webdav.wsgidav_base_resources import BaseDavResource
 from eric.webdav.wsgidav_db_resources import BaseDBDavResource, NameLookupDBDavMixIn
 from eric.webdav.wsgidav_resources import MetaEtagMixIn
-from eric.webdav.wsgidav_responses import ResponseException
+from eric.webdav.wsgidav_responses import HttpResponseInsufficientStorage, ResponseException
 from eric.webdav.wsgidav_rest import RestAuthViewMixIn
+from eric.webdav.wsgidav_utils import url_join
 from eric.webdav.wsgidav_views import DavView
 
 User = get_user_model()
 
+# number of bytes that are read from the request at once when a file is uploaded
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class LocalAuthenticationCache:
+    """
+    A small thread-safe in-process LRU cache with expiring entries, which is used in front of the shared cache
+    """
+
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key, None)
+
+            if entry is None:
+                return None
+
+            value, expires_at = entry
+
+            if expires_at < monotonic():
+                del self.entries[key]
+                return None
+
+            self.entries.move_to_end(key)
+
+            return value
+
+    def set(self, key, value):
+        if self.max_size <= 0 or self.timeout <= 0:
+            return
+
+        with self.lock:
+            self.entries[key] = (value, monotonic() + self.timeout)
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
 
 class CachedBasicAuthentication(BasicAuthentication):
     """
@@ -53,44 +112,61 @@ class CachedBasicAuthentication(BasicAuthentication):
     server (e.g., redis) somehow exposes this information (misconfiguration, etc...). To counteract this, the
     authorization string is scrambled.
 
-    Scrambling the authentication string uses Djangos built in ``make_password`` function. This is usually a very
-    strong password derivation function, and we don't need to worry about this function at all (if this function
-    ever becomes insecure, we will have a much bigger issue...). In addition, we are using a combination of the
-    applications secret key
+    Scrambling the authentication string uses a HMAC-SHA256 keyed with the applications secret key. Without the
+    secret key, the cache keys can neither be reversed nor brute forced, and in contrast to a password derivation
+    function (like ``make_password``) computing them is cheap enough to be done on every request.
+
+    The cache stores the pk of the authenticated user. A small in-process LRU cache is used in front of the shared
+    cache, so most requests of a client (e.g., PROPFIND requests of a file explorer) do not need a cache round trip.
     """
 
     CACHED_BASIC_AUTHENTICATION_CACHE_KEY = "basic_auth_cache"
 
+    local_cache = LocalAuthenticationCache(
+        max_size=settings.WEBDAV_AUTH_LOCAL_CACHE_SIZE,
+        timeout=settings.WEBDAV_AUTH_LOCAL_CACHE_TIMEOUT,
+    )
+
     @staticmethod
-    def check_if_key_is_in_cache(key):
-        return cache.get(f"{CachedBasicAuthentication.CACHED_BASIC_AUTHENTICATION_CACHE_KEY}:{key}", None) is not None
+    def get_user_pk_from_cache(key):
+        user_pk = CachedBasicAuthentication.local_cache.get(key)
+
+        if user_pk is None:
+            user_pk = cache.get(f"{CachedBasicAuthentication.CACHED_BASIC_AUTHENTICATION_CACHE_KEY}:{key}", None)
+
+            if user_pk is not None:
+                CachedBasicAuthentication.local_cache.set(key, user_pk)
+
+        return user_pk
 
     @staticmethod
-    def add_key_to_cache(key):
+    def add_key_to_cache(key, user_pk):
         """
-        Adds the key to the cache for 600 seconds
+        Adds the key with the pk of the authenticated user to the cache for WEBDAV_AUTH_CACHE_TIMEOUT seconds
         :param key:
+        :param user_pk:
         :return:
         """
-        cache.set(f"{CachedBasicAuthentication.CACHED_BASIC_AUTHENTICATION_CACHE_KEY}:{key}", "", 600)
+        cache.set(
+            f"{CachedBasicAuthentication.CACHED_BASIC_AUTHENTICATION_CACHE_KEY}:{key}",
+            user_pk,
+            settings.WEBDAV_AUTH_CACHE_TIMEOUT,
+        )
+        CachedBasicAuthentication.local_cache.set(key, user_pk)
 
     @staticmethod
     def scramble_auth_string(auth_str, userid):
         """
-        Scrambles the authentication string using djangos built-in make password function
+        Scrambles the authentication string using a HMAC-SHA256 keyed with the secret key
         This is required in order to prevent storing of the actual authentication string (Base64 username+password) in
         memory
         :param auth_str:
         :param userid:
         :return:
         """
-        # create a reproducable salt by hashing the secret key and the userid (secret key is used as a salt for the
-        # hash here)
-        user_id_hash = sha256(force_bytes(settings.SECRET_KEY) + userid.encode()).hexdigest()[0:8]
-
-        # using djangos make_password function (uses PBKDF or similar ), hash the authentication string
-        # (we dont want to store the raw Base64 password/username in memory...)
-        return make_password(auth_str, salt=user_id_hash)
+        return hmac.new(
+            force_bytes(settings.SECRET_KEY), force_bytes(userid) + b":" + force_bytes(auth_str), sha256
+        ).hexdigest()
 
     def authenticate_credentials(self, userid, password, request=None):
         """
@@ -102,21 +178,25 @@ class CachedBasicAuthentication(BasicAuthentication):
         :param request:
         :return:
         """
-        key = self.scramble_auth_string(get_authorization_header(request).split()[0], userid)
+        # the authorization header consists of the keyword "Basic" and the Base64 encoded credentials
+        key = self.scramble_auth_string(get_authorization_header(request).split()[1], userid)
 
         # check if the user has recently authed with this key
-        if self.check_if_key_is_in_cache(key):
-            # found the key in cache -> get user by userid
-            user = User.objects.get(username=userid)
+        user_pk = self.get_user_pk_from_cache(key)
 
-            return (user, None)
+        if user_pk is not None:
+            # found the key in cache -> get user by pk
+            user = User.objects.filter(pk=user_pk, is_active=True).first()
+
+            if user:
+                return (user, None)
 
         # else: handle auth
         user, resp = super().authenticate_credentials(userid, password, request)
 
         if user:
             # auth successful, add this key to cache
-            self.add_key_to_cache(key)
+            self.add_key_to_cache(key, user.pk)
 
         return user, resp
 
@@ -267,6 +347,46 @@ class MyDriveListResource(MetaEtagMixIn, BaseDBDavResource):
         return False
 
 
+class DriveListingDavResource(MetaEtagMixIn, BaseDavResource):
+    """
+    Read-only WebDav Resource of a directory or file within a drive listing, which only holds the values that are
+    needed to answer a PROPFIND request
+    """
+
+    def __init__(self, path, is_collection, size, created, modified):
+        self.collection = is_collection
+        self.size = size
+        self.created = created
+        self.modified = modified
+
+        super().__init__(path)
+
+    @property
+    def getcontentlength(self):
+        return self.size
+
+    def get_created(self):
+        return self.created
+
+    def get_modified(self):
+        return self.modified
+
+    @property
+    def is_collection(self):
+        return self.collection
+
+    @property
+    def is_object(self):
+        return not self.collection
+
+    @property
+    def exists(self):
+        return True
+
+    def get_children(self):
+        return []
+
+
 class MyDriveDavResource(MetaEtagMixIn, NameLookupDBDavMixIn, BaseDBDavResource):
     """
     WebDav Resource for a specific drive
@@ -293,9 +413,115 @@ class MyDriveDavResource(MetaEtagMixIn, NameLookupDBDavMixIn, BaseDBDavResource)
         super().__init__(path, **kwargs)
 
     def get_model_by_path(self, model_attr, path):
-        path = ["/"] + path
+        """
+        Resolves the path using the cached directory path index of the drive, so only a single query by pk (for
+        collections) or by parent directory and name (for objects) is needed
+        """
+        request = get_current_request()
+        directory_path_index = get_directory_path_index(request.drive.pk)
+
+        if model_attr == "collection":
+            directory_pk = directory_path_index.get(tuple(path), None)
+            qs = self.collection_model_qs.filter(pk=directory_pk)
+        else:
+            directory_pk = directory_path_index.get(tuple(path[:-1]), None)
+            qs = self.object_model_qs.filter(**{self.collection_attribute: directory_pk, self.name_attribute: path[-1]})
+
+        if directory_pk is None:
+            raise qs.model.DoesNotExist()
+
+        obj = qs.first()
+
+        if obj is None:
+            raise qs.model.DoesNotExist()
+
+        return obj
+
+    def get_descendants(self, depth=1, include_self=True):
+        """
+        Lists the direct children of a directory (PROPFIND with depth 1) with a single query
+        Other depths use the recursive default implementation
+        """
+        if depth != 1 or not self.exists or not self.is_collection:
+            yield from super().get_descendants(depth=depth, include_self=include_self)
+            return
+
+        if include_self:
+            yield self
+
+        yield from self.get_listing()
 
-        return super().get_model_by_path(model_attr, path)
+    def get_listing(self):
+        """
+        Returns read-only resources for all sub directories and files of this directory, which are loaded with a single
+        UNION ALL query (plus a single query for the sizes of the sub directories)
+        """
+        fields = ("pk", self.name_attribute, self.created_attribute, self.modified_attribute, "size", "is_directory")
+
+        directories = self.collection_model_qs.filter(**{self.collection_attribute: self.obj}).annotate(
+            size=Value(0, output_field=BigIntegerField()),
+            is_directory=Value(True, output_field=BooleanField()),
+        )
+        files = self.object_model_qs.filter(**{self.collection_attribute: self.obj}).annotate(
+            size=F(self.size_attribute),
+            is_directory=Value(False, output_field=BooleanField()),
+        )
+
+        entries = list(
+            directories.prefetch_related(None)
+            .order_by()
+            .values(*fields)
+            .union(files.prefetch_related(None).order_by().values(*fields), all=True)
+            .order_by("-is_directory", self.name_attribute)
+        )
+
+        directory_sizes = self.get_sub_directory_sizes()
+
+        for entry in entries:
+            yield DriveListingDavResource(
+                url_join(*(self.path + [entry[self.name_attribute]])),
+                is_collection=entry["is_directory"],
+                size=directory_sizes.get(entry["pk"], 0) if entry["is_directory"] else entry["size"],
+                created=entry[self.created_attribute],
+                modified=entry[self.modified_attribute],
+            )
+
+    def get_sub_directory_sizes(self):
+        """
+        Returns the size of all files within each sub directory of this directory (including nested directories),
+        using the cached directory path index of the drive and a single aggregate query
+        :return: a dict of sub directory pk to size
+        """
+        request = get_current_request()
+        directory_path_index = get_directory_path_index(request.drive.pk)
+
+        path = tuple(self.path)
+        depth = len(path)
+
+        # maps the pks of all nested directories to the pk of the sub directory they are in
+        sub_directory_pks = {}
+
+        for directory_path, directory_pk in directory_path_index.items():
+            if len(directory_path) > depth and directory_path[:depth] == path:
+                sub_directory_pks[directory_pk] = directory_path_index[directory_path[: depth + 1]]
+
+        if not sub_directory_pks:
+            return {}
+
+        sizes = (
+            File.objects.filter(directory_id__in=list(sub_directory_pks.keys()))
+            .order_by()
+            .values("directory_id")
+            .annotate(size=Sum("file_size"))
+            .values_list("directory_id", "size")
+        )
+
+        directory_sizes = defaultdict(int)
+
+        for directory_pk, size in sizes:
+            directory_sizes[sub_directory_pks[directory_pk]] += size or 0
+
+        return directory_sizes
 
     @property
     def collection_model_qs(self):
@@ -337,6 +563,18 @@ class MyDriveDavResource(MetaEtagMixIn, NameLookupDBDavMixIn, BaseDBDavResource)
             # create a new object within the drive
             self.obj = self.object_model()
 
+        parent = self.get_parent().obj
+
+        # do not allow users to store files without a parent directory (e.g., in the drive root)
+        if not parent:
+            raise ResponseException(HttpResponseBadRequest(_("Please use a sub directory")))
+
+        # when a new file is created, wait for it to have a proper name before the upload
+        if self.displayname.startswith("~ew") and self.displayname.endswith(".tmp"):
+            raise ResponseException(HttpResponseBadRequest(_("Not uploading until the file is named")))
+
+        content_type = guess_type(self.displayname)[0] or "application/octet-stream"
+
         # check if temp_file is set by nginx
         if temp_file:
             # file has already been created by nginx, process it
@@ -352,21 +590,11 @@ class MyDriveDavResource(MetaEtagMixIn, NameLookupDBDavMixIn, BaseDBDavResource)
                 file=open(new_file_path, "rb"),
                 name=self.displayname,
                 size=size,
-                content_type=guess_type(self.displayname)[0] or "application/octet-stream",
+                content_type=content_type,
             )
         else:
-            # file is being submitted in body/memory
-            some_file = SimpleUploadedFile(
-                name=self.displayname,
-                content=request.body,
-                content_type=guess_type(self.displayname)[0] or "application/octet-stream",
-            )
-
-        parent = self.get_parent().obj
-
-        # do not allow users to store files without a parent directory (e.g., in the drive root)
-        if not parent:
-            raise ResponseException(HttpResponseBadRequest(_("Please use a sub directory")))
+            # file is being submitted in the body, stream it into a temporary file
+            some_file = self.receive_file(request, content_type)
 
         # set name
         setattr(self.obj, self.name_attribute, self.displayname)
@@ -375,14 +603,63 @@ class MyDriveDavResource(MetaEtagMixIn, NameLookupDBDavMixIn, BaseDBDavResource)
 
         self.obj.path = some_file
 
-        # when a new file is created, wait for it to have a proper name before the upload
-        if self.displayname.startswith("~ew") and self.displayname.endswith(".tmp"):
-            raise ResponseException(HttpResponseBadRequest(_("Not uploading until the file is named")))
-
         self.obj.save()
         if self.obj.__class__.__name__ == "File":
             self.obj.lock(webdav=True)
 
+    def receive_file(self, request, content_type):
+        """
+        Streams the request body in chunks into a temporary file (which is moved into the storage when the file is
+        saved), so uploads are never held in memory. The upload limits of the user are checked while the bytes arrive,
+        and the size and the SHA-256 checksum (available as ``sha256``) are calculated on the fly.
+        :param request:
+        :param content_type:
+        :return: TemporaryUploadedFile
+        """
+        try:
+            content_length = int(request.META.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            content_length = 0
+
+        try:
+            upload_limit = UserUploadLimit(request.user)
+            upload_limit.check(content_length)
+
+            uploaded_file = TemporaryUploadedFile(self.displayname, content_type, 0, None)
+            checksum = sha256()
+            size = 0
+
+            try:
+                while True:
+                    chunk = request.read(UPLOAD_CHUNK_SIZE)
+
+                    if not chunk:
+                        break
+
+                    size += len(chunk)
+                    upload_limit.check(size)
+
+                    checksum.update(chunk)
+                    uploaded_file.write(chunk)
+            except Exception:
+                # closing the temporary file deletes it
+                uploaded_file.close()
+                raise
+        except MaxFileSizeReachedException as exception:
+            raise ResponseException(
+                HttpResponseInsufficientStorage(
+                    _("Max file size of %(max_file_size)s reached") % {"max_file_size": exception.max_file_size}
+                )
+            )
+        except UserStorageLimitReachedException:
+            raise ResponseException(HttpResponseInsufficientStorage(_("User storage limit reached")))
+
+        uploaded_file.seek(0)
+        uploaded_file.size = size
+        uploaded_file.sha256 = checksum.hexdigest()
+
+        return uploaded_file
+
     # override this method to make sure we are creating the collection within a drive
     def create_collection_in_db(self, parent, name):
         """
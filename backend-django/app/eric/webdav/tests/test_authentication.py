@@ -0,0 +1,69 @@
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+import base64
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+
+from rest_framework.authentication import BasicAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from eric.webdav.resources2 import CachedBasicAuthentication
+
+User = get_user_model()
+
+
+class CachedBasicAuthenticationTest(TestCase):
+    """Testing of the cached basic authentication of the WebDAV endpoints"""
+
+    def setUp(self):
+        self.user1 = User.objects.create_user(username="student_1", email="student_1@email.com", password="top_secret")
+        self.user2 = User.objects.create_user(username="student_2", email="student_2@email.com", password="foobar")
+
+        cache.clear()
+        CachedBasicAuthentication.local_cache.clear()
+        self.addCleanup(CachedBasicAuthentication.local_cache.clear)
+
+        self.authentication = CachedBasicAuthentication()
+
+    def authenticate(self, username, password):
+        credentials = base64.b64encode(f"{username}:{password}".encode()).decode()
+        request = RequestFactory().get("/webdav/", HTTP_AUTHORIZATION=f"Basic {credentials}")
+
+        return self.authentication.authenticate(request)[0]
+
+    def test_users_never_share_a_cache_entry(self):
+        self.assertEqual(self.authenticate("student_1", "top_secret"), self.user1)
+        self.assertEqual(self.authenticate("student_2", "foobar"), self.user2)
+
+        # every set of credentials has its own cache entry
+        self.assertEqual(len(CachedBasicAuthentication.local_cache.entries), 2)
+
+        # both users are authenticated from the cache, each as themselves
+        with mock.patch.object(BasicAuthentication, "authenticate_credentials") as authenticate_credentials:
+            self.assertEqual(self.authenticate("student_1", "top_secret"), self.user1)
+            self.assertEqual(self.authenticate("student_2", "foobar"), self.user2)
+
+        authenticate_credentials.assert_not_called()
+
+        # the same password with another username does not match the cache entry of the other user
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate("student_2", "top_secret")
+
+    def test_wrong_password_is_not_accepted_from_cache(self):
+        self.assertEqual(self.authenticate("student_1", "top_secret"), self.user1)
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate("student_1", "wrong_password")
+
+        # neither when the entry has expired from the local cache and is only found in the shared cache
+        CachedBasicAuthentication.local_cache.clear()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate("student_1", "wrong_password")
+
+        self.assertEqual(self.authenticate("student_1", "top_secret"), self.user1)
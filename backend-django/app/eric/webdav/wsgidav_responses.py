@@ -53,3 +53,7 @@ class HttpResponseLocked(HttpResponse):
 
 class HttpResponseUnAuthorized(HttpResponse):
     status_code = httplib.UNAUTHORIZED
+
+
+class HttpResponseInsufficientStorage(HttpResponse):
+    status_code = httplib.INSUFFICIENT_STORAGE
@@ -7,6 +7,8 @@ from django.test import RequestFactory
 from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.settings import api_settings
 
+from channels.db import database_sync_to_async
+
 authenticators = [auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
 
 
@@ -47,3 +49,10 @@ def fake_rest_auth(auth_token, scope, *args, **kwargs):
                 break
 
     return user, auth, request
+
+
+async def fake_rest_auth_async(auth_token, scope, *args, **kwargs):
+    """
+    Asynchronous variant of fake_rest_auth for async consumers, the authenticators are run in a worker thread
+    """
+    return await database_sync_to_async(fake_rest_auth)(auth_token, scope, *args, **kwargs)
@@ -6,12 +6,13 @@ import abc
 import json
 
 from asgiref.sync import async_to_sync
-from channels.generic.websocket import JsonWebsocketConsumer
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer, JsonWebsocketConsumer
 from django_userforeignkey.request import get_current_request, get_current_user, set_current_request
 
 from eric.core.models.abstract import get_all_workbench_models
 from eric.search.models import FTSMixin
-from eric.websockets.authentication import fake_rest_auth
+from eric.websockets.authentication import fake_rest_auth, fake_rest_auth_async
 
 
 class AuthenticatedWorkbenchJsonWebsocketConsumer(JsonWebsocketConsumer):
@@ -73,6 +74,74 @@ class AuthenticatedWorkbenchJsonWebsocketConsumer(JsonWebsocketConsumer):
         pass
 
 
+class AuthenticatedWorkbenchAsyncJsonWebsocketConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Abstract asynchronous Workbench Websocket Consumer that handles authentication
+
+    Idle connections do not occupy a thread of the worker. Everything that needs the database (or the current user)
+    has to be run via `run_in_request_context`.
+    """
+
+    async def connect(self, **kwargs):
+        raise NotImplementedError()
+
+    async def disconnect(self, code):
+        raise NotImplementedError()
+
+    async def receive_json(self, content, **kwargs):
+        # all authenticated messages need to be forwarded to the receive_json_authenticated method
+        if "is_authenticated" in self.scope and self.scope["is_authenticated"]:
+            return await self.receive_json_authenticated(content, **kwargs)
+
+        # check for auth requests
+        if "authorization" in content:
+            self.scope["is_authenticated"] = False
+            # check auth
+            auth_token = content["authorization"]
+
+            # fake the auth request
+            user, auth, request = await fake_rest_auth_async(auth_token, self.scope)
+
+            self.scope["request"] = request
+            self.scope["user"] = user
+
+            if user and not user.is_anonymous:
+                self.scope["is_authenticated"] = True
+                await self.authentication_success(user)
+                # send auth_success
+                await self.send_json({"auth_success": True})
+
+            return
+
+        # else: got unauthorized message
+        print("Got an unauthorized message")
+        print(content)
+
+    async def run_in_request_context(self, func, *args, **kwargs):
+        """
+        Runs a synchronous function (e.g., one that accesses the database) in a worker thread
+        The request of this websocket is set as current request, so we can rely on the get_current_user() method
+        """
+        return await database_sync_to_async(self._call_with_current_request)(func, *args, **kwargs)
+
+    def _call_with_current_request(self, func, *args, **kwargs):
+        set_current_request(self.scope.get("request"))
+        return func(*args, **kwargs)
+
+    async def authentication_success(self, user):
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def receive_json_authenticated(self, content, **kwargs):
+        """
+        Called when json data is sent after authentication
+        :param content: object constructed from json
+        :param kwargs:
+        :return:
+        """
+        pass
+
+
 class GenericWorkbenchElementConsumer(AuthenticatedWorkbenchJsonWebsocketConsumer):
     """
     A generic consumer for workbench elements, which selects the workbench element based on the URL params. The
@@ -4,21 +4,19 @@
 #
 import logging
 
-from django.db import transaction
 from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
-
 from eric.kanban_boards.models import KanbanBoard, KanbanBoardColumn, KanbanBoardColumnTaskAssignment
 from eric.labbooks.models import LabBook, LabBookChildElement, LabbookSection
+from eric.labbooks.signals import labbook_child_elements_bulk_updated
 from eric.pictures.models import Picture
 from eric.plugins.models import PluginInstance
 from eric.projects.models import ElementLock
 from eric.relations.models import Relation
 from eric.search.models import FTSMixin
 from eric.shared_elements.models import File, Note
+from eric.websockets.events import get_element_group_name, send_to_group_on_commit
 
 logger = logging.Logger(__name__)
 
@@ -27,6 +25,7 @@ logger = logging.Logger(__name__)
 def propagate_workbench_element_changes_via_websocket(sender, instance, created, *args, **kwargs):
     """
     Everytime a workbench element is changed, we notify the channel group about the change
+    Several changes of the same element within one transaction are sent as a single event with the latest version
     :param sender:
     :param instance:
     :param created:
@@ -42,96 +41,51 @@ def propagate_workbench_element_changes_via_websocket(sender, instance, created,
         # must inherit from FTSMixin
         return
 
-    # get current channel
-    channel_layer = get_channel_layer()
-
-    # check if channel layer is available (e.g., in unit tests this is not available)
-    if channel_layer:
-        model_name = instance.__class__.__name__.lower()
-
-        room_group_name = f"elements_{model_name}_{instance.pk}"
-
-        # notify this channel that this element has changed, and provide the latest version number of the element
-        transaction.on_commit(
-            lambda: async_to_sync(channel_layer.group_send)(
-                room_group_name,
-                {
-                    "type": "element_changed",
-                    "message": {
-                        "model_name": model_name,
-                        "model_pk": str(instance.pk),
-                        "version": instance.version_number,
-                    },
-                },
-            )
-        )
-    else:
-        print("propagate_workbench_element_changes_via_websocket: Channel Layer is not available, not sending...")
+    model_name = instance.__class__.__name__.lower()
+
+    # notify this channel that this element has changed, and provide the latest version number of the element
+    send_to_group_on_commit(
+        get_element_group_name(model_name, instance.pk),
+        {
+            "type": "element_changed",
+            "message": {
+                "model_name": model_name,
+                "model_pk": str(instance.pk),
+                "version": instance.version_number,
+            },
+        },
+    )
 
 
-@receiver(post_save, sender=ElementLock)
-def propagate_workbench_element_lock_changed_via_websocket(instance, *args, **kwargs):
-    # get current channel
-    channel_layer = get_channel_layer()
+def send_element_lock_changed(element, locked):
+    model_name = element.__class__.__name__.lower()
 
-    element = instance.content_object
+    send_to_group_on_commit(
+        get_element_group_name(model_name, element.pk),
+        {
+            "type": "element_lock_changed",
+            "message": {
+                "locked": locked,
+                "model_name": model_name,
+                "model_pk": str(element.pk),
+            },
+        },
+    )
 
-    # check if channel layer is available (e.g., in unit tests this is not available)
-    if channel_layer:
-        model_name = element.__class__.__name__.lower()
-
-        room_group_name = f"elements_{model_name}_{element.pk}"
-
-        # notify this channel that this element has been locked
-        transaction.on_commit(
-            lambda: async_to_sync(channel_layer.group_send)(
-                room_group_name,
-                {
-                    "type": "element_lock_changed",
-                    "message": {
-                        "locked": True,
-                        "model_name": model_name,
-                        "model_pk": str(element.pk),
-                    },
-                },
-            )
-        )
-    else:
-        print("propagate_workbench_element_lock_changed_via_websocket: Channel Layer is not available, not sending...")
+
+@receiver(post_save, sender=ElementLock)
+def propagate_workbench_element_lock_changed_via_websocket(instance, *args, **kwargs):
+    # notify this channel that this element has been locked
+    send_element_lock_changed(instance.content_object, locked=True)
 
 
 @receiver(post_delete, sender=ElementLock)
 def propagate_workbench_element_lock_deleted_via_websocket(instance, *args, **kwargs):
-    # print("In @post_delete: An ElementLock was deleted: {}".format(instance.pk))
-
-    # get current channel
-    channel_layer = get_channel_layer()
     element = instance.content_object
 
-    # check if channel layer is available (e.g., in unit tests this is not available)
-    if channel_layer and element:
-        model_name = element.__class__.__name__.lower()
-
-        room_group_name = f"elements_{model_name}_{element.pk}"
-
-        print(f"Sending a notification that an element lock has been removed to {room_group_name}")
-
+    if element:
         # notify this channel that this element has been unlocked
-        transaction.on_commit(
-            lambda: async_to_sync(channel_layer.group_send)(
-                room_group_name,
-                {
-                    "type": "element_lock_changed",
-                    "message": {
-                        "locked": False,
-                        "model_name": model_name,
-                        "model_pk": str(element.pk),
-                    },
-                },
-            )
-        )
-    else:
-        print("propagate_workbench_element_lock_deleted_via_websocket: Channel Layer is not available, not sending...")
+        send_element_lock_changed(element, locked=False)
 
 
 @receiver(post_save, sender=Relation)
@@ -142,46 +96,35 @@ def propagate_workbench_relations_changes_via_websocket(instance, *args, **kwarg
     :param kwargs:
     :return:
     """
-    print("In @post_save of Relations: a relation was created/modified")
-
-    # get current channel
-    channel_layer = get_channel_layer()
-
-    # check if channel layer is available (e.g., in unit tests this is not available)
-    if channel_layer:
-        # construct room group names for both elements within the relation
-        left_model_name = instance.left_content_type.model_class().__name__.lower()
-        left_pk = instance.left_object_id
-        left_room_group_name = f"elements_{left_model_name}_{left_pk}"
-
-        right_model_name = instance.right_content_type.model_class().__name__.lower()
-        right_pk = instance.right_object_id
-        right_room_group_name = "elements_{model_name}_{model_pk}".format(
-            model_name=right_model_name, model_pk=right_pk
+    # notify the channels of both elements within the relation about the change
+    for content_type, object_id in (
+        (instance.left_content_type, instance.left_object_id),
+        (instance.right_content_type, instance.right_object_id),
+    ):
+        model_name = content_type.model_class().__name__.lower()
+
+        send_to_group_on_commit(
+            get_element_group_name(model_name, object_id),
+            {"type": "element_relations_changed", "message": {"model_name": model_name, "model_pk": str(object_id)}},
         )
 
-        print(
-            "Sending a notification for a new relation for {} and {}".format(
-                left_room_group_name, right_room_group_name
-            )
-        )
 
-        # notify both channels about the change
-        async_to_sync(channel_layer.group_send)(
-            left_room_group_name,
-            {"type": "element_relations_changed", "message": {"model_name": left_model_name, "model_pk": str(left_pk)}},
-        )
+def send_kanbanboard_task_assignment_event(event_type, assignment):
+    model_name = KanbanBoard.__name__.lower()
+    kanban_board_pk = assignment.kanban_board_column.kanban_board.pk
 
-        async_to_sync(channel_layer.group_send)(
-            right_room_group_name,
-            {
-                "type": "element_relations_changed",
-                "message": {"model_name": right_model_name, "model_pk": str(right_pk)},
+    send_to_group_on_commit(
+        get_element_group_name(model_name, kanban_board_pk),
+        {
+            "type": event_type,
+            "message": {
+                "model_name": model_name,
+                "model_pk": str(kanban_board_pk),
+                "id": str(assignment.pk),
+                "task_id": str(assignment.task.pk),
             },
-        )
-
-    else:
-        print("propagate_workbench_relations_changes_via_websocket: Channel Layer is not available, not sending...")
+        },
+    )
 
 
 @receiver(post_save, sender=KanbanBoardColumnTaskAssignment)
@@ -192,36 +135,7 @@ def kanbanboard_column_task_assignment_changed(instance, *args, **kwargs):
     :param kwargs:
     :return:
     """
-    print("In @post_save of KanbanBoardColumnTaskAssignment: an assignment has changed")
-
-    # get current channel
-    channel_layer = get_channel_layer()
-
-    # check if channel layer is available (e.g., in unit tests this is not available)
-    if channel_layer:
-        model_name = KanbanBoard.__name__.lower()
-
-        room_group_name = "elements_{model_name}_{model_pk}".format(
-            model_name=model_name, model_pk=instance.kanban_board_column.kanban_board.pk
-        )
-
-        print(f"Sending a notification that an assignment has changed to {room_group_name}")
-
-        # notify this channel that this element has changed
-        async_to_sync(channel_layer.group_send)(
-            room_group_name,
-            {
-                "type": "kanbanboard_task_assignment_changed",
-                "message": {
-                    "model_name": model_name,
-                    "model_pk": str(instance.kanban_board_column.kanban_board.pk),
-                    "id": str(instance.pk),
-                    "task_id": str(instance.task.pk),
-                },
-            },
-        )
-    else:
-        print("kanbanboard_column_task_assignment_changed: Channel Layer is not available, not sending...")
+    send_kanbanboard_task_assignment_event("kanbanboard_task_assignment_changed", instance)
 
 
 @receiver(post_delete, sender=KanbanBoardColumnTaskAssignment)
@@ -232,40 +146,9 @@ def kanbanboard_column_task_assignment_deleted(instance, *args, **kwargs):
     :param kwargs:
     :return:
     """
-    print("In @post_save of KanbanBoardColumnTaskAssignment: an assignment has been removed")
-
-    # get current channel
-    channel_layer = get_channel_layer()
-
-    # check if channel layer is available (e.g., in unit tests this is not available)
-    # and if the entry for instance.kanban_board_column.kanban_board exists
-    if channel_layer and instance.kanban_board_column.kanban_board is not None:
-        model_name = KanbanBoard.__name__.lower()
-
-        room_group_name = "elements_{model_name}_{model_pk}".format(
-            model_name=model_name, model_pk=instance.kanban_board_column.kanban_board.pk
-        )
-
-        print(f"Sending a notification that an assignment has changed to {room_group_name}")
-
-        # notify this channel that this element has changed
-        async_to_sync(channel_layer.group_send)(
-            room_group_name,
-            {
-                "type": "kanbanboard_task_assignment_deleted",
-                "message": {
-                    "model_name": model_name,
-                    "model_pk": str(instance.kanban_board_column.kanban_board.pk),
-                    "id": str(instance.pk),
-                    "task_id": str(instance.task.pk),
-                },
-            },
-        )
-    else:
-        print(
-            "kanbanboard_column_task_assignment_deleted: Channel Layer is not available or "
-            "instance.kanban_board_column.kanban_board is null, not sending..."
-        )
+    # the entry for instance.kanban_board_column.kanban_board might not exist anymore
+    if instance.kanban_board_column.kanban_board is not None:
+        send_kanbanboard_task_assignment_event("kanbanboard_task_assignment_deleted", instance)
 
 
 @receiver(post_save, sender=KanbanBoardColumn)
@@ -277,38 +160,39 @@ def kanbanboard_column_changed(instance, *args, **kwargs):
     :param kwargs:
     :return:
     """
-    print("In @post_save of KanbanBoardColumn: a column has changed")
+    if not instance.kanban_board:
+        return
 
-    # get current channel
-    channel_layer = get_channel_layer()
+    model_name = KanbanBoard.__name__.lower()
+
+    # notify this channel that this element has changed
+    send_to_group_on_commit(
+        get_element_group_name(model_name, instance.kanban_board.pk),
+        {
+            "type": "kanbanboard_column_changed",
+            "message": {
+                "model_name": model_name,
+                "model_pk": str(instance.kanban_board.pk),
+                "id": str(instance.pk),
+            },
+        },
+    )
 
-    # check if channel layer is available (e.g., in unit tests this is not available)
-    if channel_layer and instance.kanban_board:
-        model_name = KanbanBoard.__name__.lower()
 
-        room_group_name = "elements_{model_name}_{model_pk}".format(
-            model_name=model_name, model_pk=instance.kanban_board.pk
-        )
+def send_labbook_child_element_changed(child_element):
+    model_name = LabBook.__name__.lower()
 
-        print(f"Sending a notification that a column has changed to {room_group_name}")
-
-        # notify this channel that this element has changed
-        transaction.on_commit(
-            lambda: async_to_sync(channel_layer.group_send)(
-                room_group_name,
-                {
-                    "type": "kanbanboard_column_changed",
-                    "message": {
-                        "model_name": model_name,
-                        "model_pk": str(instance.kanban_board.pk),
-                        "id": str(instance.pk),
-                    },
-                },
-            )
-        )
-
-    else:
-        print("kanbanboard_column_changed: Channel Layer is not available, not sending...")
+    send_to_group_on_commit(
+        get_element_group_name(model_name, child_element.lab_book.pk),
+        {
+            "type": "labbook_child_element_changed",
+            "message": {
+                "model_name": model_name,
+                "model_pk": str(child_element.lab_book.pk),
+                "id": str(child_element.pk),
+            },
+        },
+    )
 
 
 @receiver(post_save, sender=LabBookChildElement)
@@ -320,38 +204,33 @@ def labbook_child_element_changed(instance, *args, **kwargs):
     :param kwargs:
     :return:
     """
-    print("In @post_save of LabBookChildelement: a column has changed")
-
-    # get current channel
-    channel_layer = get_channel_layer()
+    if instance.lab_book:
+        send_labbook_child_element_changed(instance)
 
-    # check if channel layer is available (e.g., in unit tests this is not available)
-    if channel_layer and instance.lab_book:
-        model_name = LabBook.__name__.lower()
-
-        room_group_name = "elements_{model_name}_{model_pk}".format(
-            model_name=model_name, model_pk=instance.lab_book.pk
-        )
-
-        print(f"Sending a notification that a child element has changed to {room_group_name}")
-
-        # notify this channel that this element has changed
-        transaction.on_commit(
-            lambda: async_to_sync(channel_layer.group_send)(
-                room_group_name,
-                {
-                    "type": "labbook_child_element_changed",
-                    "message": {
-                        "model_name": model_name,
-                        "model_pk": str(instance.lab_book.pk),
-                        "id": str(instance.pk),
-                    },
-                },
-            )
-        )
 
-    else:
-        print("labbook_child_element_changed: Channel Layer is not available, not sending...")
+@receiver(labbook_child_elements_bulk_updated)
+def labbook_child_elements_bulk_changed(lab_book, child_elements, *args, **kwargs):
+    """
+    Notifies the channel of the labbook about all child elements that have been updated at once with a single event
+    :param eric.labbooks.models.LabBook lab_book: the labbook of the child elements
+    :param list child_elements: the child elements that have been updated
+    :param args:
+    :param kwargs:
+    :return:
+    """
+    model_name = LabBook.__name__.lower()
+
+    send_to_group_on_commit(
+        get_element_group_name(model_name, lab_book.pk),
+        {
+            "type": "labbook_child_element_changed",
+            "message": {
+                "model_name": model_name,
+                "model_pk": str(lab_book.pk),
+                "ids": [str(child_element.pk) for child_element in child_elements],
+            },
+        },
+    )
 
 
 @receiver(post_save, sender=Note)
@@ -371,8 +250,6 @@ def labbook_child_element_object_changed(instance, *args, **kwargs):
     :param kwargs:
     :return:
     """
-    print("In @post_save of labbook_child_element_object_changed: a child element object has changed")
-
     # Check if this object is a LabBook child element
     child_element = (
         LabBookChildElement.objects.editable()
@@ -380,36 +257,5 @@ def labbook_child_element_object_changed(instance, *args, **kwargs):
         .first()
     )
 
-    if not child_element:
-        return
-
-    # get current channel
-    channel_layer = get_channel_layer()
-
-    # check if channel layer is available (e.g., in unit tests this is not available)
-    if channel_layer and child_element.lab_book:
-        model_name = LabBook.__name__.lower()
-
-        room_group_name = "elements_{model_name}_{model_pk}".format(
-            model_name=model_name, model_pk=child_element.lab_book.pk
-        )
-
-        print(f"Sending a notification that a child element object has changed to {room_group_name}")
-
-        # notify this channel that this element has changed
-        transaction.on_commit(
-            lambda: async_to_sync(channel_layer.group_send)(
-                room_group_name,
-                {
-                    "type": "labbook_child_element_changed",
-                    "message": {
-                        "model_name": model_name,
-                        "model_pk": str(child_element.lab_book.pk),
-                        "id": str(child_element.pk),
-                    },
-                },
-            )
-        )
-
-    else:
-        print("labbook_child_element_changed: Channel Layer is not available, not sending...")
+    if child_element and child_element.lab_book:
+        send_labbook_child_element_changed(child_element)
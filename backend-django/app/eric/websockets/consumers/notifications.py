@@ -10,12 +10,23 @@ from django.dispatch import receiver
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 
+from eric.core.signals import export_job_changed
 from eric.notifications.models import Notification
-from eric.websockets.consumers.core import AuthenticatedWorkbenchJsonWebsocketConsumer
+from eric.notifications.signals import notifications_bulk_created
+from eric.websockets.consumers.core import AuthenticatedWorkbenchAsyncJsonWebsocketConsumer
 
 NOTIFICATION_CHANNEL_GROUP = "notifications_user_{user_pk}"
 
 
+def send_notification_changed(channel_layer, notification):
+    # group name
+    group_name = NOTIFICATION_CHANNEL_GROUP.format(user_pk=notification.user_id)
+
+    async_to_sync(channel_layer.group_send)(
+        group_name, {"type": "notification_changed", "message": {"pk": str(notification.pk)}}
+    )
+
+
 @receiver(post_save, sender=Notification)
 def notification_has_changed(instance, created, *args, **kwargs):
     # send an info to the channel of the current user
@@ -25,15 +36,42 @@ def notification_has_changed(instance, created, *args, **kwargs):
 
     # check if channel layer is available (e.g., in unit tests this is not available)
     if channel_layer:
-        # group name
-        group_name = NOTIFICATION_CHANNEL_GROUP.format(user_pk=instance.user.pk)
+        send_notification_changed(channel_layer, instance)
+
+
+@receiver(notifications_bulk_created)
+def notifications_have_been_created(notifications, *args, **kwargs):
+    # send an info to the channels of the users of the created notifications
+    channel_layer = get_channel_layer()
+
+    if channel_layer:
+        for notification in notifications:
+            send_notification_changed(channel_layer, notification)
+
+
+@receiver(export_job_changed)
+def export_job_has_changed(job, *args, **kwargs):
+    # send an info to the channel of the user that started the export job
+    channel_layer = get_channel_layer()
+
+    if channel_layer:
+        group_name = NOTIFICATION_CHANNEL_GROUP.format(user_pk=job["user_pk"])
 
         async_to_sync(channel_layer.group_send)(
-            group_name, {"type": "notification_changed", "message": {"pk": str(instance.pk)}}
+            group_name,
+            {
+                "type": "export_job_changed",
+                "message": {
+                    "job_id": job["job_id"],
+                    "model": job["model"],
+                    "pk": job["object_pk"],
+                    "status": job["status"],
+                },
+            },
         )
 
 
-class NotificationConsumer(AuthenticatedWorkbenchJsonWebsocketConsumer):
+class NotificationConsumer(AuthenticatedWorkbenchAsyncJsonWebsocketConsumer):
     """
     A Websocket consumer that lets the user watch their notifications
 
@@ -43,20 +81,20 @@ class NotificationConsumer(AuthenticatedWorkbenchJsonWebsocketConsumer):
 
     group_name = None
 
-    def connect(self):
+    async def connect(self):
         # we're accepting any connection, auth is handled in the superclass
-        self.accept()
+        await self.accept()
 
-    def disconnect(self, close_code):
+    async def disconnect(self, close_code):
         if self.group_name:
             # Leave notification group with this channel
-            async_to_sync(self.channel_layer.group_discard)(self.group_name, self.channel_name)
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
 
-    def receive_json_authenticated(self, content, **kwargs):
+    async def receive_json_authenticated(self, content, **kwargs):
         # we do not expect the user to send anything over this channel
         pass
 
-    def authentication_success(self, user):
+    async def authentication_success(self, user):
         """
         If authentication was successful, we can subscribe to the users notification stream
         """
@@ -64,9 +102,9 @@ class NotificationConsumer(AuthenticatedWorkbenchJsonWebsocketConsumer):
         self.group_name = NOTIFICATION_CHANNEL_GROUP.format(user_pk=user.pk)
 
         # Join notification group with the current channel
-        async_to_sync(self.channel_layer.group_add)(self.group_name, self.channel_name)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
 
-    def notification_changed(self, event):
+    async def notification_changed(self, event):
         """
         Event fired when a notification has changed
 
@@ -75,4 +113,15 @@ class NotificationConsumer(AuthenticatedWorkbenchJsonWebsocketConsumer):
         message = event["message"]
 
         # Send message to WebSocket
-        self.send(text_data=json.dumps({"message": message}))
+        await self.send(text_data=json.dumps({"message": message}))
+
+    async def export_job_changed(self, event):
+        """
+        Event fired when the status of an export job of the user has changed
+
+        Notify the current channel about this change (the download link is provided by the export job endpoint)
+        """
+        message = event["message"]
+
+        # Send message to WebSocket
+        await self.send(text_data=json.dumps({"export_job": message}))
@@ -2,22 +2,27 @@
 # Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
 # SPDX-License-Identifier: AGPL-3.0-or-later
 #
-import json
+import asyncio
+
+from django.conf import settings
 
 from rest_framework.exceptions import ValidationError
 
-from asgiref.sync import async_to_sync
 from django_userforeignkey.request import get_current_user
 
 from eric.core.models import LockMixin
 from eric.core.models.abstract import get_all_workbench_models
 from eric.projects.rest.serializers.element_lock import ElementLockSerializer
-from eric.websockets.consumers.core import AuthenticatedWorkbenchJsonWebsocketConsumer
+from eric.websockets.consumers.core import AuthenticatedWorkbenchAsyncJsonWebsocketConsumer
+from eric.websockets.events import get_element_group_name
 
 
-class WorkbenchElementConsumer(AuthenticatedWorkbenchJsonWebsocketConsumer):
+class WorkbenchElementConsumer(AuthenticatedWorkbenchAsyncJsonWebsocketConsumer):
     """
     WebSocket Consumer that allows subscribing to a workbench element and propagates those changes to the user
+
+    element_changed events of the same element are coalesced: the first change is sent immediately, further changes
+    within WEBSOCKET_ELEMENT_CHANGED_COALESCE_WINDOW are sent as one event with the latest version after the window.
     """
 
     ALLOWED_ACTIONS = ["subscribe", "unsubscribe", "unsubscribe_all", "lock", "unlock"]
@@ -25,11 +30,14 @@ class WorkbenchElementConsumer(AuthenticatedWorkbenchJsonWebsocketConsumer):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.group_names = []
+        # (model_name, model_pk) -> latest pending element_changed message (or None) of an open coalesce window
+        self.pending_element_changes = {}
+        self.element_changed_tasks = {}
 
-    def authentication_success(self, user):
+    async def authentication_success(self, user):
         pass
 
-    def receive_json_authenticated(self, content):
+    async def receive_json_authenticated(self, content):
         """
         Data is being received on the websocket and dispatched to the appropriate sub-methods
         :param content:
@@ -45,19 +53,19 @@ class WorkbenchElementConsumer(AuthenticatedWorkbenchJsonWebsocketConsumer):
                 if hasattr(self, action) and callable(getattr(self, action)):
                     # call it
                     action_method = getattr(self, action)
-                    action_method(content)
+                    await action_method(content)
                 else:
                     # method not found
                     print(f"Method {action} not found")
         else:
             print("Please use the 'action' attribute in your JSON")
 
-    def connect(self, **kwargs):
+    async def connect(self, **kwargs):
         # we're accepting any connection, auth is handled in the `authentication_success` method in
-        # `AuthenticatedWorkbenchJsonWebsocketConsumer`
-        self.accept()
+        # `AuthenticatedWorkbenchAsyncJsonWebsocketConsumer`
+        await self.accept()
 
-    def disconnect(self, *args, **kwargs):
+    async def disconnect(self, *args, **kwargs):
         # remove the channel from all groups it is listening on
         print("Disconnecting...")
 
@@ -65,7 +73,14 @@ class WorkbenchElementConsumer(AuthenticatedWorkbenchJsonWebsocketConsumer):
             print(f"Removing channel from group {group_name}")
 
             # Leave group with this channel
-            async_to_sync(self.channel_layer.group_discard)(group_name, self.channel_name)
+            await self.channel_layer.group_discard(group_name, self.channel_name)
+
+        # pending element_changed events can not be sent anymore
+        for task in self.element_changed_tasks.values():
+            task.cancel()
+
+        self.element_changed_tasks = {}
+        self.pending_element_changes = {}
 
     @staticmethod
     def check_workbench_params(data, check_viewable=True):
@@ -104,8 +119,7 @@ class WorkbenchElementConsumer(AuthenticatedWorkbenchJsonWebsocketConsumer):
                 # make sure the element is viewable (if check_viewable is true)
                 if not check_viewable or element.is_viewable():
                     # generate group name
-                    # ToDo: this should be a static method somewhere, as it's also used in handlers.py
-                    group_name = f"elements_{model_name}_{model_pk}"
+                    group_name = get_element_group_name(model_name, model_pk)
 
                     return element, group_name
         else:
@@ -114,58 +128,67 @@ class WorkbenchElementConsumer(AuthenticatedWorkbenchJsonWebsocketConsumer):
         # else:
         return None, None
 
-    def subscribe(self, text_data_json):
+    def get_lock_message(self, element):
+        """
+        Returns the element_lock_changed message for the element if it is currently locked, else None
+        """
+        element_lock = element.get_lock_element().first()
+
+        if element_lock is None:
+            return None
+
+        return {
+            "locked": True,
+            "lock_details": ElementLockSerializer(element_lock, context={"request": self.scope["request"]}).data,
+            "model_name": element.__class__.__name__.lower(),
+            "model_pk": str(element.pk),
+        }
+
+    def get_subscription(self, text_data_json):
+        """
+        Returns a tuple of the group name of the element and the lock message (if the element is currently locked)
+        """
+        element, group_name = self.check_workbench_params(text_data_json)
+
+        if element and group_name:
+            return group_name, self.get_lock_message(element)
+
+        return None, None
+
+    async def subscribe(self, text_data_json):
         """
         Subscribe to an element
         :param text_data_json: contains the model_name and the model_pk that the user wants to subscribe to
         :return:
         """
-        element, group_name = self.check_workbench_params(text_data_json)
+        group_name, lock_message = await self.run_in_request_context(self.get_subscription, text_data_json)
 
-        if element and group_name:
+        if group_name:
             self.group_names.append(group_name)
 
             print(f"subscribing to {group_name}")
 
             # Join room group for this element with this channel
-            async_to_sync(self.channel_layer.group_add)(group_name, self.channel_name)
-
-            # Figure out whether this element is locked and send a lock message
-            element_lock = element.get_lock_element()
-
-            model_name = element.__class__.__name__.lower()
+            await self.channel_layer.group_add(group_name, self.channel_name)
 
-            if element_lock.exists():
+            if lock_message:
                 # element is currently locked, send out a message
-                element_lock = element_lock.first()
-
-                self.send(
-                    text_data=json.dumps(
-                        {
-                            "element_lock_changed": {
-                                "locked": True,
-                                "lock_details": ElementLockSerializer(
-                                    element_lock, context={"request": self.scope["request"]}
-                                ).data,
-                                "model_name": model_name,
-                                "model_pk": str(element.pk),
-                            }
-                        }
-                    )
-                )
+                await self.send_json({"element_lock_changed": lock_message})
 
             return
 
         # else:
         print(f"Can not subscribe to {text_data_json}")
 
-    def unsubscribe(self, text_data_json):
+    async def unsubscribe(self, text_data_json):
         """
         Unsubscribe from an element
         :param text_data_json:
         :return:
         """
-        element, group_name = self.check_workbench_params(text_data_json, check_viewable=False)
+        element, group_name = await self.run_in_request_context(
+            self.check_workbench_params, text_data_json, check_viewable=False
+        )
 
         if element and group_name:
             if group_name in self.group_names:
@@ -174,13 +197,13 @@ class WorkbenchElementConsumer(AuthenticatedWorkbenchJsonWebsocketConsumer):
                 print(f"User is unsubscribing from {group_name}")
 
                 # Leave group with this channel
-                async_to_sync(self.channel_layer.group_discard)(group_name, self.channel_name)
+                await self.channel_layer.group_discard(group_name, self.channel_name)
             else:
                 print(f"Group_name {group_name} is not in self.group_names")
         else:
             print("Trying to unsubscribe from an element that does not exist...")
 
-    def unsubscribe_all(self, text_data_json):
+    async def unsubscribe_all(self, text_data_json):
         """
         Unsubscribe from all subscribed elements (probably in preparation of a disconnect)
         :param text_data_json:
@@ -190,9 +213,27 @@ class WorkbenchElementConsumer(AuthenticatedWorkbenchJsonWebsocketConsumer):
             print(f"Removing channel from group {group_name}")
 
             # Leave group with this channel
-            async_to_sync(self.channel_layer.group_discard)(group_name, self.channel_name)
+            await self.channel_layer.group_discard(group_name, self.channel_name)
 
-    def element_lock_changed(self, event):
+    def get_lock_changed_message(self, message):
+        if not message["locked"]:
+            return message
+
+        # this message contains a model_name and model_pk, let's find out what model this is
+        element, group_name = self.check_workbench_params(message, check_viewable=False)
+
+        lock_message = self.get_lock_message(element)
+
+        if lock_message is None:
+            # message['locked’] says that it is locked, but apparently it is not locked.. or at least not in the db
+            raise ValidationError("Model should be locked, but is not locked...")
+
+        # serialize all the necessary details about the lock
+        message["lock_details"] = lock_message["lock_details"]
+
+        return message
+
+    async def element_lock_changed(self, event):
         """
         Event fired when an element lock has changed
         :param event:
@@ -202,28 +243,11 @@ class WorkbenchElementConsumer(AuthenticatedWorkbenchJsonWebsocketConsumer):
 
         print("Element lock has changed:", message)
 
-        if message["locked"]:
-            # this message contains a model_name and model_pk, let's find out what model this is
-            element, group_name = self.check_workbench_params(message, check_viewable=False)
-
-            element_lock = element.get_lock_element()
+        message = await self.run_in_request_context(self.get_lock_changed_message, message)
 
-            if element_lock.exists():
-                element_lock = element_lock.first()
+        await self.send_json({"element_lock_changed": message})
 
-                # serialize all the necessary details about the lock
-                message["lock_details"] = ElementLockSerializer(
-                    element_lock, context={"request": self.scope["request"]}
-                ).data
-
-                self.send(text_data=json.dumps({"element_lock_changed": message}))
-            else:
-                # message['locked’] says that it is locked, but apparently it is not locked.. or at least not in the db
-                raise ValidationError("Model should be locked, but is not locked...")
-
-        self.send(text_data=json.dumps({"element_lock_changed": message}))
-
-    def element_changed(self, event):
+    async def element_changed(self, event):
         """
         Event fired when an element has changed
 
@@ -232,25 +256,61 @@ class WorkbenchElementConsumer(AuthenticatedWorkbenchJsonWebsocketConsumer):
         :return:
         """
         message = event["message"]
+        window = settings.WEBSOCKET_ELEMENT_CHANGED_COALESCE_WINDOW
+
+        if not window:
+            await self.send_json({"element_changed": message})
+            return
+
+        key = (message["model_name"], message["model_pk"])
 
-        self.send(text_data=json.dumps({"element_changed": message}))
+        if key in self.pending_element_changes:
+            # a change of this element has been sent recently, the latest change is sent once the window is over
+            self.pending_element_changes[key] = message
+            return
+
+        self.pending_element_changes[key] = None
+
+        await self.send_json({"element_changed": message})
+
+        self.element_changed_tasks[key] = asyncio.ensure_future(self.send_coalesced_element_changes(key, window))
+
+    async def send_coalesced_element_changes(self, key, window):
+        """
+        Sends the latest pending change of an element at the end of every coalesce window, until there is a window
+        without any change
+        """
+        while True:
+            await asyncio.sleep(window)
 
-    def kanbanboard_task_assignment_deleted(self, event):
+            message = self.pending_element_changes.get(key)
+
+            if message is None:
+                break
+
+            self.pending_element_changes[key] = None
+
+            await self.send_json({"element_changed": message})
+
+        self.pending_element_changes.pop(key, None)
+        self.element_changed_tasks.pop(key, None)
+
+    async def kanbanboard_task_assignment_deleted(self, event):
         message = event["message"]
 
-        self.send(text_data=json.dumps({"kanbanboard_task_assignment_deleted": message}))
+        await self.send_json({"kanbanboard_task_assignment_deleted": message})
 
-    def kanbanboard_task_assignment_changed(self, event):
+    async def kanbanboard_task_assignment_changed(self, event):
         message = event["message"]
 
-        self.send(text_data=json.dumps({"kanbanboard_task_assignment_changed": message}))
+        await self.send_json({"kanbanboard_task_assignment_changed": message})
 
-    def kanbanboard_column_changed(self, event):
+    async def kanbanboard_column_changed(self, event):
         message = event["message"]
 
-        self.send(text_data=json.dumps({"kanbanboard_column_changed": message}))
+        await self.send_json({"kanbanboard_column_changed": message})
 
-    def element_relations_changed(self, event):
+    async def element_relations_changed(self, event):
         """
         Event fired when the relations of an element have changed
         :param event:
@@ -258,21 +318,21 @@ class WorkbenchElementConsumer(AuthenticatedWorkbenchJsonWebsocketConsumer):
         """
         message = event["message"]
 
-        self.send(text_data=json.dumps({"element_relations_changed": message}))
+        await self.send_json({"element_relations_changed": message})
 
-    def labbook_child_element_changed(self, event):
+    async def labbook_child_element_changed(self, event):
         """
         Event fired when the child element of a labbook has changed
+        The message contains either the "id" of the child element, or the "ids" of several child elements that have
+        been updated at once
         :param event:
         :return:
         """
         message = event["message"]
 
-        self.send(text_data=json.dumps({"labbook_child_element_changed": message}))
-
-    def lock(self, text_data_json):
-        print("locking")
+        await self.send_json({"labbook_child_element_changed": message})
 
+    def lock_element(self, text_data_json):
         element, group_name = self.check_workbench_params(text_data_json)
 
         element_lock = element.get_lock_element()
@@ -281,9 +341,12 @@ class WorkbenchElementConsumer(AuthenticatedWorkbenchJsonWebsocketConsumer):
             # not locked, try to lock it
             element.lock()
 
-    def unlock(self, text_data_json):
-        print("trying to unlock...")
+    async def lock(self, text_data_json):
+        print("locking")
+
+        await self.run_in_request_context(self.lock_element, text_data_json)
 
+    def unlock_element(self, text_data_json):
         element, group_name = self.check_workbench_params(text_data_json)
 
         element_lock = element.get_lock_element()
@@ -299,3 +362,8 @@ class WorkbenchElementConsumer(AuthenticatedWorkbenchJsonWebsocketConsumer):
                 print("Locked by another user, can not unlock")
         else:
             print("Trying to unlock an element that is not locked... this should not happen")
+
+    async def unlock(self, text_data_json):
+        print("trying to unlock...")
+
+        await self.run_in_request_context(self.unlock_element, text_data_json)
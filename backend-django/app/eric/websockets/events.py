@@ -0,0 +1,92 @@
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+"""
+Sends events to channel groups (e.g., the websocket room of a workbench element).
+
+Events that are sent within a transaction are sent once the transaction has been committed. Events of the same type for
+the same group (and the same sub element, e.g., the same LabBook child element) within one transaction are coalesced
+into a single event (the last one wins), so bulk operations do not flood the clients with messages.
+"""
+import threading
+
+from django.db import transaction
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+_local = threading.local()
+
+
+def get_element_group_name(model_name, model_pk):
+    """
+    Returns the name of the channel group of a workbench element
+    """
+    return f"elements_{model_name}_{model_pk}"
+
+
+def send_to_group(group_name, event):
+    """
+    Sends the event to the channel group immediately
+    """
+    channel_layer = get_channel_layer()
+
+    # check if channel layer is available (e.g., in unit tests this is not available)
+    if channel_layer:
+        async_to_sync(channel_layer.group_send)(group_name, event)
+
+
+class PendingGroupEvents:
+    """
+    The coalesced events of the current transaction, which are sent once the transaction has been committed
+    """
+
+    def __init__(self):
+        self.events = {}
+        # keep a reference to the bound method, so it can be found in the on_commit callbacks of the connection
+        self.send = self.send_all
+
+    def add(self, key, group_name, event):
+        # move the key to the end, so events are sent in the order of their last occurrence
+        self.events.pop(key, None)
+        self.events[key] = (group_name, event)
+
+    def send_all(self):
+        if getattr(_local, "pending_events", None) is self:
+            _local.pending_events = None
+
+        for group_name, event in self.events.values():
+            send_to_group(group_name, event)
+
+
+def _get_pending_events(connection):
+    pending_events = getattr(_local, "pending_events", None)
+
+    # the pending events of a previous transaction have either been sent or discarded with a rollback
+    if pending_events is None or not any(callback[1] is pending_events.send for callback in connection.run_on_commit):
+        pending_events = PendingGroupEvents()
+        _local.pending_events = pending_events
+        transaction.on_commit(pending_events.send)
+
+    return pending_events
+
+
+def send_to_group_on_commit(group_name, event, coalesce_key=None):
+    """
+    Sends the event to the channel group once the current transaction has been committed (or immediately, if there is
+    no transaction). Events with the same coalesce key within one transaction are only sent once (the last one wins).
+    :param group_name: name of the channel group
+    :param event: dict with the type and the message of the event
+    :param coalesce_key: defaults to the group name, the event type and the id of the message (if any)
+    """
+    connection = transaction.get_connection()
+
+    if not connection.in_atomic_block:
+        send_to_group(group_name, event)
+        return
+
+    if coalesce_key is None:
+        coalesce_key = (group_name, event["type"], event.get("message", {}).get("id"))
+
+    _get_pending_events(connection).add(coalesce_key, group_name, event)
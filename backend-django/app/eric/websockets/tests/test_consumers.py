@@ -0,0 +1,124 @@
+#
+# Copyright (C) 2016-present TU Muenchen and contributors of ANEXIA Internetdienstleistungs GmbH
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.test import override_settings
+
+from rest_framework.test import APITransactionTestCase
+
+from channels.db import database_sync_to_async
+from channels.testing import WebsocketCommunicator
+
+from eric.core.tests import HTTP_USER_AGENT, REMOTE_ADDR
+from eric.core.tests.test_utils import FakeRequest, FakeRequestUser
+from eric.projects.tests.core import AuthenticationMixin
+from eric.shared_elements.models import Note
+from eric.websockets.consumers import WorkbenchElementConsumer
+
+User = get_user_model()
+
+COALESCE_WINDOW = 0.5
+
+
+@override_settings(
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+    WEBSOCKET_ELEMENT_CHANGED_COALESCE_WINDOW=COALESCE_WINDOW,
+)
+class WorkbenchElementConsumerTest(APITransactionTestCase, AuthenticationMixin):
+    """
+    Tests the websocket of workbench elements (/ws/elements/)
+    The consumer accesses the database from worker threads, therefore the changes of the tests need to be committed
+    """
+
+    serialized_rollback = True
+
+    def setUp(self):
+        self.user1 = User.objects.create_user(username="student_1", email="student_1@email.com", password="top_secret")
+        self.user1.groups.add(Group.objects.get(name="User"))
+        self.token1 = self.login_and_return_token("student_1", "top_secret", HTTP_USER_AGENT, REMOTE_ADDR)
+
+        with FakeRequest(), FakeRequestUser(self.user1):
+            self.note = Note.objects.create(subject="My note", content="Some content")
+
+        self.subscription = {"model_name": "note", "model_pk": str(self.note.pk)}
+
+    def update_note(self, subject):
+        with FakeRequest(), FakeRequestUser(self.user1):
+            note = Note.objects.get(pk=self.note.pk)
+            note.subject = subject
+            note.save()
+
+        return Note.objects.get(pk=self.note.pk).version_number
+
+    async def connect_and_authenticate(self):
+        communicator = WebsocketCommunicator(
+            WorkbenchElementConsumer.as_asgi(),
+            "/ws/elements/",
+            headers=[(b"user-agent", HTTP_USER_AGENT.encode())],
+        )
+
+        connected, subprotocol = await communicator.connect()
+        self.assertTrue(connected)
+
+        await communicator.send_json_to({"authorization": self.token1})
+        self.assertEqual(await communicator.receive_json_from(), {"auth_success": True})
+
+        return communicator
+
+    async def subscribe(self, communicator):
+        await communicator.send_json_to({"action": "subscribe", **self.subscription})
+
+        # subscribing to an element that is not locked does not send anything
+        self.assertTrue(await communicator.receive_nothing())
+
+    async def test_subscribe_and_receive_element_changes(self):
+        communicator = await self.connect_and_authenticate()
+        await self.subscribe(communicator)
+
+        version = await database_sync_to_async(self.update_note)("Changed subject")
+
+        self.assertEqual(
+            await communicator.receive_json_from(timeout=COALESCE_WINDOW),
+            {"element_changed": {**self.subscription, "version": version}},
+        )
+
+        await communicator.disconnect()
+
+    async def test_burst_of_changes_is_coalesced(self):
+        communicator = await self.connect_and_authenticate()
+        await self.subscribe(communicator)
+
+        versions = []
+        for i in range(5):
+            versions.append(await database_sync_to_async(self.update_note)(f"Changed subject {i}"))
+
+        # the first change is sent immediately
+        self.assertEqual(
+            await communicator.receive_json_from(timeout=COALESCE_WINDOW),
+            {"element_changed": {**self.subscription, "version": versions[0]}},
+        )
+
+        # all further changes are sent as one message with the latest version at the end of the window
+        self.assertEqual(
+            await communicator.receive_json_from(timeout=COALESCE_WINDOW * 4),
+            {"element_changed": {**self.subscription, "version": versions[-1]}},
+        )
+
+        self.assertTrue(await communicator.receive_nothing(timeout=COALESCE_WINDOW * 2))
+
+        await communicator.disconnect()
+
+    async def test_no_element_changes_after_unsubscribe(self):
+        communicator = await self.connect_and_authenticate()
+        await self.subscribe(communicator)
+
+        await communicator.send_json_to({"action": "unsubscribe", **self.subscription})
+        self.assertTrue(await communicator.receive_nothing())
+
+        await database_sync_to_async(self.update_note)("Changed subject")
+
+        self.assertTrue(await communicator.receive_nothing(timeout=COALESCE_WINDOW * 2))
+
+        await communicator.disconnect()
@@ -103,6 +103,17 @@ export class LabBookDrawBoardPictureComponent implements OnInit {
     return { ownUser: false, user: null };
   }
 
+  public get renderedImagePreview(): string | undefined {
+    const url = this.initialState?.download_rendered_image;
+
+    if (!url) {
+      return url;
+    }
+
+    // the LabBook only shows a scaled down preview, the full image is available in the picture editor
+    return `${url}${url.includes('?') ? '&' : '?'}size=1024`;
+  }
+
   private get picture(): Pick<PicturePayload, 'title'> {
     return {
       title: this.f.title.value!,
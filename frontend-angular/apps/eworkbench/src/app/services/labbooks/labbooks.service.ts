@@ -144,8 +144,8 @@ export class LabBooksService
     return this.httpClient.delete<void>(`${this.apiUrl}${id}/elements/${elementId}/`);
   }
 
-  public updateAllElements(id: string, elements: LabBookElementPayload[]): Observable<string[]> {
-    return this.httpClient.put<string[]>(`${this.apiUrl}${id}/elements/update_all/`, elements);
+  public updateAllElements(id: string, elements: LabBookElementPayload[]): Observable<{ changed: LabBookElementPayload[] }> {
+    return this.httpClient.put<{ changed: LabBookElementPayload[] }>(`${this.apiUrl}${id}/elements/update_all/`, elements);
   }
 
   public history(id: string, params = new HttpParams()): Observable<RecentChanges[]> {
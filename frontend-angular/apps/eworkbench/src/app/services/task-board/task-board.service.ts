@@ -162,8 +162,8 @@ export class TaskBoardsService implements TableViewService, ExportService, Permi
     id: string,
     task: { assignment_pk: string; to_column: string; to_index: number },
     params = new HttpParams()
-  ): Observable<TaskBoardColumn[]> {
-    return this.httpClient.put<TaskBoardColumn[]>(`${this.apiUrl}${id}/tasks/move_assignment/`, task, { params });
+  ): Observable<KanbanTask[]> {
+    return this.httpClient.put<KanbanTask[]>(`${this.apiUrl}${id}/tasks/move_assignment/`, task, { params });
   }
 
   public deleteCard(id: string, taskId: string, params = new HttpParams()): Observable<void> {
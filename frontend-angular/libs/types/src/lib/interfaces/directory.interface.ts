@@ -19,6 +19,7 @@ export interface Directory {
   display: string;
   download_directory: string;
   drive_id: string;
+  file_size: number;
   imported: boolean;
   is_virtual_root: boolean;
   last_modified_at: string;